@@ -0,0 +1,86 @@
+# api/budget.py
+#
+# Предварительная оценка расхода DP-бюджета по конфигу — до постановки запуска
+# в очередь (GET /configs/{name}/privacy-budget, проверка в POST /runs).
+#
+# Считается аналитическим RDP-accountant-ом shared/dp_accounting.py по
+# расписанию DP-SGD генератора: torch / SmartNoise / Opacus в Gateway не нужны.
+#
+# Бюджет, с которым сравнивается кривая ε:
+#   dpctgan — epsilon - preprocessor_eps (SmartNoise останавливает обучение сам);
+#   dptvae  — thresholds.max_spent_epsilon (sigma фиксирована, обучаются все
+#             эпохи; без порога бюджет не задан).
+#
+# n_rows — строки обучающей выборки. Если не передано, берётся из CSV конфига:
+# min(строки, pipeline.sample_size) минус holdout (как train_test_split в
+# Data Service). Предобработка может убрать часть строк — это оценка.
+
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import Any, Optional
+
+from api.schemas.configs import PrivacyBudgetEstimate
+from shared.dp_accounting import (
+    dpctgan_steps_per_epoch,
+    dptvae_steps_per_epoch,
+    estimate_budget,
+)
+
+
+def train_rows(cfg: Any, base_dir: Path) -> Optional[int]:
+    """Ожидаемый размер train по конфигу; None — источник не CSV или файла нет."""
+    if cfg.data_import.type != "csv":
+        return None
+    path = base_dir / cfg.data_import.path
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        rows = sum(1 for _ in f) - 1  # минус заголовок
+    if 0 < cfg.pipeline.sample_size < rows:
+        rows = cfg.pipeline.sample_size
+    return rows - math.ceil(rows * cfg.pipeline.holdout_size)
+
+
+def estimate_privacy_budget(
+    config_name: str,
+    cfg: Any,
+    n_rows: int,
+) -> Optional[PrivacyBudgetEstimate]:
+    """Оценка для DP-генератора из cfg (AppConfig); None — генератор без DP."""
+    gen = cfg.generator
+    if gen.generator_type == "dpctgan" and not gen.disabled_dp:
+        steps = dpctgan_steps_per_epoch(n_rows, gen.batch_size, gen.loss)
+        budget: Optional[float] = gen.epsilon - gen.preprocessor_eps
+    elif gen.generator_type == "dptvae":
+        steps = dptvae_steps_per_epoch(n_rows, gen.batch_size)
+        budget = cfg.thresholds.max_spent_epsilon
+    else:
+        return None
+
+    estimate = estimate_budget(
+        n_rows=n_rows,
+        batch_size=gen.batch_size,
+        sigma=gen.sigma,
+        epochs=gen.epochs,
+        steps_per_epoch=steps,
+        delta=gen.delta,
+        epsilon_budget=budget,
+    )
+    return PrivacyBudgetEstimate(
+        config_name=config_name,
+        generator_type=gen.generator_type,
+        n_rows=estimate.n_rows,
+        batch_size=estimate.batch_size,
+        sigma=estimate.sigma,
+        delta=estimate.delta,
+        sample_rate=estimate.sample_rate,
+        steps_per_epoch=estimate.steps_per_epoch,
+        epochs_requested=estimate.epochs_requested,
+        epsilon_at_requested=estimate.epsilon_at_requested,
+        epsilon_budget=estimate.epsilon_budget,
+        max_epochs=estimate.max_epochs,
+        within_budget=estimate.within_budget,
+        epsilon_curve=estimate.epsilon_curve,
+    )
@@ -6,12 +6,29 @@
 
 from __future__ import annotations
 
+import logging
 import time
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 
 import httpx
 
+from shared.schemas.synthesis import JOB_ERROR_WORKER_CRASHED
+
+logger = logging.getLogger(__name__)
+
+
+class SynthesisJobCancelled(RuntimeError):
+    """Джоб синтеза отменён через DELETE /jobs/{id} — повторять его не нужно."""
+
+
+class SynthesisJobFailed(RuntimeError):
+    """Джоб синтеза завершился со status=failed; error_code — код причины из SynthesisJobSummary."""
+
+    def __init__(self, message: str, error_code: Optional[str] = None) -> None:
+        super().__init__(message)
+        self.error_code = error_code
+
 
 class ServiceClient:
     """Тонкая обёртка вокруг httpx для вызова одного микросервиса."""
@@ -52,21 +69,77 @@ def poll_synthesis_job(
     job_id: str,
     poll_interval: int = 10,
     timeout: int = 7200,
+    queue_timeout: int = 86400,
 ) -> Dict[str, Any]:
     """
-    Ждёт завершения джоба синтеза (done / failed).
+    Ждёт завершения джоба синтеза (done / failed / cancelled).
     Возвращает финальный SynthesisJobSummary dict.
-    Бросает RuntimeError если джоб упал или исчерпан таймаут.
+    Бросает SynthesisJobFailed если джоб упал, SynthesisJobCancelled — если отменён,
+    TimeoutError — если исчерпан таймаут. Время ожидания в очереди
+    synthesis_service (status=queued) в timeout не входит и ограничено
+    отдельно — queue_timeout: зависшая очередь не опрашивается бесконечно.
     """
     elapsed = 0
+    queued = 0
     while elapsed < timeout:
         time.sleep(poll_interval)
-        elapsed += poll_interval
         job = client.get(f"/api/v1/jobs/{job_id}")
+        if job["status"] == "queued":
+            queued += poll_interval
+            if queued >= queue_timeout:
+                raise TimeoutError(f"Synthesis job {job_id} stayed queued for {queue_timeout}s")
+        else:
+            elapsed += poll_interval
         if job["status"] == "done":
             return job
         if job["status"] == "failed":
-            raise RuntimeError(f"Synthesis job failed: {job.get('error_message')}")
+            raise SynthesisJobFailed(
+                f"Synthesis job failed: {job.get('error_message')}", error_code=job.get("error_code"),
+            )
         if job["status"] == "cancelled":
-            raise RuntimeError(f"Synthesis job {job_id} was cancelled")
+            raise SynthesisJobCancelled(f"Synthesis job {job_id} was cancelled")
     raise TimeoutError(f"Synthesis job {job_id} timed out after {timeout}s")
+
+
+def run_synthesis_job(
+    client: ServiceClient,
+    body: Dict[str, Any],
+    retries: int = 1,
+    poll_interval: int = 10,
+    timeout: int = 7200,
+    queue_timeout: int = 86400,
+    on_submit: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    POST /jobs + poll_synthesis_job с повторной отправкой.
+
+    Если джоб пропал (synthesis_service перезапущен / вытеснен — 404 или обрыв
+    соединения) или его процесс обучения завершился аварийно (error_code
+    WORKER_CRASHED), тот же body отправляется заново, до retries раз.
+    С checkpoint_key в body обучение продолжится с последнего чекпоинта,
+    а не с нуля. Джоб, упавший с ошибкой обучения (данные, конфиг), и
+    отменённый джоб не повторяются: повтор дал бы тот же результат.
+    on_submit(job_id) вызывается после каждой отправки.
+    """
+    attempt = 0
+    while True:
+        job_id = client.post("/api/v1/jobs", json=body)["job_id"]
+        if on_submit is not None:
+            on_submit(job_id)
+        try:
+            return poll_synthesis_job(
+                client, job_id, poll_interval=poll_interval, timeout=timeout, queue_timeout=queue_timeout,
+            )
+        except (SynthesisJobFailed, httpx.TransportError, httpx.HTTPStatusError) as e:
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code != 404:
+                raise
+            if isinstance(e, SynthesisJobFailed) and e.error_code != JOB_ERROR_WORKER_CRASHED:
+                raise
+            if attempt >= retries:
+                raise
+            attempt += 1
+            logger.warning(
+                "Synthesis job %s lost (%s) — resubmitting (attempt %d/%d)",
+                job_id, e, attempt, retries,
+            )
+            time.sleep(poll_interval)
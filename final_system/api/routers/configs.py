@@ -5,14 +5,15 @@ from __future__ import annotations
 import math
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import yaml
 from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
 from fastapi.responses import PlainTextResponse
 
+from api.budget import estimate_privacy_budget, train_rows
 from api.dependencies import require_auth
-from api.schemas.configs import ConfigSummary, ConfigValidationResult
+from api.schemas.configs import ConfigSummary, ConfigValidationResult, PrivacyBudgetEstimate
 from api.settings import Settings, get_settings
 
 router = APIRouter(prefix="/configs", tags=["configs"])
@@ -152,6 +153,48 @@ def get_config(
     return PlainTextResponse(path.read_text(encoding="utf-8"), media_type="application/x-yaml")
 
 
+# ──────────────────────────────────────────────────────────────────────────────
+# GET /configs/{name}/privacy-budget
+# ──────────────────────────────────────────────────────────────────────────────
+
+@router.get("/{name}/privacy-budget", response_model=PrivacyBudgetEstimate)
+def get_privacy_budget(
+    name:       str,
+    n_rows:     Optional[int] = Query(None, ge=1),
+    quick_test: bool = Query(False),
+    settings:   Settings = Depends(get_settings),
+    _: None = Depends(require_auth),
+) -> PrivacyBudgetEstimate:
+    """Аналитическая кривая ε по эпохам и максимум эпох в бюджете (без обучения)."""
+    path = settings.configs_dir / f"{name}.yaml"
+    if not path.exists():
+        raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": f"Конфиг '{name}' не найден"})
+
+    from config_loader import apply_quick_test, load_config
+    cfg = load_config(str(path))
+    if quick_test:
+        cfg = apply_quick_test(cfg)
+
+    if n_rows is None:
+        n_rows = train_rows(cfg, settings.base_dir)
+    if n_rows is None:
+        raise HTTPException(
+            status_code=422,
+            detail={"code": "VALIDATION_ERROR", "message": "Размер выборки неизвестен (источник не CSV) — передайте n_rows"},
+        )
+
+    estimate = estimate_privacy_budget(name, cfg, n_rows)
+    if estimate is None:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "code": "VALIDATION_ERROR",
+                "message": f"Генератор '{cfg.generator.generator_type}' не использует DP — бюджет не расходуется",
+            },
+        )
+    return estimate
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # PUT /configs/{name}
 # ──────────────────────────────────────────────────────────────────────────────
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import io
 import json
+import logging
 import math
 from datetime import datetime, timezone
 from pathlib import Path
@@ -15,18 +16,21 @@ from fastapi.responses import StreamingResponse
 from api.dependencies import require_auth
 from api.schemas.models import ModelDetail, ModelSummary, SampleRequest
 from api.settings import Settings, get_settings
+from shared.artifacts import read_frame
+from shared.model_files import find_model, list_models, sidecar_path
 
 router = APIRouter(prefix="/models", tags=["models"])
+logger = logging.getLogger(__name__)
 
 
-def _load_sidecar(pkl_path: Path) -> Dict[str, Any]:
-    """Читает {model_id}.meta.json рядом с .pkl.
+def _load_sidecar(model_path: Path) -> Dict[str, Any]:
+    """Читает {model_id}.meta.json рядом с файлом модели.
 
     Сайдкар пишет synthesis_service при сохранении модели. Gateway не
-    десериализует .pkl — это развязывает его от synthesizer-классов.
+    загружает саму модель — это развязывает его от synthesizer-классов.
     Отсутствующий/битый сайдкар трактуется как "метаданные недоступны".
     """
-    meta_path = pkl_path.with_suffix(".meta.json")
+    meta_path = sidecar_path(model_path)
     if not meta_path.exists():
         return {}
     try:
@@ -77,7 +81,7 @@ def list_models(
     settings: Settings = Depends(get_settings),
     _: None = Depends(require_auth),
 ) -> Dict[str, Any]:
-    paths = sorted(settings.models_dir.glob("*.pkl"), key=lambda p: p.stat().st_mtime, reverse=True)
+    paths = sorted(list_models(settings.models_dir), key=lambda p: p.stat().st_mtime, reverse=True)
     total = len(paths)
     offset = (page - 1) * per_page
     items = [_model_summary(p).model_dump() for p in paths[offset: offset + per_page]]
@@ -97,8 +101,8 @@ def get_model(
     settings: Settings = Depends(get_settings),
     _: None = Depends(require_auth),
 ) -> ModelDetail:
-    path = settings.models_dir / f"{model_id}.pkl"
-    if not path.exists():
+    path = find_model(settings.models_dir, model_id)
+    if path is None:
         raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": f"Модель '{model_id}' не найдена"})
 
     stat = path.stat()
@@ -139,14 +143,24 @@ def delete_model(
     settings: Settings = Depends(get_settings),
     _: None = Depends(require_auth),
 ) -> None:
-    path = settings.models_dir / f"{model_id}.pkl"
-    if not path.exists():
+    path = find_model(settings.models_dir, model_id)
+    if path is None:
         raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": f"Модель '{model_id}' не найдена"})
     path.unlink()
-    sidecar = path.with_suffix(".meta.json")
+    sidecar = sidecar_path(path)
     if sidecar.exists():
         sidecar.unlink()
 
+    # Освобождаем память synthesis_service (best-effort: запись и так
+    # вытеснится по TTL / бюджету)
+    try:
+        from api.clients import ServiceClient
+        ServiceClient(settings.synthesis_service_url, timeout=10).delete(
+            f"/api/v1/models/{model_id}/cache"
+        )
+    except Exception as e:
+        logger.warning("Could not evict model %s from synthesis cache: %s", model_id, e)
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 # POST /models/{model_id}/samples
@@ -159,19 +173,21 @@ def sample_from_model(
     settings: Settings = Depends(get_settings),
     _: None = Depends(require_auth),
 ) -> Any:
-    path = settings.models_dir / f"{model_id}.pkl"
-    if not path.exists():
+    path = find_model(settings.models_dir, model_id)
+    if path is None:
         raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": f"Модель '{model_id}' не найдена"})
 
     from api.clients import ServiceClient
     synth_cli = ServiceClient(settings.synthesis_service_url, timeout=300)
-    result = synth_cli.post(f"/api/v1/models/{model_id}/sample", json={"n_rows": body.n_rows})
+    result = synth_cli.post(
+        f"/api/v1/models/{model_id}/sample",
+        json={"n_rows": body.n_rows, "n_workers": body.n_workers, "seed": body.seed},
+    )
     synth_path = Path("/data") / result["synth_path"]
     if not synth_path.exists():
         raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "Файл синтетики не найден"})
 
-    import pandas as pd
-    synth_df = pd.read_csv(synth_path)
+    synth_df = read_frame(synth_path)
 
     if body.output_format == "json":
         from fastapi.responses import JSONResponse
@@ -8,16 +8,18 @@ import os
 import uuid
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
 
 import yaml
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 
+from api.budget import estimate_privacy_budget, train_rows
 from api.dependencies import require_auth
 from api.schemas.runs import RunCreate, RunDetail, RunListResponse, RunSummary
 from api.settings import Settings, get_settings
 from api.store import RunRecord, RunStatus, run_store
+from shared.artifacts import artifact_format, iter_frames, read_frame
 from shared.log_context import set_run_id
 
 router = APIRouter(prefix="/runs", tags=["runs"])
@@ -161,6 +163,8 @@ def create_run(
             )
         dataset_path_str = str(_csv_path)
 
+    _check_privacy_budget(body, cfg_check, settings)
+
     run_id = str(uuid.uuid4())
     record = RunRecord(
         run_id=run_id,
@@ -184,6 +188,43 @@ def create_run(
     return RunSummary.from_record(record)
 
 
+def _check_privacy_budget(body: RunCreate, cfg: Any, settings: Settings) -> None:
+    """Pre-flight: DP-бюджет по аналитическому RDP-accountant-у до постановки в очередь.
+
+    dptvae обучает все эпохи с фиксированной sigma — если прогноз ε превышает
+    thresholds.max_spent_epsilon, вердикт заведомо FAIL: запуск отклоняется (422).
+    dpctgan останавливается по бюджету сам — только предупреждение в лог.
+    """
+    if body.quick_test:
+        from config_loader import apply_quick_test
+        cfg = apply_quick_test(cfg)
+    n_rows = train_rows(cfg, settings.base_dir)
+    if n_rows is None:
+        return
+    estimate = estimate_privacy_budget(body.config_name, cfg, n_rows)
+    if estimate is None or estimate.within_budget is not False:
+        return
+
+    if estimate.generator_type == "dptvae":
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "code": "BUDGET_EXCEEDED",
+                "message": (
+                    f"Прогноз ε={estimate.epsilon_at_requested:.3f} за {estimate.epochs_requested} эпох "
+                    f"превышает max_spent_epsilon={estimate.epsilon_budget}; "
+                    f"в бюджет укладывается {estimate.max_epochs} эпох"
+                ),
+            },
+        )
+    logger.warning(
+        "Budget: %s — бюджет ε=%.3f исчерпается на эпохе ~%d из %d (n_rows≈%d); "
+        "SmartNoise остановит обучение досрочно",
+        body.config_name, estimate.epsilon_budget, estimate.max_epochs,
+        estimate.epochs_requested, n_rows,
+    )
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # GET /runs/{run_id}
 # ──────────────────────────────────────────────────────────────────────────────
@@ -330,16 +371,22 @@ def get_run_synthetic(
         )
 
     if format == "json":
-        import pandas as pd
         from fastapi.responses import JSONResponse
-        df = pd.read_csv(record.synth_path)
+        df = read_frame(record.synth_path)
         return JSONResponse(content=df.to_dict(orient="records"))
 
     filename = f"{record.dataset_name}__synth__{record.run_id[:8]}.csv"
-    return FileResponse(
-        path=record.synth_path,
+    if artifact_format(record.synth_path) == "csv":
+        return FileResponse(
+            path=record.synth_path,
+            media_type="text/csv",
+            filename=filename,
+        )
+    # Синтетика хранится в Parquet / Feather — экспорт всё равно в CSV
+    return StreamingResponse(
+        _iter_csv(record.synth_path),
         media_type="text/csv",
-        filename=filename,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
@@ -370,8 +417,6 @@ def generate_more_synthetic(
     if not n_rows or n_rows <= 0:
         raise HTTPException(status_code=400, detail={"code": "VALIDATION_ERROR", "message": "n_rows должен быть > 0"})
 
-    import io
-
     from api.clients import ServiceClient
     synth_cli = ServiceClient(settings.synthesis_service_url, timeout=300)
     result = synth_cli.post(f"/api/v1/models/{record.model_id}/sample", json={"n_rows": n_rows})
@@ -380,13 +425,8 @@ def generate_more_synthetic(
     if not synth_path.exists():
         raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "Файл синтетики не найден"})
 
-    import pandas as pd
-    synth_df = pd.read_csv(synth_path)
-    buf = io.StringIO()
-    synth_df.to_csv(buf, index=False)
-    buf.seek(0)
     return StreamingResponse(
-        iter([buf.getvalue()]),
+        _iter_csv(synth_path),
         media_type="text/csv",
         headers={"Content-Disposition": f'attachment; filename="{record.dataset_name}_extra_{n_rows}.csv"'},
     )
@@ -396,6 +436,12 @@ def generate_more_synthetic(
 # Вспомогательные функции
 # ──────────────────────────────────────────────────────────────────────────────
 
+def _iter_csv(path: Path | str) -> Iterator[str]:
+    """CSV-экспорт артефакта синтетики по чанкам, без загрузки файла целиком."""
+    for i, chunk in enumerate(iter_frames(path)):
+        yield chunk.to_csv(index=False, header=i == 0)
+
+
 def _list_pg_runs(settings: Settings) -> list[RunSummary]:
     """Читает все записи из таблицы processes в PostgreSQL и конвертирует в RunSummary."""
     try:
@@ -455,7 +501,7 @@ def _execute_pipeline(
     import sys
     sys.path.insert(0, str(settings.base_dir))
 
-    from api.clients import ServiceClient, poll_synthesis_job
+    from api.clients import ServiceClient, run_synthesis_job
     from config_loader import load_config, apply_quick_test
 
     set_run_id(run_id)
@@ -473,7 +519,7 @@ def _execute_pipeline(
 
         data_cli  = ServiceClient(settings.data_service_url,      timeout=60)
         synth_cli = ServiceClient(settings.synthesis_service_url,  timeout=60)
-        eval_cli  = ServiceClient(settings.evaluation_service_url, timeout=300)
+        eval_cli  = ServiceClient(settings.evaluation_service_url, timeout=600)
         rep_cli   = ServiceClient(settings.reporting_service_url,  timeout=60)
 
         # 1. Загрузка датасета в Data Service (CSV или PostgreSQL)
@@ -533,52 +579,74 @@ def _execute_pipeline(
         for iteration in range(1, max_iterations + 1):
             iter_tag = f" (iteration {iteration}/{max_iterations})" if max_iterations > 1 else ""
 
-            # 3. Запуск джоба синтеза
+            # 3–4. Запуск джоба синтеза и ожидание (polling). Упавший джоб
+            # отправляется повторно с тем же checkpoint_key — обучение
+            # продолжается с последнего чекпоинта
             logger.info("Step 3/7: starting synthesis job%s", iter_tag)
-            job = synth_cli.post("/api/v1/jobs", json={
-                "split_id":    split_id,
-                "generator":   generator_body,
-                "n_rows":      record.n_synth_rows,
-                "save_model":  record.save_model,
-                "run_id":      run_id,
-                "dataset_name": record.dataset_name,
-            })
-            job_id = job["job_id"]
-            run_store.update(run_id, current_job_id=job_id)
-            logger.info("Step 3/7 done: job_id=%s", job_id)
 
-            # 4. Ожидание завершения синтеза (polling)
-            logger.info("Step 4/7: waiting for synthesis (polling every %ds)%s...", poll_interval, iter_tag)
-            job = poll_synthesis_job(synth_cli, job_id, poll_interval=poll_interval, timeout=7200)
+            def _on_submit(job_id: str) -> None:
+                run_store.update(run_id, current_job_id=job_id)
+                logger.info("Step 3/7 done: job_id=%s", job_id)
+                logger.info("Step 4/7: waiting for synthesis (polling every %ds)%s...", poll_interval, iter_tag)
+
+            job = run_synthesis_job(
+                synth_cli,
+                {
+                    "split_id":       split_id,
+                    "generator":      generator_body,
+                    "n_rows":         record.n_synth_rows,
+                    "save_model":     record.save_model,
+                    "run_id":         run_id,
+                    "dataset_name":   record.dataset_name,
+                    "checkpoint_key": f"{run_id}-{iteration}",
+                },
+                retries=settings.synthesis_job_retries,
+                poll_interval=poll_interval,
+                timeout=7200,
+                queue_timeout=settings.synthesis_queue_timeout,
+                on_submit=_on_submit,
+            )
 
             synth_path = job["synth_path"]
             dp_report  = job.get("dp_report")
             model_id   = job.get("model_id")
             logger.info("Step 4/7 done: synth_path=%s", synth_path)
 
-            # 5. Оценка приватности
-            logger.info("Step 5/7: privacy evaluation%s", iter_tag)
-            privacy_report = eval_cli.post("/api/v1/evaluate/privacy", json={
-                "split_id":           split_id,
-                "synth_path":         synth_path,
-                "dp_report":          dp_report,
-                "quasi_identifiers":  cfg.privacy.quasi_identifiers,
-                "sensitive_attribute": cfg.privacy.sensitive_attribute,
-                "run_id":             run_id,
-            })
-            logger.info("Step 5/7 done")
-
-            # 6. Оценка полезности
-            logger.info("Step 6/7: utility evaluation%s", iter_tag)
-            utility_report = eval_cli.post("/api/v1/evaluate/utility", json={
-                "split_id":           split_id,
-                "synth_path":         synth_path,
-                "target_column":      cfg.utility.target_column,
-                "categorical_columns": split_meta["categorical_columns"],
-                "continuous_columns":  split_meta["continuous_columns"],
-                "run_id":             run_id,
+            # 5–6. Оценка приватности и полезности: один запрос, датасеты
+            # читаются сервисом один раз, секции считаются параллельно
+            logger.info("Step 5-6/7: privacy + utility evaluation%s", iter_tag)
+            evaluation = eval_cli.post("/api/v1/evaluate/all", json={
+                "split_id":   split_id,
+                "synth_path": synth_path,
+                "dp_report":  dp_report,
+                "privacy": {
+                    "quasi_identifiers":    cfg.privacy.quasi_identifiers,
+                    "sensitive_attribute":  cfg.privacy.sensitive_attribute,
+                    "nn_backend":           cfg.privacy.nn_backend,
+                    "distance_encoding":    cfg.privacy.distance_encoding,
+                    "distance_reference_size": cfg.privacy.distance_reference_size,
+                    "distance_approximate": cfg.privacy.distance_approximate,
+                    "ann_n_probe":          cfg.privacy.ann_n_probe,
+                    "n_workers":            cfg.privacy.n_workers,
+                    "mia_method":           cfg.privacy.mia_method,
+                    "mia_sample_size":      cfg.privacy.mia_sample_size,
+                    "mia_n_bootstrap":      cfg.privacy.mia_n_bootstrap,
+                },
+                "utility": {
+                    "target_column":       cfg.utility.target_column,
+                    "categorical_columns": split_meta["categorical_columns"],
+                    "continuous_columns":  split_meta["continuous_columns"],
+                    "ml_model":            cfg.utility.ml_model,
+                },
+                "run_id": run_id,
             })
-            logger.info("Step 6/7 done")
+            privacy_report = evaluation["privacy_report"]
+            utility_report = evaluation["utility_report"]
+            timings = evaluation["timings"]
+            logger.info(
+                "Step 5-6/7 done: load=%.1fs privacy=%.1fs utility=%.1fs total=%.1fs",
+                timings["load_sec"], timings["privacy_sec"], timings["utility_sec"], timings["total_sec"],
+            )
 
             # 7. Финальный отчёт
             logger.info("Step 7/7: building report%s", iter_tag)
@@ -609,8 +677,8 @@ def _execute_pipeline(
             logger.info("Verdict is FAIL — retrying synthesis (iteration %d/%d)", iteration + 1, max_iterations)
 
         # FR-08.5: финализируем синтетику — переименовываем pending → final.
-        pending_path = Path("/data") / synth_path   # .../synthetic_pending.csv
-        final_rel    = synth_path.replace("synthetic_pending.csv", "synthetic.csv")
+        pending_path = Path("/data") / synth_path   # .../synthetic_pending.{csv,parquet,feather}
+        final_rel    = synth_path.replace("synthetic_pending.", "synthetic.")
         final_path   = Path("/data") / final_rel
         try:
             pending_path.rename(final_path)
@@ -627,9 +695,8 @@ def _execute_pipeline(
             dsn = os.environ.get(cfg.data_export.dsn_env, "")
             if not dsn:
                 raise RuntimeError(f"Переменная окружения {cfg.data_export.dsn_env!r} не задана")
-            import pandas as _pd
             from sqlalchemy import create_engine as _ce
-            _df = _pd.read_csv(abs_synth)
+            _df = read_frame(abs_synth)
             _engine = _ce(dsn)
             _df.to_sql(cfg.data_export.table, _engine,
                        if_exists=cfg.data_export.if_exists, index=False, schema="public")
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from pydantic import BaseModel
 
 
@@ -19,3 +19,20 @@ class ConfigValidationResult(BaseModel):
     valid:    bool
     errors:   List[Dict[str, str]] = []
     warnings: List[str] = []
+
+
+class PrivacyBudgetEstimate(BaseModel):
+    config_name:          str
+    generator_type:       str
+    n_rows:               int
+    batch_size:           int
+    sigma:                float
+    delta:                float
+    sample_rate:          float
+    steps_per_epoch:      int
+    epochs_requested:     int
+    epsilon_at_requested: float
+    epsilon_budget:       Optional[float]
+    max_epochs:           Optional[int]
+    within_budget:        Optional[bool]
+    epsilon_curve:        List[Tuple[int, float]]
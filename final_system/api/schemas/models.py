@@ -27,6 +27,8 @@ class ModelDetail(ModelSummary):
 class SampleRequest(BaseModel):
     n_rows:        int
     output_format: str = "csv"
+    n_workers:     Optional[int] = None   # None = SAMPLE_WORKERS synthesis_service
+    seed:          Optional[int] = None   # воспроизводимая шардированная генерация
 
     @field_validator("n_rows")
     @classmethod
@@ -59,6 +59,14 @@ class Settings(BaseSettings):
     synthesis_service_url: str = ""
     evaluation_service_url: str = ""
     reporting_service_url: str = ""
+    # Повторные отправки пропавшего (404, обрыв связи) или аварийно завершённого
+    # (error_code=WORKER_CRASHED) джоба синтеза; обучение продолжается с последнего
+    # чекпоинта (checkpoint_key = {run_id}-{iteration})
+    synthesis_job_retries: int = 1
+    # Сколько секунд джоб синтеза может ждать в очереди synthesis_service
+    # (status=queued), прежде чем запуск упадёт с таймаутом; время в очереди
+    # не входит в таймаут обучения
+    synthesis_queue_timeout: int = 86400
 
 
 @lru_cache
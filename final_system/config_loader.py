@@ -325,6 +325,7 @@ class UtilityYamlConfig(BaseModel):
     target_column: str
     task_type: str = "classification"
     drop_columns: List[str] = Field(default_factory=list)
+    ml_model: str = "random_forest"
     n_estimators: int = 100
     random_state: int = 42
 
@@ -337,12 +338,22 @@ class UtilityYamlConfig(BaseModel):
             )
         return v
 
+    @field_validator("ml_model")
+    @classmethod
+    def check_ml_model(cls, v: str) -> str:
+        if v not in ("random_forest", "hist_gradient_boosting"):
+            raise ValueError(
+                f"ml_model должен быть 'random_forest' или 'hist_gradient_boosting', получено: '{v}'"
+            )
+        return v
+
     def to_utility_config(self) -> Any:
         from evaluator.utility.utility_evaluator import UtilityConfig
         return UtilityConfig(
             target_column=self.target_column,
             task_type=self.task_type,  # type: ignore[arg-type]
             drop_columns=self.drop_columns,
+            ml_model=self.ml_model,
             n_estimators=self.n_estimators,
             random_state=self.random_state,
         )
@@ -355,7 +366,47 @@ class PrivacyYamlConfig(BaseModel):
     compute_distance: bool = True
     compute_mia: bool = True
     distance_sample_size: int = 2000
-    mia_sample_size: int = 1000
+    distance_reference_size: Optional[int] = None
+    nn_backend: str = "auto"
+    distance_encoding: str = "onehot"
+    distance_approximate: bool = False
+    ann_n_probe: int = 8
+    n_workers: Optional[int] = None   # None = значение PRIVACY_WORKERS Evaluation Service
+    mia_method: str = "forest"
+    mia_sample_size: Optional[int] = 1000
+    mia_n_bootstrap: int = 200
+
+    @field_validator("nn_backend")
+    @classmethod
+    def check_nn_backend(cls, v: str) -> str:
+        if v not in ("auto", "tree", "gemm"):
+            raise ValueError(
+                f"nn_backend должен быть 'auto', 'tree' или 'gemm', получено: '{v}'"
+            )
+        return v
+
+    @field_validator("distance_encoding")
+    @classmethod
+    def check_distance_encoding(cls, v: str) -> str:
+        if v not in ("onehot", "codes"):
+            raise ValueError(
+                f"distance_encoding должен быть 'onehot' или 'codes', получено: '{v}'"
+            )
+        return v
+
+    @field_validator("ann_n_probe")
+    @classmethod
+    def check_ann_n_probe(cls, v: int) -> int:
+        if v < 1:
+            raise ValueError(f"ann_n_probe должен быть >= 1, получено: {v}")
+        return v
+
+    @field_validator("mia_method")
+    @classmethod
+    def check_mia_method(cls, v: str) -> str:
+        if v not in ("forest", "exact"):
+            raise ValueError(f"mia_method должен быть 'forest' или 'exact', получено: '{v}'")
+        return v
 
     def to_privacy_config(self) -> Any:
         from evaluator.privacy.privacy_evaluator import PrivacyConfig
@@ -366,7 +417,15 @@ class PrivacyYamlConfig(BaseModel):
             compute_distance=self.compute_distance,
             compute_mia=self.compute_mia,
             distance_sample_size=self.distance_sample_size,
+            distance_reference_size=self.distance_reference_size,
+            nn_backend=self.nn_backend,
+            distance_encoding=self.distance_encoding,
+            distance_approximate=self.distance_approximate,
+            ann_n_probe=self.ann_n_probe,
+            n_workers=self.n_workers if self.n_workers is not None else 1,
+            mia_method=self.mia_method,
             mia_sample_size=self.mia_sample_size,
+            mia_n_bootstrap=self.mia_n_bootstrap,
         )
 
 
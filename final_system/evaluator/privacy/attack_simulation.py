@@ -22,78 +22,212 @@ Proxy MIA даёт консервативную нижнюю оценку рис
 достаточное условие отсутствия утечки.
 
 Кодирование признаков:
-    Используется та же схема, что и в distance_metrics.py:
-    категориальные → one-hot (обучаем на real_train_df),
-    числовые → MinMaxScaler [0, 1].
-    Это гарантирует, что расстояния в признаковом пространстве не искажены
-    артефактами порядкового кодирования LabelEncoder.
+    Используется общий FeatureSpace (feature_space.py), тот же, что и
+    в distance_metrics.py: категориальные → one-hot (словарь из real_train_df),
+    числовые → min-max [0, 1]. Это гарантирует, что расстояния в признаковом
+    пространстве не искажены артефактами порядкового кодирования LabelEncoder,
+    а кодировщик обучается один раз на весь PrivacyEvaluator.evaluate.
+
+Точный режим (method="exact"):
+    На одном признаке обучение RandomForest эквивалентно подбору монотонного
+    порога, поэтому AUC считается напрямую по отсортированным расстояниям
+    (U-статистика Манна — Уитни, O(n log n)). Там же — преимущество
+    атакующего max(TPR − FPR), TPR при FPR ≤ 1% и 0.1% и бутстрэп-CI AUC,
+    посчитанный весами повторов без пересортировки. Без ограничения
+    sample_size атака идёт по всем записям train и holdout.
+
+Поиск соседей:
+    В PrivacyEvaluator атака получает тот же NeighborContext, что и DCR:
+    закодированные матрицы переиспользуются, а индекс по синтетике
+    строится один раз (DCR ищет в train, MIA — в синтетике; по индексу
+    на направление). В приближённом режиме контекста (approximate=True)
+    индекс по синтетике тоже IVF — тогда, как и у DCR, в отчёт добавляется
+    блок "approximation" с оценкой recall@1 на подвыборке запросов.
 """
 
 from __future__ import annotations
 
 import logging
-from typing import Dict
+from typing import Dict, Literal, Optional
 
 import numpy as np
 import pandas as pd
+from scipy.stats import rankdata
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import roc_auc_score
 from sklearn.model_selection import cross_val_score
-from sklearn.preprocessing import MinMaxScaler
+
+from .feature_space import FeatureSpace
+from .neighbor_context import NeighborContext
+from .neighbors import estimate_recall
 
 logger = logging.getLogger(__name__)
 
+MIAMethod = Literal["forest", "exact"]
 
-def _encode(df: pd.DataFrame, reference_df: pd.DataFrame) -> np.ndarray:
-    """
-    Кодирует df в числовой массив, используя словарь признаков из reference_df.
 
-    Категориальные колонки → one-hot (pd.get_dummies, обучаем на reference).
-    Числовые колонки       → MinMaxScaler [0, 1] (обучаем на reference).
+def _build_context(
+    real_train_df: pd.DataFrame,
+    real_holdout_df: pd.DataFrame,
+    synth_df: pd.DataFrame,
+    random_state: int,
+    sample_size: Optional[int],
+    feature_space: Optional[FeatureSpace],
+    train_matrix: Optional[np.ndarray],
+) -> NeighborContext:
+    """Собственный контекст для автономного вызова MIA (без общего с DCR)."""
+    if sample_size is None:
+        train_positions = np.arange(len(real_train_df))
+        holdout_sample  = real_holdout_df
+    else:
+        n = min(sample_size, len(real_train_df), len(real_holdout_df))
+        train_positions = np.random.RandomState(random_state).choice(len(real_train_df), n, replace=False)
+        holdout_sample  = real_holdout_df.sample(n, random_state=random_state)
 
-    Категории из df, отсутствующие в reference, заполняются нулём (reindex).
-    Этот метод намеренно дублирует логику distance_metrics._encode_and_normalize,
-    чтобы attack_simulation оставался самодостаточным модулем.
-    """
-    common = [c for c in reference_df.columns if c in df.columns]
-    ref = reference_df[common].copy()
-    qry = df[common].copy()
-
-    num_cols = ref.select_dtypes(include=[np.number]).columns.tolist()
-    cat_cols = ref.select_dtypes(exclude=[np.number]).columns.tolist()
-
-    # One-hot кодирование категориальных признаков
-    ref_dummies = pd.get_dummies(ref[cat_cols], prefix_sep="__") if cat_cols else pd.DataFrame(index=ref.index)
-    qry_dummies = pd.get_dummies(qry[cat_cols], prefix_sep="__") if cat_cols else pd.DataFrame(index=qry.index)
-    qry_dummies = qry_dummies.reindex(columns=ref_dummies.columns, fill_value=0)
-
-    # Нормализация числовых признаков
-    if num_cols:
-        scaler = MinMaxScaler()
-        ref_num = scaler.fit_transform(ref[num_cols].fillna(0))
-        qry_num = scaler.transform(qry[num_cols].fillna(0))
+    if sample_size is not None and len(synth_df) > sample_size:
+        synth_sample = synth_df.sample(sample_size, random_state=random_state)
     else:
-        ref_num = np.empty((len(ref), 0))
-        qry_num = np.empty((len(qry), 0))
+        synth_sample = synth_df
+
+    # Кодируем все три датасета относительно real_train_df.
+    # Важно: один и тот же эталон признакового пространства для всех —
+    # только так расстояния между train/holdout/synth сопоставимы.
+    if feature_space is None:
+        feature_space = FeatureSpace.fit(real_train_df)
+    if train_matrix is not None:
+        train_encoded = train_matrix[train_positions]
+    else:
+        train_encoded = feature_space.transform(real_train_df.iloc[train_positions])
+
+    return NeighborContext({
+        "train":   train_encoded,
+        "holdout": feature_space.transform(holdout_sample),
+        "synth":   feature_space.transform(synth_sample),
+    })
+
+
+# ─────────────────────────────────────────────
+# Атакующие модели
+# ─────────────────────────────────────────────
+
+def _forest_attack(
+    dist_train: np.ndarray,
+    dist_holdout: np.ndarray,
+    n_estimators: int,
+    random_state: int,
+) -> Dict:
+    """RandomForest на одном признаке (DCR) с 5-fold CV."""
+    X_attack = np.concatenate([dist_train, dist_holdout]).reshape(-1, 1)
+    y_attack = np.concatenate([np.ones(len(dist_train)), np.zeros(len(dist_holdout))])
+
+    # Кросс-валидация даёт более честную оценку, чем простой train/test.
+    attacker = RandomForestClassifier(
+        n_estimators=n_estimators,
+        random_state=random_state,
+        n_jobs=-1,
+    )
+    cv_scores = cross_val_score(attacker, X_attack, y_attack, cv=5, scoring="roc_auc")
+    return {
+        "attack_auc": round(float(np.mean(cv_scores)), 4),
+        "attack_auc_std": round(float(np.std(cv_scores)), 4),
+    }
+
+
+def _mann_whitney_auc(dist_members: np.ndarray, dist_non_members: np.ndarray) -> float:
+    """
+    AUC порогового атакующего «член, если расстояние мало»:
+    P(d_member < d_non_member) + ½·P(равны), через ранги за O(n log n).
+    """
+    ranks = rankdata(np.concatenate([dist_non_members, dist_members]))
+    n_non = len(dist_non_members)
+    # Сумма рангов не-членов в порядке возрастания расстояния = число пар,
+    # где член ближе (U-статистика Манна — Уитни)
+    u = ranks[:n_non].sum() - n_non * (n_non + 1) / 2
+    return float(u / (n_non * len(dist_members)))
 
-    return np.hstack([qry_num, qry_dummies.values.astype(float)])
 
+def _roc_points(dist_members: np.ndarray, dist_non_members: np.ndarray) -> tuple:
+    """(FPR, TPR) по всем порогам: член ⇔ расстояние ≤ порога."""
+    all_d = np.concatenate([dist_members, dist_non_members])
+    labels = np.concatenate([np.ones(len(dist_members)), np.zeros(len(dist_non_members))])
+    order = np.argsort(all_d, kind="mergesort")
+    all_d, labels = all_d[order], labels[order]
+    # Порог — после последнего вхождения каждого уникального значения (ничьи не делятся)
+    last = np.r_[np.flatnonzero(np.diff(all_d)), len(all_d) - 1]
+    tp = np.cumsum(labels)[last]
+    fp = (last + 1) - tp
+    return np.r_[0.0, fp / len(dist_non_members)], np.r_[0.0, tp / len(dist_members)]
 
-def _compute_min_distances_to_synth(
-    query_arr: np.ndarray,
-    synth_arr: np.ndarray,
-    batch_size: int = 500,
+
+def _bootstrap_auc(
+    dist_members: np.ndarray,
+    dist_non_members: np.ndarray,
+    n_bootstrap: int,
+    random_state: int,
+    block: int = 16,
 ) -> np.ndarray:
-    """Расстояние от каждой реальной записи до ближайшей синтетической."""
-    n = query_arr.shape[0]
-    min_dists = np.empty(n)
-    for start in range(0, n, batch_size):
-        end = min(start + batch_size, n)
-        batch = query_arr[start:end]
-        diff = batch[:, np.newaxis, :] - synth_arr[np.newaxis, :, :]
-        dists = np.sqrt((diff ** 2).sum(axis=2))
-        min_dists[start:end] = dists.min(axis=1)
-    return min_dists
+    """
+    Бутстрэп AUC без пересортировки: повтор задаётся весами (кратностями)
+    записей. Для каждого члена число более далёких не-членов берётся из
+    накопленных весов по отсортированным расстояниям не-членов — один
+    проход cumsum на блок повторов.
+    """
+    rng = np.random.RandomState(random_state)
+    n_m, n_h = len(dist_members), len(dist_non_members)
+    order = np.argsort(dist_non_members, kind="mergesort")
+    sorted_h = dist_non_members[order]
+    # Позиции члена среди не-членов: [left, right) — равные расстояния
+    left = np.searchsorted(sorted_h, dist_members, side="left")
+    right = np.searchsorted(sorted_h, dist_members, side="right")
+
+    aucs = np.empty(n_bootstrap)
+    for start in range(0, n_bootstrap, block):
+        b = min(block, n_bootstrap - start)
+        w_m = _resample_weights(rng, b, n_m)
+        w_h = _resample_weights(rng, b, n_h)[:, order]
+        cum_h = np.concatenate([np.zeros((b, 1)), np.cumsum(w_h, axis=1)], axis=1)
+        farther = cum_h[:, -1:] - cum_h[:, right]
+        ties = cum_h[:, right] - cum_h[:, left]
+        aucs[start:start + b] = (w_m * (farther + 0.5 * ties)).sum(axis=1) / (n_m * n_h)
+    return aucs
+
+
+def _resample_weights(rng: np.random.RandomState, b: int, n: int) -> np.ndarray:
+    """b бутстрэп-выборок размера n в виде кратностей записей, [b, n]."""
+    draws = rng.randint(0, n, size=(b, n)) + (np.arange(b) * n)[:, None]
+    return np.bincount(draws.ravel(), minlength=b * n).reshape(b, n).astype(np.float64)
+
+
+def _exact_attack(
+    dist_train: np.ndarray,
+    dist_holdout: np.ndarray,
+    n_bootstrap: int,
+    random_state: int,
+) -> Dict:
+    """
+    Точный пороговый атакующий на одном признаке (DCR).
+
+    На одном признаке лучший классификатор — монотонный порог, поэтому AUC
+    считается напрямую (Манн — Уитни) без обучения модели. Направление
+    фиксировано гипотезой атаки: член — если расстояние мало; AUC < 0.5
+    значит, что члены в среднем дальше от синтетики, чем не-члены.
+    """
+    auc = _mann_whitney_auc(dist_train, dist_holdout)
+    fpr, tpr = _roc_points(dist_train, dist_holdout)
+    result = {
+        "attack_auc": round(auc, 4),
+        # Максимальное преимущество атакующего: max(TPR − FPR) по порогам
+        "attacker_advantage": round(float(np.max(tpr - fpr)), 4),
+        "tpr_at_fpr_0.01": round(float(tpr[fpr <= 0.01].max()), 4),
+        "tpr_at_fpr_0.001": round(float(tpr[fpr <= 0.001].max()), 4),
+    }
+    if n_bootstrap > 0:
+        aucs = _bootstrap_auc(dist_train, dist_holdout, n_bootstrap, random_state)
+        result["attack_auc_std"] = round(float(aucs.std()), 4)
+        result["attack_auc_ci95_low"] = round(float(np.percentile(aucs, 2.5)), 4)
+        result["attack_auc_ci95_high"] = round(float(np.percentile(aucs, 97.5)), 4)
+    else:
+        result["attack_auc_std"] = 0.0
+    return result
 
 
 def evaluate_membership_inference(
@@ -102,7 +236,13 @@ def evaluate_membership_inference(
     synth_df: pd.DataFrame,
     n_estimators: int = 100,
     random_state: int = 42,
-    sample_size: int = 1000,
+    sample_size: Optional[int] = 1000,
+    feature_space: Optional[FeatureSpace] = None,
+    train_matrix: Optional[np.ndarray] = None,
+    context: Optional[NeighborContext] = None,
+    method: MIAMethod = "forest",
+    n_bootstrap: int = 200,
+    recall_sample_size: int = 1000,
 ) -> Dict:
     """
     Запускает proxy MIA и возвращает метрики атаки.
@@ -111,7 +251,20 @@ def evaluate_membership_inference(
         real_train_df   — данные, на которых обучался генератор (метка: 1 = "в train")
         real_holdout_df — данные, которые генератор НЕ видел  (метка: 0 = "не в train")
         synth_df        — синтетические данные от генератора
-        sample_size     — ограничение выборки для скорости
+        sample_size     — число членов и не-членов (поровну); None — все доступные
+                          записи train и holdout (имеет смысл для method="exact")
+        feature_space   — обученный на real_train_df кодировщик (None = обучить здесь)
+        train_matrix    — real_train_df, уже закодированный feature_space (None = закодировать выборку)
+        context         — общий с DCR NeighborContext (см. distance_metrics.prepare_neighbor_context).
+                          Члены выбираются из его матрицы "train", не-члены и эталон —
+                          из выборок sample_size его матриц "holdout" и "synth";
+                          feature_space и train_matrix в этом случае не используются.
+        method          — "forest": RandomForest + 5-fold CV (как раньше);
+                          "exact": точный AUC по отсортированным расстояниям (см. ниже)
+        n_bootstrap     — число бутстрэп-повторов для доверительного интервала AUC
+                          (только method="exact")
+        recall_sample_size — размер подвыборки для оценки recall приближённого
+                          поиска (только если context.approximate)
 
     Кодирование выполняется относительно real_train_df — это эталон
     признакового пространства для всех трёх датасетов.
@@ -120,55 +273,81 @@ def evaluate_membership_inference(
         attack_auc ≈ 0.5 → атака не работает, генератор защищён (хороший результат для DP)
         attack_auc > 0.7 → атака эффективна, есть риск утечки membership info
     """
-    # Сэмплируем для баланса и скорости
-    n = min(sample_size, len(real_train_df), len(real_holdout_df))
-    train_sample   = real_train_df.sample(n, random_state=random_state)
-    holdout_sample = real_holdout_df.sample(n, random_state=random_state)
+    own_context = context is None
+    if own_context:
+        context = _build_context(
+            real_train_df, real_holdout_df, synth_df,
+            random_state, sample_size, feature_space, train_matrix,
+        )
 
-    if len(synth_df) > sample_size:
-        synth_sample = synth_df.sample(sample_size, random_state=random_state)
+    if method not in ("forest", "exact"):
+        raise ValueError(f"method должен быть 'forest' или 'exact', получено: '{method}'")
+
+    # Выборки MIA из матриц контекста (общих с DCR, см. NeighborContext.subset):
+    # не-члены и эталонная синтетика — по sample_size строк, члены — из всего train
+    holdout = context.subset("holdout", sample_size)
+    synth = context.subset("synth", sample_size)
+
+    # Сэмплируем для баланса и скорости
+    rng = np.random.RandomState(random_state)
+    if sample_size is None:
+        member_rows     = np.arange(context.n_rows("train"))
+        non_member_rows = np.arange(context.n_rows(holdout))
     else:
-        synth_sample = synth_df
+        n = min(sample_size, context.n_rows("train"), context.n_rows(holdout))
+        member_rows     = np.sort(rng.choice(context.n_rows("train"), n, replace=False))
+        non_member_rows = np.sort(rng.choice(context.n_rows(holdout), n, replace=False))
+    n_members, n_non_members = len(member_rows), len(non_member_rows)
 
     logger.info(
-        f"[MIA] Запуск атаки. train_members={n}, non_members={n}, synth={len(synth_sample)}"
+        f"[MIA] Запуск атаки ({method}). train_members={n_members}, "
+        f"non_members={n_non_members}, synth={context.n_rows(synth)}"
     )
 
-    # Кодируем все три датасета относительно real_train_df.
-    # Важно: один и тот же эталон признакового пространства для всех —
-    # только так расстояния между train/holdout/synth сопоставимы.
-    synth_encoded   = _encode(synth_sample,   real_train_df)
-    train_encoded   = _encode(train_sample,   real_train_df)
-    holdout_encoded = _encode(holdout_sample, real_train_df)
-
     # Признак атаки: расстояние от реальной записи до ближайшей синтетической.
     # Гипотеза: train-записи "отпечатались" в синтетике → меньше расстояние.
-    dist_train   = _compute_min_distances_to_synth(train_encoded,   synth_encoded)
-    dist_holdout = _compute_min_distances_to_synth(holdout_encoded, synth_encoded)
+    # Индекс по синтетике строится один раз на оба запроса.
+    approximation = None
+    try:
+        dist_train, _   = context.query("train", synth, k=1, rows=member_rows)
+        dist_holdout, _ = context.query(holdout, synth, k=1, rows=non_member_rows)
+        if context.approximate:
+            logger.info("[MIA] Оцениваем recall приближённого поиска...")
+            index = context.index(synth)
+            approximation = {
+                "method": "ivf",
+                "n_lists": index.n_lists,
+                "n_probe": index.n_probe,
+                **estimate_recall(
+                    index,
+                    np.concatenate([
+                        context.matrix("train")[member_rows],
+                        context.matrix(holdout)[non_member_rows],
+                    ]),
+                    np.concatenate([dist_train[:, 0], dist_holdout[:, 0]]),
+                    sample_size=recall_sample_size,
+                ),
+            }
+    finally:
+        if own_context:
+            context.close()
+    dist_train, dist_holdout = dist_train[:, 0], dist_holdout[:, 0]
 
-    # Формируем датасет для атакующего классификатора
-    X_attack = np.concatenate([dist_train, dist_holdout]).reshape(-1, 1)
-    y_attack = np.concatenate([np.ones(n), np.zeros(n)])
-
-    # Атакующий классификатор: простой RF на одном признаке (DCR).
-    # Кросс-валидация даёт более честную оценку, чем простой train/test.
-    attacker = RandomForestClassifier(
-        n_estimators=n_estimators,
-        random_state=random_state,
-        n_jobs=-1,
-    )
-    cv_scores = cross_val_score(attacker, X_attack, y_attack, cv=5, scoring="roc_auc")
-    attack_auc = float(np.mean(cv_scores))
+    if method == "exact":
+        attack = _exact_attack(dist_train, dist_holdout, n_bootstrap, random_state)
+    else:
+        attack = _forest_attack(dist_train, dist_holdout, n_estimators, random_state)
+    attack_auc = attack["attack_auc"]
 
     logger.info(
         f"[MIA] Attack AUC = {attack_auc:.4f} "
-        f"(std={np.std(cv_scores):.4f}). "
+        f"(std={attack['attack_auc_std']:.4f}). "
         f"{'Защита эффективна' if attack_auc < 0.6 else 'РИСК: атака эффективна'}"
     )
 
-    return {
-        "attack_auc": round(attack_auc, 4),
-        "attack_auc_std": round(float(np.std(cv_scores)), 4),
+    result = {
+        **attack,
+        "method": method,
         "interpretation": (
             "protected: атака не лучше случайного угадывания (AUC < 0.6)"
             if attack_auc < 0.6
@@ -176,11 +355,14 @@ def evaluate_membership_inference(
             if attack_auc < 0.75
             else "risk: высокая эффективность атаки (AUC ≥ 0.75)"
         ),
-        "n_members_tested": n,
-        "n_non_members_tested": n,
+        "n_members_tested": n_members,
+        "n_non_members_tested": n_non_members,
         "note": (
             "Distance-based proxy MIA. "
             "AUC ≈ 0.5 означает отсутствие утечки membership-информации. "
             "Это консервативная нижняя оценка риска — не полная shadow-model MIA."
         ),
-    }
\ No newline at end of file
+    }
+    if approximation is not None:
+        result["approximation"] = approximation
+    return result
\ No newline at end of file
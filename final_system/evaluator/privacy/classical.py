@@ -8,12 +8,16 @@ classical.py
 k/l/t описывают структуру таблицы, но не дают математических гарантий
 против атак восстановления. В отчете эти метрики идут в раздел
 'diagnostic', отдельно от 'dp_guarantees' и 'empirical_risk'.
+
+Все три метрики считаются за один проход по общему int64-ключу QI-группы
+(факторизация QI-колонок) через np.bincount и разреженную таблицу
+«группа × значение SA», без Python-цикла по группам.
 """
 
 from __future__ import annotations
 
 import logging
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
@@ -21,20 +25,94 @@ import pandas as pd
 logger = logging.getLogger(__name__)
 
 
+# ─────────────────────────────────────────────
+# Групповой ключ QI
+# ─────────────────────────────────────────────
+
+def _check_columns(df: pd.DataFrame, quasi_identifiers: List[str]) -> None:
+    missing = [q for q in quasi_identifiers if q not in df.columns]
+    if missing:
+        raise ValueError(f"Квазиидентификаторы не найдены в датасете: {missing}")
+
+
+def _qi_group_ids(df: pd.DataFrame, quasi_identifiers: List[str]) -> Tuple[np.ndarray, int]:
+    """
+    Один int64-ключ группы на запись по комбинации QI.
+
+    Колонки факторизуются по очереди; после каждого шага комбинированный код
+    снова сжимается factorize — ключ остаётся плотным [0, n_groups) и не
+    переполняется при любом числе QI. Записи с пропуском в любом QI получают −1
+    и, как в groupby(dropna=True), ни в одну группу не входят.
+    """
+    group_ids = np.zeros(len(df), dtype=np.int64)
+    n_groups = 1
+    for col in quasi_identifiers:
+        codes, uniques = pd.factorize(df[col])
+        codes = codes.astype(np.int64)
+        combined = np.where((group_ids < 0) | (codes < 0), -1, group_ids * len(uniques) + codes)
+        group_ids, uniques = pd.factorize(combined)
+        group_ids = group_ids.astype(np.int64)
+        # factorize сохраняет −1 как обычное значение: возвращаем его в пропуск
+        missing = np.flatnonzero(uniques == -1)
+        if missing.size:
+            group_ids[group_ids == missing[0]] = -1
+            group_ids[group_ids > missing[0]] -= 1
+        n_groups = len(uniques) - missing.size
+    return group_ids, n_groups
+
+
+def _sa_group_counts(
+    group_ids: np.ndarray,
+    sa_codes: np.ndarray,
+    n_values: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Разреженная таблица сопряжённости (группа × значение SA): только
+    встретившиеся пары. Возвращает (group, value, count) для каждой пары.
+    """
+    valid = (group_ids >= 0) & (sa_codes >= 0)
+    pairs, counts = np.unique(group_ids[valid] * n_values + sa_codes[valid], return_counts=True)
+    return pairs // n_values, pairs % n_values, counts
+
+
+# ─────────────────────────────────────────────
+# Метрики
+# ─────────────────────────────────────────────
+
 def compute_k_anonymity(df: pd.DataFrame, quasi_identifiers: List[str]) -> int:
     """
     k-анонимность: минимальный размер группы с одинаковой комбинацией QI.
     Чем больше k, тем сложнее идентифицировать конкретного субъекта.
     k=1 означает, что в датасете есть уникальные записи — серьезный риск.
     """
-    missing = [q for q in quasi_identifiers if q not in df.columns]
-    if missing:
-        raise ValueError(f"Квазиидентификаторы не найдены в датасете: {missing}")
+    _check_columns(df, quasi_identifiers)
+    group_ids, n_groups = _qi_group_ids(df, quasi_identifiers)
+    return _k_from_groups(group_ids, n_groups)[0]
 
-    group_sizes = df.groupby(quasi_identifiers, observed=True).size()
+
+def _k_from_groups(group_ids: np.ndarray, n_groups: int) -> Tuple[int, np.ndarray]:
+    group_sizes = np.bincount(group_ids[group_ids >= 0], minlength=n_groups)
     k = int(group_sizes.min())
     logger.info(f"[classical] k-anonymity = {k} (группы: min={k}, max={group_sizes.max()})")
-    return k
+    return k, group_sizes
+
+
+def compute_record_k_risk(df: pd.DataFrame, quasi_identifiers: List[str]) -> pd.Series:
+    """
+    Риск повторной идентификации по каждой записи: 1 / размер её QI-группы.
+    1.0 — запись уникальна по QI; NaN — пропуск в QI (запись вне групп).
+    """
+    _check_columns(df, quasi_identifiers)
+    group_ids, n_groups = _qi_group_ids(df, quasi_identifiers)
+    group_sizes = np.bincount(group_ids[group_ids >= 0], minlength=n_groups)
+    return pd.Series(_record_risk(group_ids, group_sizes), index=df.index, name="k_risk")
+
+
+def _record_risk(group_ids: np.ndarray, group_sizes: np.ndarray) -> np.ndarray:
+    risk = np.full(len(group_ids), np.nan)
+    inside = group_ids >= 0
+    risk[inside] = 1.0 / group_sizes[group_ids[inside]]
+    return risk
 
 
 def compute_l_diversity(
@@ -50,7 +128,14 @@ def compute_l_diversity(
     if sensitive_attribute not in df.columns:
         raise ValueError(f"Чувствительный атрибут '{sensitive_attribute}' не найден")
 
-    l_values = df.groupby(quasi_identifiers, observed=True)[sensitive_attribute].nunique()
+    group_ids, n_groups = _qi_group_ids(df, quasi_identifiers)
+    sa_codes, sa_values = pd.factorize(df[sensitive_attribute])
+    return _l_from_groups(group_ids, n_groups, sa_codes.astype(np.int64), len(sa_values))
+
+
+def _l_from_groups(group_ids: np.ndarray, n_groups: int, sa_codes: np.ndarray, n_values: int) -> int:
+    pair_groups, _, _ = _sa_group_counts(group_ids, sa_codes, max(n_values, 1))
+    l_values = np.bincount(pair_groups, minlength=n_groups)
     l = int(l_values.min())
     logger.info(f"[classical] l-diversity = {l}")
     return l
@@ -73,23 +158,37 @@ def compute_t_closeness(
     if sensitive_attribute not in df.columns:
         raise ValueError(f"Чувствительный атрибут '{sensitive_attribute}' не найден")
 
-    # Глобальное распределение SA из эталонного (реального) датасета
-    global_dist = reference_df[sensitive_attribute].value_counts(normalize=True)
-
-    max_t = 0.0
-    for _, group in df.groupby(quasi_identifiers, observed=True):
-        group_dist = group[sensitive_attribute].value_counts(normalize=True)
+    group_ids, n_groups = _qi_group_ids(df, quasi_identifiers)
+    return _t_from_groups(group_ids, n_groups, df[sensitive_attribute], reference_df[sensitive_attribute])
 
-        # EMD для категориального SA: сумма абсолютных разностей частот
-        all_vals = set(global_dist.index) | set(group_dist.index)
-        emd = sum(
-            abs(global_dist.get(v, 0.0) - group_dist.get(v, 0.0))
-            for v in all_vals
-        ) / 2.0  # делим на 2, т.к. сумма abs разностей двух распределений = 2 * TVD
 
-        max_t = max(max_t, emd)
+def _t_from_groups(
+    group_ids: np.ndarray,
+    n_groups: int,
+    sa: pd.Series,
+    reference_sa: pd.Series,
+) -> float:
+    # Общие коды SA для синтетики и эталона
+    codes, values = pd.factorize(pd.concat([reference_sa, sa], ignore_index=True))
+    codes = codes.astype(np.int64)
+    n_values = max(len(values), 1)
+    ref_codes, sa_codes = codes[:len(reference_sa)], codes[len(reference_sa):]
 
-    t = round(max_t, 6)
+    # Глобальное распределение SA из эталонного (реального) датасета
+    ref_valid = ref_codes[ref_codes >= 0]
+    global_dist = np.bincount(ref_valid, minlength=n_values) / max(len(ref_valid), 1)
+
+    # EMD для категориального SA = TVD = ½·Σ|p_g − q|. Значения SA, которых
+    # нет в группе, дают вклад q, поэтому достаточно встретившихся пар:
+    # ½·(Σq + Σ_встретившиеся (|p − q| − q)).
+    pair_groups, pair_values, pair_counts = _sa_group_counts(group_ids, sa_codes, n_values)
+    group_totals = np.bincount(pair_groups, weights=pair_counts, minlength=n_groups)
+    p = pair_counts / group_totals[pair_groups]
+    q = global_dist[pair_values]
+    correction = np.bincount(pair_groups, weights=np.abs(p - q) - q, minlength=n_groups)
+    emd = 0.5 * (global_dist.sum() + correction)
+
+    t = round(float(emd.max()) if n_groups else 0.0, 6)
     logger.info(f"[classical] t-closeness = {t}")
     return t
 
@@ -103,11 +202,31 @@ def compute_classical_metrics(
     """
     Считает все три классические метрики в одном вызове.
     Возвращает словарь, совместимый с форматом privacy_report.
+
+    QI-ключ группы строится один раз и общий для k, l и t; из размеров групп
+    там же получается сводка риска по записям (k_risk, см. compute_record_k_risk).
     """
+    _check_columns(synth_df, quasi_identifiers)
+    if sensitive_attribute not in synth_df.columns:
+        raise ValueError(f"Чувствительный атрибут '{sensitive_attribute}' не найден")
+
+    group_ids, n_groups = _qi_group_ids(synth_df, quasi_identifiers)
+    k, group_sizes = _k_from_groups(group_ids, n_groups)
+    sa_codes, sa_values = pd.factorize(synth_df[sensitive_attribute])
+    l = _l_from_groups(group_ids, n_groups, sa_codes.astype(np.int64), len(sa_values))
+    t = _t_from_groups(group_ids, n_groups, synth_df[sensitive_attribute], real_df[sensitive_attribute])
+
+    risk = _record_risk(group_ids, group_sizes)
+    risk = risk[~np.isnan(risk)]
     return {
-        "k_anonymity": compute_k_anonymity(synth_df, quasi_identifiers),
-        "l_diversity": compute_l_diversity(synth_df, quasi_identifiers, sensitive_attribute),
-        "t_closeness": compute_t_closeness(synth_df, quasi_identifiers, sensitive_attribute, real_df),
+        "k_anonymity": k,
+        "l_diversity": l,
+        "t_closeness": t,
+        "k_risk": {
+            "mean": round(float(risk.mean()), 6) if risk.size else None,
+            "max": round(float(risk.max()), 6) if risk.size else None,
+            "share_unique": round(float((risk == 1.0).mean()), 6) if risk.size else None,
+        },
         "quasi_identifiers": quasi_identifiers,
         "sensitive_attribute": sensitive_attribute,
     }
@@ -14,146 +14,172 @@ NNDR — Nearest Neighbor Distance Ratio: отношение расстояни
 - Если NNDR → 0, записи почти идентичны ближайшему соседу → риск утечки.
 
 Кодирование признаков:
-    Категориальные колонки кодируются через one-hot (pd.get_dummies), а числовые
-    нормируются в [0, 1] через MinMaxScaler. Оба типа признаков оказываются
-    в единой нормированной системе координат, где евклидово расстояние
-    имеет корректную геометрическую интерпретацию.
+    Категориальные колонки кодируются через one-hot, а числовые нормируются
+    в [0, 1] (min-max). Оба типа признаков оказываются в единой нормированной
+    системе координат, где евклидово расстояние имеет корректную
+    геометрическую интерпретацию.
 
     Это важно: LabelEncoder присваивает категориям целые числа (0, 1, 2, ...),
     создавая искусственный порядок и метрику между категориями. Для "Moscow",
     "SPb", "Kazan" расстояние 1 vs 2 ничем не хуже 0 vs 1 — это артефакт
     кодирования, а не семантика данных. One-hot лишён этого недостатка.
 
-    Трансформация обучается на reference_df (реальные train-данные),
-    затем применяется к query_df (синтетика или holdout). Категории,
-    отсутствующие в reference, заполняются нулём через reindex.
+    Кодировщик — общий FeatureSpace (feature_space.py), обученный на
+    reference (реальные train-данные). Его же используют MIA и, при наличии
+    кэша на Shared Volume, повторные запросы по тому же split_id.
+
+    encoding="codes" — режим для высококардинальных категорий: one-hot не
+    материализуется, категории остаются целочисленными кодами, а их вклад
+    в расстояние считается как 2 × число несовпавших категорий. Расстояния
+    те же, что и в режиме "onehot", но память растёт с числом колонок,
+    а не с числом уровней категорий.
+
+Приближённый режим (approximate=True):
+    Вместо подсэмплирования синтетики до sample_size оценивается ВЕСЬ
+    синтетический набор через IVF-индекс (ApproximateNeighborIndex). Рядом
+    с медианой DCR в отчёт попадает оценка recall приближения, измеренная
+    на случайной подвыборке запросов против точного поиска, — оператор явно
+    видит цену выбранного компромисса «точность ↔ покрытие».
+
+Параллельный режим (n_workers > 1):
+    Строки запросов (синтетика, holdout) шардируются между процессами пула,
+    эталонный train-сет разделяется через shared memory без копирования
+    (ShardedNeighborIndex, parallel_neighbors.py).
+
+Поиск соседей:
+    Выполняется через NeighborIndex (neighbors.py): KD/ball-tree для низкой
+    размерности, блочное GEMM-ядро для широких one-hot матриц. 1-й и 2-й
+    сосед находятся за один проход, поэтому DCR и NNDR синтетики считаются
+    из одного запроса, а эталонный train-сет не нужно подрезать.
 """
 
 from __future__ import annotations
 
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
+
+from .feature_space import CodedMatrix, FeatureSpace
+from .neighbor_context import NeighborContext
+from .neighbors import NeighborBackend, estimate_recall
 
 logger = logging.getLogger(__name__)
 
+DistanceEncoding = Literal["onehot", "codes"]
+
 
 # ─────────────────────────────────────────────
-# Preprocessing для расстояний
+# Подготовка общего контекста соседей
 # ─────────────────────────────────────────────
 
-def _encode_and_normalize(
-    reference_df: pd.DataFrame,
-    query_df: pd.DataFrame,
-) -> Tuple[np.ndarray, np.ndarray]:
+def prepare_neighbor_context(
+    real_train_df: pd.DataFrame,
+    real_holdout_df: pd.DataFrame,
+    synth_df: pd.DataFrame,
+    sample_size: Optional[int] = 2000,
+    reference_sample_size: Optional[int] = None,
+    nn_backend: NeighborBackend = "auto",
+    n_jobs: Optional[int] = None,
+    feature_space: Optional[FeatureSpace] = None,
+    train_matrix: Optional[Union[np.ndarray, CodedMatrix]] = None,
+    encoding: DistanceEncoding = "onehot",
+    approximate: bool = False,
+    ann_n_lists: Optional[int] = None,
+    ann_n_probe: int = 8,
+    n_workers: Optional[int] = 1,
+    mia: bool = False,
+    mia_sample_size: Optional[int] = 1000,
+) -> NeighborContext:
     """
-    Приводит оба датафрейма к числовому виду для расчета расстояний.
-
-    Категориальные колонки → one-hot (pd.get_dummies, обучаем на reference).
-    Числовые колонки       → MinMaxScaler [0, 1] (обучаем на reference).
-
-    Трансформация всегда обучается на reference_df, к query_df только применяется.
-    Категории из query, которых нет в reference, заполняются нулём (reindex).
-    Общие колонки обоих датафреймов используются для расчета.
+    Кодирует три датасета в общем пространстве и возвращает NeighborContext
+    с матрицами "train", "holdout", "synth". Правила подвыборок (sample_size,
+    reference_sample_size, approximate) — те же, что у compute_distance_metrics;
+    контекст затем разделяют DCR/NNDR и MIA.
+
+    sample_size:           ограничиваем выборку запросов для скорости (None = весь датасет).
+    reference_sample_size: ограничение эталонного train-сета (None = весь train).
+    nn_backend:            бэкенд поиска соседей — "auto", "tree" или "gemm".
+    n_jobs:                число потоков для tree-бэкенда (None = 1, -1 = все ядра).
+    feature_space:         обученный на real_train_df кодировщик (None = обучить здесь).
+    train_matrix:          real_train_df, уже закодированный feature_space в режиме encoding
+                           (None = закодировать).
+    encoding:              "onehot" — плотная one-hot матрица; "codes" — коды категорий
+                           без развёртывания (для высококардинальных датасетов).
+    approximate:           IVF-поиск по всей синтетике и holdout вместо sample_size;
+                           только для encoding="onehot".
+    ann_n_lists:           число ячеек IVF (None = ≈√n_train).
+    ann_n_probe:           сколько ближайших ячеек просматривает запрос.
+    n_workers:             число процессов для шардирования запросов (1 = в текущем
+                           процессе, 0 или −1 = все ядра); в приближённом режиме не используется.
+    mia:                   контекст разделяет MIA: synth и holdout кодируются выборкой
+                           max(sample_size, mia_sample_size), а DCR и MIA берут из неё
+                           свои выборки через NeighborContext.subset.
+    mia_sample_size:       размер выборки MIA (None = все записи).
     """
-    common_cols = [c for c in reference_df.columns if c in query_df.columns]
-    ref = reference_df[common_cols].copy()
-    qry = query_df[common_cols].copy()
-
-    num_cols = ref.select_dtypes(include=[np.number]).columns.tolist()
-    cat_cols = ref.select_dtypes(exclude=[np.number]).columns.tolist()
-
-    # One-hot кодирование категориальных признаков.
-    # Обучаем на reference, чтобы query получил те же колонки.
-    # Категории из query, отсутствующие в reference → столбец с нулями (reindex).
-    ref_dummies = pd.get_dummies(ref[cat_cols], prefix_sep="__") if cat_cols else pd.DataFrame(index=ref.index)
-    qry_dummies = pd.get_dummies(qry[cat_cols], prefix_sep="__") if cat_cols else pd.DataFrame(index=qry.index)
-    qry_dummies = qry_dummies.reindex(columns=ref_dummies.columns, fill_value=0)
-
-    # Нормализация числовых признаков в [0, 1].
-    # Обучаем scaler на reference, применяем к обоим — одинаковая шкала.
-    if num_cols:
-        scaler = MinMaxScaler()
-        ref_num = pd.DataFrame(
-            scaler.fit_transform(ref[num_cols].fillna(0)),
-            columns=num_cols,
-            index=ref.index,
-        )
-        qry_num = pd.DataFrame(
-            scaler.transform(qry[num_cols].fillna(0)),
-            columns=num_cols,
-            index=qry.index,
-        )
-    else:
-        ref_num = pd.DataFrame(index=ref.index)
-        qry_num = pd.DataFrame(index=qry.index)
+    if encoding not in ("onehot", "codes"):
+        raise ValueError(f"encoding должен быть 'onehot' или 'codes', получено: '{encoding}'")
+    if approximate and encoding != "onehot":
+        raise ValueError("Приближённый режим DCR поддерживается только для encoding='onehot'")
+    if feature_space is None:
+        feature_space = FeatureSpace.fit(real_train_df)
+    encode = feature_space.transform_codes if encoding == "codes" else feature_space.transform
+    if train_matrix is None:
+        train_matrix = encode(real_train_df)
+
+    # В приближённом режиме подсэмплирования нет: оцениваем все строки
+    if approximate:
+        sample_size = None
+    sizes = [sample_size, mia_sample_size] if mia else [sample_size]
+
+    synth_matrix, synth_order = _encode_sample(encode, synth_df, sizes)
+    holdout_matrix, holdout_order = _encode_sample(encode, real_holdout_df, sizes)
+    orders = {"train": np.random.RandomState(42).permutation(len(train_matrix))}
+    sampled = []
+    for name, order in (("synth", synth_order), ("holdout", holdout_order)):
+        if order is None:
+            sampled.append(name)
+        else:
+            orders[name] = order
 
-    ref_arr = np.hstack([ref_num.values, ref_dummies.values.astype(float)])
-    qry_arr = np.hstack([qry_num.values, qry_dummies.values.astype(float)])
+    logger.info(
+        f"[distance] Кодирование признаков ({encoding})... "
+        f"train={len(train_matrix)}, synth={len(synth_matrix)}, holdout={len(holdout_matrix)}"
+    )
 
-    return ref_arr, qry_arr
+    # Синтетика и holdout кодируются в пространстве real_train:
+    # словарь категорий и границы нормировки взяты из train.
+    return NeighborContext(
+        {"train": train_matrix, "synth": synth_matrix, "holdout": holdout_matrix},
+        nn_backend=nn_backend,
+        n_jobs=n_jobs,
+        n_workers=n_workers,
+        approximate=approximate,
+        ann_n_lists=ann_n_lists,
+        ann_n_probe=ann_n_probe,
+        orders=orders,
+        sampled=sampled,
+    )
 
 
-def _compute_distances_batched(
-    query_arr: np.ndarray,
-    reference_arr: np.ndarray,
-    batch_size: int = 500,
-) -> np.ndarray:
-    """
-    Вычисляет евклидово расстояние от каждой строки query до всех строк reference.
-    Возвращает массив расстояний до ближайшего соседа (shape: [len(query)]).
-    Батчинг нужен, чтобы не грузить RAM при больших датасетах.
+def _encode_sample(
+    encode: Any,
+    df: pd.DataFrame,
+    sizes: List[Optional[int]],
+) -> Tuple[Union[np.ndarray, CodedMatrix], Optional[np.ndarray]]:
     """
-    n_query = query_arr.shape[0]
-    min_distances = np.empty(n_query)
-
-    for start in range(0, n_query, batch_size):
-        end = min(start + batch_size, n_query)
-        batch = query_arr[start:end]  # [batch, features]
-
-        # Векторизованный расчет расстояний: [batch, n_reference]
-        diff = batch[:, np.newaxis, :] - reference_arr[np.newaxis, :, :]
-        dists = np.sqrt((diff ** 2).sum(axis=2))
-        min_distances[start:end] = dists.min(axis=1)
-
-    return min_distances
-
+    Кодирует строки df, достаточные для выборок размеров sizes (None = все строки).
 
-def _compute_nndr_batched(
-    query_arr: np.ndarray,
-    reference_arr: np.ndarray,
-    batch_size: int = 500,
-) -> np.ndarray:
+    Выборка размера n — первые n строк перестановки RandomState(42) (тот же набор,
+    что df.sample(n, random_state=42)). Если какой-то выборке нужны все строки,
+    df кодируется целиком и возвращается вместе с перестановкой; иначе кодируется
+    только префикс перестановки длины max(sizes), порядок — None.
     """
-    Nearest Neighbor Distance Ratio: dist_1st / dist_2nd.
-    Если NNDR → 0, запись почти совпадает с ближайшим соседом.
-    Если NNDR → 1, первый и второй сосед одинаково далеки — запись уникальна.
-    """
-    n_query = query_arr.shape[0]
-    nndr_values = np.empty(n_query)
-
-    for start in range(0, n_query, batch_size):
-        end = min(start + batch_size, n_query)
-        batch = query_arr[start:end]
-
-        diff = batch[:, np.newaxis, :] - reference_arr[np.newaxis, :, :]
-        dists = np.sqrt((diff ** 2).sum(axis=2))
-
-        # Сортируем и берем двух ближайших соседей
-        dists.sort(axis=1)
-        d1 = dists[:, 0]
-        d2 = dists[:, 1]
-
-        # Защита от деления на 0: если d2=0, NNDR считаем 0
-        with np.errstate(divide='ignore', invalid='ignore'):
-            nndr = np.where(d2 > 0, d1 / d2, 0.0)
-
-        nndr_values[start:end] = nndr
-
-    return nndr_values
+    order = np.random.RandomState(42).permutation(len(df))
+    if any(not size or size >= len(df) for size in sizes):
+        return encode(df), order
+    return encode(df.take(order[:max(sizes)])), None
 
 
 # ─────────────────────────────────────────────
@@ -165,6 +191,18 @@ def compute_distance_metrics(
     real_holdout_df: pd.DataFrame,
     synth_df: pd.DataFrame,
     sample_size: Optional[int] = 2000,
+    reference_sample_size: Optional[int] = None,
+    nn_backend: NeighborBackend = "auto",
+    n_jobs: Optional[int] = None,
+    feature_space: Optional[FeatureSpace] = None,
+    train_matrix: Optional[Union[np.ndarray, CodedMatrix]] = None,
+    encoding: DistanceEncoding = "onehot",
+    approximate: bool = False,
+    ann_n_lists: Optional[int] = None,
+    ann_n_probe: int = 8,
+    recall_sample_size: int = 1000,
+    n_workers: Optional[int] = 1,
+    context: Optional[NeighborContext] = None,
 ) -> Dict:
     """
     Считает DCR и NNDR для синтетики и для holdout-выборки реальных данных.
@@ -175,56 +213,70 @@ def compute_distance_metrics(
     - Если медиана DCR_synth >= медианы DCR_holdout, синтетика не "ближе"
       к обучающим данным, чем отложенные реальные данные. Это целевое поведение.
 
-    sample_size: ограничиваем выборку для скорости (None = весь датасет).
+    context: готовый NeighborContext (см. prepare_neighbor_context) — общий с MIA.
+             Если не передан, строится здесь по остальным параметрам (их смысл
+             описан в prepare_neighbor_context) и закрывается по завершении.
+    recall_sample_size: размер подвыборки для оценки recall приближения.
     """
-    # Сэмплируем для ускорения на больших датасетах.
-    # reference (real_train) тоже ограничиваем — иначе промежуточный тензор
-    # (batch, n_reference, n_features) выходит за пределы RAM.
-    # При 24k строках и 105 признаках батч 500×24k×105×8 байт ≈ 10 ГБ.
-    _REF_CAP = 5000  # эталонная выборка: достаточно для стат. надёжности DCR/NNDR
-    if len(real_train_df) > _REF_CAP:
-        real_train_ref = real_train_df.sample(_REF_CAP, random_state=42)
-    else:
-        real_train_ref = real_train_df
-
-    if sample_size and len(synth_df) > sample_size:
-        synth_sample = synth_df.sample(sample_size, random_state=42)
-    else:
-        synth_sample = synth_df
-
-    if sample_size and len(real_holdout_df) > sample_size:
-        holdout_sample = real_holdout_df.sample(sample_size, random_state=42)
-    else:
-        holdout_sample = real_holdout_df
-
-    logger.info(
-        f"[distance] Кодирование и нормализация признаков... "
-        f"train_ref={len(real_train_ref)}, synth={len(synth_sample)}, holdout={len(holdout_sample)}"
-    )
-
-    # Кодируем синтетику и holdout относительно real_train.
-    # real_train — эталон: на нём обучаем scaler и one-hot словарь,
-    # затем применяем ту же трансформацию к synth и holdout.
-    ref_arr, synth_arr = _encode_and_normalize(real_train_ref, synth_sample)
-    _, holdout_arr = _encode_and_normalize(real_train_ref, holdout_sample)
-
-    # DCR
-    logger.info("[distance] Считаем DCR (synth → real_train)...")
-    dcr_synth = _compute_distances_batched(synth_arr, ref_arr)
-
-    logger.info("[distance] Считаем DCR (holdout → real_train)...")
-    dcr_holdout = _compute_distances_batched(holdout_arr, ref_arr)
+    own_context = context is None
+    if own_context:
+        context = prepare_neighbor_context(
+            real_train_df, real_holdout_df, synth_df,
+            sample_size=sample_size,
+            reference_sample_size=reference_sample_size,
+            nn_backend=nn_backend,
+            n_jobs=n_jobs,
+            feature_space=feature_space,
+            train_matrix=train_matrix,
+            encoding=encoding,
+            approximate=approximate,
+            ann_n_lists=ann_n_lists,
+            ann_n_probe=ann_n_probe,
+            n_workers=n_workers,
+        )
 
-    # NNDR
-    logger.info("[distance] Считаем NNDR (synth → real_train)...")
-    nndr_synth = _compute_nndr_batched(synth_arr, ref_arr)
+    try:
+        # Выборки DCR из матриц контекста (общих с MIA, см. NeighborContext.subset)
+        if context.approximate:
+            sample_size = None
+        synth = context.subset("synth", sample_size)
+        holdout = context.subset("holdout", sample_size)
+        train = context.subset("train", reference_sample_size)
+
+        # DCR и NNDR синтетики — из одного запроса (1-й и 2-й сосед)
+        logger.info("[distance] Считаем DCR и NNDR (synth → real_train)...")
+        synth_d, _ = context.query(synth, train, k=2)
+        dcr_synth = synth_d[:, 0]
+        # Защита от деления на 0: если d2=0, NNDR считаем 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            nndr_synth = np.where(synth_d[:, 1] > 0, synth_d[:, 0] / synth_d[:, 1], 0.0)
+
+        logger.info("[distance] Считаем DCR (holdout → real_train)...")
+        holdout_d, _ = context.query(holdout, train, k=1)
+        dcr_holdout = holdout_d[:, 0]
+
+        approximation = None
+        if context.approximate:
+            logger.info("[distance] Оцениваем recall приближённого поиска...")
+            index = context.index(train)
+            approximation = {
+                "method": "ivf",
+                "n_lists": index.n_lists,
+                "n_probe": index.n_probe,
+                "synth_rows_evaluated": context.n_rows(synth),
+                "holdout_rows_evaluated": context.n_rows(holdout),
+                **estimate_recall(index, context.matrix(synth), dcr_synth, sample_size=recall_sample_size),
+            }
+    finally:
+        if own_context:
+            context.close()
 
     # Интерпретация: если синтетика не ближе к обучающим данным, чем holdout — всё ок
     dcr_synth_median = float(np.median(dcr_synth))
     dcr_holdout_median = float(np.median(dcr_holdout))
     privacy_preserved = dcr_synth_median >= dcr_holdout_median
 
-    return {
+    result = {
         "dcr": {
             "synth_to_real": {
                 "min":    round(float(dcr_synth.min()), 6),
@@ -250,4 +302,8 @@ def compute_distance_metrics(
             "synth_median":    round(float(np.median(nndr_synth)), 6),
             "share_below_0.1": round(float((nndr_synth < 0.1).mean()), 6),
         },
-    }
\ No newline at end of file
+    }
+    if approximation is not None:
+        result["dcr"]["synth_to_real"]["estimated_recall"] = approximation["estimated_recall"]
+        result["approximation"] = approximation
+    return result
\ No newline at end of file
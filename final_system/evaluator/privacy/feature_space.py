@@ -0,0 +1,188 @@
+"""
+feature_space.py
+
+Общее признаковое пространство для дистанционных метрик приватности (DCR, NNDR, MIA).
+
+FeatureSpace обучается один раз на реальном train-сете и затем кодирует любые
+датафреймы (синтетику, holdout, сам train) в одну и ту же систему координат:
+
+    Числовые колонки       → min-max нормировка в [0, 1] (как MinMaxScaler,
+                             пропуски заполняются нулём до обучения).
+    Категориальные колонки → one-hot по словарю категорий из train;
+                             неизвестные категории и пропуски → нулевой блок.
+
+Порядок признаков: сначала числовые, затем one-hot блоки — в порядке колонок
+train-сета, категории внутри блока отсортированы (как у pd.get_dummies).
+
+Режим "codes" (transform_codes): категориальные колонки не разворачиваются
+в one-hot, а хранятся целочисленными кодами (−1 = неизвестная категория/пропуск).
+Евклидов вклад one-hot блока восстанавливается точно: две разные известные
+категории дают 2 (две различающиеся единицы), известная против неизвестной — 1,
+совпадение — 0. Память растёт с числом колонок, а не с числом категорий.
+
+Результат — компактная float32-матрица. Параметры кодировщика сериализуются
+в JSON, поэтому Evaluation Service может сохранить их рядом с
+splits/{split_id}/meta.json вместе с уже закодированным train-сетом (.npy)
+и не переобучать кодировщик на каждом запросе.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FEATURE_SPACE_VERSION = 1
+
+
+@dataclass
+class CodedMatrix:
+    """
+    Признаки в режиме "codes": нормированные числовые колонки + коды категорий.
+
+    numeric: [n, n_numeric] float32, min-max в [0, 1]
+    codes:   [n, n_categorical] int32, −1 = категория вне словаря train или пропуск
+    """
+    numeric: np.ndarray
+    codes: np.ndarray
+
+    def __len__(self) -> int:
+        return self.numeric.shape[0]
+
+    def __getitem__(self, rows: Any) -> "CodedMatrix":
+        return CodedMatrix(numeric=self.numeric[rows], codes=self.codes[rows])
+
+
+@dataclass
+class FeatureSpace:
+    """
+    Обученный кодировщик признаков.
+
+    numeric:     колонка → (min, max) на train
+    categorical: колонка → отсортированный список категорий train
+    """
+    numeric: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    categorical: Dict[str, List[Any]] = field(default_factory=dict)
+
+    # ── Обучение ──────────────────────────────────────────────────────────────
+
+    @classmethod
+    def fit(cls, reference_df: pd.DataFrame) -> "FeatureSpace":
+        """Обучает кодировщик на reference_df (реальный train-сет)."""
+        num_cols = reference_df.select_dtypes(include=[np.number]).columns.tolist()
+        cat_cols = reference_df.select_dtypes(exclude=[np.number]).columns.tolist()
+
+        numeric = {}
+        for col in num_cols:
+            values = reference_df[col].fillna(0)
+            numeric[col] = (float(values.min()), float(values.max()))
+
+        categorical = {}
+        for col in cat_cols:
+            categorical[col] = pd.Categorical(reference_df[col].dropna()).categories.tolist()
+
+        space = cls(numeric=numeric, categorical=categorical)
+        logger.info(
+            f"[feature_space] Обучено: numeric={len(numeric)}, "
+            f"categorical={len(categorical)}, n_features={space.n_features}"
+        )
+        return space
+
+    # ── Свойства ──────────────────────────────────────────────────────────────
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.numeric) + list(self.categorical)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.numeric) + sum(len(c) for c in self.categorical.values())
+
+    @property
+    def feature_names(self) -> List[str]:
+        names = list(self.numeric)
+        for col, cats in self.categorical.items():
+            names.extend(f"{col}__{c}" for c in cats)
+        return names
+
+    # ── Кодирование ──────────────────────────────────────────────────────────
+
+    def transform(self, df: pd.DataFrame, dtype: Any = np.float32) -> np.ndarray:
+        """
+        Кодирует df в матрицу [len(df), n_features].
+        Колонки train, отсутствующие в df, кодируются нулями (с предупреждением).
+        """
+        missing = [c for c in self.columns if c not in df.columns]
+        if missing:
+            logger.warning(f"[feature_space] Колонки отсутствуют в данных и закодированы нулями: {missing}")
+
+        out = np.zeros((len(df), self.n_features), dtype=dtype)
+        out[:, :len(self.numeric)] = self._numeric_block(df, dtype)
+
+        rows = np.arange(len(df))
+        offset = len(self.numeric)
+        codes = self._category_codes(df)
+        for j, cats in enumerate(self.categorical.values()):
+            known = codes[:, j] >= 0
+            out[rows[known], offset + codes[known, j]] = 1.0
+            offset += len(cats)
+
+        return out
+
+    def transform_codes(self, df: pd.DataFrame) -> CodedMatrix:
+        """
+        Кодирует df в режиме "codes" — без развёртывания категорий в one-hot.
+        Колонки train, отсутствующие в df, кодируются нулями / кодом −1.
+        """
+        missing = [c for c in self.columns if c not in df.columns]
+        if missing:
+            logger.warning(f"[feature_space] Колонки отсутствуют в данных и закодированы нулями: {missing}")
+        return CodedMatrix(numeric=self._numeric_block(df), codes=self._category_codes(df))
+
+    def _numeric_block(self, df: pd.DataFrame, dtype: Any = np.float32) -> np.ndarray:
+        out = np.zeros((len(df), len(self.numeric)), dtype=dtype)
+        for j, (col, (lo, hi)) in enumerate(self.numeric.items()):
+            if col in df.columns:
+                scale = (hi - lo) or 1.0
+                values = pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+                out[:, j] = (values - lo) / scale
+        return out
+
+    def _category_codes(self, df: pd.DataFrame) -> np.ndarray:
+        out = np.full((len(df), len(self.categorical)), -1, dtype=np.int32)
+        for j, (col, cats) in enumerate(self.categorical.items()):
+            if col in df.columns and cats:
+                out[:, j] = pd.Index(cats).get_indexer(df[col])
+        return out
+
+    # ── Сериализация ─────────────────────────────────────────────────────────
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": FEATURE_SPACE_VERSION,
+            "numeric": {c: list(bounds) for c, bounds in self.numeric.items()},
+            "categorical": self.categorical,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FeatureSpace":
+        if data.get("version") != FEATURE_SPACE_VERSION:
+            raise ValueError(f"Неподдерживаемая версия FeatureSpace: {data.get('version')}")
+        return cls(
+            numeric={c: (float(lo), float(hi)) for c, (lo, hi) in data["numeric"].items()},
+            categorical={c: list(cats) for c, cats in data["categorical"].items()},
+        )
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "FeatureSpace":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
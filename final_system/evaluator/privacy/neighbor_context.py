@@ -0,0 +1,164 @@
+"""
+neighbor_context.py
+
+Общий контекст поиска соседей для одного вызова PrivacyEvaluator.evaluate.
+
+DCR/NNDR ищут соседей синтетики и holdout в train-сете (reference = train),
+MIA — соседей train- и holdout-записей в синтетике (reference = synth).
+NeighborContext хранит уже закодированные матрицы трёх датасетов
+("train", "holdout", "synth"), строит индекс по каждому эталону не более
+одного раза и запоминает результаты запросов. Итог: одно построение индекса
+на направление, всё остальное — запросы к готовым индексам.
+
+Тип индекса задаётся один раз для контекста: точный NeighborIndex,
+многопроцессный ShardedNeighborIndex (n_workers > 1) или приближённый
+ApproximateNeighborIndex (approximate=True).
+
+Выборки отдельных метрик (DCR — distance_sample_size, MIA — mia_sample_size)
+берутся из общих матриц через subset(): это первые n строк случайного порядка
+строк матрицы, поэтому выборки разных размеров вложены друг в друга и размер
+выборки одной метрики не меняет выборку другой.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from .feature_space import CodedMatrix
+from .neighbors import ApproximateNeighborIndex, NeighborBackend, NeighborIndex
+from .parallel_neighbors import ShardedNeighborIndex, resolve_n_workers
+
+logger = logging.getLogger(__name__)
+
+Matrix = Union[np.ndarray, CodedMatrix]
+
+
+class NeighborContext:
+    """
+    Закодированные датасеты + лениво построенные индексы + кэш запросов.
+
+    matrices — словарь имя → матрица в общем признаковом пространстве
+    (обычно "train", "holdout", "synth"). Используется как контекстный
+    менеджер: close() освобождает пулы процессов и разделяемую память.
+
+    orders  — имя → случайная перестановка строк матрицы, задающая выборки
+              subset(); для матриц без перестановки строки уже идут
+              в случайном порядке (матрица — подвыборка датасета).
+    sampled — имена матриц, закодированных не целиком: выборку больше
+              матрицы из них взять нельзя (subset() поднимает ValueError).
+    """
+
+    def __init__(
+        self,
+        matrices: Dict[str, Matrix],
+        nn_backend: NeighborBackend = "auto",
+        n_jobs: Optional[int] = None,
+        n_workers: Optional[int] = 1,
+        approximate: bool = False,
+        ann_n_lists: Optional[int] = None,
+        ann_n_probe: int = 8,
+        orders: Optional[Dict[str, np.ndarray]] = None,
+        sampled: Iterable[str] = (),
+    ) -> None:
+        self.matrices = matrices
+        self.nn_backend = nn_backend
+        self.n_jobs = n_jobs
+        self.n_workers = resolve_n_workers(n_workers)
+        self.approximate = approximate
+        self.ann_n_lists = ann_n_lists
+        self.ann_n_probe = ann_n_probe
+        self.orders = orders or {}
+        self.sampled = set(sampled)
+        self._indexes: Dict[str, Any] = {}
+        self._results: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]] = {}
+
+    def matrix(self, name: str) -> Matrix:
+        return self.matrices[name]
+
+    def n_rows(self, name: str) -> int:
+        return len(self.matrices[name])
+
+    def subset(self, name: str, n_rows: Optional[int]) -> str:
+        """
+        Имя матрицы из n_rows случайных строк матрицы name (None — все строки).
+
+        Подматрица — первые n_rows строк в порядке orders[name] (без порядка —
+        первые n_rows строк самой матрицы); она регистрируется в контексте,
+        так что её индекс и результаты запросов кэшируются как у основных.
+        """
+        n_total = self.n_rows(name)
+        if not n_rows or n_rows >= n_total:
+            if name in self.sampled and (not n_rows or n_rows > n_total):
+                raise ValueError(
+                    f"Матрица '{name}' закодирована подвыборкой из {n_total} строк, "
+                    f"запрошено {n_rows or 'все'}: контекст подготовлен под меньшую выборку"
+                )
+            return name
+        key = f"{name}[:{n_rows}]"
+        if key not in self.matrices:
+            order = self.orders.get(name)
+            rows = order[:n_rows] if order is not None else slice(0, n_rows)
+            self.matrices[key] = self.matrices[name][rows]
+        return key
+
+    def index(self, reference: str) -> Any:
+        """Индекс по матрице reference; строится при первом обращении."""
+        if reference not in self._indexes:
+            ref_arr = self.matrices[reference]
+            logger.info(f"[neighbors] Строим индекс по '{reference}' ({len(ref_arr)} строк)")
+            if self.approximate:
+                index: Any = ApproximateNeighborIndex(
+                    ref_arr, n_lists=self.ann_n_lists, n_probe=self.ann_n_probe,
+                )
+            elif self.n_workers > 1:
+                index = ShardedNeighborIndex(ref_arr, backend=self.nn_backend, n_workers=self.n_workers)
+            else:
+                index = NeighborIndex(ref_arr, backend=self.nn_backend, n_jobs=self.n_jobs)
+            self._indexes[reference] = index
+        return self._indexes[reference]
+
+    def query(
+        self,
+        query: str,
+        reference: str,
+        k: int = 1,
+        rows: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k ближайших соседей строк матрицы query в матрице reference.
+
+        Результат для всей матрицы query запоминается: повторный запрос
+        (в том числе с меньшим k или подмножеством строк rows) не выполняет
+        поиск заново. Запрос по подмножеству rows без готового полного
+        результата считается только для этих строк и не кэшируется.
+        """
+        key = (query, reference)
+        cached = self._results.get(key)
+        if cached is not None and cached[0].shape[1] >= k:
+            dists, idx = cached[0][:, :k], cached[1][:, :k]
+            if rows is not None:
+                return dists[rows], idx[rows]
+            return dists, idx
+
+        query_arr = self.matrices[query]
+        if rows is not None:
+            return self.index(reference).query(query_arr[rows], k=k)
+
+        dists, idx = self.index(reference).query(query_arr, k=k)
+        self._results[key] = (dists, idx)
+        return dists, idx
+
+    def close(self) -> None:
+        for index in self._indexes.values():
+            if isinstance(index, ShardedNeighborIndex):
+                index.close()
+        self._indexes = {}
+
+    def __enter__(self) -> "NeighborContext":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
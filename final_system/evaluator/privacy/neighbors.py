@@ -0,0 +1,445 @@
+"""
+neighbors.py
+
+Движок поиска ближайших соседей для дистанционных метрик приватности (DCR, NNDR).
+
+Прямой перебор через плотный тензор разностей [batch, n_reference, n_features]
+с полной сортировкой строк не масштабируется дальше нескольких тысяч эталонных
+записей. Поэтому поиск вынесен в подключаемый бэкенд NeighborIndex:
+
+    "tree" — sklearn NearestNeighbors (KD-tree / ball-tree). Точный поиск
+             за ~O(log n) на запрос; эффективен на низкой размерности.
+    "gemm" — блочное ||a||² + ||b||² − 2·a·bᵀ через матричное умножение (BLAS)
+             и np.argpartition вместо полной сортировки. Подходит для широких
+             one-hot матриц, где деревья вырождаются в полный перебор.
+    "auto" — "tree" при n_features ≤ TREE_MAX_FEATURES, иначе "gemm".
+    "codes" — для CodedMatrix (FeatureSpace.transform_codes): числовая часть
+             через GEMM, категориальная — как 2 × (число несовпавших категорий),
+             векторизованно по целочисленным кодам. Выбирается автоматически,
+             если reference передан как CodedMatrix.
+
+Оба бэкенда возвращают 1-го и 2-го соседа за один проход — DCR и NNDR
+считаются из одного результата запроса.
+
+Приближённый режим (ApproximateNeighborIndex):
+    IVF-схема на numpy — reference разбивается k-means на n_lists ячеек
+    (coarse quantizer), запрос просматривает только n_probe ближайших ячеек.
+    Позволяет прогнать через DCR/NNDR всю синтетику (миллионы строк) без
+    скрытого подсэмплирования. Качество приближения измеряется явно:
+    estimate_recall() сравнивает результат с точным поиском на случайной
+    подвыборке запросов, и оценка recall попадает в отчёт.
+
+Точность GEMM-ядра:
+    Формула через скалярные произведения теряет точность при малых
+    расстояниях (катастрофическое сокращение). Поэтому GEMM используется
+    только для отбора кандидатов, а итоговые расстояния до отобранных
+    соседей пересчитываются напрямую как ||a − b|| в float64. Точные дубликаты
+    (DCR = 0) распознаются корректно, а float32-матрицы из FeatureSpace
+    не приходится расширять до float64 целиком.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Dict, Literal, Optional, Tuple, Union
+
+import numpy as np
+
+from .feature_space import CodedMatrix
+
+logger = logging.getLogger(__name__)
+
+NeighborBackend = Literal["auto", "tree", "gemm", "codes"]
+
+# Порог размерности, выше которого KD/ball-tree перестают выигрывать у перебора
+TREE_MAX_FEATURES = 20
+
+# Бюджет на промежуточную матрицу расстояний GEMM-ядра (в элементах).
+# 2^24 элементов ≈ 128 МБ во float64 — блок подбирается так, чтобы не выходить за него.
+_GEMM_BLOCK_ELEMENTS = 1 << 24
+
+
+def _merge_topk(
+    best_d2: np.ndarray,
+    best_idx: np.ndarray,
+    d2: np.ndarray,
+    ref_ids: np.ndarray,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Сливает текущие k лучших кандидатов с блоком квадратов расстояний d2
+    [n_query, n_block] (ref_ids — номера строк reference для колонок блока).
+    np.argpartition вместо полной сортировки: O(n_block) на строку.
+    """
+    kk = min(k, d2.shape[1])
+    part = np.argpartition(d2, kk - 1, axis=1)[:, :kk]
+    merged_d2 = np.hstack([best_d2, np.take_along_axis(d2, part, axis=1)])
+    merged_idx = np.hstack([best_idx, ref_ids[part]])
+    sel = np.argpartition(merged_d2, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(merged_d2, sel, axis=1), np.take_along_axis(merged_idx, sel, axis=1)
+
+
+def _rerank_dense(
+    query_arr: np.ndarray,
+    reference_arr: np.ndarray,
+    cand_idx: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Точный пересчёт расстояний до кандидатов (float64) и сортировка по возрастанию."""
+    diff = query_arr[:, None, :].astype(np.float64) - reference_arr[cand_idx]
+    exact = np.sqrt((diff ** 2).sum(axis=2))
+    # Незаполненные кандидаты (−1) не должны выглядеть как реальные соседи
+    exact[cand_idx < 0] = np.inf
+    order = np.argsort(exact, axis=1)
+    return np.take_along_axis(exact, order, axis=1), np.take_along_axis(cand_idx, order, axis=1)
+
+
+def resolve_backend(backend: NeighborBackend, n_features: int) -> str:
+    """Конкретный бэкенд ("tree" | "gemm") для плотной матрицы ширины n_features."""
+    if backend == "codes":
+        raise ValueError("nn_backend='codes' требует reference в виде CodedMatrix")
+    if backend == "auto":
+        return "tree" if n_features <= TREE_MAX_FEATURES else "gemm"
+    if backend not in ("tree", "gemm"):
+        raise ValueError(
+            f"nn_backend должен быть 'auto', 'tree' или 'gemm', получено: '{backend}'"
+        )
+    return backend
+
+
+class NeighborIndex:
+    """
+    Индекс ближайших соседей над эталонной матрицей reference_arr.
+
+    Строится один раз, затем query() отвечает на запросы k ближайших соседей
+    для произвольного числа матриц-запросов в том же признаковом пространстве.
+    """
+
+    def __init__(
+        self,
+        reference_arr: Union[np.ndarray, CodedMatrix],
+        backend: NeighborBackend = "auto",
+        n_jobs: Optional[int] = None,
+    ) -> None:
+        self.n_jobs = n_jobs
+        self._tree = None
+        self._ref_sq_norms: Optional[np.ndarray] = None
+
+        if isinstance(reference_arr, CodedMatrix):
+            if len(reference_arr) == 0:
+                raise ValueError("reference_arr должен быть непустым")
+            self.backend = "codes"
+            self.reference_arr = CodedMatrix(
+                numeric=np.ascontiguousarray(reference_arr.numeric, dtype=np.float64),
+                codes=np.ascontiguousarray(reference_arr.codes),
+            )
+            self._ref_sq_norms = np.einsum("ij,ij->i", self.reference_arr.numeric, self.reference_arr.numeric)
+            logger.info(
+                f"[neighbors] Индекс построен: backend=codes, reference={len(reference_arr)}×"
+                f"({reference_arr.numeric.shape[1]} num + {reference_arr.codes.shape[1]} cat)"
+            )
+            return
+
+        if reference_arr.ndim != 2 or reference_arr.shape[0] == 0:
+            raise ValueError("reference_arr должен быть непустой 2D-матрицей")
+
+        # float32 (FeatureSpace) сохраняется как есть, прочие типы → float64
+        dtype = reference_arr.dtype if reference_arr.dtype in (np.float32, np.float64) else np.float64
+        self.reference_arr = np.ascontiguousarray(reference_arr, dtype=dtype)
+        self.backend = resolve_backend(backend, self.reference_arr.shape[1])
+
+        if self.backend == "tree":
+            from sklearn.neighbors import NearestNeighbors
+
+            self._tree = NearestNeighbors(algorithm="auto", n_jobs=n_jobs)
+            self._tree.fit(self.reference_arr)
+        else:
+            self._ref_sq_norms = np.einsum("ij,ij->i", self.reference_arr, self.reference_arr)
+
+        logger.info(
+            f"[neighbors] Индекс построен: backend={self.backend}, "
+            f"reference={self.reference_arr.shape}"
+        )
+
+    @property
+    def n_reference(self) -> int:
+        return len(self.reference_arr)
+
+    def query(
+        self,
+        query_arr: Union[np.ndarray, CodedMatrix],
+        k: int = 2,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Возвращает (distances, indices) формы [n_query, k], отсортированные
+        по возрастанию расстояния. Если в reference меньше k строк,
+        недостающие соседи заполняются расстоянием inf и индексом −1.
+        """
+        k_eff = min(k, self.n_reference)
+
+        if self.backend == "codes":
+            if not isinstance(query_arr, CodedMatrix):
+                raise TypeError("Индекс в режиме 'codes' принимает запросы только в виде CodedMatrix")
+            dists, idx = self._query_codes(query_arr, k_eff)
+        elif self.backend == "tree":
+            dists, idx = self._tree.kneighbors(query_arr, n_neighbors=k_eff)
+        else:
+            query_arr = np.ascontiguousarray(query_arr, dtype=self.reference_arr.dtype)
+            dists, idx = self._query_gemm(query_arr, k_eff)
+
+        if k_eff < k:
+            pad = k - k_eff
+            dists = np.hstack([dists, np.full((len(dists), pad), np.inf)])
+            idx = np.hstack([idx, np.full((len(idx), pad), -1, dtype=idx.dtype)])
+        return dists, idx
+
+    def _query_gemm(self, query_arr: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Блочный GEMM-поиск: для каждого блока запросов перебираем блоки reference,
+        поддерживая текущие k лучших кандидатов. Память — O(block_q × block_r)
+        на расстояния и O(block_q × k × n_features) на rerank кандидатов.
+        """
+        n_query = query_arr.shape[0]
+        n_ref = self.n_reference
+        ref = self.reference_arr
+        ref_sq = self._ref_sq_norms
+
+        block_r = min(n_ref, max(k, _GEMM_BLOCK_ELEMENTS // 512))
+        # _rerank_dense строит float64-тензор [block_q, k, n_features] —
+        # он ограничен тем же числом элементов, что и блок расстояний
+        block_q = max(1, min(
+            n_query,
+            _GEMM_BLOCK_ELEMENTS // block_r,
+            _GEMM_BLOCK_ELEMENTS // max(1, k * ref.shape[1]),
+        ))
+
+        d2_dtype = ref.dtype
+        out_d = np.empty((n_query, k))
+        out_idx = np.empty((n_query, k), dtype=np.int64)
+
+        for q_start in range(0, n_query, block_q):
+            q_end = min(q_start + block_q, n_query)
+            q = query_arr[q_start:q_end]
+            q_sq = np.einsum("ij,ij->i", q, q)
+
+            best_d2 = np.full((len(q), k), np.inf, dtype=d2_dtype)
+            best_idx = np.full((len(q), k), -1, dtype=np.int64)
+
+            for r_start in range(0, n_ref, block_r):
+                r_end = min(r_start + block_r, n_ref)
+                d2 = q_sq[:, None] + ref_sq[None, r_start:r_end] - 2.0 * (q @ ref[r_start:r_end].T)
+                best_d2, best_idx = _merge_topk(best_d2, best_idx, d2, np.arange(r_start, r_end), k)
+
+            out_d[q_start:q_end], out_idx[q_start:q_end] = _rerank_dense(q, ref, best_idx)
+
+        return out_d, out_idx
+
+    def _query_codes(self, query: CodedMatrix, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Перебор для CodedMatrix: d² = ||num_a − num_b||² + Σ_c w_c, где для каждой
+        категориальной колонки w_c = [a_c ≠ b_c] · ([a_c ≥ 0] + [b_c ≥ 0]).
+        Это в точности квадрат евклидова расстояния между one-hot векторами,
+        но без их материализации: временные массивы — [block_q, block_r].
+        """
+        ref = self.reference_arr
+        ref_sq = self._ref_sq_norms
+        ref_known = ref.codes >= 0
+        q_num = np.ascontiguousarray(query.numeric, dtype=np.float64)
+        q_codes = query.codes
+        q_known = q_codes >= 0
+        n_query, n_ref = len(query), self.n_reference
+        n_cat = q_codes.shape[1]
+
+        # На блок приходится несколько временных массивов [block_q, block_r]
+        block_r = min(n_ref, max(k, _GEMM_BLOCK_ELEMENTS // 2048))
+        block_q = max(1, min(n_query, _GEMM_BLOCK_ELEMENTS // 4 // block_r))
+
+        out_d = np.empty((n_query, k))
+        out_idx = np.empty((n_query, k), dtype=np.int64)
+
+        for q_start in range(0, n_query, block_q):
+            q_end = min(q_start + block_q, n_query)
+            qn = q_num[q_start:q_end]
+            qc = q_codes[q_start:q_end]
+            qk = q_known[q_start:q_end]
+            q_sq = np.einsum("ij,ij->i", qn, qn)
+
+            best_d2 = np.full((len(qn), k), np.inf)
+            best_idx = np.full((len(qn), k), -1, dtype=np.int64)
+
+            for r_start in range(0, n_ref, block_r):
+                r_end = min(r_start + block_r, n_ref)
+                d2 = q_sq[:, None] + ref_sq[None, r_start:r_end] - 2.0 * (qn @ ref.numeric[r_start:r_end].T)
+
+                # Вклад категорий копится в компактном целочисленном счётчике:
+                # несовпадение двух известных категорий = 2, с неизвестной = 1.
+                cat_d2 = np.zeros((len(qn), r_end - r_start), dtype=np.int16)
+                for c in range(n_cat):
+                    rc = ref.codes[r_start:r_end, c]
+                    neq = qc[:, c, None] != rc[None, :]
+                    cat_d2 += neq
+                    cat_d2 += neq
+                    if not (qk[:, c].all() and ref_known[r_start:r_end, c].all()):
+                        cat_d2 -= neq & ~(qk[:, c, None] & ref_known[None, r_start:r_end, c])
+                d2 += cat_d2
+
+                best_d2, best_idx = _merge_topk(best_d2, best_idx, d2, np.arange(r_start, r_end), k)
+
+            # Точный пересчёт расстояний до отобранных кандидатов
+            num_d2 = ((qn[:, None, :] - ref.numeric[best_idx]) ** 2).sum(axis=2)
+            cand_codes = ref.codes[best_idx]
+            mismatch = qc[:, None, :] != cand_codes
+            cat_d2 = (mismatch * (qk[:, None, :].astype(np.int32) + (cand_codes >= 0))).sum(axis=2)
+            exact = np.sqrt(num_d2 + cat_d2)
+            order = np.argsort(exact, axis=1)
+            out_d[q_start:q_end] = np.take_along_axis(exact, order, axis=1)
+            out_idx[q_start:q_end] = np.take_along_axis(best_idx, order, axis=1)
+
+        return out_d, out_idx
+
+
+class ApproximateNeighborIndex:
+    """
+    Приближённый индекс (IVF, inverted file) над плотной матрицей reference_arr.
+
+    Построение: k-means (несколько итераций Ллойда на подвыборке) даёт
+    n_lists центроидов; каждая строка reference попадает в список ближайшего
+    центроида. Запрос: находим n_probe ближайших центроидов и точно ищем
+    соседей только среди строк этих списков. Интерфейс query() совпадает
+    с NeighborIndex.
+
+    Найденный сосед — всегда реальная строка reference, поэтому приближённый
+    DCR не меньше точного: ошибка односторонняя (в сторону завышения).
+    """
+
+    def __init__(
+        self,
+        reference_arr: np.ndarray,
+        n_lists: Optional[int] = None,
+        n_probe: int = 8,
+        random_state: int = 42,
+        kmeans_iter: int = 10,
+    ) -> None:
+        if isinstance(reference_arr, CodedMatrix):
+            raise TypeError("Приближённый режим поддерживает только плотные матрицы (distance_encoding='onehot')")
+        if reference_arr.ndim != 2 or reference_arr.shape[0] == 0:
+            raise ValueError("reference_arr должен быть непустой 2D-матрицей")
+
+        dtype = reference_arr.dtype if reference_arr.dtype in (np.float32, np.float64) else np.float64
+        self.reference_arr = np.ascontiguousarray(reference_arr, dtype=dtype)
+        n_ref = self.reference_arr.shape[0]
+
+        # Эвристика IVF: ~√n ячеек
+        self.n_lists = int(min(n_ref, max(1, n_lists or round(np.sqrt(n_ref)))))
+        self.n_probe = int(min(self.n_lists, max(1, n_probe)))
+        self.backend = "ivf"
+
+        rng = np.random.RandomState(random_state)
+        train_size = min(n_ref, 256 * self.n_lists)
+        train = self.reference_arr[rng.choice(n_ref, train_size, replace=False)]
+        centroids = train[rng.choice(train_size, self.n_lists, replace=False)].astype(np.float64)
+
+        for _ in range(kmeans_iter):
+            _, assign = NeighborIndex(centroids, backend="gemm").query(train, k=1)
+            assign = assign[:, 0]
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            counts = np.bincount(assign, minlength=self.n_lists)
+            nonempty = counts > 0
+            # Пустые ячейки сохраняют прежний центроид
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+
+        self.centroids = centroids
+        self._centroid_index = NeighborIndex(centroids, backend="gemm")
+        _, assign = self._centroid_index.query(self.reference_arr, k=1)
+        assign = assign[:, 0]
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(self.n_lists + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.n_lists)]
+        self._ref_sq_norms = np.einsum("ij,ij->i", self.reference_arr, self.reference_arr)
+
+        logger.info(
+            f"[neighbors] IVF-индекс построен: reference={self.reference_arr.shape}, "
+            f"n_lists={self.n_lists}, n_probe={self.n_probe}"
+        )
+
+    @property
+    def n_reference(self) -> int:
+        return self.reference_arr.shape[0]
+
+    def query(self, query_arr: np.ndarray, k: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Возвращает (distances, indices) формы [n_query, k], как NeighborIndex.query.
+        Если в просмотренных ячейках меньше k строк, недостающие соседи — inf / −1.
+        """
+        query_arr = np.ascontiguousarray(query_arr, dtype=self.reference_arr.dtype)
+        n_query = query_arr.shape[0]
+        ref = self.reference_arr
+
+        _, probes = self._centroid_index.query(query_arr, k=self.n_probe)
+
+        best_d2 = np.full((n_query, k), np.inf, dtype=ref.dtype)
+        best_idx = np.full((n_query, k), -1, dtype=np.int64)
+        q_sq = np.einsum("ij,ij->i", query_arr, query_arr)
+
+        # Обход по ячейкам: каждая ячейка сравнивается со всеми запросами,
+        # которые её просматривают, одним GEMM-блоком.
+        for list_id, members in enumerate(self._lists):
+            if len(members) == 0:
+                continue
+            q_ids = np.flatnonzero((probes == list_id).any(axis=1))
+            if len(q_ids) == 0:
+                continue
+            block_q = max(1, _GEMM_BLOCK_ELEMENTS // len(members))
+            ref_block = ref[members]
+            ref_sq = self._ref_sq_norms[members]
+            for start in range(0, len(q_ids), block_q):
+                ids = q_ids[start:start + block_q]
+                q = query_arr[ids]
+                d2 = q_sq[ids, None] + ref_sq[None, :] - 2.0 * (q @ ref_block.T)
+                best_d2[ids], best_idx[ids] = _merge_topk(best_d2[ids], best_idx[ids], d2, members, k)
+
+        out_d = np.empty((n_query, k))
+        out_idx = np.empty((n_query, k), dtype=np.int64)
+        block = max(1, _GEMM_BLOCK_ELEMENTS // max(1, k * ref.shape[1]))
+        for start in range(0, n_query, block):
+            end = min(start + block, n_query)
+            out_d[start:end], out_idx[start:end] = _rerank_dense(
+                query_arr[start:end], ref, best_idx[start:end]
+            )
+        return out_d, out_idx
+
+
+def estimate_recall(
+    approx_index: ApproximateNeighborIndex,
+    query_arr: np.ndarray,
+    approx_d1: np.ndarray,
+    sample_size: int = 1000,
+    random_state: int = 42,
+) -> Dict[str, float]:
+    """
+    Оценивает качество приближённого поиска 1-го соседа на случайной подвыборке
+    запросов: точный поиск (GEMM) против уже посчитанного approx_d1.
+
+    recall@1 — доля запросов, для которых найден истинный ближайший сосед
+    (с учётом равных расстояний). Также возвращается средняя абсолютная
+    ошибка DCR на подвыборке и 95% доверительный интервал для recall.
+    """
+    n_query = len(query_arr)
+    m = min(sample_size, n_query)
+    positions = np.random.RandomState(random_state).choice(n_query, m, replace=False)
+
+    exact_index = NeighborIndex(approx_index.reference_arr, backend="gemm")
+    exact_d, _ = exact_index.query(query_arr[positions], k=1)
+    exact_d1 = exact_d[:, 0]
+    found = approx_d1[positions] <= exact_d1 + 1e-9
+
+    recall = float(found.mean())
+    # Нормальное приближение биномиальной доли
+    half_width = 1.96 * np.sqrt(max(recall * (1.0 - recall), 1e-12) / m)
+    return {
+        "estimated_recall": round(recall, 4),
+        "recall_ci95_low": round(float(max(0.0, recall - half_width)), 4),
+        "recall_ci95_high": round(float(min(1.0, recall + half_width)), 4),
+        "dcr_mean_abs_error": round(float(np.mean(approx_d1[positions] - exact_d1)), 6),
+        "recall_sample_size": m,
+    }
@@ -0,0 +1,177 @@
+"""
+parallel_neighbors.py
+
+Многопроцессный поиск ближайших соседей: строки запросов шардируются между
+процессами, эталонная матрица разделяется между ними без копирования.
+
+Эталон (train-сет) один раз копируется в multiprocessing.shared_memory;
+каждый worker подключается к сегменту по имени и видит его как обычный
+np.ndarray, не сериализуя матрицу через pickle. Внутри worker-а строится
+обычный NeighborIndex (один раз на процесс) и обрабатываются шарды запросов.
+
+Пул создаётся с контекстом "spawn": fork из многопоточного процесса
+(uvicorn + BLAS) может зависнуть на унаследованных блокировках. Каждый worker
+ограничивает BLAS одним потоком — параллелизм обеспечивают процессы,
+а не вложенные пулы потоков.
+
+Использование:
+
+    with ShardedNeighborIndex(ref_arr, backend="gemm", n_workers=8) as index:
+        dists, idx = index.query(query_arr, k=2)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .feature_space import CodedMatrix
+from .neighbors import NeighborBackend, NeighborIndex, resolve_backend
+
+logger = logging.getLogger(__name__)
+
+# Шардов на worker: мелкие шарды выравнивают нагрузку между процессами
+_SHARDS_PER_WORKER = 4
+
+# Индекс, построенный в worker-процессе над разделяемой памятью (ключ — имена сегментов)
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def resolve_n_workers(n_workers: Optional[int]) -> int:
+    """None/1 → 1 процесс; 0 или −1 → все ядра; иначе — как задано."""
+    if n_workers is None:
+        return 1
+    if n_workers <= 0:
+        return os.cpu_count() or 1
+    return n_workers
+
+
+# ── Worker ────────────────────────────────────────────────────────────────────
+
+def _worker_init() -> None:
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def _attach(spec: Tuple[str, Tuple[int, ...], str]) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _worker_index(specs: List[Tuple[str, Tuple[int, ...], str]], backend: str) -> NeighborIndex:
+    key = "|".join(spec[0] for spec in specs) + f"|{backend}"
+    if _WORKER_STATE.get("key") != key:
+        attached = [_attach(spec) for spec in specs]
+        arrays = [arr for _, arr in attached]
+        reference: Union[np.ndarray, CodedMatrix] = (
+            CodedMatrix(numeric=arrays[0], codes=arrays[1]) if len(arrays) == 2 else arrays[0]
+        )
+        _WORKER_STATE.clear()
+        _WORKER_STATE.update(
+            key=key,
+            segments=[shm for shm, _ in attached],  # держим сегменты открытыми
+            index=NeighborIndex(reference, backend=backend),  # type: ignore[arg-type]
+        )
+    return _WORKER_STATE["index"]
+
+
+def _query_shard(
+    specs: List[Tuple[str, Tuple[int, ...], str]],
+    backend: str,
+    query_shard: Union[np.ndarray, CodedMatrix],
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    return _worker_index(specs, backend).query(query_shard, k=k)
+
+
+# ── Parent ────────────────────────────────────────────────────────────────────
+
+class ShardedNeighborIndex:
+    """
+    Интерфейс NeighborIndex (query) поверх пула процессов.
+
+    reference_arr копируется в разделяемую память один раз при создании;
+    пул и сегменты освобождаются в close() / при выходе из with-блока.
+    """
+
+    def __init__(
+        self,
+        reference_arr: Union[np.ndarray, CodedMatrix],
+        backend: NeighborBackend = "auto",
+        n_workers: int = 2,
+    ) -> None:
+        self.n_workers = max(1, n_workers)
+        self._segments: List[shared_memory.SharedMemory] = []
+
+        arrays = (
+            [reference_arr.numeric, reference_arr.codes]
+            if isinstance(reference_arr, CodedMatrix)
+            else [reference_arr]
+        )
+        self._specs = [self._share(np.ascontiguousarray(arr)) for arr in arrays]
+        self.n_reference = len(arrays[0])
+
+        # Бэкенд выбирается в родителе, чтобы все worker-ы использовали один и тот же
+        if isinstance(reference_arr, CodedMatrix):
+            self.backend = "codes"
+        else:
+            self.backend = resolve_backend(backend, reference_arr.shape[1])
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=get_context("spawn"),
+            initializer=_worker_init,
+        )
+        logger.info(
+            f"[neighbors] Шардированный индекс: backend={self.backend}, "
+            f"reference={self.n_reference}, workers={self.n_workers}"
+        )
+
+    def _share(self, arr: np.ndarray) -> Tuple[str, Tuple[int, ...], str]:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        self._segments.append(shm)
+        return shm.name, arr.shape, arr.dtype.str
+
+    def query(
+        self,
+        query_arr: Union[np.ndarray, CodedMatrix],
+        k: int = 2,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        n_query = len(query_arr)
+        if n_query == 0:
+            return np.empty((0, k)), np.empty((0, k), dtype=np.int64)
+
+        n_shards = min(n_query, self.n_workers * _SHARDS_PER_WORKER)
+        bounds = np.linspace(0, n_query, n_shards + 1, dtype=int)
+        futures = [
+            self._pool.submit(_query_shard, self._specs, self.backend, query_arr[lo:hi], k)
+            for lo, hi in zip(bounds[:-1], bounds[1:])
+        ]
+        results = [f.result() for f in futures]
+        return (
+            np.vstack([d for d, _ in results]),
+            np.vstack([i for _, i in results]),
+        )
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+        self._segments = []
+
+    def __enter__(self) -> "ShardedNeighborIndex":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
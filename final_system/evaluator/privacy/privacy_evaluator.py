@@ -31,8 +31,9 @@ import numpy as np
 import pandas as pd
 
 from .classical import compute_classical_metrics
-from .distance_metrics import compute_distance_metrics
+from .distance_metrics import compute_distance_metrics, prepare_neighbor_context
 from .attack_simulation import evaluate_membership_inference
+from .feature_space import FeatureSpace
 
 logger = logging.getLogger(__name__)
 
@@ -54,8 +55,26 @@ class PrivacyConfig:
 
     # Параметры DCR/NNDR и MIA
     distance_sample_size: int = 2000
-    mia_sample_size: int = 1000
+    # Ограничение эталонного train-сета для DCR/NNDR (None = весь train)
+    distance_reference_size: Optional[int] = None
+    # Бэкенд поиска соседей: "auto" | "tree" (KD/ball-tree) | "gemm" (BLAS-перебор)
+    nn_backend: str = "auto"
+    # Кодирование категорий для DCR/NNDR: "onehot" | "codes" (без развёртывания one-hot,
+    # для высококардинальных датасетов; nn_backend при этом не используется)
+    distance_encoding: str = "onehot"
+    # Приближённый DCR/NNDR по всей синтетике (IVF) с оценкой recall в отчёте;
+    # distance_sample_size при этом не применяется
+    distance_approximate: bool = False
+    ann_n_probe: int = 8
+    # Процессы для шардирования DCR/NNDR-запросов (1 = без пула, 0/−1 = все ядра)
+    n_workers: int = 1
+    # MIA: "forest" — RandomForest + 5-fold CV; "exact" — точный AUC по
+    # отсортированным расстояниям с бутстрэп-CI, TPR при низком FPR и
+    # преимуществом атакующего. mia_sample_size=None — все записи train/holdout
+    mia_method: str = "forest"
+    mia_sample_size: Optional[int] = 1000
     mia_n_estimators: int = 100
+    mia_n_bootstrap: int = 200
 
     random_state: int = 42
 
@@ -86,6 +105,8 @@ class PrivacyEvaluator:
         real_holdout_df: pd.DataFrame,
         synth_df: pd.DataFrame,
         dp_report: Optional[Dict[str, Any]] = None,
+        feature_space: Optional[FeatureSpace] = None,
+        train_matrix: Optional[np.ndarray] = None,
     ) -> Dict:
         """
         Запускает все включенные группы метрик и возвращает единый отчет.
@@ -96,6 +117,10 @@ class PrivacyEvaluator:
             synth_df        — синтетические данные от генератора
             dp_report       — словарь из DPCTGANGenerator.privacy_report();
                               если передан, формальные DP-гарантии включаются в отчет
+            feature_space   — кодировщик, обученный на real_train_df (например, из кэша
+                              сплита); если не передан, обучается один раз здесь
+            train_matrix    — real_train_df, закодированный feature_space.transform (one-hot);
+                              общий для DCR и MIA
         """
         for name, df in [
             ("real_train_df", real_train_df),
@@ -126,27 +151,65 @@ class PrivacyEvaluator:
             "diagnostic": {},
         }
 
-        # Метрики расстояний (DCR, NNDR)
-        if self.config.compute_distance:
-            logger.info("[PrivacyEvaluator] Считаем DCR и NNDR...")
-            report["empirical_risk"]["distance_metrics"] = compute_distance_metrics(
+        # Общее признаковое пространство и общий контекст соседей для DCR/NNDR
+        # и MIA: кодировщик обучается, датасеты кодируются и индекс по каждому
+        # эталону (train для DCR, synth для MIA) строится один раз на весь вызов.
+        context = None
+        if self.config.compute_distance or self.config.compute_mia:
+            if feature_space is None:
+                feature_space = FeatureSpace.fit(real_train_df)
+                train_matrix = None
+            # В режиме "codes" плотный one-hot train не нужен: контекст кодирует
+            # train кодами категорий.
+            if self.config.distance_encoding != "onehot":
+                train_matrix = None
+            context = prepare_neighbor_context(
                 real_train_df=real_train_df,
                 real_holdout_df=real_holdout_df,
                 synth_df=synth_df,
                 sample_size=self.config.distance_sample_size,
+                reference_sample_size=self.config.distance_reference_size,
+                nn_backend=self.config.nn_backend,  # type: ignore[arg-type]
+                feature_space=feature_space,
+                train_matrix=train_matrix,
+                encoding=self.config.distance_encoding,  # type: ignore[arg-type]
+                approximate=self.config.distance_approximate,
+                ann_n_probe=self.config.ann_n_probe,
+                n_workers=self.config.n_workers,
+                mia=self.config.compute_mia,
+                mia_sample_size=self.config.mia_sample_size,
             )
 
-        # Proxy Membership Inference Attack (distance-based)
-        if self.config.compute_mia:
-            logger.info("[PrivacyEvaluator] Запускаем proxy MIA...")
-            report["empirical_risk"]["membership_inference"] = evaluate_membership_inference(
-                real_train_df=real_train_df,
-                real_holdout_df=real_holdout_df,
-                synth_df=synth_df,
-                n_estimators=self.config.mia_n_estimators,
-                random_state=self.config.random_state,
-                sample_size=self.config.mia_sample_size,
-            )
+        try:
+            # Метрики расстояний (DCR, NNDR)
+            if self.config.compute_distance:
+                logger.info("[PrivacyEvaluator] Считаем DCR и NNDR...")
+                report["empirical_risk"]["distance_metrics"] = compute_distance_metrics(
+                    real_train_df=real_train_df,
+                    real_holdout_df=real_holdout_df,
+                    synth_df=synth_df,
+                    sample_size=self.config.distance_sample_size,
+                    reference_sample_size=self.config.distance_reference_size,
+                    context=context,
+                )
+
+            # Proxy Membership Inference Attack (distance-based)
+            if self.config.compute_mia:
+                logger.info("[PrivacyEvaluator] Запускаем proxy MIA...")
+                report["empirical_risk"]["membership_inference"] = evaluate_membership_inference(
+                    real_train_df=real_train_df,
+                    real_holdout_df=real_holdout_df,
+                    synth_df=synth_df,
+                    n_estimators=self.config.mia_n_estimators,
+                    random_state=self.config.random_state,
+                    sample_size=self.config.mia_sample_size,
+                    context=context,
+                    method=self.config.mia_method,  # type: ignore[arg-type]
+                    n_bootstrap=self.config.mia_n_bootstrap,
+                )
+        finally:
+            if context is not None:
+                context.close()
 
         # Классические диагностические метрики (k/l/t)
         if self.config.compute_classical:
@@ -13,17 +13,34 @@ ml_efficacy.py
 Это принципиально: генератор не должен видеть real_test ни на каком этапе.
 
 Поддерживаемые задачи: classification (F1, ROC-AUC), regression (MAE, R²).
+
+TRTR зависит только от сплита и конфигурации модели, поэтому его результат
+можно передать готовым (trtr_scores) — ключ кэша даёт trtr_baseline_key().
+TRTR и TSTR выполняются параллельно в двух потоках, n_jobs делится между ними.
+
+Модели: RandomForest (по умолчанию) или HistGradientBoosting
+(MLEfficacyConfig.model = "hist_gradient_boosting") — на нативных кодах
+категорий и признаках, разбиненных один раз для обоих обучений.
 """
 
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
-from dataclasses import dataclass, field
-from typing import Dict, List, Literal, Optional
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Literal, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.ensemble import (
+    HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+)
 from sklearn.metrics import (
     f1_score,
     mean_absolute_error,
@@ -35,6 +52,12 @@ from sklearn.preprocessing import LabelEncoder
 logger = logging.getLogger(__name__)
 
 TaskType = Literal["classification", "regression"]
+MLModel = Literal["random_forest", "hist_gradient_boosting"]
+
+# Число бинов HistGradientBoosting (максимум sklearn); категорий на колонку — не больше
+_HGB_MAX_BINS = 255
+# Подвыборка real_train для квантильных границ бинов (как у _BinMapper в sklearn)
+_HGB_BIN_SUBSAMPLE = 200_000
 
 
 @dataclass
@@ -45,6 +68,10 @@ class MLEfficacyConfig:
 
     # Random Forest — стабильная baseline-модель для сравнения.
     # Не требует нормализации и хорошо работает "из коробки".
+    # "hist_gradient_boosting" — HistGradientBoosting на кодах категорий и
+    # заранее разбиненных признаках: на сплитах в миллионы строк в разы быстрее RF.
+    # n_estimators для него — число итераций бустинга (max_iter).
+    model: MLModel = "random_forest"
     n_estimators: int = 100
     max_depth: Optional[int] = None
     random_state: int = 42
@@ -52,6 +79,29 @@ class MLEfficacyConfig:
     # Дополнительные колонки, которые нужно исключить из признаков
     drop_columns: List[str] = field(default_factory=list)
 
+    # Общий бюджет потоков на ML-оценку (−1 = все ядра); при параллельном
+    # запуске TRTR и TSTR делится между ними поровну
+    n_jobs: int = -1
+    parallel: bool = True
+
+
+def trtr_baseline_key(config: MLEfficacyConfig) -> str:
+    """
+    Ключ кэша TRTR: всё, от чего зависит результат TRTR на фиксированном
+    сплите (target, задача, модель, исключённые колонки). n_jobs и parallel
+    на результат не влияют и в ключ не входят.
+    """
+    params = asdict(config)
+    params.pop("n_jobs")
+    params.pop("parallel")
+    params["drop_columns"] = sorted(params["drop_columns"])
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+    return digest[:16]
+
+
+def _resolve_n_jobs(n_jobs: int) -> int:
+    return (os.cpu_count() or 1) if n_jobs is None or n_jobs <= 0 else n_jobs
+
 
 # ─────────────────────────────────────────────
 # Вспомогательные функции
@@ -136,10 +186,11 @@ def _run_single_experiment(
     test_df: pd.DataFrame,
     config: MLEfficacyConfig,
     label: str,
+    n_jobs: int = -1,
 ) -> Dict:
     """
     Запускает один эксперимент: обучение на train_df, тест на test_df.
-    label — имя для логов ('TRTR' или 'TSTR').
+    label — имя для логов ('TRTR' или 'TSTR'); n_jobs — потоки модели.
     """
     X_train, y_train, X_test, y_test = _prepare_features(
         train_df, test_df, config.target_column, config.drop_columns
@@ -162,14 +213,14 @@ def _run_single_experiment(
             n_estimators=config.n_estimators,
             max_depth=config.max_depth,
             random_state=config.random_state,
-            n_jobs=-1,
+            n_jobs=n_jobs,
         )
     else:
         model = RandomForestRegressor(
             n_estimators=config.n_estimators,
             max_depth=config.max_depth,
             random_state=config.random_state,
-            n_jobs=-1,
+            n_jobs=n_jobs,
         )
 
     model.fit(X_train, y_train)
@@ -181,6 +232,135 @@ def _run_single_experiment(
     return scores
 
 
+# ─────────────────────────────────────────────
+# HistGradientBoosting: общие признаки для TRTR и TSTR
+# ─────────────────────────────────────────────
+
+def _encode_shared_features(
+    real_train_df: pd.DataFrame,
+    synth_df: pd.DataFrame,
+    real_test_df: pd.DataFrame,
+    target: str,
+    drop_cols: List[str],
+) -> Tuple[List[np.ndarray], np.ndarray]:
+    """
+    Кодирует три датасета один раз в общую float32-сетку для HistGradientBoosting.
+
+    Числовые колонки → номер квантильного бина (границы по real_train, ≤255 бинов):
+        модель видит не больше 255 различных значений, и её собственный биннинг
+        на обоих обучениях (TRTR и TSTR) воспроизводит ту же сетку.
+    Категориальные  → целочисленные коды категорий real_train по убыванию
+        частоты (≤255); неизвестные и редкие за пределом — NaN (бин пропусков).
+    Возвращает ([X_real_train, X_synth, X_real_test], categorical_mask).
+    """
+    exclude = set(drop_cols + [target])
+    feature_cols = [
+        c for c in real_train_df.columns
+        if c not in exclude and c in synth_df.columns and c in real_test_df.columns
+    ]
+    frames = [real_train_df, synth_df, real_test_df]
+    out = [np.empty((len(df), len(feature_cols)), dtype=np.float32) for df in frames]
+    categorical = np.zeros(len(feature_cols), dtype=bool)
+    rng = np.random.RandomState(0)
+
+    for j, col in enumerate(feature_cols):
+        reference = real_train_df[col]
+        if pd.api.types.is_numeric_dtype(reference):
+            values = reference.dropna().to_numpy(dtype=np.float64)
+            if len(values) > _HGB_BIN_SUBSAMPLE:
+                values = values[rng.choice(len(values), _HGB_BIN_SUBSAMPLE, replace=False)]
+            uniques = np.unique(values)
+            if len(uniques) <= _HGB_MAX_BINS:
+                edges = (uniques[:-1] + uniques[1:]) / 2
+            else:
+                edges = np.unique(np.percentile(values, np.linspace(0, 100, _HGB_MAX_BINS + 1)[1:-1]))
+            for X, df in zip(out, frames):
+                x = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+                binned = np.searchsorted(edges, x, side="left").astype(np.float32)
+                binned[np.isnan(x)] = np.nan
+                X[:, j] = binned
+        else:
+            categorical[j] = True
+            categories = reference.astype(str).value_counts().index[:_HGB_MAX_BINS]
+            index = pd.Index(categories)
+            for X, df in zip(out, frames):
+                codes = index.get_indexer(df[col].astype(str)).astype(np.float32)
+                codes[codes < 0] = np.nan
+                X[:, j] = codes
+
+    return out, categorical
+
+
+def _encode_targets(
+    targets: List[pd.Series],
+    task_type: TaskType,
+) -> List[np.ndarray]:
+    """Целевые переменные трёх датасетов в общей кодировке (для классификации)."""
+    if task_type != "classification":
+        return [t.to_numpy(dtype=np.float64) for t in targets]
+    le_target = LabelEncoder()
+    le_target.fit(pd.concat([t.astype(str) for t in targets]).unique())
+    return [le_target.transform(t.astype(str)) for t in targets]
+
+
+def _run_hgb_experiment(
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    X_test: np.ndarray,
+    y_test: np.ndarray,
+    categorical: np.ndarray,
+    config: MLEfficacyConfig,
+    label: str,
+) -> Dict:
+    params = dict(
+        max_iter=config.n_estimators,
+        max_depth=config.max_depth,
+        max_bins=_HGB_MAX_BINS,
+        categorical_features=categorical,
+        early_stopping=False,
+        random_state=config.random_state,
+    )
+    if config.task_type == "classification":
+        model = HistGradientBoostingClassifier(**params)
+    else:
+        model = HistGradientBoostingRegressor(**params)
+
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    y_proba = model.predict_proba(X_test) if config.task_type == "classification" else None
+
+    scores = _compute_scores(pd.Series(y_test), y_pred, y_proba, config.task_type)
+    logger.info(f"[MLEfficacy] {label} (hist_gradient_boosting): {scores}")
+    return scores
+
+
+def _run_hgb_experiments(
+    real_train_df: pd.DataFrame,
+    synth_df: pd.DataFrame,
+    real_test_df: pd.DataFrame,
+    config: MLEfficacyConfig,
+    need_trtr: bool,
+) -> Tuple[Optional[Dict], Dict]:
+    """
+    TRTR/TSTR на HistGradientBoosting. Признаки кодируются один раз на оба
+    обучения. Обучения идут последовательно: HistGradientBoosting сам
+    распараллелен через OpenMP, а лимит OpenMP-потоков глобален для процесса
+    и не делится между конкурентными обучениями.
+    """
+    (X_real, X_synth, X_test), categorical = _encode_shared_features(
+        real_train_df, synth_df, real_test_df, config.target_column, config.drop_columns,
+    )
+    y_real, y_synth, y_test = _encode_targets(
+        [real_train_df[config.target_column], synth_df[config.target_column], real_test_df[config.target_column]],
+        config.task_type,
+    )
+    trtr_scores = None
+    if need_trtr:
+        trtr_scores = _run_hgb_experiment(X_real, y_real, X_test, y_test, categorical, config, "TRTR")
+    tstr_scores = _run_hgb_experiment(X_synth, y_synth, X_test, y_test, categorical, config, "TSTR")
+    return trtr_scores, tstr_scores
+
+
 # ─────────────────────────────────────────────
 # Публичная функция
 # ─────────────────────────────────────────────
@@ -190,6 +370,7 @@ def evaluate_ml_efficacy(
     synth_df: pd.DataFrame,
     real_test_df: pd.DataFrame,
     config: MLEfficacyConfig,
+    trtr_scores: Optional[Dict] = None,
 ) -> Dict:
     """
     Запускает TRTR и TSTR и считает Utility Loss.
@@ -203,14 +384,42 @@ def evaluate_ml_efficacy(
     TRTR обучается на real_train_df, тестируется на real_test_df.
     TSTR обучается на synth_df, тестируется на том же real_test_df.
     real_test_df — единый holdout для обоих экспериментов.
+
+    trtr_scores — ранее посчитанный TRTR для того же сплита и того же
+    trtr_baseline_key(config); если передан, обучается только TSTR
+    со всем бюджетом n_jobs.
     """
     logger.info(
         f"[MLEfficacy] real_train={len(real_train_df)}, "
         f"synth_train={len(synth_df)}, real_test={len(real_test_df)}"
     )
 
-    trtr_scores = _run_single_experiment(real_train_df, real_test_df, config, label="TRTR")
-    tstr_scores = _run_single_experiment(synth_df, real_test_df, config, label="TSTR")
+    n_jobs = _resolve_n_jobs(config.n_jobs)
+    trtr_cached = trtr_scores is not None
+    if trtr_cached:
+        logger.info(f"[MLEfficacy] TRTR из кэша: {trtr_scores}")
+    if config.model == "hist_gradient_boosting":
+        computed_trtr, tstr_scores = _run_hgb_experiments(
+            real_train_df, synth_df, real_test_df, config, need_trtr=not trtr_cached,
+        )
+        trtr_scores = trtr_scores if trtr_cached else computed_trtr
+    elif trtr_cached:
+        tstr_scores = _run_single_experiment(synth_df, real_test_df, config, "TSTR", n_jobs)
+    elif config.parallel and n_jobs > 1:
+        # Два независимых обучения в параллельных потоках; sklearn/BLAS
+        # освобождают GIL, бюджет потоков делится поровну
+        half = max(1, n_jobs // 2)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            trtr_future = pool.submit(
+                _run_single_experiment, real_train_df, real_test_df, config, "TRTR", half,
+            )
+            tstr_future = pool.submit(
+                _run_single_experiment, synth_df, real_test_df, config, "TSTR", max(1, n_jobs - half),
+            )
+            trtr_scores, tstr_scores = trtr_future.result(), tstr_future.result()
+    else:
+        trtr_scores = _run_single_experiment(real_train_df, real_test_df, config, "TRTR", n_jobs)
+        tstr_scores = _run_single_experiment(synth_df, real_test_df, config, "TSTR", n_jobs)
 
     # Utility Loss: по основной метрике (f1 или r2).
     # Положительное значение → синтетика хуже реальных данных.
@@ -223,6 +432,7 @@ def evaluate_ml_efficacy(
     return {
         "trtr": trtr_scores,
         "tstr": tstr_scores,
+        "trtr_cached": trtr_cached,
         "utility_loss": {
             "metric": main_metric,
             "value": utility_loss,
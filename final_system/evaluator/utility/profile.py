@@ -0,0 +1,179 @@
+"""
+profile.py
+
+Предвычисленный статистический профиль реальных данных для метрик полезности.
+
+Реальная сторона статистик (гистограммы, частоты категорий, матрицы Pearson
+и Cramér's V) не меняется между итерациями max_iterations и между конфигами
+генераторов, оцениваемыми на одном split_id. RealDataProfile считает её один
+раз по real_train и сериализуется в JSON — Evaluation Service хранит его в
+splits/{split_id}/real_profile.json, и оценка полезности обрабатывает только
+синтетическую сторону.
+
+Состав профиля:
+    marginals — MarginalSummary (streaming.py) по всем колонкам real_train:
+                гистограммы на замороженных границах бинов, моменты,
+                KLL-скетч медианы, частоты категорий;
+    medians   — точные медианы числовых колонок;
+    pearson   — матрица Pearson по числовым колонкам;
+    cramers_v — матрица Cramér's V по категориальным колонкам.
+
+Профиль строится по всем колонкам; исключённые из оценки колонки (target,
+drop_columns) отбрасываются при сравнении.
+
+Границы бинов заморожены по диапазону real_train: значения синтетики вне
+него учитываются в бинах underflow/overflow (см. streaming.py).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .statistical import (
+    _correlation_report,
+    _cramers_v_matrix,
+    _detect_column_types,
+    _matrix_mae,
+)
+from .streaming import (
+    DEFAULT_BINS,
+    MarginalSummary,
+    fit_bin_edges,
+    marginal_stats_from_summaries,
+    summarize,
+)
+
+logger = logging.getLogger(__name__)
+
+REAL_PROFILE_VERSION = 1
+
+
+@dataclass
+class RealDataProfile:
+    """Статистический профиль реального train-сета."""
+    marginals: MarginalSummary
+    pearson: pd.DataFrame
+    cramers_v: pd.DataFrame
+    # Точные медианы real: синтетика в памяти, поэтому median_delta не зависит от скетча
+    medians: Dict[str, float]
+    n_rows: int
+
+    # ── Построение ───────────────────────────────────────────────────────────
+
+    @classmethod
+    def build(cls, real_df: pd.DataFrame, bins: int = DEFAULT_BINS) -> "RealDataProfile":
+        num_cols, cat_cols = _detect_column_types(real_df)
+        numeric_edges, categorical = fit_bin_edges(real_df, chunk_rows=max(len(real_df), 1), bins=bins)
+        profile = cls(
+            marginals=summarize(real_df, numeric_edges, categorical, chunk_rows=max(len(real_df), 1)),
+            pearson=real_df[num_cols].corr(method="pearson"),
+            cramers_v=_cramers_v_matrix(real_df, cat_cols),
+            medians={c: float(real_df[c].median()) for c in numeric_edges},
+            n_rows=len(real_df),
+        )
+        logger.info(
+            f"[profile] Профиль real построен: rows={len(real_df)}, "
+            f"numeric={len(num_cols)}, categorical={len(cat_cols)}"
+        )
+        return profile
+
+    # ── Сравнение с синтетикой ───────────────────────────────────────────────
+
+    def marginal_stats(self, synth_df: pd.DataFrame, exclude: Iterable[str] = ()) -> Dict:
+        """Аналог compute_marginal_stats: обрабатывается только synth_df."""
+        exclude = set(exclude)
+        edges = {
+            c: e for c, e in self.marginals.numeric_edges.items()
+            if c not in exclude and c in synth_df.columns
+        }
+        categorical = [c for c in self.marginals.categorical if c not in exclude and c in synth_df.columns]
+        synth = summarize(synth_df, edges, categorical, chunk_rows=max(len(synth_df), 1))
+        results = marginal_stats_from_summaries(self.marginals, synth)
+        for col, stats in results["numerical"].items():
+            synth_median = float(pd.to_numeric(synth_df[col], errors="coerce").median())
+            stats["median_delta"] = round(self.medians[col] - synth_median, 4)
+        return results
+
+    def summary_marginal_stats(self, synth: MarginalSummary, exclude: Iterable[str] = ()) -> Dict:
+        """
+        Аналог marginal_stats по сводке синтетики, накопленной потоково
+        (синтетика целиком в память не читается). Медиана синтетики — оценка
+        KLL-скетча.
+        """
+        exclude = set(exclude)
+        synth = synth.select(
+            c for c in list(synth.numeric_edges) + synth.categorical if c not in exclude
+        )
+        results = marginal_stats_from_summaries(self.marginals, synth)
+        for col, stats in results["numerical"].items():
+            stats["median_delta"] = round(self.medians[col] - synth.median(col), 4)
+        return results
+
+    def correlation_delta(self, synth_df: pd.DataFrame, exclude: Iterable[str] = ()) -> Dict:
+        """Аналог compute_correlation_delta: матрицы считаются только по synth_df."""
+        exclude = set(exclude)
+        common_num = [c for c in self.pearson.columns if c not in exclude and c in synth_df.columns]
+        common_cat = [c for c in self.cramers_v.columns if c not in exclude and c in synth_df.columns]
+
+        pearson_delta: Optional[float] = None
+        if len(common_num) >= 2:
+            synth_corr = synth_df[common_num].corr(method="pearson")
+            pearson_delta = _matrix_mae(self.pearson.loc[common_num, common_num], synth_corr)
+
+        cramers_delta: Optional[float] = None
+        if len(common_cat) >= 2:
+            synth_v = _cramers_v_matrix(synth_df, common_cat)
+            cramers_delta = _matrix_mae(self.cramers_v.loc[common_cat, common_cat], synth_v)
+
+        return _correlation_report(pearson_delta, cramers_delta)
+
+    # ── Сериализация ─────────────────────────────────────────────────────────
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": REAL_PROFILE_VERSION,
+            "n_rows": self.n_rows,
+            "marginals": self.marginals.to_dict(),
+            "pearson": _matrix_to_dict(self.pearson),
+            "cramers_v": _matrix_to_dict(self.cramers_v),
+            "medians": self.medians,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RealDataProfile":
+        if data.get("version") != REAL_PROFILE_VERSION:
+            raise ValueError(f"Неподдерживаемая версия RealDataProfile: {data.get('version')}")
+        return cls(
+            marginals=MarginalSummary.from_dict(data["marginals"]),
+            pearson=_matrix_from_dict(data["pearson"]),
+            cramers_v=_matrix_from_dict(data["cramers_v"]),
+            medians={c: float(v) for c, v in data["medians"].items()},
+            n_rows=int(data["n_rows"]),
+        )
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "RealDataProfile":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+def _matrix_to_dict(matrix: pd.DataFrame) -> Dict[str, Any]:
+    # NaN (константная колонка в Pearson) → null в JSON
+    values = [[None if np.isnan(v) else float(v) for v in row] for row in matrix.to_numpy(dtype=np.float64)]
+    return {"columns": [str(c) for c in matrix.columns], "values": values}
+
+
+def _matrix_from_dict(data: Dict[str, Any]) -> pd.DataFrame:
+    values = np.array(
+        [[np.nan if v is None else v for v in row] for row in data["values"]], dtype=np.float64,
+    ).reshape(len(data["columns"]), len(data["columns"]))
+    return pd.DataFrame(values, index=data["columns"], columns=data["columns"])
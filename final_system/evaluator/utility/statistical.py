@@ -4,12 +4,19 @@ statistical.py
 Статистические метрики сходства между реальными и синтетическими данными.
 Работает покоменно: числовые колонки → JSD + stats delta, категориальные → TVD.
 Отдельно считается разница матриц корреляций.
+
+Cramér's V для категориальных пар считается на целочисленных кодах:
+категории кодируются один раз на датафрейм, таблицы сопряжённости строятся
+через np.bincount, χ² — векторно, без поэлементного обхода crosstab.
+
+JSD и TVD считаются по счётчикам (_jsd_from_counts, _tvd_from_counts) —
+те же функции используют потоковые сводки (streaming.py).
 """
 
 from __future__ import annotations
 
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -30,6 +37,27 @@ def _detect_column_types(df: pd.DataFrame) -> Tuple[List[str], List[str]]:
     return num_cols, cat_cols
 
 
+def _jsd_from_counts(real_counts: np.ndarray, synth_counts: np.ndarray) -> float:
+    """
+    JSD по гистограммам на общих границах бинов.
+    Счётчики нормируются в вероятности; малый сглаживающий шум
+    исключает деление на 0 в пустых бинах.
+    """
+    eps = 1e-10
+    real_p = real_counts / max(real_counts.sum(), 1) + eps
+    synth_p = synth_counts / max(synth_counts.sum(), 1) + eps
+    # jensenshannon возвращает корень из JSD, поэтому возводим в квадрат
+    return float(jensenshannon(real_p, synth_p) ** 2)
+
+
+def _tvd_from_counts(real_counts: pd.Series, synth_counts: pd.Series) -> float:
+    """TVD по счётчикам категорий (индекс — категория), выравнивание по объединению."""
+    real_counts, synth_counts = real_counts.align(synth_counts, fill_value=0)
+    real_p = real_counts.to_numpy(dtype=np.float64) / max(real_counts.sum(), 1)
+    synth_p = synth_counts.to_numpy(dtype=np.float64) / max(synth_counts.sum(), 1)
+    return float(0.5 * np.abs(real_p - synth_p).sum())
+
+
 def _compute_jsd(real_col: pd.Series, synth_col: pd.Series, bins: int = 50) -> float:
     """
     Jensen-Shannon Divergence для числовых колонок.
@@ -40,17 +68,9 @@ def _compute_jsd(real_col: pd.Series, synth_col: pd.Series, bins: int = 50) -> f
     combined_max = max(real_col.max(), synth_col.max())
     bin_edges = np.linspace(combined_min, combined_max, bins + 1)
 
-    # Нормируем в вероятностное распределение (density=True)
-    real_hist, _ = np.histogram(real_col.dropna(), bins=bin_edges, density=True)
-    synth_hist, _ = np.histogram(synth_col.dropna(), bins=bin_edges, density=True)
-
-    # Добавляем малый сглаживающий шум, чтобы избежать деления на 0 в JSD
-    eps = 1e-10
-    real_hist = real_hist + eps
-    synth_hist = synth_hist + eps
-
-    # jensenshannon возвращает корень из JSD, поэтому возводим в квадрат
-    return float(jensenshannon(real_hist, synth_hist) ** 2)
+    real_hist, _ = np.histogram(real_col.dropna(), bins=bin_edges)
+    synth_hist, _ = np.histogram(synth_col.dropna(), bins=bin_edges)
+    return _jsd_from_counts(real_hist, synth_hist)
 
 
 def _compute_tvd(real_col: pd.Series, synth_col: pd.Series) -> float:
@@ -58,41 +78,94 @@ def _compute_tvd(real_col: pd.Series, synth_col: pd.Series) -> float:
     Total Variation Distance для категориальных колонок.
     TVD ∈ [0, 1]: 0 = одинаковые распределения, 1 = нет общих категорий.
     """
-    # Считаем нормализованные частоты по всем категориям из обоих датасетов
-    all_categories = set(real_col.dropna().unique()) | set(synth_col.dropna().unique())
+    return _tvd_from_counts(real_col.value_counts(), synth_col.value_counts())
 
-    real_freq = real_col.value_counts(normalize=True)
-    synth_freq = synth_col.value_counts(normalize=True)
 
-    tvd = 0.5 * sum(
-        abs(real_freq.get(cat, 0.0) - synth_freq.get(cat, 0.0))
-        for cat in all_categories
-    )
-    return float(tvd)
+# Порог плотной таблицы сопряжённости (ячеек): выше — разреженный подсчёт через np.unique
+_DENSE_CONTINGENCY_MAX_CELLS = 1 << 22
 
 
-def _cramers_v(col_a: pd.Series, col_b: pd.Series) -> float:
+def _category_codes(df: pd.DataFrame, cols: List[str]) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Cramér's V — симметричная мера ассоциации для двух категориальных колонок.
-    Значение ∈ [0, 1]: 0 = нет ассоциации, 1 = полная ассоциация.
-    Используется вместо Pearson там, где Pearson неприменим.
+    Кодирует категориальные колонки целыми кодами один раз на датафрейм.
+    Возвращает (codes [n, len(cols)] int64, −1 = пропуск; n_levels [len(cols)]).
     """
-    contingency = pd.crosstab(col_a, col_b)
-    n = contingency.sum().sum()
+    codes = np.empty((len(df), len(cols)), dtype=np.int64)
+    n_levels = np.empty(len(cols), dtype=np.int64)
+    for j, col in enumerate(cols):
+        col_codes, uniques = pd.factorize(df[col])
+        codes[:, j] = col_codes
+        n_levels[j] = len(uniques)
+    return codes, n_levels
+
+
+def _cramers_v_codes(codes_a: np.ndarray, codes_b: np.ndarray, k_a: int, k_b: int) -> float:
+    """
+    Cramér's V для пары колонок, заданных целыми кодами (−1 = пропуск).
+
+    Таблица сопряжённости строится через np.bincount по комбинированному коду
+    a·k_b + b (или np.unique, если таблица слишком велика для плотного массива).
+    χ² считается через тождество χ² = n·(Σ o²/(r_i·c_j) − 1) по ненулевым
+    ячейкам — то же значение, что и Σ (o − e)²/e по всей таблице.
+    Пропуски в любой из колонок исключают строку, как в pd.crosstab.
+    """
+    valid = (codes_a >= 0) & (codes_b >= 0)
+    a, b = codes_a[valid], codes_b[valid]
+    n = a.size
     if n == 0:
         return 0.0
 
-    chi2 = 0.0
-    expected = np.outer(contingency.sum(axis=1), contingency.sum(axis=0)) / n
-    for i in range(contingency.shape[0]):
-        for j in range(contingency.shape[1]):
-            e = expected[i, j]
-            if e > 0:
-                chi2 += (contingency.iloc[i, j] - e) ** 2 / e
+    row_sums = np.bincount(a, minlength=k_a)
+    col_sums = np.bincount(b, minlength=k_b)
+
+    combined = a * k_b + b
+    if k_a * k_b <= _DENSE_CONTINGENCY_MAX_CELLS:
+        observed = np.bincount(combined, minlength=k_a * k_b)
+        cells = np.flatnonzero(observed)
+        observed = observed[cells]
+    else:
+        cells, observed = np.unique(combined, return_counts=True)
+
+    observed = observed.astype(np.float64)
+    expected_ratio = row_sums[cells // k_b].astype(np.float64) * col_sums[cells % k_b]
+    chi2 = n * (np.sum(observed * observed / expected_ratio) - 1.0)
 
-    r, k = contingency.shape
+    # Размерность таблицы — только реально встретившиеся категории (как у crosstab)
+    r, k = np.count_nonzero(row_sums), np.count_nonzero(col_sums)
     denom = n * (min(r, k) - 1)
-    return float(np.sqrt(chi2 / denom)) if denom > 0 else 0.0
+    return float(np.sqrt(max(chi2, 0.0) / denom)) if denom > 0 else 0.0
+
+
+def _cramers_v_matrix(df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
+    """Симметричная матрица Cramér's V по всем парам cols (диагональ = 1)."""
+    codes, n_levels = _category_codes(df, cols)
+    m = len(cols)
+    out = np.eye(m)
+    for i in range(m):
+        for j in range(i + 1, m):
+            out[i, j] = out[j, i] = _cramers_v_codes(
+                codes[:, i], codes[:, j], int(n_levels[i]), int(n_levels[j]),
+            )
+    return pd.DataFrame(out, index=cols, columns=cols)
+
+
+def _matrix_mae(real_matrix: pd.DataFrame, synth_matrix: pd.DataFrame) -> float:
+    """MAE между матрицами по верхнему треугольнику (без диагонали)."""
+    diff = (real_matrix - synth_matrix).abs().values
+    return float(diff[np.triu_indices_from(diff, k=1)].mean())
+
+
+def _cramers_v(col_a: pd.Series, col_b: pd.Series) -> float:
+    """
+    Cramér's V — симметричная мера ассоциации для двух категориальных колонок.
+    Значение ∈ [0, 1]: 0 = нет ассоциации, 1 = полная ассоциация.
+    Используется вместо Pearson там, где Pearson неприменим.
+    """
+    codes_a, uniques_a = pd.factorize(col_a)
+    codes_b, uniques_b = pd.factorize(col_b)
+    return _cramers_v_codes(
+        codes_a.astype(np.int64), codes_b.astype(np.int64), len(uniques_a), len(uniques_b),
+    )
 
 
 # ─────────────────────────────────────────────
@@ -158,20 +231,19 @@ def compute_correlation_delta(
         real_corr = real_df[common_num].corr(method="pearson")
         synth_corr = synth_df[common_num].corr(method="pearson")
         # MAE между матрицами — чем меньше, тем лучше сохранены зависимости
-        pearson_delta = float(
-            (real_corr - synth_corr).abs().values[np.triu_indices_from(real_corr.values, k=1)].mean()
-        )
+        pearson_delta = _matrix_mae(real_corr, synth_corr)
 
     cramers_delta = None
     if len(common_cat) >= 2:
-        deltas = []
-        for i, col_a in enumerate(common_cat):
-            for col_b in common_cat[i + 1:]:
-                real_v = _cramers_v(real_df[col_a], real_df[col_b])
-                synth_v = _cramers_v(synth_df[col_a], synth_df[col_b])
-                deltas.append(abs(real_v - synth_v))
-        cramers_delta = float(np.mean(deltas)) if deltas else None
+        # Категории кодируются один раз на датафрейм, пары считаются на кодах
+        real_v = _cramers_v_matrix(real_df, common_cat)
+        synth_v = _cramers_v_matrix(synth_df, common_cat)
+        cramers_delta = _matrix_mae(real_v, synth_v)
+
+    return _correlation_report(pearson_delta, cramers_delta)
+
 
+def _correlation_report(pearson_delta: Optional[float], cramers_delta: Optional[float]) -> Dict:
     return {
         "pearson_corr_mae": round(pearson_delta, 6) if pearson_delta is not None else None,
         "cramers_v_mae": round(cramers_delta, 6) if cramers_delta is not None else None,
@@ -0,0 +1,418 @@
+"""
+streaming.py
+
+Потоковые (one-pass) маргинальные статистики для больших датасетов.
+
+compute_marginal_stats (statistical.py) требует оба датафрейма целиком в памяти.
+Здесь те же метрики считаются по сводкам, накопленным за один проход по чанкам
+CSV/Parquet/Feather, — синтетический файл на десятки миллионов строк не загружается
+в RAM целиком.
+
+Сводка одной стороны (MarginalSummary) по каждой колонке:
+    Числовые       → гистограмма на фиксированных границах бинов + счётчики
+                     выхода за диапазон (underflow/overflow), среднее и
+                     дисперсия по Уэлфорду (слияние чанков по формуле Чана),
+                     KLL-скетч для медианы.
+    Категориальные → счётчики категорий (ключи приводятся к строкам).
+
+Границы бинов замораживаются по реальным данным (min/max real) и общие для
+обеих сторон. Значения синтетики вне диапазона попадают в отдельные бины
+underflow/overflow и участвуют в JSD. Если синтетика не выходит за диапазон
+реальных данных, JSD совпадает с compute_marginal_stats; медиана — оценка
+KLL-скетча с ошибкой по рангу порядка 1/k.
+
+Сводки сериализуются в JSON (to_dict/from_dict) — реальную сторону можно
+посчитать один раз и переиспользовать.
+
+RowSample — равномерная выборка строк за тот же проход: метрики, которым нужны
+строки целиком (корреляции, TSTR, DCR/MIA), считаются по ней.
+
+Использование:
+    stats = compute_marginal_stats_streaming("train.csv", "synthetic.csv", chunk_rows=200_000)
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from shared.artifacts import iter_frames
+
+from .statistical import _detect_column_types, _jsd_from_counts, _tvd_from_counts
+
+logger = logging.getLogger(__name__)
+
+DataSource = Union[str, Path, pd.DataFrame, Iterable[pd.DataFrame]]
+
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_BINS = 50
+
+
+# ─────────────────────────────────────────────
+# Чтение чанками
+# ─────────────────────────────────────────────
+
+def iter_chunks(source: DataSource, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Итерирует датасет чанками не более chunk_rows строк.
+
+    source: путь к артефакту (.csv / .parquet / .feather — читается через
+    shared.artifacts.iter_frames), DataFrame или уже готовый итератор чанков.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+        return
+    if not isinstance(source, (str, Path)):
+        yield from source
+        return
+
+    # Feather читается по record batch — их размер задан при записи
+    for frame in iter_frames(source, chunk_rows=chunk_rows):
+        for start in range(0, len(frame), chunk_rows):
+            yield frame.iloc[start:start + chunk_rows]
+
+
+# ─────────────────────────────────────────────
+# KLL-скетч для квантилей
+# ─────────────────────────────────────────────
+
+class KLLSketch:
+    """
+    Компактный KLL-скетч квантилей (Karnin, Lang, Liberty, 2016).
+
+    Уровень h хранит элементы с весом 2^h. Переполненный уровень сортируется,
+    и каждый второй элемент (со случайным сдвигом) поднимается на уровень выше.
+    Память — O(k · log(n/k)), ошибка по рангу — порядка 1/k.
+    """
+
+    def __init__(self, k: int = 1024, seed: int = 0) -> None:
+        self.k = k
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.RandomState(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            buf = self.levels[level]
+            if len(buf) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                buf = np.sort(buf)
+                # Нечётный хвост остаётся на уровне, чтобы сохранить суммарный вес
+                keep = buf[-1:] if len(buf) % 2 else buf[:0]
+                even = buf[:len(buf) - len(keep)]
+                promoted = even[self._rng.randint(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    @property
+    def n(self) -> int:
+        return int(sum(len(buf) << h for h, buf in enumerate(self.levels)))
+
+    def quantile(self, q: float) -> float:
+        items = np.concatenate(self.levels)
+        if items.size == 0:
+            return float("nan")
+        weights = np.concatenate([np.full(len(buf), 1 << h) for h, buf in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cum = np.cumsum(weights[order])
+        pos = np.searchsorted(cum, q * cum[-1], side="left")
+        return float(items[order][min(pos, len(items) - 1)])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "levels": [buf.tolist() for buf in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KLLSketch":
+        sketch = cls(k=int(data["k"]))
+        sketch.levels = [np.asarray(buf, dtype=np.float64) for buf in data["levels"]] or [np.empty(0)]
+        return sketch
+
+
+# ─────────────────────────────────────────────
+# Сводка одной стороны
+# ─────────────────────────────────────────────
+
+class MarginalSummary:
+    """
+    Накопитель маргинальных статистик одной стороны (real или synth).
+
+    numeric_edges: колонка → границы бинов (общие для real и synth)
+    categorical:   список категориальных колонок
+    Колонки, отсутствующие в чанке, пропускаются.
+    """
+
+    def __init__(
+        self,
+        numeric_edges: Dict[str, np.ndarray],
+        categorical: List[str],
+        sketch_k: int = 1024,
+    ) -> None:
+        self.numeric_edges = {c: np.asarray(e, dtype=np.float64) for c, e in numeric_edges.items()}
+        self.categorical = list(categorical)
+        self.n_rows = 0
+        # [underflow, бины..., overflow]
+        self.hist = {c: np.zeros(len(e) + 1, dtype=np.int64) for c, e in self.numeric_edges.items()}
+        self.count = {c: 0 for c in self.numeric_edges}
+        self.mean = {c: 0.0 for c in self.numeric_edges}
+        self.m2 = {c: 0.0 for c in self.numeric_edges}
+        self.sketch = {c: KLLSketch(k=sketch_k) for c in self.numeric_edges}
+        self.category_counts: Dict[str, pd.Series] = {
+            c: pd.Series(dtype=np.int64) for c in self.categorical
+        }
+
+    # ── Накопление ───────────────────────────────────────────────────────────
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        self.n_rows += len(chunk)
+        for col, edges in self.numeric_edges.items():
+            if col not in chunk.columns:
+                continue
+            values = pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64)
+            values = values[~np.isnan(values)]
+            if values.size == 0:
+                continue
+            self._update_hist(col, edges, values)
+            self._update_moments(col, values)
+            self.sketch[col].update(values)
+
+        for col in self.categorical:
+            if col not in chunk.columns:
+                continue
+            # Ключи категорий — строки: так сводка совпадает после JSON-сериализации
+            counts = chunk[col].dropna().astype(str).value_counts()
+            self.category_counts[col] = self.category_counts[col].add(counts, fill_value=0).astype(np.int64)
+
+    def _update_hist(self, col: str, edges: np.ndarray, values: np.ndarray) -> None:
+        n_bins = len(edges) - 1
+        # Слот 0 — underflow, 1..n_bins — бины, n_bins+1 — overflow.
+        # Правая граница входит в последний бин, как в np.histogram.
+        slot = np.searchsorted(edges, values, side="right")
+        slot[values == edges[-1]] = n_bins
+        slot[values > edges[-1]] = n_bins + 1
+        self.hist[col] += np.bincount(slot, minlength=n_bins + 2)
+
+    def _update_moments(self, col: str, values: np.ndarray) -> None:
+        # Слияние (count, mean, M2) текущей сводки со статистиками чанка (Chan et al.)
+        n_b = values.size
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+        n_a, mean_a = self.count[col], self.mean[col]
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        self.mean[col] = mean_a + delta * n_b / n
+        self.m2[col] += m2_b + delta * delta * n_a * n_b / n
+        self.count[col] = n
+
+    def select(self, columns: Iterable[str]) -> "MarginalSummary":
+        """Сводка только по колонкам columns (накопленные значения не копируются)."""
+        keep = set(columns)
+        out = MarginalSummary(
+            {c: e for c, e in self.numeric_edges.items() if c in keep},
+            [c for c in self.categorical if c in keep],
+        )
+        out.n_rows = self.n_rows
+        for col in out.numeric_edges:
+            out.hist[col] = self.hist[col]
+            out.count[col] = self.count[col]
+            out.mean[col] = self.mean[col]
+            out.m2[col] = self.m2[col]
+            out.sketch[col] = self.sketch[col]
+        for col in out.categorical:
+            out.category_counts[col] = self.category_counts[col]
+        return out
+
+    # ── Итоговые значения ────────────────────────────────────────────────────
+
+    def std(self, col: str) -> float:
+        n = self.count[col]
+        return float(np.sqrt(self.m2[col] / (n - 1))) if n > 1 else float("nan")
+
+    def median(self, col: str) -> float:
+        return self.sketch[col].quantile(0.5)
+
+    # ── Сериализация ─────────────────────────────────────────────────────────
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "n_rows": self.n_rows,
+            "numeric": {
+                col: {
+                    "edges": edges.tolist(),
+                    "hist": self.hist[col].tolist(),
+                    "count": self.count[col],
+                    "mean": self.mean[col],
+                    "m2": self.m2[col],
+                    "sketch": self.sketch[col].to_dict(),
+                }
+                for col, edges in self.numeric_edges.items()
+            },
+            "categorical": {
+                col: {str(k): int(v) for k, v in counts.items()}
+                for col, counts in self.category_counts.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MarginalSummary":
+        numeric = data["numeric"]
+        summary = cls({c: v["edges"] for c, v in numeric.items()}, list(data["categorical"]))
+        summary.n_rows = int(data["n_rows"])
+        for col, v in numeric.items():
+            summary.hist[col] = np.asarray(v["hist"], dtype=np.int64)
+            summary.count[col] = int(v["count"])
+            summary.mean[col] = float(v["mean"])
+            summary.m2[col] = float(v["m2"])
+            summary.sketch[col] = KLLSketch.from_dict(v["sketch"])
+        for col, counts in data["categorical"].items():
+            summary.category_counts[col] = pd.Series(counts, dtype=np.int64)
+        return summary
+
+
+class RowSample:
+    """
+    Равномерная выборка до size строк за один проход по чанкам (bottom-k):
+    каждая строка получает случайный ключ, хранятся size строк с наименьшими
+    ключами. Число строк источника заранее не нужно; в памяти — выборка и
+    текущий чанк. Строки выборки идут в исходном порядке.
+    """
+
+    def __init__(self, size: int, random_state: int = 42) -> None:
+        if size <= 0:
+            raise ValueError("size должен быть положительным.")
+        self.size = size
+        self.n_rows = 0
+        self._rng = np.random.default_rng(random_state)
+        self._keys = np.empty(0)
+        self._frame: Optional[pd.DataFrame] = None
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        keys = np.concatenate([self._keys, self._rng.random(len(chunk))])
+        chunk = chunk.set_axis(pd.RangeIndex(self.n_rows, self.n_rows + len(chunk)))
+        self.n_rows += len(chunk)
+        frame = chunk if self._frame is None else pd.concat([self._frame, chunk])
+        if len(keys) > self.size:
+            keep = np.sort(np.argpartition(keys, self.size - 1)[:self.size])
+            frame, keys = frame.iloc[keep], keys[keep]
+        self._frame, self._keys = frame, keys
+
+    def frame(self) -> pd.DataFrame:
+        if self._frame is None:
+            return pd.DataFrame()
+        return self._frame.reset_index(drop=True)
+
+
+# ─────────────────────────────────────────────
+# Публичные функции
+# ─────────────────────────────────────────────
+
+def summarize(
+    source: DataSource,
+    numeric_edges: Dict[str, np.ndarray],
+    categorical: List[str],
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> MarginalSummary:
+    """Один проход по source с накоплением MarginalSummary."""
+    summary = MarginalSummary(numeric_edges, categorical)
+    for chunk in iter_chunks(source, chunk_rows):
+        summary.update(chunk)
+    return summary
+
+
+def fit_bin_edges(
+    source: DataSource,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    bins: int = DEFAULT_BINS,
+) -> tuple:
+    """
+    Проход по реальным данным: типы колонок (по первому чанку) и границы бинов
+    по min/max каждой числовой колонки. Возвращает (numeric_edges, categorical).
+    """
+    num_cols: Optional[List[str]] = None
+    cat_cols: List[str] = []
+    lo: Dict[str, float] = {}
+    hi: Dict[str, float] = {}
+    for chunk in iter_chunks(source, chunk_rows):
+        if num_cols is None:
+            num_cols, cat_cols = _detect_column_types(chunk)
+        for col in num_cols:
+            values = pd.to_numeric(chunk[col], errors="coerce")
+            if values.notna().any():
+                lo[col] = min(lo.get(col, np.inf), float(values.min()))
+                hi[col] = max(hi.get(col, -np.inf), float(values.max()))
+    edges = {col: np.linspace(lo[col], hi[col], bins + 1) for col in (num_cols or []) if col in lo}
+    return edges, cat_cols
+
+
+def marginal_stats_from_summaries(real: MarginalSummary, synth: MarginalSummary) -> Dict:
+    """
+    JSD, TVD и дельты mean/std/median по двум сводкам.
+    Формат результата — как у compute_marginal_stats.
+    """
+    results: Dict = {"numerical": {}, "categorical": {}}
+
+    for col in real.numeric_edges:
+        if col not in synth.hist or real.count[col] == 0 or synth.count[col] == 0:
+            continue
+        results["numerical"][col] = {
+            "jsd": round(_jsd_from_counts(real.hist[col], synth.hist[col]), 6),
+            "mean_delta": round(real.mean[col] - synth.mean[col], 4),
+            "std_delta": round(real.std(col) - synth.std(col), 4),
+            "median_delta": round(real.median(col) - synth.median(col), 4),
+        }
+
+    for col in real.categorical:
+        if col not in synth.category_counts:
+            continue
+        results["categorical"][col] = {
+            "tvd": round(_tvd_from_counts(real.category_counts[col], synth.category_counts[col]), 6),
+        }
+
+    jsd_values = [v["jsd"] for v in results["numerical"].values()]
+    tvd_values = [v["tvd"] for v in results["categorical"].values()]
+    results["summary"] = {
+        "mean_jsd": round(float(np.mean(jsd_values)), 6) if jsd_values else None,
+        "mean_tvd": round(float(np.mean(tvd_values)), 6) if tvd_values else None,
+    }
+    return results
+
+
+def compute_marginal_stats_streaming(
+    real_source: DataSource,
+    synth_source: DataSource,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    bins: int = DEFAULT_BINS,
+) -> Dict:
+    """
+    Потоковый аналог compute_marginal_stats.
+
+    Реальные данные читаются дважды (границы бинов, затем сводка),
+    синтетические — один раз. В памяти одновременно только один чанк.
+    Источник-итератор для real_source должен быть перечитываемым (путь или DataFrame).
+    """
+    numeric_edges, categorical = fit_bin_edges(real_source, chunk_rows, bins)
+    real = summarize(real_source, numeric_edges, categorical, chunk_rows)
+    synth = summarize(synth_source, numeric_edges, categorical, chunk_rows)
+    logger.info(
+        f"[streaming] Сводки готовы: real_rows={real.n_rows}, synth_rows={synth.n_rows}, "
+        f"numeric={len(numeric_edges)}, categorical={len(categorical)}"
+    )
+    return marginal_stats_from_summaries(real, synth)
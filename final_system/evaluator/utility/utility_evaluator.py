@@ -25,8 +25,10 @@ from typing import Dict, List, Literal, Optional
 
 import pandas as pd
 
+from .profile import RealDataProfile
 from .statistical import compute_correlation_delta, compute_marginal_stats
-from .ml_efficacy import MLEfficacyConfig, evaluate_ml_efficacy
+from .streaming import MarginalSummary
+from .ml_efficacy import MLEfficacyConfig, evaluate_ml_efficacy, trtr_baseline_key
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +49,8 @@ class UtilityConfig:
     compute_ml_efficacy: bool = True
 
     # Параметры ML-оценки
+    # Модель TRTR/TSTR: "random_forest" | "hist_gradient_boosting"
+    ml_model: str = "random_forest"
     n_estimators: int = 100
     max_depth: Optional[int] = None
     random_state: int = 42
@@ -54,6 +58,9 @@ class UtilityConfig:
     # Колонки, которые нужно исключить из признаков (ID, технические поля и т.д.)
     drop_columns: List[str] = field(default_factory=list)
 
+    # Бюджет потоков на ML-оценку (−1 = все ядра), делится между TRTR и TSTR
+    n_jobs: int = -1
+
 
 class UtilityEvaluator:
     """
@@ -70,11 +77,31 @@ class UtilityEvaluator:
     def __init__(self, config: UtilityConfig) -> None:
         self.config = config
 
+    @property
+    def ml_config(self) -> MLEfficacyConfig:
+        return MLEfficacyConfig(
+            target_column=self.config.target_column,
+            task_type=self.config.task_type,
+            model=self.config.ml_model,  # type: ignore[arg-type]
+            n_estimators=self.config.n_estimators,
+            max_depth=self.config.max_depth,
+            random_state=self.config.random_state,
+            drop_columns=self.config.drop_columns,
+            n_jobs=self.config.n_jobs,
+        )
+
+    def trtr_cache_key(self) -> str:
+        """Ключ кэша TRTR-baseline для текущей конфигурации (см. trtr_baseline_key)."""
+        return trtr_baseline_key(self.ml_config)
+
     def evaluate(
         self,
         real_train_df: pd.DataFrame,
         synth_df: pd.DataFrame,
         real_test_df: pd.DataFrame,
+        real_profile: Optional[RealDataProfile] = None,
+        trtr_scores: Optional[Dict] = None,
+        synth_marginals: Optional[MarginalSummary] = None,
     ) -> Dict:
         """
         Запускает все включенные группы метрик и возвращает единый отчет.
@@ -83,6 +110,15 @@ class UtilityEvaluator:
             real_train_df — часть реальных данных, на которой обучался генератор
             synth_df      — сгенерированные синтетические данные
             real_test_df  — отложенная тестовая выборка (генератор её НЕ видел)
+            real_profile  — предвычисленный профиль real_train_df (например, из кэша
+                            сплита); если передан, статистика и корреляции считаются
+                            только по синтетической стороне
+            trtr_scores   — TRTR-baseline, ранее посчитанный для этого сплита
+                            и trtr_cache_key(); если передан, TRTR не переобучается
+            synth_marginals — сводка всей синтетики, накопленная потоково на границах
+                            бинов real_profile (требует real_profile). Тогда synth_df —
+                            равномерная выборка строк: маргинальные метрики считаются
+                            по всей синтетике, корреляции и TSTR — по выборке
 
         Статистические метрики (JSD, TVD, корреляции) считаются между
         real_train_df и synth_df — сравниваем синтетику с тем, чему учился генератор.
@@ -99,6 +135,8 @@ class UtilityEvaluator:
         for name, df in [("real_train_df", real_train_df), ("synth_df", synth_df), ("real_test_df", real_test_df)]:
             if not isinstance(df, pd.DataFrame):
                 raise TypeError(f"{name} должен быть pandas.DataFrame")
+        if synth_marginals is not None and real_profile is None:
+            raise ValueError("synth_marginals требует real_profile")
 
         if self.config.target_column not in real_train_df.columns:
             raise ValueError(
@@ -115,7 +153,7 @@ class UtilityEvaluator:
         report: Dict = {
             "metadata": {
                 "real_train_rows": len(real_train_df),
-                "synth_rows": len(synth_df),
+                "synth_rows": synth_marginals.n_rows if synth_marginals is not None else len(synth_df),
                 "real_test_rows": len(real_test_df),
                 "real_columns": len(real_train_df.columns),
                 "target_column": self.config.target_column,
@@ -125,6 +163,8 @@ class UtilityEvaluator:
             "correlations": None,
             "ml_efficacy": None,
         }
+        if synth_marginals is not None:
+            report["metadata"]["synth_rows_sampled"] = len(synth_df)
 
         # Статистику считаем между train и synth: сравниваем с тем,
         # на чём обучался генератор, а не с holdout.
@@ -139,29 +179,30 @@ class UtilityEvaluator:
         # Статистические метрики по колонкам
         if self.config.compute_statistical:
             logger.info("[UtilityEvaluator] Считаем маргинальные распределения...")
-            report["statistical"] = compute_marginal_stats(real_features, synth_features)
+            if synth_marginals is not None:
+                report["statistical"] = real_profile.summary_marginal_stats(synth_marginals, exclude_from_stats)
+            elif real_profile is not None:
+                report["statistical"] = real_profile.marginal_stats(synth_features, exclude_from_stats)
+            else:
+                report["statistical"] = compute_marginal_stats(real_features, synth_features)
 
         # Сравнение матриц корреляций
         if self.config.compute_correlations:
             logger.info("[UtilityEvaluator] Считаем матрицы корреляций...")
-            report["correlations"] = compute_correlation_delta(real_features, synth_features)
+            if real_profile is not None:
+                report["correlations"] = real_profile.correlation_delta(synth_features, exclude_from_stats)
+            else:
+                report["correlations"] = compute_correlation_delta(real_features, synth_features)
 
         # ML-оценка (TSTR / TRTR)
         if self.config.compute_ml_efficacy:
             logger.info("[UtilityEvaluator] Запускаем TRTR / TSTR...")
-            ml_config = MLEfficacyConfig(
-                target_column=self.config.target_column,
-                task_type=self.config.task_type,
-                n_estimators=self.config.n_estimators,
-                max_depth=self.config.max_depth,
-                random_state=self.config.random_state,
-                drop_columns=self.config.drop_columns,
-            )
             report["ml_efficacy"] = evaluate_ml_efficacy(
                 real_train_df=real_train_df,
                 synth_df=synth_df,
                 real_test_df=real_test_df,
-                config=ml_config,
+                config=self.ml_config,
+                trtr_scores=trtr_scores,
             )
 
         report["metadata"]["eval_duration_sec"] = round(time.monotonic() - eval_start, 2)
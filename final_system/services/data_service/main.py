@@ -31,6 +31,7 @@ from fastapi import Request
 
 from services.data_service.router import router
 from services.data_service.settings import get_settings
+from shared.artifacts import check_engine
 
 
 @asynccontextmanager
@@ -38,6 +39,7 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     settings = get_settings()
     settings.datasets_dir.mkdir(parents=True, exist_ok=True)
     settings.splits_dir.mkdir(parents=True, exist_ok=True)
+    check_engine(settings.artifact_format)
     _add_shared_log_handler(settings.data_root / "logs" / "data_service.log")
     yield
 
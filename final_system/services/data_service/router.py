@@ -18,6 +18,7 @@ from pydantic import BaseModel
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))  # → final_system/
 from data_processor.processor import DataProcessor
+from shared.artifacts import MEDIA_TYPES, artifact_format, artifact_name, write_frame
 from shared.log_context import set_run_id
 from shared.schemas.datasets import DatasetMeta, SplitMeta, SplitRequest
 from services.data_service.settings import Settings, get_settings
@@ -259,11 +260,11 @@ def split_dataset(
     split_dir = settings.splits_dir / split_id
     split_dir.mkdir(parents=True, exist_ok=True)
 
-    train_path = f"splits/{split_id}/train.csv"
-    holdout_path = f"splits/{split_id}/holdout.csv"
+    train_path = f"splits/{split_id}/{artifact_name('train', settings.artifact_format)}"
+    holdout_path = f"splits/{split_id}/{artifact_name('holdout', settings.artifact_format)}"
 
-    train_df.to_csv(settings.data_root / train_path, index=False)
-    holdout_df.to_csv(settings.data_root / holdout_path, index=False)
+    write_frame(train_df, settings.data_root / train_path)
+    write_frame(holdout_df, settings.data_root / holdout_path)
 
     # FR-02.7: профиль предобработанного датасета (до разбивки, на df_clean)
     import json as _json
@@ -321,7 +322,7 @@ def get_split_profile(
 # ── GET /datasets/{dataset_id}/splits/{split_id}/train ───────────────────────
 
 @router.get("/datasets/{dataset_id}/splits/{split_id}/train",
-            summary="Скачать train.csv")
+            summary="Скачать train (в формате хранения сплита)")
 def get_train(
     dataset_id: str,
     split_id: str,
@@ -331,13 +332,13 @@ def get_train(
     if meta.dataset_id != dataset_id:
         raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "Сплит не найден"})
     path = settings.data_root / meta.train_path
-    return FileResponse(path=str(path), media_type="text/csv", filename="train.csv")
+    return FileResponse(path=str(path), media_type=MEDIA_TYPES[artifact_format(path)], filename=path.name)
 
 
 # ── GET /datasets/{dataset_id}/splits/{split_id}/holdout ─────────────────────
 
 @router.get("/datasets/{dataset_id}/splits/{split_id}/holdout",
-            summary="Скачать holdout.csv")
+            summary="Скачать holdout (в формате хранения сплита)")
 def get_holdout(
     dataset_id: str,
     split_id: str,
@@ -347,7 +348,7 @@ def get_holdout(
     if meta.dataset_id != dataset_id:
         raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "Сплит не найден"})
     path = settings.data_root / meta.holdout_path
-    return FileResponse(path=str(path), media_type="text/csv", filename="holdout.csv")
+    return FileResponse(path=str(path), media_type=MEDIA_TYPES[artifact_format(path)], filename=path.name)
 
 
 # ── GET /datasets/{dataset_id}/splits/{split_id} ─────────────────────────────
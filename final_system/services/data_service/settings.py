@@ -7,6 +7,8 @@ from pathlib import Path
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from shared.artifacts import ArtifactFormat
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -18,6 +20,8 @@ class Settings(BaseSettings):
 
     api_key: str | None = None     # None = авторизация отключена
     data_root: Path = Path("/data")
+    # Формат train / holdout сплита (см. shared/artifacts.py)
+    artifact_format: ArtifactFormat = "csv"
 
     @property
     def datasets_dir(self) -> Path:
@@ -0,0 +1,175 @@
+# services/evaluation_service/frame_cache.py
+#
+# In-process LRU-кэш прочитанных train / holdout сплита (CSV, Parquet, Feather).
+#
+# Один и тот же split_id оценивается многократно: итерации max_iterations,
+# sweep по конфигам генераторов. Кэш держит уже прочитанные DataFrame в памяти
+# процесса, повторные запросы не читают файлы заново.
+#
+# Ключ — (абсолютный путь, st_mtime_ns, st_size): перезапись файла меняет ключ,
+# и устаревшая запись удаляется при следующем обращении к этому пути.
+#
+# Бюджет задаётся в байтах (FRAME_CACHE_MB); размер записи — оценка её реального
+# потребления памяти (см. frame_nbytes). При превышении бюджета вытесняются
+# наименее недавно использованные записи; кадр больше бюджета не кэшируется.
+#
+# Возвращаемые DataFrame разделяются между запросами и потоками — вызывающий
+# код не должен изменять их на месте (оценщики этого не делают).
+
+from __future__ import annotations
+
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.evaluation_service.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+FrameKey = Tuple[str, int, int]
+
+
+def _is_python_strings(dtype: object) -> bool:
+    """object или StringDtype(storage="python"): по объекту str на ячейку."""
+    if dtype == object:
+        return True
+    return isinstance(dtype, pd.StringDtype) and dtype.storage == "python"
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Уменьшает потребление памяти без изменения значений.
+
+    Целочисленные колонки понижаются до минимального int-типа (все числовые
+    пути оценщиков приводят значения к float64, результат метрик не меняется).
+    float64 не понижается — DCR/JSD остаются бит-в-бит такими же, как без кэша.
+    Строковые колонки сохраняют свой dtype (object / str), но одинаковые строки
+    интернируются: read_csv создаёт отдельный объект str на каждую ячейку,
+    после compact_dtypes все ячейки с одинаковым значением ссылаются на один
+    объект. Строки в pyarrow-хранилище и так компактны и не трогаются.
+    """
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, np.dtype) and s.dtype.kind in "iu":
+            out[col] = pd.to_numeric(s, downcast="integer")
+        elif _is_python_strings(s.dtype):
+            codes, uniques = pd.factorize(s)
+            present = codes >= 0
+            # Пропуски (NaN / None) остаются как были
+            values = s.to_numpy(dtype=object, copy=True)
+            values[present] = np.asarray(uniques, dtype=object).take(codes[present])
+            out[col] = pd.Series(values, index=s.index, dtype=s.dtype, name=col)
+        else:
+            out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """
+    Оценка памяти DataFrame после compact_dtypes.
+
+    memory_usage(deep=True) считает каждую ячейку object отдельно и завышает
+    размер интернированных колонок в разы; здесь каждое уникальное значение
+    учитывается один раз.
+    """
+    total = int(df.index.memory_usage())
+    for col in df.columns:
+        s = df[col]
+        if _is_python_strings(s.dtype):
+            total += len(s) * np.dtype(object).itemsize
+            total += sum(sys.getsizeof(v) for v in s.dropna().unique())
+        else:
+            total += int(s.memory_usage(index=False, deep=True))
+    return total
+
+
+class FrameCache:
+    """Потокобезопасный LRU-кэш DataFrame с бюджетом в байтах."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries: "OrderedDict[str, Tuple[FrameKey, pd.DataFrame, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(path: Path) -> FrameKey:
+        st = path.stat()
+        return str(path.resolve()), st.st_mtime_ns, st.st_size
+
+    def get(self, path: Path, loader: Callable[[Path], pd.DataFrame]) -> pd.DataFrame:
+        """DataFrame файла path: из кэша или loader(path) + compact_dtypes."""
+        if self.max_bytes == 0:
+            return loader(path)
+
+        key = self.key(path)
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is not None:
+                if entry[0] == key:
+                    self._entries.move_to_end(key[0])
+                    self.hits += 1
+                    return entry[1]
+                # Файл перезаписан: старая версия больше не нужна
+                self._drop(key[0])
+                self.invalidations += 1
+            self.misses += 1
+
+        # Парсинг вне блокировки: параллельные промахи по разным файлам не ждут
+        # друг друга; одновременный промах по одному файлу парсит его дважды,
+        # в кэше остаётся последняя копия.
+        df = compact_dtypes(loader(path))
+        size = frame_nbytes(df)
+        if size > self.max_bytes:
+            logger.info("Frame cache: %s (%d MB) exceeds budget, not cached", key[0], size >> 20)
+            return df
+
+        with self._lock:
+            if key[0] in self._entries:
+                self._drop(key[0])
+            self._entries[key[0]] = (key, df, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted = next(iter(self._entries))
+                self._drop(evicted)
+                self.evictions += 1
+                logger.info("Frame cache: evicted %s", evicted)
+        return df
+
+    def _drop(self, path_key: str) -> None:
+        _, _, size = self._entries.pop(path_key)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+@lru_cache
+def get_frame_cache() -> FrameCache:
+    return FrameCache(get_settings().frame_cache_mb << 20)
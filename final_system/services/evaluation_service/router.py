@@ -2,19 +2,37 @@
 
 from __future__ import annotations
 
+import contextvars
 import logging
+import json
+import os
 import sys
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from fastapi import APIRouter, Depends, HTTPException, status
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))  # -> final_system/
+from evaluator.privacy.feature_space import FeatureSpace
+from evaluator.privacy.parallel_neighbors import resolve_n_workers
 from evaluator.privacy.privacy_evaluator import PrivacyConfig, PrivacyEvaluator
+from evaluator.utility.profile import RealDataProfile
+from evaluator.utility.streaming import MarginalSummary, RowSample
 from evaluator.utility.utility_evaluator import UtilityConfig, UtilityEvaluator
-from shared.schemas.evaluation import PrivacyEvalRequest, UtilityEvalRequest
+from shared.artifacts import find_artifact, iter_frames, read_frame
+from shared.schemas.evaluation import (
+    FullEvalRequest,
+    PrivacyEvalOptions,
+    PrivacyEvalRequest,
+    UtilityEvalOptions,
+    UtilityEvalRequest,
+)
+from services.evaluation_service.frame_cache import FrameCache, get_frame_cache
 from services.evaluation_service.settings import Settings, get_settings
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))  # already set above, idempotent
@@ -26,13 +44,32 @@ logger = logging.getLogger(__name__)
 
 # ── helpers ───────────────────────────────────────────────────────────────────
 
-def _load_csv(path: Path, label: str) -> pd.DataFrame:
+def _not_found(label: str, path: Path) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail={"code": "NOT_FOUND", "message": f"{label} не найден: {path}"},
+    )
+
+
+def _load_frame(path: Path, label: str, cache: Optional[FrameCache] = None) -> pd.DataFrame:
+    """
+    Табличный артефакт с Shared Volume; формат — по расширению (shared/artifacts.py).
+    cache — in-process кэш (см. frame_cache.py): используется для train / holdout
+    сплита, которые читаются каждым запросом.
+    """
     if not path.exists():
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={"code": "NOT_FOUND", "message": f"{label} не найден: {path}"},
-        )
-    return pd.read_csv(path)
+        raise _not_found(label, path)
+    if cache is not None:
+        return cache.get(path, read_frame)
+    return read_frame(path)
+
+
+def _load_split_frame(split_dir: Path, stem: str, cache: FrameCache) -> pd.DataFrame:
+    """train / holdout сплита в любом из форматов ARTIFACT_FORMAT Data Service."""
+    path = find_artifact(split_dir, stem)
+    if path is None:
+        raise _not_found(stem, split_dir / stem)
+    return _load_frame(path, stem, cache)
 
 
 def _resolve_synth(settings: Settings, synth_path: str) -> Path:
@@ -43,6 +80,257 @@ def _resolve_synth(settings: Settings, synth_path: str) -> Path:
     return settings.data_root / p
 
 
+def _load_synth(
+    settings: Settings,
+    synth_path: str,
+    real_profile: Optional[RealDataProfile] = None,
+) -> Tuple[pd.DataFrame, Optional[MarginalSummary]]:
+    """
+    Синтетика для оценки. До SYNTH_STREAM_MB читается целиком, сводка — None.
+
+    Больше — один проход порциями по SYNTH_CHUNK_ROWS строк: в памяти остаются
+    равномерная выборка SYNTH_SAMPLE_ROWS строк (её получают оценщики) и
+    MarginalSummary всей синтетики на границах бинов real_profile (без
+    профиля — только счётчик строк).
+    """
+    path = _resolve_synth(settings, synth_path)
+    if not path.exists():
+        raise _not_found("synthetic", path)
+    if settings.synth_stream_mb <= 0 or path.stat().st_size < settings.synth_stream_mb * 2**20:
+        return read_frame(path), None
+
+    if real_profile is not None:
+        summary = MarginalSummary(real_profile.marginals.numeric_edges, real_profile.marginals.categorical)
+    else:
+        summary = MarginalSummary({}, [])
+    sample = RowSample(settings.synth_sample_rows)
+    for chunk in iter_frames(path, settings.synth_chunk_rows):
+        summary.update(chunk)
+        sample.update(chunk)
+    synth = sample.frame()
+    logger.info(
+        "Synthetic streamed: %d rows (%.0f MB), sample=%d",
+        summary.n_rows, path.stat().st_size / 2**20, len(synth),
+    )
+    return synth, summary
+
+
+def _load_feature_space(
+    split_dir: Path,
+    real_train: pd.DataFrame,
+    with_matrix: bool = True,
+) -> Tuple[FeatureSpace, Optional[np.ndarray]]:
+    """
+    FeatureSpace сплита для DCR/NNDR/MIA.
+
+    Кэшируется на Shared Volume рядом с meta.json: feature_space.json (параметры
+    кодировщика) и feature_space.train.npy (закодированный one-hot train, float32).
+    Повторные оценки того же split_id не переобучают кодировщик и не кодируют
+    train заново; матрица открывается через mmap.
+
+    with_matrix=False (режим distance_encoding="codes") — плотная one-hot матрица
+    не строится и не читается, возвращается только кодировщик.
+    """
+    fs_path = split_dir / "feature_space.json"
+    matrix_path = split_dir / "feature_space.train.npy"
+
+    if not with_matrix and fs_path.exists():
+        try:
+            return FeatureSpace.load(fs_path), None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("FeatureSpace cache unreadable, refitting: %s", e)
+
+    if with_matrix and fs_path.exists() and matrix_path.exists():
+        try:
+            feature_space = FeatureSpace.load(fs_path)
+            train_matrix = np.load(matrix_path, mmap_mode="r")
+            if train_matrix.shape == (len(real_train), feature_space.n_features):
+                logger.info("FeatureSpace loaded from cache: %s", fs_path)
+                return feature_space, train_matrix
+            logger.warning("FeatureSpace cache shape mismatch, refitting: %s", fs_path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("FeatureSpace cache unreadable, refitting: %s", e)
+
+    feature_space = FeatureSpace.fit(real_train)
+    train_matrix = feature_space.transform(real_train) if with_matrix else None
+
+    # Атомарная запись: параллельные запросы по одному split_id не видят
+    # недописанных файлов. JSON пишется последним — его наличие означает,
+    # что матрица (если она строилась) уже на месте.
+    tag = uuid.uuid4().hex
+    try:
+        if train_matrix is not None:
+            tmp_matrix = split_dir / f".{tag}.feature_space.train.npy"
+            np.save(tmp_matrix, train_matrix)
+            os.replace(tmp_matrix, matrix_path)
+        tmp_fs = split_dir / f".{tag}.feature_space.json"
+        feature_space.save(tmp_fs)
+        os.replace(tmp_fs, fs_path)
+    except OSError as e:
+        logger.warning("Cannot cache FeatureSpace in %s: %s", split_dir, e)
+    return feature_space, train_matrix
+
+
+def _load_real_profile(split_dir: Path, real_train: pd.DataFrame) -> RealDataProfile:
+    """
+    Статистический профиль real_train для метрик полезности.
+
+    Кэшируется на Shared Volume в real_profile.json: реальная сторона
+    гистограмм, частот и матриц корреляций считается один раз на split_id,
+    повторные оценки обрабатывают только синтетику.
+    """
+    profile_path = split_dir / "real_profile.json"
+    if profile_path.exists():
+        try:
+            profile = RealDataProfile.load(profile_path)
+            if profile.n_rows == len(real_train):
+                logger.info("Real profile loaded from cache: %s", profile_path)
+                return profile
+            logger.warning("Real profile row count mismatch, rebuilding: %s", profile_path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Real profile cache unreadable, rebuilding: %s", e)
+
+    profile = RealDataProfile.build(real_train)
+    tmp_path = split_dir / f".{uuid.uuid4().hex}.real_profile.json"
+    try:
+        profile.save(tmp_path)
+        os.replace(tmp_path, profile_path)
+    except OSError as e:
+        logger.warning("Cannot cache real profile in %s: %s", split_dir, e)
+    return profile
+
+
+def _load_trtr_baseline(split_dir: Path, key: str) -> Optional[Dict[str, Any]]:
+    """TRTR-скоры из splits/{split_id}/trtr/{key}.json (None — ещё не считались)."""
+    path = split_dir / "trtr" / f"{key}.json"
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning("TRTR cache unreadable, retraining: %s", e)
+        return None
+
+
+def _save_trtr_baseline(split_dir: Path, key: str, scores: Dict[str, Any]) -> None:
+    cache_dir = split_dir / "trtr"
+    tmp_path = cache_dir / f".{uuid.uuid4().hex}.json"
+    try:
+        cache_dir.mkdir(exist_ok=True)
+        tmp_path.write_text(json.dumps(scores), encoding="utf-8")
+        os.replace(tmp_path, cache_dir / f"{key}.json")
+    except OSError as e:
+        logger.warning("Cannot cache TRTR baseline in %s: %s", cache_dir, e)
+
+
+def _privacy_workers(options: PrivacyEvalOptions, settings: Settings) -> int:
+    """Запрошенное число процессов DCR/NNDR: из запроса или PRIVACY_WORKERS сервиса."""
+    return options.n_workers if options.n_workers is not None else settings.privacy_workers
+
+
+def _split_cores(privacy_workers: int) -> Tuple[int, int]:
+    """
+    Делит ядра между одновременно работающими секциями /evaluate/all.
+
+    Приватности — запрошенные процессы, но не больше половины ядер;
+    полезности (потоки sklearn) — все остальные. Возвращает
+    (n_workers для PrivacyConfig, n_jobs для UtilityConfig).
+    """
+    n_cores = os.cpu_count() or 1
+    privacy = max(1, min(resolve_n_workers(privacy_workers), n_cores // 2))
+    return privacy, max(1, n_cores - privacy)
+
+
+def _run_privacy(
+    options: PrivacyEvalOptions,
+    settings: Settings,
+    split_dir: Path,
+    real_train: pd.DataFrame,
+    real_holdout: pd.DataFrame,
+    synth: pd.DataFrame,
+    dp_report: Optional[Dict[str, Any]],
+    synth_summary: Optional[MarginalSummary] = None,
+    n_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    PrivacyEvaluator над уже прочитанными датасетами.
+
+    synth_summary (см. _load_synth) — synth является выборкой: в metadata
+    пишутся полное и оценённое число строк синтетики.
+    n_workers — процессы DCR/NNDR, выделенные вызывающим (см. _split_cores);
+    None — options.n_workers или PRIVACY_WORKERS сервиса.
+    """
+    if n_workers is None:
+        n_workers = _privacy_workers(options, settings)
+    config = PrivacyConfig(
+        quasi_identifiers=options.quasi_identifiers,
+        sensitive_attribute=options.sensitive_attribute,
+        compute_classical=bool(options.quasi_identifiers and options.sensitive_attribute),
+        nn_backend=options.nn_backend,
+        distance_encoding=options.distance_encoding,
+        distance_reference_size=options.distance_reference_size,
+        distance_approximate=options.distance_approximate,
+        ann_n_probe=options.ann_n_probe,
+        n_workers=n_workers,
+        mia_method=options.mia_method,
+        mia_sample_size=options.mia_sample_size,
+        mia_n_bootstrap=options.mia_n_bootstrap,
+    )
+    feature_space, train_matrix = _load_feature_space(
+        split_dir, real_train, with_matrix=options.distance_encoding == "onehot",
+    )
+    evaluator = PrivacyEvaluator(config)
+    report = evaluator.evaluate(
+        real_train, real_holdout, synth,
+        dp_report=dp_report,
+        feature_space=feature_space,
+        train_matrix=train_matrix,
+    )
+    if synth_summary is not None:
+        report["metadata"]["synth_rows"] = synth_summary.n_rows
+        report["metadata"]["synth_rows_sampled"] = len(synth)
+    return report
+
+
+def _run_utility(
+    options: UtilityEvalOptions,
+    split_dir: Path,
+    real_train: pd.DataFrame,
+    real_holdout: pd.DataFrame,
+    synth: pd.DataFrame,
+    real_profile: RealDataProfile,
+    synth_summary: Optional[MarginalSummary] = None,
+    n_jobs: int = -1,
+) -> Dict[str, Any]:
+    """
+    UtilityEvaluator над уже прочитанными датасетами.
+
+    synth_summary (см. _load_synth) — маргинальные метрики по всей синтетике,
+    корреляции и TSTR — по выборке synth.
+    n_jobs — потоки ML-оценки (−1 = все ядра).
+    """
+    config = UtilityConfig(target_column=options.target_column, ml_model=options.ml_model, n_jobs=n_jobs)
+    evaluator = UtilityEvaluator(config)
+    # TRTR зависит только от сплита и конфигурации модели: считается один раз
+    # на (split_id, target, model config) и переиспользуется между прогонами
+    trtr_key = evaluator.trtr_cache_key()
+    trtr_scores = _load_trtr_baseline(split_dir, trtr_key)
+    # real_test_df = holdout: отложенная выборка, которую генератор не видел
+    result = evaluator.evaluate(
+        real_train, synth, real_holdout,
+        real_profile=real_profile, trtr_scores=trtr_scores, synth_marginals=synth_summary,
+    )
+    if trtr_scores is None and result.get("ml_efficacy"):
+        _save_trtr_baseline(split_dir, trtr_key, result["ml_efficacy"]["trtr"])
+    return result
+
+
+def _timed(fn: Callable[..., Dict[str, Any]], *args: Any) -> Tuple[Dict[str, Any], float]:
+    t0 = time.time()
+    result = fn(*args)
+    return result, round(time.time() - t0, 3)
+
+
 # ── POST /evaluate/privacy ────────────────────────────────────────────────────
 
 @router.post(
@@ -53,23 +341,20 @@ def _resolve_synth(settings: Settings, synth_path: str) -> Path:
 def evaluate_privacy(
     body: PrivacyEvalRequest,
     settings: Settings = Depends(get_settings),
+    cache: FrameCache = Depends(get_frame_cache),
 ) -> Dict[str, Any]:
     set_run_id(body.run_id)
     t0 = time.time()
     logger.info("Privacy eval started: split_id=%s synth_path=%s", body.split_id, body.synth_path)
     split_dir = settings.splits_dir / body.split_id
-    real_train = _load_csv(split_dir / "train.csv", "train.csv")
-    real_holdout = _load_csv(split_dir / "holdout.csv", "holdout.csv")
-    synth = _load_csv(_resolve_synth(settings, body.synth_path), "synthetic.csv")
+    real_train = _load_split_frame(split_dir, "train", cache)
+    real_holdout = _load_split_frame(split_dir, "holdout", cache)
+    synth, synth_summary = _load_synth(settings, body.synth_path)
     logger.info("Privacy eval: train=%d holdout=%d synth=%d", len(real_train), len(real_holdout), len(synth))
 
-    config = PrivacyConfig(
-        quasi_identifiers=body.quasi_identifiers,
-        sensitive_attribute=body.sensitive_attribute,
-        compute_classical=bool(body.quasi_identifiers and body.sensitive_attribute),
+    result = _run_privacy(
+        body, settings, split_dir, real_train, real_holdout, synth, body.dp_report, synth_summary,
     )
-    evaluator = PrivacyEvaluator(config)
-    result = evaluator.evaluate(real_train, real_holdout, synth, dp_report=body.dp_report)
     logger.info("Privacy eval done in %.1fs", time.time() - t0)
     return result
 
@@ -84,18 +369,96 @@ def evaluate_privacy(
 def evaluate_utility(
     body: UtilityEvalRequest,
     settings: Settings = Depends(get_settings),
+    cache: FrameCache = Depends(get_frame_cache),
 ) -> Dict[str, Any]:
     set_run_id(body.run_id)
     t0 = time.time()
     logger.info("Utility eval started: split_id=%s target=%s", body.split_id, body.target_column)
     split_dir = settings.splits_dir / body.split_id
-    real_train = _load_csv(split_dir / "train.csv", "train.csv")
-    real_holdout = _load_csv(split_dir / "holdout.csv", "holdout.csv")
-    synth = _load_csv(_resolve_synth(settings, body.synth_path), "synthetic.csv")
+    real_train = _load_split_frame(split_dir, "train", cache)
+    real_holdout = _load_split_frame(split_dir, "holdout", cache)
+    real_profile = _load_real_profile(split_dir, real_train)
+    synth, synth_summary = _load_synth(settings, body.synth_path, real_profile)
 
-    config = UtilityConfig(target_column=body.target_column)
-    evaluator = UtilityEvaluator(config)
-    # real_test_df = holdout: отложенная выборка, которую генератор не видел
-    result = evaluator.evaluate(real_train, synth, real_holdout)
+    result = _run_utility(body, split_dir, real_train, real_holdout, synth, real_profile, synth_summary)
     logger.info("Utility eval done in %.1fs", time.time() - t0)
     return result
+
+
+# ── POST /evaluate/all ────────────────────────────────────────────────────────
+
+@router.post(
+    "/evaluate/all",
+    status_code=status.HTTP_200_OK,
+    summary="Совместная оценка приватности и полезности",
+)
+def evaluate_all(
+    body: FullEvalRequest,
+    settings: Settings = Depends(get_settings),
+    cache: FrameCache = Depends(get_frame_cache),
+) -> Dict[str, Any]:
+    """
+    Приватность и полезность за один запрос.
+
+    Датасеты читаются один раз, оба оценщика получают одни и те же DataFrame
+    (на месте их не изменяет ни один из них) и выполняются в двух потоках:
+    основное время уходит в numpy/sklearn, которые отпускают GIL.
+    Каждый поток запускается в копии contextvars, чтобы run_id попадал в логи.
+    """
+    set_run_id(body.run_id)
+    t0 = time.time()
+    logger.info("Full eval started: split_id=%s synth_path=%s", body.split_id, body.synth_path)
+    split_dir = settings.splits_dir / body.split_id
+    real_train = _load_split_frame(split_dir, "train", cache)
+    real_holdout = _load_split_frame(split_dir, "holdout", cache)
+    real_profile = _load_real_profile(split_dir, real_train)
+    synth, synth_summary = _load_synth(settings, body.synth_path, real_profile)
+    load_sec = round(time.time() - t0, 3)
+    logger.info(
+        "Full eval: train=%d holdout=%d synth=%d loaded in %.1fs",
+        len(real_train), len(real_holdout), len(synth), load_sec,
+    )
+
+    # Секции работают одновременно: ядра делятся между ними явно, иначе
+    # процессы DCR и потоки sklearn (n_jobs=−1) переподписывают CPU
+    privacy_workers, utility_jobs = _split_cores(_privacy_workers(body.privacy, settings))
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="eval") as pool:
+        privacy_future = pool.submit(
+            contextvars.copy_context().run, _timed, _run_privacy,
+            body.privacy, settings, split_dir, real_train, real_holdout, synth, body.dp_report,
+            synth_summary, privacy_workers,
+        )
+        utility_future = pool.submit(
+            contextvars.copy_context().run, _timed, _run_utility,
+            body.utility, split_dir, real_train, real_holdout, synth, real_profile, synth_summary,
+            utility_jobs,
+        )
+        privacy_report, privacy_sec = privacy_future.result()
+        utility_report, utility_sec = utility_future.result()
+
+    total_sec = round(time.time() - t0, 3)
+    logger.info(
+        "Full eval done in %.1fs (load=%.1fs privacy=%.1fs utility=%.1fs)",
+        total_sec, load_sec, privacy_sec, utility_sec,
+    )
+    return {
+        "privacy_report": privacy_report,
+        "utility_report": utility_report,
+        "timings": {
+            "load_sec": load_sec,
+            "privacy_sec": privacy_sec,
+            "utility_sec": utility_sec,
+            "total_sec": total_sec,
+        },
+    }
+
+
+# ── GET /metrics ──────────────────────────────────────────────────────────────
+
+@router.get(
+    "/metrics",
+    status_code=status.HTTP_200_OK,
+    summary="Счётчики in-process кэшей сервиса",
+)
+def metrics(cache: FrameCache = Depends(get_frame_cache)) -> Dict[str, Any]:
+    return {"frame_cache": cache.stats()}
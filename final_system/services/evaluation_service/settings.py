@@ -17,6 +17,16 @@ class Settings(BaseSettings):
     )
 
     data_root: Path = Path("/data")
+    # Процессы для DCR/NNDR по умолчанию (1 = без пула, 0 = все ядра)
+    privacy_workers: int = 1
+    # Бюджет in-process кэша train/holdout DataFrame (0 = кэш выключен)
+    frame_cache_mb: int = 1024
+    # Синтетика от этого размера читается порциями (0 = всегда целиком):
+    # маргинальные метрики — по всем строкам, остальные секции — по равномерной
+    # выборке synth_sample_rows строк
+    synth_stream_mb: int = 1024
+    synth_sample_rows: int = 500_000
+    synth_chunk_rows: int = 200_000
 
     @property
     def splits_dir(self) -> Path:
@@ -10,6 +10,8 @@ from datetime import datetime, timezone
 from enum import Enum
 from typing import Any, Dict, Optional
 
+from synthesizer.training import CancellationToken
+
 
 class JobStatus(str, Enum):
     queued    = "queued"
@@ -19,6 +21,10 @@ class JobStatus(str, Enum):
     cancelled = "cancelled"
 
 
+# Из этих статусов джоб не выходит
+TERMINAL_STATUSES = frozenset({JobStatus.done, JobStatus.failed, JobStatus.cancelled})
+
+
 def _now() -> datetime:
     return datetime.now(timezone.utc)
 
@@ -31,9 +37,13 @@ class JobRecord:
     model_id:      Optional[str] = None
     dp_report:     Optional[Dict[str, Any]] = None
     error_message: Optional[str] = None
+    error_code:    Optional[str] = None      # см. shared.schemas.synthesis.JOB_ERROR_*
     created_at:    datetime = field(default_factory=_now)
     started_at:    Optional[datetime] = None
     finished_at:   Optional[datetime] = None
+    checkpoint_epoch: Optional[int] = None
+    # Выставляется DELETE /jobs/{id}; обучение проверяет его внутри fit()
+    cancel_token:  CancellationToken = field(default_factory=CancellationToken)
 
 
 class JobStore:
@@ -50,10 +60,19 @@ class JobStore:
             return self._jobs.get(job_id)
 
     def update(self, job_id: str, **kwargs) -> Optional[JobRecord]:
+        """
+        Обновляет поля джоба. Обновление, которое выводит джоб из конечного
+        статуса (done / failed / cancelled), отбрасывается целиком: DELETE,
+        пришедший между извлечением из очереди и status=running или после
+        последней порции генерации, не перезаписывается обучением.
+        """
         with self._lock:
             rec = self._jobs.get(job_id)
             if rec is None:
                 return None
+            status = kwargs.get("status", rec.status)
+            if rec.status in TERMINAL_STATUSES and status != rec.status:
+                return rec
             for k, v in kwargs.items():
                 setattr(rec, k, v)
             return rec
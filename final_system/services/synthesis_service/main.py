@@ -28,6 +28,8 @@ from fastapi.responses import JSONResponse
 
 from services.synthesis_service.router import router
 from services.synthesis_service.settings import get_settings
+from services.synthesis_service.training_worker import get_worker_pool
+from shared.artifacts import check_engine
 
 
 @asynccontextmanager
@@ -35,8 +37,12 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     settings = get_settings()
     settings.synth_dir.mkdir(parents=True, exist_ok=True)
     settings.models_dir.mkdir(parents=True, exist_ok=True)
+    check_engine(settings.artifact_format)
     _add_shared_log_handler(settings.data_root / "logs" / "synthesis_service.log")
     yield
+    if settings.train_process_isolation:
+        # Простаивающие процессы обучения; занятые — daemon, завершатся с сервисом
+        get_worker_pool().shutdown()
 
 
 def _add_shared_log_handler(log_path) -> None:
@@ -0,0 +1,189 @@
+# services/synthesis_service/model_cache.py
+#
+# In-process LRU-кэш загруженных генераторов для POST /models/{id}/sample.
+#
+# load_generator — для .pkl полный pickle.load объекта torch / SmartNoise; для
+# небольших догенераций (POST /runs/{id}/synthetic на 1000 строк) он занимает
+# большую часть времени запроса. Кэш держит уже загруженные генераторы в памяти
+# процесса, повторные запросы к той же модели используют один экземпляр.
+#
+# Ключ — model_id; запись валидна, пока у файла модели те же (st_mtime_ns, st_size):
+# перезапись файла модели приводит к повторной загрузке.
+#
+# Бюджет задаётся в байтах (MODEL_CACHE_MB); размер записи — размер файла
+# модели на диске (веса и трансформер сериализуются почти без накладных
+# расходов, поэтому это близкая оценка занимаемой памяти; для *.model — оценка
+# сверху, веса отображаются в память лениво). При превышении бюджета вытесняются
+# наименее недавно использованные записи; модель больше бюджета не кэшируется.
+# Записи, не использовавшиеся дольше MODEL_CACHE_TTL_SEC, удаляются при
+# следующем обращении к кэшу.
+#
+# Загрузка одной модели сериализуется отдельной блокировкой на model_id:
+# параллельные промахи по одной модели ждут единственной загрузки и получают
+# один и тот же экземпляр; загрузки разных моделей идут параллельно.
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from services.synthesis_service.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+FileKey = Tuple[int, int]
+
+
+@dataclass
+class _Entry:
+    key: FileKey
+    generator: Any
+    size: int
+    last_used: float
+
+
+class ModelCache:
+    """Потокобезопасный LRU-кэш генераторов с бюджетом в байтах и TTL."""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl_sec: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl_sec = max(0.0, float(ttl_sec))
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(path: Path) -> FileKey:
+        st = path.stat()
+        return st.st_mtime_ns, st.st_size
+
+    def get(self, model_id: str, path: Path, loader: Callable[[str], Any]) -> Any:
+        """Генератор model_id: из кэша или loader(str(path))."""
+        if self.max_bytes == 0:
+            return loader(str(path))
+
+        key = self.key(path)
+        cached = self._lookup(model_id, key)
+        if cached is not None:
+            return cached
+
+        with self._load_lock(model_id):
+            # Пока ждали блокировку, модель мог загрузить другой запрос
+            cached = self._lookup(model_id, key)
+            if cached is not None:
+                return cached
+            with self._lock:
+                self.misses += 1
+            t0 = time.time()
+            generator = loader(str(path))
+            logger.info("Model cache: loaded %s in %.2fs", model_id, time.time() - t0)
+            self._put(model_id, key, generator, key[1])
+        return generator
+
+    def warm(self, model_id: str, path: Path, loader: Callable[[str], Any]) -> bool:
+        """Загружает модель в кэш заранее; False — модель больше бюджета и не закэширована."""
+        self.get(model_id, path, loader)
+        with self._lock:
+            return model_id in self._entries
+
+    def evict(self, model_id: str) -> bool:
+        """Удаляет модель из кэша; False — её там не было."""
+        with self._lock:
+            if model_id not in self._entries:
+                return False
+            self._drop(model_id)
+            return True
+
+    def _lookup(self, model_id: str, key: FileKey) -> Optional[Any]:
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(model_id)
+            if entry is None:
+                return None
+            if entry.key != key:
+                # Файл модели перезаписан
+                self._drop(model_id)
+                self.invalidations += 1
+                return None
+            entry.last_used = self._clock()
+            self._entries.move_to_end(model_id)
+            self.hits += 1
+            return entry.generator
+
+    def _put(self, model_id: str, key: FileKey, generator: Any, size: int) -> None:
+        if size > self.max_bytes:
+            logger.info("Model cache: %s (%d MB) exceeds budget, not cached", model_id, size >> 20)
+            return
+        with self._lock:
+            if model_id in self._entries:
+                self._drop(model_id)
+            self._entries[model_id] = _Entry(key, generator, size, self._clock())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted = next(iter(self._entries))
+                self._drop(evicted)
+                self.evictions += 1
+                logger.info("Model cache: evicted %s", evicted)
+
+    def _load_lock(self, model_id: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(model_id, threading.Lock())
+
+    def _expire(self) -> None:
+        if self.ttl_sec == 0:
+            return
+        deadline = self._clock() - self.ttl_sec
+        expired = [mid for mid, e in self._entries.items() if e.last_used < deadline]
+        for model_id in expired:
+            self._drop(model_id)
+            self.expirations += 1
+            logger.info("Model cache: expired %s", model_id)
+
+    def _drop(self, model_id: str) -> None:
+        entry = self._entries.pop(model_id)
+        self._bytes -= entry.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_sec": self.ttl_sec,
+                "models": list(self._entries),
+            }
+
+
+@lru_cache
+def get_model_cache() -> ModelCache:
+    settings = get_settings()
+    return ModelCache(settings.model_cache_mb << 20, ttl_sec=settings.model_cache_ttl_sec)
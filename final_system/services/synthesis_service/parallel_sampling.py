@@ -0,0 +1,151 @@
+# services/synthesis_service/parallel_sampling.py
+#
+# Многопроцессная генерация из сохранённой модели (POST /models/{id}/sample
+# с n_workers > 1 или seed).
+#
+# n_rows делится на шарды фиксированного размера shard_rows; шард i
+# генерируется с seed-ом, выведенным из (seed, i) через numpy SeedSequence.
+# Ни размер шардов, ни их seed-ы не зависят от числа процессов — при одном
+# и том же seed результат побайтно одинаков для 1, 4 или 32 worker-ов.
+# Перед шардом генератор сбрасывает свой ГСЧ (BaseGenerator.reseed): у SDV
+# это random_state синтезатора, у DP-TVAE / DPCTGAN — глобальные ГСЧ процесса.
+#
+# Каждый worker загружает модель один раз (initializer пула) и пишет свой
+# шард в отдельный файл-часть synth/{job_id}/parts/part-NNNNN.<ext>; после
+# завершения всех шардов части склеиваются в synthetic.<ext> по порядку
+# индексов и удаляются.
+#
+# Пул создаётся с контекстом "spawn" (как в evaluator/privacy/parallel_neighbors.py);
+# torch и BLAS в worker-е ограничены одним потоком — параллелизм дают процессы.
+
+from __future__ import annotations
+
+import logging
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from shared.artifacts import artifact_format, artifact_name, concat_artifacts, write_frames
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[str], Any]
+
+# Генератор, загруженный в worker-процессе (один раз на процесс)
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def shard_plan(n_rows: int, shard_rows: int) -> List[Tuple[int, int]]:
+    """Шарды (index, rows): все по shard_rows, последний — остаток."""
+    if n_rows <= 0:
+        raise ValueError("n_rows должен быть положительным.")
+    if shard_rows <= 0:
+        raise ValueError("shard_rows должен быть положительным.")
+    return [
+        (i, min(shard_rows, n_rows - start))
+        for i, start in enumerate(range(0, n_rows, shard_rows))
+    ]
+
+
+def shard_seed(seed: int, index: int) -> int:
+    """Независимый seed шарда index, детерминированно выведенный из seed."""
+    return int(np.random.SeedSequence([seed, index]).generate_state(1)[0])
+
+
+def new_seed() -> int:
+    """Случайный seed (возвращается клиенту, чтобы запрос можно было повторить)."""
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+# ── Worker ────────────────────────────────────────────────────────────────────
+
+def _worker_init(model_path: str, loader: Optional[Loader]) -> None:
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    if loader is None:
+        from synthesizer.loader import load_generator as loader
+    _WORKER_STATE["generator"] = loader(model_path)
+
+
+def _write_shard(generator: Any, n_rows: int, seed: int, part_path: str, chunk_rows: int) -> int:
+    generator.reseed(seed)
+    return write_frames(generator.sample_iter(n_rows, chunk_rows), part_path)
+
+
+def _sample_shard(n_rows: int, seed: int, part_path: str, chunk_rows: int) -> int:
+    return _write_shard(_WORKER_STATE["generator"], n_rows, seed, part_path, chunk_rows)
+
+
+# ── Parent ────────────────────────────────────────────────────────────────────
+
+def sample_parallel(
+    model_path: Path,
+    n_rows: int,
+    out_path: Path,
+    seed: int,
+    n_workers: int = 1,
+    shard_rows: int = 100_000,
+    chunk_rows: int = 100_000,
+    loader: Optional[Loader] = None,
+    generator: Any = None,
+) -> int:
+    """
+    Генерирует n_rows строк из модели model_path в out_path; возвращает число строк.
+
+    n_workers = 1 — шарды по очереди в текущем процессе (тот же результат,
+    что и с пулом). loader — функция загрузки модели по пути (по умолчанию
+    synthesizer.loader.load_generator); должна быть импортируемой на уровне
+    модуля, чтобы передаваться в spawn-процессы. generator — уже загруженная
+    модель для n_workers = 1 (например, из кэша моделей сервиса).
+    """
+    plan = shard_plan(n_rows, shard_rows)
+    parts_dir = out_path.parent / "parts"
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    fmt = artifact_format(out_path)
+    parts = [parts_dir / artifact_name(f"part-{i:05d}", fmt) for i, _ in plan]
+    tasks = [
+        (rows, shard_seed(seed, i), str(part), chunk_rows)
+        for (i, rows), part in zip(plan, parts)
+    ]
+    n_workers = max(1, min(n_workers, len(plan)))
+    logger.info(
+        "[sample] %d rows → %d shards × %d, workers=%d, seed=%d",
+        n_rows, len(plan), shard_rows, n_workers, seed,
+    )
+
+    try:
+        if n_workers == 1:
+            # Без _worker_init: потоки torch / BLAS процесса сервиса не ограничиваем
+            if generator is None:
+                if loader is None:
+                    from synthesizer.loader import load_generator as loader
+                generator = loader(str(model_path))
+            # ГСЧ генератора общий для потоков сервиса: между reseed() и
+            # концом шарда его не должна двигать другая генерация
+            with generator.sampling_lock():
+                written = sum(_write_shard(generator, *task) for task in tasks)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=get_context("spawn"),
+                initializer=_worker_init,
+                initargs=(str(model_path), loader),
+            ) as pool:
+                futures = [pool.submit(_sample_shard, *task) for task in tasks]
+                written = sum(f.result() for f in futures)
+        concat_artifacts(parts, out_path)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    return written
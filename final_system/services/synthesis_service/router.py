@@ -4,24 +4,32 @@ from __future__ import annotations
 
 import json
 import logging
+import os
 import sys
-import threading
 import time
 import uuid
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, Optional
 
 import pandas as pd
 from fastapi import APIRouter, Depends, HTTPException, status
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))  # -> final_system/
 from config_loader import GeneratorYamlConfig
+from shared.artifacts import artifact_name, find_artifact, read_frame, write_frames
 from shared.log_context import set_run_id
+from shared.model_files import find_model, sidecar_path
 from shared.schemas.datasets import SplitMeta
 from shared.schemas.synthesis import SampleRequest, SynthesisJobCreate, SynthesisJobSummary
-from services.synthesis_service.job_store import JobRecord, JobStatus, JobStore, job_store
+from services.synthesis_service.job_store import TERMINAL_STATUSES, JobRecord, JobStatus, JobStore, job_store
+from services.synthesis_service.model_cache import ModelCache, get_model_cache
+from services.synthesis_service.parallel_sampling import new_seed, sample_parallel
+from services.synthesis_service.scheduler import JobScheduler, get_job_scheduler
 from services.synthesis_service.settings import Settings, get_settings
+from services.synthesis_service.training_worker import get_worker_pool
+from synthesizer.training import CancellationToken, TrainingCancelled, TrainingHooks
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -158,10 +166,10 @@ def _write_model_sidecar(
     file_size_bytes: int,
     privacy_report: Dict[str, Any],
 ) -> None:
-    """Пишет {model_id}.meta.json рядом с .pkl.
+    """Пишет {model_id}.meta.json рядом с файлом модели.
 
     Gateway читает этот сайдкар для /models и /models/{id} — и не обязан
-    импортировать synthesizer-классы ради pickle.load.
+    импортировать synthesizer-классы ради загрузки модели.
     """
     payload = {
         "model_id": model_id,
@@ -182,7 +190,8 @@ def _load_split_meta(settings: Settings, split_id: str) -> SplitMeta:
     return SplitMeta.model_validate_json(meta_path.read_text(encoding="utf-8"))
 
 
-def _job_to_summary(rec: JobRecord) -> SynthesisJobSummary:
+def _job_to_summary(rec: JobRecord, scheduler: JobScheduler) -> SynthesisJobSummary:
+    queued_or_running = rec.status in (JobStatus.queued, JobStatus.running)
     return SynthesisJobSummary(
         job_id=rec.job_id,
         status=rec.status,
@@ -190,25 +199,76 @@ def _job_to_summary(rec: JobRecord) -> SynthesisJobSummary:
         synth_path=rec.synth_path,
         dp_report=rec.dp_report,
         error_message=rec.error_message,
+        error_code=rec.error_code,
+        checkpoint_epoch=rec.checkpoint_epoch,
+        queue_position=scheduler.position(rec.job_id) if rec.status == JobStatus.queued else None,
+        eta_seconds=scheduler.eta_seconds(rec.job_id) if queued_or_running else None,
         created_at=rec.created_at,
         started_at=rec.started_at,
         finished_at=rec.finished_at,
     )
 
 
+def _checkpoint_path(body: SynthesisJobCreate, settings: Settings) -> Optional[Path]:
+    if body.checkpoint_key and settings.checkpoint_every_epochs > 0:
+        return settings.checkpoints_dir / f"{body.checkpoint_key}.ckpt"
+    return None
+
+
+def _training_hooks(
+    body: SynthesisJobCreate,
+    settings: Settings,
+    token: CancellationToken,
+    report: Callable[..., Any],
+) -> TrainingHooks:
+    """Токен отмены джоба + чекпоинты, если Gateway передал checkpoint_key."""
+    checkpoint_path = _checkpoint_path(body, settings)
+    if checkpoint_path is not None:
+        checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    return TrainingHooks(
+        cancel_token=token,
+        checkpoint_path=str(checkpoint_path) if checkpoint_path else None,
+        checkpoint_every=settings.checkpoint_every_epochs,
+        on_checkpoint=lambda epoch: report(checkpoint_epoch=epoch),
+    )
+
+
+def _cancellable(frames: Iterator[pd.DataFrame], token: CancellationToken) -> Iterator[pd.DataFrame]:
+    """Проверка отмены между порциями генерации."""
+    for frame in frames:
+        token.raise_if_cancelled()
+        yield frame
+
+
 # ── background worker ─────────────────────────────────────────────────────────
 
-def _run_job(job_id: str, body: SynthesisJobCreate, settings: Settings) -> None:
+def _run_job(
+    job_id: str,
+    body: SynthesisJobCreate,
+    settings: Settings,
+    token: CancellationToken,
+    report: Callable[..., Any],
+) -> None:
+    """
+    Обучение + генерация + сохранение модели.
+
+    Выполняется в дочернем процессе обучения (training_worker.py) или, при
+    TRAIN_PROCESS_ISOLATION=false, прямо в потоке слота. Изменения JobRecord
+    передаются через report(**fields), а не в job_store напрямую.
+    """
     set_run_id(body.run_id)
-    store = job_store
-    store.update(job_id, status=JobStatus.running, started_at=datetime.now(timezone.utc))
+    report(status=JobStatus.running, started_at=datetime.now(timezone.utc))
+    hooks = _training_hooks(body, settings, token, report)
     t0 = time.time()
     logger.info("[job %s] Started: split_id=%s generator_type=%s n_rows=%s",
                 job_id, body.split_id, body.generator.get("generator_type"), body.n_rows)
     try:
         # 1. Загрузка метаданных сплита
         meta = _load_split_meta(settings, body.split_id)
-        train_df = pd.read_csv(settings.splits_dir / body.split_id / "train.csv")
+        train_path = find_artifact(settings.splits_dir / body.split_id, "train")
+        if train_path is None:
+            raise FileNotFoundError(f"train не найден в сплите {body.split_id}")
+        train_df = read_frame(train_path)
         logger.info("[job %s] Loaded train set: %d rows, %d columns", job_id, len(train_df), len(train_df.columns))
 
         # 2. Валидация inline-конфига генератора (присылает Gateway)
@@ -226,34 +286,36 @@ def _run_job(job_id: str, body: SynthesisJobCreate, settings: Settings) -> None:
         train_df = train_df[[c for c in train_df.columns if c in all_classified]]
         logger.info("[job %s] Columns: cat=%d cont=%d total=%d", job_id, len(cat_cols), len(cont_cols), len(train_df.columns))
 
-        # 4. Обучение
-        rec = store.get(job_id)
-        if rec and rec.status == JobStatus.cancelled:
-            logger.info("[job %s] Cancelled before fit", job_id)
-            return
+        # 4. Обучение: отмена проверяется внутри fit() (не позже конца эпохи),
+        # при checkpoint_key — периодические чекпоинты / продолжение с последнего
+        token.raise_if_cancelled()
         logger.info("[job %s] Fitting generator...", job_id)
         t_fit = time.time()
-        generator.fit(train_df, categorical_columns=cat_cols, continuous_columns=cont_cols)
+        generator.fit(train_df, categorical_columns=cat_cols, continuous_columns=cont_cols, hooks=hooks)
         logger.info("[job %s] Fit done in %.1fs", job_id, time.time() - t_fit)
 
         # 5. Генерация
-        rec = store.get(job_id)
-        if rec and rec.status == JobStatus.cancelled:
-            logger.info("[job %s] Cancelled after fit, before sample", job_id)
-            return
+        token.raise_if_cancelled()
         n_rows = body.n_rows or len(train_df)
-        logger.info("[job %s] Sampling %d rows...", job_id, n_rows)
-        synth_df = generator.sample(n_rows)
-        logger.info("[job %s] Sampled %d rows", job_id, len(synth_df))
-
-        # 6. Сохранение синтетики на shared volume.
-        # FR-08.5: финальный synthetic.csv записывается однократно после валидации
+        # 6. Генерация порциями прямо в файл на shared volume: в памяти только
+        # текущая порция (SAMPLE_CHUNK_ROWS), первые строки на диске сразу.
+        # FR-08.5: финальный synthetic.* записывается однократно после валидации
         # (gateway переименует pending → final после шага 7).
         synth_dir = settings.synth_dir / job_id
         synth_dir.mkdir(parents=True, exist_ok=True)
-        synth_rel = f"synth/{job_id}/synthetic_pending.csv"
-        synth_df.to_csv(settings.data_root / synth_rel, index=False)
-        logger.info("[job %s] Synth (pending) saved: %s", job_id, synth_rel)
+        synth_rel = f"synth/{job_id}/{artifact_name('synthetic_pending', settings.artifact_format)}"
+        logger.info("[job %s] Sampling %d rows...", job_id, n_rows)
+        t_sample = time.time()
+        written = write_frames(
+            _cancellable(generator.sample_iter(n_rows, settings.sample_chunk_rows), token),
+            settings.data_root / synth_rel,
+        )
+        logger.info(
+            "[job %s] Sampled %d rows in %.1fs, synth (pending) saved: %s",
+            job_id, written, time.time() - t_sample, synth_rel,
+        )
+
+        token.raise_if_cancelled()
 
         # 7. Опционально: сохранение модели + JSON-сайдкар с метаданными.
         # Сайдкар читает Gateway (GET /models, /models/{id}) — так он не зависит
@@ -270,22 +332,21 @@ def _run_job(job_id: str, body: SynthesisJobCreate, settings: Settings) -> None:
                 model_id=model_id,
                 created_at=created_at,
             )
-            pkl_path = settings.models_dir / f"{model_id}.pkl"
-            generator.save(str(pkl_path))
+            model_path = settings.models_dir / f"{model_id}{generator.MODEL_SUFFIX}"
+            generator.save(str(model_path))
             _write_model_sidecar(
-                settings.models_dir / f"{model_id}.meta.json",
+                sidecar_path(model_path),
                 model_id=model_id,
                 run_id=body.run_id,
                 dataset_name=body.dataset_name,
                 generator_type=gen_yaml.generator_type,
                 created_at=created_at,
-                file_size_bytes=pkl_path.stat().st_size,
+                file_size_bytes=model_path.stat().st_size,
                 privacy_report=dp_report,
             )
             logger.info("[job %s] Model saved: %s (dataset=%s)", job_id, model_id, body.dataset_name)
 
-        store.update(
-            job_id,
+        report(
             status=JobStatus.done,
             synth_path=synth_rel,
             model_id=model_id,
@@ -293,37 +354,73 @@ def _run_job(job_id: str, body: SynthesisJobCreate, settings: Settings) -> None:
             finished_at=datetime.now(timezone.utc),
         )
         logger.info("[job %s] Done in %.1fs total", job_id, time.time() - t0)
+        _remove_checkpoint(hooks)
+
+    except TrainingCancelled:
+        logger.info("[job %s] Cancelled after %.1fs", job_id, time.time() - t0)
+        report(status=JobStatus.cancelled, finished_at=datetime.now(timezone.utc))
+        _remove_checkpoint(hooks)
 
     except Exception as exc:
+        # Чекпоинт остаётся: повторный джоб с тем же checkpoint_key продолжит с него
         logger.error("[job %s] Failed after %.1fs: %s", job_id, time.time() - t0, exc, exc_info=True)
-        store.update(
-            job_id,
+        report(
             status=JobStatus.failed,
             error_message=str(exc),
             finished_at=datetime.now(timezone.utc),
         )
 
 
+def _remove_checkpoint(hooks: TrainingHooks) -> None:
+    if hooks.checkpoint_path:
+        Path(hooks.checkpoint_path).unlink(missing_ok=True)
+
+
+def _run_job_isolated(
+    job_id: str,
+    body: SynthesisJobCreate,
+    settings: Settings,
+    token: CancellationToken,
+) -> None:
+    """_run_job в дочернем процессе пула; обновления — в job_store."""
+    get_worker_pool().run(job_id, body, settings, token, partial(job_store.update, job_id))
+    if token.cancelled:
+        # Процесс могли убить по таймауту отмены, не дав удалить чекпоинт
+        checkpoint_path = _checkpoint_path(body, settings)
+        if checkpoint_path is not None:
+            checkpoint_path.unlink(missing_ok=True)
+
+
 # ── POST /jobs ────────────────────────────────────────────────────────────────
 
 @router.post(
     "/jobs",
     response_model=SynthesisJobSummary,
     status_code=status.HTTP_202_ACCEPTED,
-    summary="Запустить обучение генератора (фоновый поток)",
+    summary="Поставить обучение генератора в очередь",
 )
 def create_job(
     body: SynthesisJobCreate,
     settings: Settings = Depends(get_settings),
+    scheduler: JobScheduler = Depends(get_job_scheduler),
 ) -> SynthesisJobSummary:
     job_id = str(uuid.uuid4())
     rec = JobRecord(job_id=job_id)
     job_store.add(rec)
 
-    t = threading.Thread(target=_run_job, args=(job_id, body, settings), daemon=True)
-    t.start()
+    if settings.train_process_isolation:
+        task = partial(_run_job_isolated, job_id, body, settings, rec.cancel_token)
+    else:
+        task = partial(_run_job, job_id, body, settings, rec.cancel_token, partial(job_store.update, job_id))
+    scheduler.submit(
+        job_id,
+        task,
+        priority=body.priority,
+        kind=str(body.generator.get("generator_type", "")),
+    )
+    logger.info("[job %s] Queued: priority=%d position=%s", job_id, body.priority, scheduler.position(job_id))
 
-    return _job_to_summary(rec)
+    return _job_to_summary(rec, scheduler)
 
 
 # ── GET /jobs/{job_id} ────────────────────────────────────────────────────────
@@ -331,13 +428,16 @@ def create_job(
 @router.get(
     "/jobs/{job_id}",
     response_model=SynthesisJobSummary,
-    summary="Статус джоба: queued / running / done / failed",
+    summary="Статус джоба: queued / running / done / failed / cancelled",
 )
-def get_job(job_id: str) -> SynthesisJobSummary:
+def get_job(
+    job_id: str,
+    scheduler: JobScheduler = Depends(get_job_scheduler),
+) -> SynthesisJobSummary:
     rec = job_store.get(job_id)
     if rec is None:
         raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "Джоб не найден"})
-    return _job_to_summary(rec)
+    return _job_to_summary(rec, scheduler)
 
 
 # ── DELETE /jobs/{job_id} ─────────────────────────────────────────────────────
@@ -351,9 +451,14 @@ def cancel_job(job_id: str) -> Dict[str, Any]:
     rec = job_store.get(job_id)
     if rec is None:
         raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "Джоб не найден"})
-    if rec.status in (JobStatus.done, JobStatus.failed, JobStatus.cancelled):
+    if rec.status in TERMINAL_STATUSES:
+        return {"job_id": job_id, "status": rec.status}
+    rec = job_store.update(job_id, status=JobStatus.cancelled, finished_at=datetime.now(timezone.utc))
+    if rec.status != JobStatus.cancelled:
+        # Джоб завершился между проверкой и отменой — конечный статус не меняется
         return {"job_id": job_id, "status": rec.status}
-    job_store.update(job_id, status=JobStatus.cancelled, finished_at=datetime.now(timezone.utc))
+    # Обучение увидит токен на ближайшем шаге / батче и завершит поток
+    rec.cancel_token.cancel()
     logger.info("[job %s] Cancelled via API", job_id)
     return {"job_id": job_id, "status": JobStatus.cancelled}
 
@@ -373,6 +478,13 @@ def get_dp_report(job_id: str) -> Dict[str, Any]:
     return rec.dp_report or {}
 
 
+def _model_path_or_404(settings: Settings, model_id: str) -> Path:
+    model_path = find_model(settings.models_dir, model_id)
+    if model_path is None:
+        raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": f"Модель не найдена: {model_id}"})
+    return model_path
+
+
 # ── POST /models/{model_id}/sample ────────────────────────────────────────────
 
 @router.post(
@@ -383,24 +495,93 @@ def sample_from_model(
     model_id: str,
     body: SampleRequest,
     settings: Settings = Depends(get_settings),
+    cache: ModelCache = Depends(get_model_cache),
 ) -> Dict[str, Any]:
     from synthesizer.loader import load_generator
 
-    model_path = settings.models_dir / f"{model_id}.pkl"
-    if not model_path.exists():
-        raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": f"Модель не найдена: {model_id}"})
+    model_path = _model_path_or_404(settings, model_id)
+    out_job_id = body.job_id or str(uuid.uuid4())
+    synth_dir = settings.synth_dir / out_job_id
+    synth_dir.mkdir(parents=True, exist_ok=True)
+    synth_rel = f"synth/{out_job_id}/{artifact_name('synthetic', settings.artifact_format)}"
+    n_workers = body.n_workers if body.n_workers is not None else settings.sample_workers
+    if n_workers <= 0:
+        n_workers = os.cpu_count() or 1
 
+    seed = body.seed
     try:
-        generator = load_generator(str(model_path))
-        synth_df = generator.sample(body.n_rows)
+        # Пул процессов загружает модель сам; в текущем процессе — из кэша
+        generator = cache.get(model_id, model_path, load_generator) if n_workers == 1 else None
+        if n_workers > 1 or seed is not None:
+            # Шарды, каждый со своим seed-ом
+            if seed is None:
+                seed = new_seed()
+            rows = sample_parallel(
+                model_path,
+                body.n_rows,
+                settings.data_root / synth_rel,
+                seed=seed,
+                n_workers=n_workers,
+                shard_rows=settings.sample_shard_rows,
+                chunk_rows=settings.sample_chunk_rows,
+                generator=generator,
+            )
+        else:
+            # Генерация порциями прямо в файл; под блокировкой генератора —
+            # иначе она сдвигает ГСЧ параллельной seeded-генерации
+            with generator.sampling_lock():
+                rows = write_frames(
+                    generator.sample_iter(body.n_rows, settings.sample_chunk_rows),
+                    settings.data_root / synth_rel,
+                )
     except Exception as e:
         raise HTTPException(status_code=500, detail={"code": "SAMPLE_ERROR", "message": str(e)})
 
-    # Сохраняем результат
-    out_job_id = body.job_id or str(uuid.uuid4())
-    synth_dir = settings.synth_dir / out_job_id
-    synth_dir.mkdir(parents=True, exist_ok=True)
-    synth_rel = f"synth/{out_job_id}/synthetic.csv"
-    synth_df.to_csv(settings.data_root / synth_rel, index=False)
+    return {"synth_path": synth_rel, "rows": rows, "model_id": model_id, "seed": seed}
+
+
+# ── Кэш моделей ───────────────────────────────────────────────────────────────
+
+@router.post(
+    "/models/{model_id}/warm",
+    summary="Загрузить модель в кэш заранее",
+)
+def warm_model(
+    model_id: str,
+    settings: Settings = Depends(get_settings),
+    cache: ModelCache = Depends(get_model_cache),
+) -> Dict[str, Any]:
+    from synthesizer.loader import load_generator
+
+    model_path = _model_path_or_404(settings, model_id)
+    try:
+        cached = cache.warm(model_id, model_path, load_generator)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail={"code": "MODEL_LOAD_ERROR", "message": str(e)})
+    return {"model_id": model_id, "cached": cached}
+
+
+@router.delete(
+    "/models/{model_id}/cache",
+    summary="Выгрузить модель из кэша",
+)
+def evict_model(
+    model_id: str,
+    cache: ModelCache = Depends(get_model_cache),
+) -> Dict[str, Any]:
+    return {"model_id": model_id, "evicted": cache.evict(model_id)}
+
 
-    return {"synth_path": synth_rel, "rows": len(synth_df), "model_id": model_id}
+@router.get(
+    "/metrics",
+    summary="Статистика кэша моделей и очереди обучения",
+)
+def metrics(
+    cache: ModelCache = Depends(get_model_cache),
+    scheduler: JobScheduler = Depends(get_job_scheduler),
+    settings: Settings = Depends(get_settings),
+) -> Dict[str, Any]:
+    training = scheduler.stats()
+    if settings.train_process_isolation:
+        training["workers"] = get_worker_pool().stats()
+    return {"model_cache": cache.stats(), "training": training}
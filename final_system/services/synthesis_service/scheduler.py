@@ -0,0 +1,224 @@
+# services/synthesis_service/scheduler.py
+#
+# Планировщик джобов обучения: фиксированное число слотов и очередь с приоритетом.
+#
+# Раньше POST /jobs запускал отдельный поток на каждый джоб: пять параллельных
+# запусков — пять GAN в одном процессе, которые делят ядра (каждый torch-поток
+# по умолчанию занимает все intra-op потоки), GIL и память. Теперь:
+#   - одновременно обучаются не больше TRAIN_SLOTS джобов, остальные ждут
+#     в очереди со статусом queued;
+#   - очередь упорядочена по priority (больше — раньше), внутри приоритета — FIFO;
+#   - каждый слот ограничивает intra-op потоки torch своего потока
+#     (torch.set_num_threads действует на вызывающий поток при OpenMP-сборке):
+#     TRAIN_THREADS_PER_JOB, по умолчанию cpu_count // TRAIN_SLOTS — слоты
+#     не переподписывают ядра;
+#   - позиция в очереди и ETA считаются по средней длительности последних
+#     джобов того же generator_type (без истории — ETA нет).
+#
+# Отменённый в очереди джоб (DELETE /jobs/{id} → status=cancelled) слот
+# не занимает: при извлечении из очереди он пропускается.
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from services.synthesis_service.job_store import JobStatus, JobStore, job_store
+from services.synthesis_service.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних длительностей хранится на generator_type для ETA
+_HISTORY = 20
+
+
+@dataclass(order=True)
+class _QueueItem:
+    sort_key: Tuple[int, int]
+    job_id: str = field(compare=False)
+    kind: str = field(compare=False)
+    task: Callable[[], None] = field(compare=False)
+
+
+class JobScheduler:
+    """Очередь джобов с приоритетом и пулом из slots потоков-исполнителей."""
+
+    def __init__(
+        self,
+        slots: int,
+        threads_per_job: int = 0,
+        store: JobStore = job_store,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.slots = max(1, int(slots))
+        self.threads_per_job = (
+            threads_per_job if threads_per_job > 0
+            else max(1, (os.cpu_count() or 1) // self.slots)
+        )
+        self._store = store
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._heap: List[_QueueItem] = []
+        self._seq = itertools.count()
+        self._running: Dict[str, Tuple[str, float]] = {}   # job_id -> (kind, started)
+        self._durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=_HISTORY))
+        self._workers: List[threading.Thread] = []
+        self._stopped = False
+        self._completed = 0
+
+    # ── Постановка в очередь ──────────────────────────────────────────────────
+
+    def submit(
+        self,
+        job_id: str,
+        task: Callable[[], None],
+        priority: int = 0,
+        kind: str = "",
+    ) -> None:
+        """Ставит task в очередь; выполнится в свободном слоте."""
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Планировщик остановлен")
+            self._start_workers()
+            heapq.heappush(self._heap, _QueueItem((-priority, next(self._seq)), job_id, kind, task))
+            self._cond.notify()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Останавливает слоты; джобы из очереди не запускаются."""
+        with self._cond:
+            self._stopped = True
+            self._heap.clear()
+            self._cond.notify_all()
+        if wait:
+            for t in self._workers:
+                t.join()
+
+    # ── Позиция и ETA ─────────────────────────────────────────────────────────
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Позиция в очереди с 1; None — джоб не в очереди."""
+        with self._cond:
+            for i, item in enumerate(self._pending()):
+                if item.job_id == job_id:
+                    return i + 1
+        return None
+
+    def eta_seconds(self, job_id: str) -> Optional[float]:
+        """
+        Оценка времени до завершения джоба, с.
+
+        Слоты освобождаются по прогнозу для выполняющихся джобов (средняя
+        длительность минус уже прошедшее); затем джобы очереди по порядку
+        занимают ближайший свободный слот. None — нет истории длительностей
+        для джоба или кого-то перед ним.
+        """
+        with self._cond:
+            now = self._clock()
+            if job_id in self._running:
+                kind, started = self._running[job_id]
+                avg = self._avg(kind)
+                return None if avg is None else max(avg - (now - started), 0.0)
+
+            free_at: List[float] = []
+            for kind, started in self._running.values():
+                avg = self._avg(kind)
+                if avg is None:
+                    return None
+                free_at.append(max(avg - (now - started), 0.0))
+            free_at += [0.0] * (self.slots - len(free_at))
+            heapq.heapify(free_at)
+
+            for item in self._pending():
+                avg = self._avg(item.kind)
+                if avg is None:
+                    return None
+                done_at = heapq.heappop(free_at) + avg
+                if item.job_id == job_id:
+                    return done_at
+                heapq.heappush(free_at, done_at)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "threads_per_job": self.threads_per_job,
+                "running": len(self._running),
+                "queued": len(self._pending()),
+                "completed": self._completed,
+                "avg_duration_sec": {
+                    kind: round(self._avg(kind), 1) for kind in self._durations if self._durations[kind]
+                },
+            }
+
+    # ── Внутреннее ────────────────────────────────────────────────────────────
+
+    def _pending(self) -> List[_QueueItem]:
+        """Джобы очереди в порядке запуска (без отменённых). Под self._cond."""
+        return [item for item in sorted(self._heap) if self._is_queued(item.job_id)]
+
+    def _is_queued(self, job_id: str) -> bool:
+        rec = self._store.get(job_id)
+        return rec is not None and rec.status == JobStatus.queued
+
+    def _avg(self, kind: str) -> Optional[float]:
+        history = self._durations.get(kind)
+        return sum(history) / len(history) if history else None
+
+    def _start_workers(self) -> None:
+        while len(self._workers) < self.slots:
+            t = threading.Thread(
+                target=self._worker,
+                name=f"train-slot-{len(self._workers)}",
+                daemon=True,
+            )
+            self._workers.append(t)
+            t.start()
+
+    def _worker(self) -> None:
+        try:
+            import torch
+            torch.set_num_threads(self.threads_per_job)
+        except ImportError:
+            pass
+
+        while True:
+            with self._cond:
+                while not self._heap and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                item = heapq.heappop(self._heap)
+                if not self._is_queued(item.job_id):
+                    logger.info("[job %s] Skipped: not queued anymore", item.job_id)
+                    continue
+                self._running[item.job_id] = (item.kind, self._clock())
+
+            t0 = self._clock()
+            try:
+                item.task()
+            except Exception:
+                logger.exception("[job %s] Task raised", item.job_id)
+            finally:
+                duration = self._clock() - t0
+                with self._cond:
+                    self._running.pop(item.job_id, None)
+                    self._completed += 1
+                    # В историю ETA — только полностью отработавшие обучения
+                    rec = self._store.get(item.job_id)
+                    if rec is not None and rec.status == JobStatus.done:
+                        self._durations[item.kind].append(duration)
+
+
+@lru_cache
+def get_job_scheduler() -> JobScheduler:
+    settings = get_settings()
+    return JobScheduler(settings.train_slots, threads_per_job=settings.train_threads_per_job)
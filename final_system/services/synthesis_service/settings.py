@@ -7,6 +7,8 @@ from pathlib import Path
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from shared.artifacts import ArtifactFormat
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -17,6 +19,32 @@ class Settings(BaseSettings):
     )
 
     data_root: Path = Path("/data")
+    # Формат файлов синтетики (см. shared/artifacts.py)
+    artifact_format: ArtifactFormat = "csv"
+    # Размер порции потоковой генерации (BaseGenerator.sample_iter), строк
+    sample_chunk_rows: int = 100_000
+    # Процессы для POST /models/{id}/sample по умолчанию (1 = без пула, 0 = все ядра)
+    sample_workers: int = 1
+    # Размер шарда многопроцессной генерации, строк; от него (а не от числа
+    # процессов) зависит результат при фиксированном seed
+    sample_shard_rows: int = 100_000
+    # Бюджет in-process кэша загруженных генераторов (0 = кэш выключен)
+    model_cache_mb: int = 2048
+    # Модель, не использовавшаяся столько секунд, выгружается (0 = без TTL)
+    model_cache_ttl_sec: float = 1800
+    # Одновременно обучаемых джобов; остальные ждут в очереди (status=queued)
+    train_slots: int = 2
+    # Intra-op потоки torch на джоб (0 = cpu_count // train_slots)
+    train_threads_per_job: int = 0
+    # Обучение в дочерних процессах (training_worker.py); false — в потоке слота
+    train_process_isolation: bool = True
+    # Джобов на один процесс обучения, после — процесс перезапускается
+    # и отдаёт память ОС (1 = новый процесс на каждый джоб)
+    train_max_jobs_per_worker: int = 1
+    # Сколько ждать кооперативной отмены, прежде чем убить процесс, с
+    train_cancel_grace_sec: float = 30
+    # Период чекпоинтов обучения в эпохах (для джобов с checkpoint_key; 0 = выкл.)
+    checkpoint_every_epochs: int = 10
 
     @property
     def splits_dir(self) -> Path:
@@ -30,6 +58,10 @@ class Settings(BaseSettings):
     def models_dir(self) -> Path:
         return self.data_root / "models"
 
+    @property
+    def checkpoints_dir(self) -> Path:
+        return self.data_root / "checkpoints"
+
 
 @lru_cache
 def get_settings() -> Settings:
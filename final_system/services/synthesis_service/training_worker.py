@@ -0,0 +1,320 @@
+# services/synthesis_service/training_worker.py
+#
+# Обучение в дочерних процессах с переиспользованием и перезапуском.
+#
+# В процессе API память torch / SmartNoise / SDV после джоба в ОС не
+# возвращается (кэширующие аллокаторы, фрагментация кучи), RSS сервиса растёт
+# с каждым запуском; длинный fit к тому же держит GIL, пока API отвечает на
+# поллинг статуса. Поэтому слот планировщика (scheduler.py) не вызывает
+# _run_job сам, а отдаёт джоб своему WorkerProcess:
+#
+#   - дочерний процесс (spawn, как в parallel_sampling.py) выполняет джобы по
+#     одному и после TRAIN_MAX_JOBS_PER_WORKER джобов завершается — вся его
+#     память уходит в ОС; замена запускается сразу, импорт torch / SDV идёт,
+#     пока слот свободен;
+#   - статус, checkpoint_epoch, synth_path, model_id, dp_report и ошибка
+#     приходят в родитель через Pipe и пишутся в job_store — поллинг читает
+#     их из памяти API-процесса, не конкурируя с обучением за GIL;
+#   - отмена: родитель видит токен джоба и выставляет multiprocessing.Event,
+#     который в дочернем процессе служит CancellationToken для fit(); если
+#     процесс не завершил джоб за TRAIN_CANCEL_GRACE_SEC — он убивается;
+#   - процесс, упавший посреди джоба (OOM killer, segfault), помечает джоб
+#     failed; Gateway отправит его заново и обучение продолжится с чекпоинта.
+#
+# Протокол Pipe: родитель → (job_id, body, settings) или None (стоп);
+# дочерний → ("update", job_id, {поля JobRecord}) и ("finished", job_id).
+
+from __future__ import annotations
+
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, Optional
+
+from services.synthesis_service.job_store import JobStatus
+from shared.log_context import LOG_DATE_FORMAT, LOG_FORMAT, RunIdFormatter
+from shared.schemas.synthesis import JOB_ERROR_WORKER_CRASHED
+from synthesizer.training import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+# job_fn(job_id, body, settings, token, report) — выполняется в дочернем процессе;
+# report(**fields) передаёт обновления JobRecord родителю
+JobFn = Callable[..., None]
+
+# Как часто родитель проверяет токен отмены и жив ли процесс, с
+_POLL_SEC = 0.5
+
+
+# ── Дочерний процесс ──────────────────────────────────────────────────────────
+
+def _worker_init(threads: int, log_path: Optional[str]) -> None:
+    logging.basicConfig(
+        stream=sys.stdout,
+        level=logging.INFO,
+        format=LOG_FORMAT,
+        datefmt=LOG_DATE_FORMAT,
+        force=True,
+    )
+    root = logging.getLogger()
+    if log_path:
+        try:
+            root.addHandler(logging.FileHandler(log_path, mode="a", encoding="utf-8"))
+        except OSError as e:
+            logger.warning("Cannot open shared log %s: %s", log_path, e)
+    for h in root.handlers:
+        h.setFormatter(RunIdFormatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _worker_main(conn: Any, cancel_event: Any, job_fn: JobFn, threads: int, log_path: Optional[str]) -> None:
+    _worker_init(threads, log_path)
+    token = CancellationToken(cancel_event)
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        job_id, body, settings = msg
+
+        def report(**fields: Any) -> None:
+            conn.send(("update", job_id, fields))
+
+        try:
+            job_fn(job_id, body, settings, token, report)
+        finally:
+            conn.send(("finished", job_id))
+
+
+# ── Родитель ──────────────────────────────────────────────────────────────────
+
+class WorkerProcess:
+    """Один дочерний процесс обучения; run() блокирует поток слота до конца джоба."""
+
+    def __init__(
+        self,
+        job_fn: JobFn,
+        threads: int,
+        cancel_grace_sec: float = 30.0,
+        log_path: Optional[str] = None,
+    ) -> None:
+        ctx = get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._cancel = ctx.Event()
+        self._proc = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self._cancel, job_fn, threads, log_path),
+            name="synthesis-train-worker",
+            daemon=True,
+        )
+        self._proc.start()
+        child_conn.close()
+        self.cancel_grace_sec = cancel_grace_sec
+        self.jobs_done = 0
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._proc.pid
+
+    def is_alive(self) -> bool:
+        return self._proc.is_alive()
+
+    def run(
+        self,
+        job_id: str,
+        body: Any,
+        settings: Any,
+        token: CancellationToken,
+        update: Callable[..., Any],
+    ) -> None:
+        """
+        Выполняет джоб в дочернем процессе; обновления — через update(**fields).
+        Если процесс умер или убит по таймауту отмены, он больше не используется
+        (is_alive() == False).
+        """
+        self._cancel.clear()
+        self._conn.send((job_id, body, settings))
+        self.jobs_done += 1
+        cancel_sent: Optional[float] = None
+
+        while True:
+            if self._conn.poll(_POLL_SEC):
+                try:
+                    kind, _, *payload = self._conn.recv()
+                except EOFError:
+                    break
+                if kind == "finished":
+                    return
+                update(**payload[0])
+                continue
+
+            if not self._proc.is_alive():
+                break
+            if token.cancelled:
+                if cancel_sent is None:
+                    self._cancel.set()
+                    cancel_sent = time.monotonic()
+                elif time.monotonic() - cancel_sent > self.cancel_grace_sec:
+                    logger.warning(
+                        "[job %s] Worker pid=%s ignored cancel for %.0fs — killing",
+                        job_id, self.pid, self.cancel_grace_sec,
+                    )
+                    self.kill()
+                    return
+
+        # Процесс завершился, не закончив джоб
+        self._proc.join(timeout=5)
+        logger.error("[job %s] Worker pid=%s died: exitcode=%s", job_id, self.pid, self._proc.exitcode)
+        if not token.cancelled:
+            update(
+                status=JobStatus.failed,
+                error_message=f"Процесс обучения завершился аварийно (exitcode={self._proc.exitcode})",
+                error_code=JOB_ERROR_WORKER_CRASHED,
+                finished_at=datetime.now(timezone.utc),
+            )
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Штатное завершение: процесс выходит и отдаёт память ОС."""
+        if self._proc.is_alive():
+            try:
+                self._conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self._proc.join(timeout)
+        if self._proc.is_alive():
+            self.kill()
+        self._conn.close()
+
+    def kill(self) -> None:
+        self._proc.kill()
+        self._proc.join(timeout=5)
+
+
+class WorkerPool:
+    """
+    Процессы обучения для слотов планировщика: не больше size одновременно,
+    каждый выполняет до max_jobs_per_worker джобов, затем заменяется новым.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        job_fn: JobFn,
+        threads_per_job: int,
+        max_jobs_per_worker: int = 1,
+        cancel_grace_sec: float = 30.0,
+        log_path: Optional[str] = None,
+    ) -> None:
+        self.size = max(1, int(size))
+        self.max_jobs_per_worker = max(1, int(max_jobs_per_worker))
+        self._factory = lambda: WorkerProcess(
+            job_fn, threads_per_job, cancel_grace_sec=cancel_grace_sec, log_path=log_path,
+        )
+        self._idle: "queue.Queue[WorkerProcess]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._recycled = 0
+        self._crashed = 0     # умерли посреди джоба или убиты по таймауту отмены
+        self._busy: Dict[int, str] = {}   # pid -> job_id
+        self._closed = False
+
+    def run(
+        self,
+        job_id: str,
+        body: Any,
+        settings: Any,
+        token: CancellationToken,
+        update: Callable[..., Any],
+    ) -> None:
+        worker = self._acquire()
+        with self._lock:
+            self._busy[worker.pid] = job_id
+        try:
+            worker.run(job_id, body, settings, token, update)
+        finally:
+            with self._lock:
+                self._busy.pop(worker.pid, None)
+            self._release(worker)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "alive": self._created - self._recycled - self._crashed,
+                "max_jobs_per_worker": self.max_jobs_per_worker,
+                "recycled": self._recycled,
+                "crashed": self._crashed,
+                "busy": {str(pid): job_id for pid, job_id in self._busy.items()},
+            }
+
+    def _acquire(self) -> WorkerProcess:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created - self._recycled - self._crashed < self.size:
+                self._created += 1
+                return self._factory()
+        # Все процессы заняты: ждём освобождения (вызывающих не больше size)
+        return self._idle.get()
+
+    def _release(self, worker: WorkerProcess) -> None:
+        if worker.is_alive() and worker.jobs_done < self.max_jobs_per_worker:
+            self._idle.put(worker)
+            return
+        with self._lock:
+            if worker.is_alive():
+                self._recycled += 1
+            else:
+                self._crashed += 1
+            closed = self._closed
+        worker.stop()
+        logger.info("Training worker pid=%s retired after %d job(s)", worker.pid, worker.jobs_done)
+        if not closed:
+            # Замена стартует сразу: импорт torch / SDV — пока слот свободен
+            with self._lock:
+                self._created += 1
+            self._idle.put(self._factory())
+
+
+@lru_cache
+def get_worker_pool() -> WorkerPool:
+    from services.synthesis_service.router import _run_job
+    from services.synthesis_service.scheduler import get_job_scheduler
+    from services.synthesis_service.settings import get_settings
+
+    settings = get_settings()
+    scheduler = get_job_scheduler()
+    return WorkerPool(
+        size=scheduler.slots,
+        job_fn=_run_job,
+        threads_per_job=scheduler.threads_per_job,
+        max_jobs_per_worker=settings.train_max_jobs_per_worker,
+        cancel_grace_sec=settings.train_cancel_grace_sec,
+        log_path=str(settings.data_root / "logs" / "synthesis_service.log"),
+    )
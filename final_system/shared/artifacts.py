@@ -0,0 +1,214 @@
+# shared/artifacts.py
+#
+# Формат табличных артефактов на Shared Volume: train / holdout сплита
+# и синтетика. Используется: Data Service и Synthesis Service (пишут),
+# Evaluation Service и Gateway (читают).
+#
+# Формат определяется расширением файла:
+#   .csv      — текст, без типов; совместим с любым потребителем;
+#   .parquet  — колоночный, dictionary encoding для строк, сжатие zstd;
+#   .feather  — Arrow IPC, самое быстрое чтение, сжатие zstd.
+# Пишущий сервис выбирает формат настройкой ARTIFACT_FORMAT; читатели
+# по расширению понимают любой. Parquet и Feather требуют pyarrow.
+#
+# Использование:
+#   from shared.artifacts import artifact_name, find_artifact, read_frame, write_frame
+#
+#   write_frame(train_df, split_dir / artifact_name("train", settings.artifact_format))
+#   df = read_frame(find_artifact(split_dir, "train"))
+#
+#   # Потоковое чтение порциями (большая синтетика в Evaluation Service)
+#   for chunk in iter_frames(synth_path, chunk_rows=200_000): ...
+#
+#   # Потоковая запись порций (синтетика из generator.sample_iter)
+#   n_rows = write_frames(generator.sample_iter(n, chunk_rows), synth_path)
+#   concat_artifacts([part_0, part_1], synth_path)
+
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Union
+
+import pandas as pd
+
+ArtifactFormat = Literal["csv", "parquet", "feather"]
+
+ARTIFACT_SUFFIXES: Dict[str, str] = {
+    "csv":     ".csv",
+    "parquet": ".parquet",
+    "feather": ".feather",
+}
+
+MEDIA_TYPES: Dict[str, str] = {
+    "csv":     "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "feather": "application/vnd.apache.arrow.file",
+}
+
+PathLike = Union[str, Path]
+
+
+def artifact_format(path: PathLike) -> str:
+    """Формат артефакта по расширению файла."""
+    suffix = Path(path).suffix.lower()
+    for fmt, fmt_suffix in ARTIFACT_SUFFIXES.items():
+        if suffix == fmt_suffix:
+            return fmt
+    raise ValueError(f"Неизвестный формат артефакта: {path}")
+
+
+def artifact_name(stem: str, fmt: str) -> str:
+    """Имя файла артефакта: artifact_name("train", "parquet") → "train.parquet"."""
+    return stem + ARTIFACT_SUFFIXES[fmt]
+
+
+def find_artifact(directory: PathLike, stem: str) -> Optional[Path]:
+    """Существующий файл stem.{csv,parquet,feather} в directory (None — нет ни одного)."""
+    for suffix in ARTIFACT_SUFFIXES.values():
+        path = Path(directory) / (stem + suffix)
+        if path.exists():
+            return path
+    return None
+
+
+def check_engine(fmt: str) -> None:
+    """Проверка при старте сервиса: для Parquet / Feather нужен pyarrow."""
+    if fmt == "csv":
+        return
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            f"ARTIFACT_FORMAT={fmt} требует pyarrow: pip install pyarrow"
+        ) from e
+
+
+def read_frame(path: PathLike, **csv_kwargs: Any) -> pd.DataFrame:
+    """
+    DataFrame из артефакта любого формата.
+
+    csv_kwargs (na_values и т.п.) передаются только в read_csv: в Parquet
+    и Feather типы и пропуски уже сохранены.
+    """
+    fmt = artifact_format(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    if fmt == "feather":
+        return pd.read_feather(path)
+    return pd.read_csv(path, **csv_kwargs)
+
+
+def iter_frames(path: PathLike, chunk_rows: int = 100_000, **csv_kwargs: Any) -> Iterator[pd.DataFrame]:
+    """
+    Артефакт любого формата порциями: в памяти одна порция.
+
+    CSV и Parquet читаются порциями не больше chunk_rows строк; Feather —
+    по record batch (write_frames пишет batch на порцию генерации).
+    """
+    fmt = artifact_format(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    elif fmt == "feather":
+        import pyarrow as pa
+
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i).to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, **csv_kwargs)
+
+
+def write_frame(df: pd.DataFrame, path: PathLike) -> None:
+    """Запись DataFrame в формате, заданном расширением path (индекс не сохраняется)."""
+    fmt = artifact_format(path)
+    if fmt == "parquet":
+        df.to_parquet(path, index=False, compression="zstd", use_dictionary=True)
+    elif fmt == "feather":
+        # Feather хранит только RangeIndex
+        df.reset_index(drop=True).to_feather(path, compression="zstd")
+    else:
+        df.to_csv(path, index=False)
+
+
+def write_frames(chunks: Iterable[pd.DataFrame], path: PathLike) -> int:
+    """
+    Потоковая запись последовательности DataFrame с одинаковыми колонками
+    в один файл; возвращает число записанных строк.
+
+    В памяти держится только текущая порция: CSV дописывается построчно,
+    Parquet — по row group на порцию, Feather — по record batch на порцию.
+    Схема Parquet / Feather фиксируется по первой порции.
+    """
+    fmt = artifact_format(path)
+    n_rows = 0
+    if fmt == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, header=i == 0, index=False)
+                n_rows += len(chunk)
+        return n_rows
+
+    import pyarrow as pa
+
+    writer: Any = None
+    schema: Any = None
+    try:
+        for chunk in chunks:
+            if schema is None:
+                schema = _stream_schema(pa.Schema.from_pandas(chunk, preserve_index=False))
+                writer = _open_arrow_writer(fmt, path, schema)
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            writer.write_table(table)
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        # Пустой поток — пустой файл корректного формата
+        write_frame(pd.DataFrame(), path)
+    return n_rows
+
+
+def concat_artifacts(parts: List[Path], path: PathLike) -> None:
+    """
+    Склеивает файлы-части одного формата в path в порядке parts.
+
+    CSV склеивается побайтно (заголовок берётся из первой части) — значения
+    не перепарсиваются; Parquet / Feather — потоково через write_frames,
+    в памяти одна часть.
+    """
+    if artifact_format(path) == "csv":
+        with open(path, "wb") as out:
+            for i, part in enumerate(parts):
+                with open(part, "rb") as f:
+                    if i > 0:
+                        f.readline()
+                    shutil.copyfileobj(f, out)
+        return
+    write_frames((read_frame(part) for part in parts), path)
+
+
+def _stream_schema(schema: Any) -> Any:
+    """Колонка из одних пропусков в первой порции имеет тип null — расширяем до string."""
+    import pyarrow as pa
+
+    return pa.schema([
+        pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+        for f in schema
+    ])
+
+
+def _open_arrow_writer(fmt: str, path: PathLike, schema: Any) -> Any:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == "parquet":
+        return pq.ParquetWriter(str(path), schema, compression="zstd", use_dictionary=True)
+    return pa.ipc.new_file(
+        str(path), schema, options=pa.ipc.IpcWriteOptions(compression="zstd"),
+    )
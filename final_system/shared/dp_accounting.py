@@ -0,0 +1,306 @@
+# shared/dp_accounting.py
+#
+# Аналитический RDP-accountant для DP-SGD (Sampled Gaussian Mechanism).
+# Используется: synthesizer (DPCTGANGenerator.estimate_max_epochs, DP-TVAE —
+# кривая ε по эпохам) и Gateway (предварительная проверка бюджета до постановки
+# запуска в очередь: GET /configs/{name}/privacy-budget, POST /runs).
+#
+# Повторяет accountant Opacus 0.14 (opacus/privacy_analysis.py, по TF Privacy),
+# которым SmartNoise DPCTGAN и DP-TVAE считают расход бюджета во время обучения:
+#   RDP одного шага SGM — Mironov et al., «Rényi DP of the Sampled Gaussian
+#   Mechanism», 2019 (раздел 3.3); за steps шагов RDP складывается линейно;
+#   перевод RDP → (ε, δ) — Balle et al., 2020 (теорема 21), минимум по порядкам α.
+# Поэтому ε совпадает с тем, что печатает privacy engine при обучении, но
+# считается за миллисекунды, без torch / opacus / scipy (только numpy и math).
+#
+# Использование:
+#   from shared.dp_accounting import dpctgan_steps_per_epoch, epsilon_curve, max_epochs
+#
+#   steps = dpctgan_steps_per_epoch(n_rows, batch_size, loss)
+#   max_epochs(n_rows, batch_size, sigma, delta, epsilon=2.5, steps_per_epoch=steps)
+#   epsilon_curve(n_rows, batch_size, sigma, delta, epochs=300, steps_per_epoch=steps)
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Порядки α, с которыми SmartNoise DPCTGAN и DP-TVAE создают PrivacyEngine
+DEFAULT_ORDERS: Tuple[float, ...] = tuple(
+    [1 + x / 10.0 for x in range(1, 100)] + list(range(12, 64))
+)
+
+
+def default_delta(n_rows: int) -> float:
+    """δ по умолчанию, как в генераторах: 1 / (n · √n)."""
+    return 1.0 / (n_rows * math.sqrt(n_rows))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# RDP Sampled Gaussian Mechanism
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _log_add(logx: float, logy: float) -> float:
+    a, b = min(logx, logy), max(logx, logy)
+    if a == -math.inf:
+        return b
+    return math.log1p(math.exp(a - b)) + b
+
+
+def _log_sub(logx: float, logy: float) -> float:
+    if logx < logy:
+        raise ValueError("Разность в лог-пространстве должна быть неотрицательной.")
+    if logy == -math.inf:
+        return logx
+    if logx == logy:
+        return -math.inf
+    try:
+        return math.log(math.expm1(logx - logy)) + logy
+    except OverflowError:
+        return logx
+
+
+def _log_erfc(x: float) -> float:
+    """log(erfc(x)), устойчиво при больших x (erfc(x) < 1e-300 при x > 26)."""
+    if x < 25.0:
+        return math.log(math.erfc(x))
+    # Асимптотический ряд erfc(x) ≈ exp(-x²) / (x√π) · (1 - 1/(2x²) + 3/(4x⁴) - 15/(8x⁶))
+    r = 1.0 / (x * x)
+    return (
+        -x * x - math.log(x) - 0.5 * math.log(math.pi)
+        + math.log1p(-0.5 * r + 0.75 * r * r - 1.875 * r * r * r)
+    )
+
+
+def _log_a_int(q: float, sigma: float, alpha: int) -> float:
+    log_a = -math.inf
+    for i in range(alpha + 1):
+        log_coef = (
+            math.lgamma(alpha + 1) - math.lgamma(i + 1) - math.lgamma(alpha - i + 1)
+            + i * math.log(q) + (alpha - i) * math.log(1 - q)
+        )
+        log_a = _log_add(log_a, log_coef + (i * i - i) / (2 * sigma ** 2))
+    return log_a
+
+
+def _log_a_frac(q: float, sigma: float, alpha: float) -> float:
+    # Интегралы по (-inf, z0] и [z0, +inf) — в лог-пространстве
+    log_a0, log_a1 = -math.inf, -math.inf
+    z0 = sigma ** 2 * math.log(1 / q - 1) + 0.5
+    # Биномиальный коэффициент C(α, i) для дробного α: знак и log|C| рекуррентно
+    log_coef, sign = 0.0, 1.0
+    i = 0
+    while True:
+        j = alpha - i
+        log_t0 = log_coef + i * math.log(q) + j * math.log(1 - q)
+        log_t1 = log_coef + j * math.log(q) + i * math.log(1 - q)
+        log_e0 = math.log(0.5) + _log_erfc((i - z0) / (math.sqrt(2) * sigma))
+        log_e1 = math.log(0.5) + _log_erfc((z0 - j) / (math.sqrt(2) * sigma))
+        log_s0 = log_t0 + (i * i - i) / (2 * sigma ** 2) + log_e0
+        log_s1 = log_t1 + (j * j - j) / (2 * sigma ** 2) + log_e1
+        if sign > 0:
+            log_a0 = _log_add(log_a0, log_s0)
+            log_a1 = _log_add(log_a1, log_s1)
+        else:
+            log_a0 = _log_sub(log_a0, log_s0)
+            log_a1 = _log_sub(log_a1, log_s1)
+        if max(log_s0, log_s1) < -30:
+            break
+        log_coef += math.log(abs(alpha - i)) - math.log(i + 1)
+        if alpha - i < 0:
+            sign = -sign
+        i += 1
+    return _log_add(log_a0, log_a1)
+
+
+def _rdp_step(q: float, sigma: float, alpha: float) -> float:
+    if q == 0:
+        return 0.0
+    if sigma == 0:
+        return math.inf
+    if q == 1.0:
+        return alpha / (2 * sigma ** 2)
+    if float(alpha).is_integer():
+        log_a = _log_a_int(q, sigma, int(alpha))
+    else:
+        log_a = _log_a_frac(q, sigma, alpha)
+    return log_a / (alpha - 1)
+
+
+def compute_rdp(
+    q: float,
+    sigma: float,
+    steps: int,
+    orders: Sequence[float] = DEFAULT_ORDERS,
+) -> np.ndarray:
+    """RDP SGM с долей выборки q и noise multiplier sigma за steps шагов по порядкам orders."""
+    if not 0.0 <= q <= 1.0:
+        raise ValueError(f"q должна быть в [0, 1], получено: {q}")
+    if sigma < 0:
+        raise ValueError(f"sigma должна быть >= 0, получено: {sigma}")
+    return np.array([_rdp_step(q, sigma, float(a)) for a in orders]) * steps
+
+
+def rdp_to_epsilon(
+    orders: Sequence[float],
+    rdp: np.ndarray,
+    delta: float,
+) -> Tuple[float, float]:
+    """(ε, лучший α) по RDP для заданного δ (Balle et al., 2020, как в Opacus 0.14)."""
+    if not 0.0 < delta < 1.0:
+        raise ValueError(f"delta должна быть в (0, 1), получено: {delta}")
+    orders_vec = np.asarray(orders, dtype=float)
+    eps = _epsilon_by_order(orders_vec, np.asarray(rdp, dtype=float), delta)
+    if np.isnan(eps).all():
+        return math.inf, math.nan
+    idx = int(np.nanargmin(eps))
+    return float(eps[idx]), float(orders_vec[idx])
+
+
+def _epsilon_offset(orders: np.ndarray, delta: float) -> np.ndarray:
+    # ε_α = rdp_α + offset_α
+    return -(np.log(delta) + np.log(orders)) / (orders - 1) + np.log((orders - 1) / orders)
+
+
+def _epsilon_by_order(orders: np.ndarray, rdp: np.ndarray, delta: float) -> np.ndarray:
+    with np.errstate(invalid="ignore"):
+        return rdp + _epsilon_offset(orders, delta)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Расписание DP-SGD генераторов системы
+# ──────────────────────────────────────────────────────────────────────────────
+
+def sample_rate(n_rows: int, batch_size: int) -> float:
+    """Доля выборки q = batch_size / n_rows (как PrivacyEngine(batch_size, sample_size))."""
+    if n_rows <= 0 or batch_size <= 0:
+        raise ValueError("n_rows и batch_size должны быть положительными.")
+    return min(1.0, batch_size / n_rows)
+
+
+def dpctgan_steps_per_epoch(n_rows: int, batch_size: int, loss: str = "cross_entropy") -> int:
+    """
+    Шаги privacy engine за эпоху SmartNoise DPCTGAN 1.0.x: max(n // batch, 1) батчей;
+    при loss="cross_entropy" дискриминатор делает два optimizer.step() на батч
+    (fake и real), при "wasserstein" — один.
+    """
+    batches = max(n_rows // batch_size, 1)
+    return batches * (2 if loss == "cross_entropy" else 1)
+
+
+def dptvae_steps_per_epoch(n_rows: int, batch_size: int) -> int:
+    """Шаги за эпоху DP-TVAE: DataLoader с drop_last=False — ceil(n / batch)."""
+    return math.ceil(n_rows / batch_size)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Кривая ε и максимум эпох
+# ──────────────────────────────────────────────────────────────────────────────
+
+def epsilon_curve(
+    n_rows: int,
+    batch_size: int,
+    sigma: float,
+    delta: float,
+    epochs: int,
+    steps_per_epoch: int,
+    orders: Sequence[float] = DEFAULT_ORDERS,
+) -> List[Tuple[int, float]]:
+    """Потраченный ε после каждой эпохи 1..epochs: [(epoch, epsilon), ...]."""
+    if epochs <= 0:
+        return []
+    orders_vec = np.asarray(orders, dtype=float)
+    step = compute_rdp(sample_rate(n_rows, batch_size), sigma, 1, orders_vec)
+    steps = np.arange(1, epochs + 1, dtype=float)[:, None] * steps_per_epoch
+    with np.errstate(invalid="ignore"):
+        eps = np.nanmin(steps * step + _epsilon_offset(orders_vec, delta), axis=1)
+    return [(int(e), float(v)) for e, v in zip(range(1, epochs + 1), eps)]
+
+
+def max_epochs(
+    n_rows: int,
+    batch_size: int,
+    sigma: float,
+    delta: float,
+    epsilon: float,
+    steps_per_epoch: int,
+    orders: Sequence[float] = DEFAULT_ORDERS,
+) -> int:
+    """
+    Наибольшее число эпох k, при котором потраченный ε не превышает epsilon.
+
+    ε_α(k) = k · steps · rdp_α + offset_α линейна по k для каждого α, а ε(k) —
+    минимум по α; поэтому k = max_α floor((epsilon - offset_α) / (steps · rdp_α)).
+    """
+    orders_vec = np.asarray(orders, dtype=float)
+    step = compute_rdp(sample_rate(n_rows, batch_size), sigma, steps_per_epoch, orders_vec)
+    offset = _epsilon_offset(orders_vec, delta)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bound = (epsilon - offset) / step
+    bound = bound[np.isfinite(bound) & (bound >= 0)]
+    k = int(np.floor(bound.max())) if bound.size else 0
+
+    # Защита от ошибок округления на границе
+    def spent(epochs: int) -> float:
+        return rdp_to_epsilon(orders_vec, step * epochs, delta)[0]
+
+    while k > 0 and spent(k) > epsilon:
+        k -= 1
+    while spent(k + 1) <= epsilon:
+        k += 1
+    return k
+
+
+@dataclass
+class BudgetEstimate:
+    """Предварительная оценка расхода DP-бюджета для расписания DP-SGD."""
+    n_rows: int
+    batch_size: int
+    sigma: float
+    delta: float
+    sample_rate: float
+    steps_per_epoch: int
+    epochs_requested: int
+    epsilon_at_requested: float
+    epsilon_budget: Optional[float] = None
+    max_epochs: Optional[int] = None        # None — бюджет не задан
+    epsilon_curve: List[Tuple[int, float]] = field(default_factory=list)
+
+    @property
+    def within_budget(self) -> Optional[bool]:
+        if self.epsilon_budget is None:
+            return None
+        return self.epsilon_at_requested <= self.epsilon_budget
+
+
+def estimate_budget(
+    n_rows: int,
+    batch_size: int,
+    sigma: float,
+    epochs: int,
+    steps_per_epoch: int,
+    delta: Optional[float] = None,
+    epsilon_budget: Optional[float] = None,
+) -> BudgetEstimate:
+    """Кривая ε, ε для запрошенного числа эпох и (если задан бюджет) максимум эпох."""
+    delta = default_delta(n_rows) if delta is None else delta
+    curve = epsilon_curve(n_rows, batch_size, sigma, delta, epochs, steps_per_epoch)
+    return BudgetEstimate(
+        n_rows=n_rows,
+        batch_size=batch_size,
+        sigma=sigma,
+        delta=delta,
+        sample_rate=sample_rate(n_rows, batch_size),
+        steps_per_epoch=steps_per_epoch,
+        epochs_requested=epochs,
+        epsilon_at_requested=curve[-1][1] if curve else 0.0,
+        epsilon_budget=epsilon_budget,
+        max_epochs=(
+            max_epochs(n_rows, batch_size, sigma, delta, epsilon_budget, steps_per_epoch)
+            if epsilon_budget is not None else None
+        ),
+        epsilon_curve=curve,
+    )
@@ -0,0 +1,37 @@
+# shared/model_files.py
+#
+# Файлы моделей на Shared Volume: models/{model_id}.<ext> + {model_id}.meta.json.
+# Используется: Synthesis Service (пишет, загружает) и Gateway (листинг,
+# удаление; метаданные — только из сайдкара, без импорта synthesizer).
+#
+# Расширение задаёт генератор (BaseGenerator.MODEL_SUFFIX):
+#   .model — формат без pickle (synthesizer/model_format.py), DP-TVAE;
+#   .pkl   — pickle, остальные генераторы и модели, сохранённые раньше.
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Optional, Union
+
+MODEL_SUFFIXES = (".model", ".pkl")
+
+PathLike = Union[str, Path]
+
+
+def find_model(models_dir: PathLike, model_id: str) -> Optional[Path]:
+    """Существующий файл модели model_id (None — нет ни одного)."""
+    for suffix in MODEL_SUFFIXES:
+        path = Path(models_dir) / (model_id + suffix)
+        if path.exists():
+            return path
+    return None
+
+
+def list_models(models_dir: PathLike) -> List[Path]:
+    """Все файлы моделей в models_dir."""
+    return [p for suffix in MODEL_SUFFIXES for p in Path(models_dir).glob(f"*{suffix}")]
+
+
+def sidecar_path(model_path: PathLike) -> Path:
+    """{model_id}.meta.json рядом с файлом модели."""
+    return Path(model_path).with_suffix(".meta.json")
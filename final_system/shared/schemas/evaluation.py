@@ -1,43 +1,89 @@
 # shared/schemas/evaluation.py
 #
-# Контракт Evaluation Service: запросы на оценку приватности и полезности.
+# Контракт Evaluation Service: запросы на оценку приватности, полезности
+# и совместную оценку (POST /evaluate/all).
 # Используется: Evaluation Service (потребляет), Gateway (отправляет).
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel
 
 
-class PrivacyEvalRequest(BaseModel):
+class PrivacyEvalOptions(BaseModel):
     """
-    Тело запроса POST /evaluate/privacy.
+    Параметры оценки приватности (без ссылок на данные).
 
-    split_id используется для поиска train.csv и holdout.csv на Shared Volume.
-    synth_path — путь к synthetic.csv на Shared Volume (относительно data_root).
-    dp_report  — DP-отчёт от генератора (опционально; нужен для dp_guarantees секции).
     quasi_identifiers и sensitive_attribute нужны для k/l/t-анонимности;
     если не указаны — классические метрики пропускаются.
+    nn_backend и distance_encoding — режим поиска соседей для DCR/NNDR
+    (см. evaluator/privacy/neighbors.py и feature_space.py).
+    distance_reference_size — подвыборка эталонного train-сета DCR/NNDR (None = весь train).
+    distance_approximate — IVF-поиск по всей синтетике с оценкой recall в отчёте.
+    mia_method="exact" — точный AUC атаки по отсортированным расстояниям
+    (см. evaluator/privacy/attack_simulation.py).
+    """
+    quasi_identifiers: List[str] = []
+    sensitive_attribute: Optional[str] = None
+    nn_backend: Literal["auto", "tree", "gemm"] = "auto"
+    distance_encoding: Literal["onehot", "codes"] = "onehot"
+    distance_reference_size: Optional[int] = None
+    distance_approximate: bool = False
+    ann_n_probe: int = 8
+    n_workers: Optional[int] = None   # None = PRIVACY_WORKERS сервиса
+    mia_method: Literal["forest", "exact"] = "forest"
+    mia_sample_size: Optional[int] = 1000   # None = все записи train/holdout
+    mia_n_bootstrap: int = 200
+
+
+class PrivacyEvalRequest(PrivacyEvalOptions):
+    """
+    Тело запроса POST /evaluate/privacy.
+
+    split_id используется для поиска train и holdout сплита на Shared Volume.
+    synth_path — путь к синтетике на Shared Volume (относительно data_root);
+    формат (CSV / Parquet / Feather) определяется расширением.
+    dp_report  — DP-отчёт от генератора (опционально; нужен для dp_guarantees секции).
+    Параметры оценки — см. PrivacyEvalOptions.
     """
     split_id: str
     synth_path: str
     dp_report: Optional[Dict[str, Any]] = None
-    quasi_identifiers: List[str] = []
-    sensitive_attribute: Optional[str] = None
     run_id: Optional[str] = None
 
 
-class UtilityEvalRequest(BaseModel):
+class UtilityEvalOptions(BaseModel):
     """
-    Тело запроса POST /evaluate/utility.
+    Параметры оценки полезности (без ссылок на данные).
 
     Схема колонок передаётся явно, т.к. Evaluation Service не знает о конфиге —
     он получает только данные и задание.
     """
-    split_id: str
-    synth_path: str
     target_column: str
     categorical_columns: List[str]
     continuous_columns: List[str]
+    # Модель TRTR/TSTR: RandomForest или HistGradientBoosting на кодах категорий
+    ml_model: Literal["random_forest", "hist_gradient_boosting"] = "random_forest"
+
+
+class UtilityEvalRequest(UtilityEvalOptions):
+    """Тело запроса POST /evaluate/utility. Параметры — см. UtilityEvalOptions."""
+    split_id: str
+    synth_path: str
+    run_id: Optional[str] = None
+
+
+class FullEvalRequest(BaseModel):
+    """
+    Тело запроса POST /evaluate/all.
+
+    train, holdout и синтетика читаются один раз и передаются обоим
+    оценщикам; приватность и полезность считаются параллельно.
+    """
+    split_id: str
+    synth_path: str
+    dp_report: Optional[Dict[str, Any]] = None
+    privacy: PrivacyEvalOptions = PrivacyEvalOptions()
+    utility: UtilityEvalOptions
     run_id: Optional[str] = None
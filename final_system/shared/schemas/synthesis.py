@@ -9,14 +9,21 @@ from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class JobStatus(str, Enum):
-    queued  = "queued"
-    running = "running"
-    done    = "done"
-    failed  = "failed"
+    queued    = "queued"
+    running   = "running"
+    done      = "done"
+    failed    = "failed"
+    cancelled = "cancelled"
+
+
+# error_code джоба, упавшего из-за аварийного завершения процесса обучения
+# (OOM-killer, segfault) — а не из-за ошибки в данных или конфиге. Такой джоб
+# Gateway отправляет повторно (с checkpoint_key — с последнего чекпоинта).
+JOB_ERROR_WORKER_CRASHED = "WORKER_CRASHED"
 
 
 class SynthesisJobCreate(BaseModel):
@@ -32,12 +39,22 @@ class SynthesisJobCreate(BaseModel):
     save_model: bool = False
     run_id: Optional[str] = None          # gateway run_id — сохраняется в metadata модели
     dataset_name: Optional[str] = None    # имя датасета — сохраняется в metadata модели
+    # Ключ чекпоинта обучения (checkpoints/{key}.ckpt). Повторный POST /jobs
+    # с тем же ключом после сбоя продолжает обучение с последнего чекпоинта.
+    checkpoint_key: Optional[str] = Field(default=None, pattern=r"^[A-Za-z0-9_.-]+$")
+    # Приоритет в очереди обучения: больше — раньше; при равном — FIFO
+    priority: int = 0
 
 
 class SampleRequest(BaseModel):
     """Тело запроса POST /models/{model_id}/sample."""
     n_rows: int
     job_id: Optional[str] = None   # если задан — synth сохраняется в synth/{job_id}/
+    # Шардированная генерация в n_workers процессах (None = SAMPLE_WORKERS
+    # сервиса, 0 = все ядра). При заданном seed результат воспроизводим
+    # и не зависит от n_workers.
+    n_workers: Optional[int] = None
+    seed: Optional[int] = None
 
 
 class SynthesisJobSummary(BaseModel):
@@ -47,6 +64,12 @@ class SynthesisJobSummary(BaseModel):
     synth_path и model_id заполняются после завершения (status=done).
     dp_report содержит DP-конфиг и потраченный epsilon — нужен Evaluation
     и Reporting сервисам.
+    error_code — машинный код причины status=failed (JOB_ERROR_WORKER_CRASHED —
+    процесс обучения завершился аварийно); None для ошибок самого обучения.
+    checkpoint_epoch — эпоха последнего записанного чекпоинта (если задан checkpoint_key).
+    queue_position (с 1) — пока status=queued; eta_seconds — оценка времени до
+    завершения по средней длительности джобов того же generator_type
+    (None, пока истории нет).
     """
     job_id: str
     status: JobStatus
@@ -54,6 +77,10 @@ class SynthesisJobSummary(BaseModel):
     synth_path: Optional[str] = None    # путь на Shared Volume
     dp_report: Optional[Dict[str, Any]] = None
     error_message: Optional[str] = None
+    error_code: Optional[str] = None
+    checkpoint_epoch: Optional[int] = None
+    queue_position: Optional[int] = None
+    eta_seconds: Optional[float] = None
     created_at: datetime
     started_at: Optional[datetime] = None
     finished_at: Optional[datetime] = None
@@ -3,23 +3,36 @@
 # Публичный API модуля synthesizer.
 # Импортируйте отсюда для удобства:
 #   from synthesizer import DPCTGANGenerator, DPTVAEGenerator, load_generator
+#
+# Имена импортируются лениво (PEP 562): `from synthesizer.loader import
+# load_generator` и загрузка DP-TVAE не тянут snsynth / sdv, пока не нужен
+# соответствующий генератор.
+
+from __future__ import annotations
+
+import importlib
+from typing import Any
+
+_EXPORTS = {
+    "BaseGenerator":      "synthesizer.base",
+    "DPCTGANConfig":      "synthesizer.dp_ctgan",
+    "DPCTGANGenerator":   "synthesizer.dp_ctgan",
+    "DPTVAEConfig":       "synthesizer.dp_tvae",
+    "DPTVAEGenerator":    "synthesizer.dp_tvae",
+    "CTGANConfig":        "synthesizer.sdv_generators",
+    "CTGANGenerator":     "synthesizer.sdv_generators",
+    "TVAEConfig":         "synthesizer.sdv_generators",
+    "TVAEGenerator":      "synthesizer.sdv_generators",
+    "CopulaGANConfig":    "synthesizer.sdv_generators",
+    "CopulaGANGenerator": "synthesizer.sdv_generators",
+    "load_generator":     "synthesizer.loader",
+}
+
+__all__ = list(_EXPORTS)
 
-from synthesizer.base import BaseGenerator
-from synthesizer.dp_ctgan import DPCTGANConfig, DPCTGANGenerator
-from synthesizer.dp_tvae import DPTVAEConfig, DPTVAEGenerator
-from synthesizer.sdv_generators import (
-    CTGANConfig, CTGANGenerator,
-    TVAEConfig, TVAEGenerator,
-    CopulaGANConfig, CopulaGANGenerator,
-)
-from synthesizer.loader import load_generator
 
-__all__ = [
-    "BaseGenerator",
-    "DPCTGANConfig", "DPCTGANGenerator",
-    "DPTVAEConfig",  "DPTVAEGenerator",
-    "CTGANConfig",   "CTGANGenerator",
-    "TVAEConfig",    "TVAEGenerator",
-    "CopulaGANConfig", "CopulaGANGenerator",
-    "load_generator",
-]
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'synthesizer' has no attribute {name!r}")
+    return getattr(importlib.import_module(module), name)
@@ -7,11 +7,22 @@
 from __future__ import annotations
 
 import pickle
+import threading
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
 
 import pandas as pd
 
+if TYPE_CHECKING:
+    from synthesizer.training import TrainingHooks
+
+# Размер порции sample_iter по умолчанию
+DEFAULT_SAMPLE_CHUNK_ROWS = 100_000
+
+# Генераторы, сэмплирующие из глобальных ГСЧ процесса, делят одну блокировку
+_GLOBAL_RNG_LOCK = threading.RLock()
+_INSTANCE_LOCK_GUARD = threading.Lock()
+
 
 class BaseGenerator(ABC):
     """
@@ -20,22 +31,38 @@ class BaseGenerator(ABC):
     Минимальный публичный контракт:
         fit()            -- обучение на реальных данных
         sample()         -- генерация синтетических строк
+        sample_iter()    -- та же генерация порциями (потоковая запись, постоянная память)
+        reseed()         -- сброс ГСЧ, из которого сэмплирует генератор
+        sampling_lock()  -- блокировка на время reseed() + sample_iter() в процессе сервиса
         privacy_report() -- отчёт о параметрах и DP-бюджете (если применимо)
         save() / load()  -- сериализация / десериализация модели
 
     Метод estimate_max_epochs() имеет дефолтную реализацию (None), т.к.
     он специфичен только для DP-генераторов. Переопределяется в DPCTGANGenerator
     и DPTVAEGenerator.
+
+    MODEL_SUFFIX — расширение файла, который пишет save(): ".pkl" (pickle)
+    или ".model" (формат без pickle, см. synthesizer/model_format.py).
     """
 
+    MODEL_SUFFIX = ".pkl"
+
     @abstractmethod
     def fit(
         self,
         data: pd.DataFrame,
         categorical_columns: Optional[List[str]] = None,
         continuous_columns: Optional[List[str]] = None,
+        hooks: Optional["TrainingHooks"] = None,
     ) -> None:
-        """Обучает генератор на реальных данных."""
+        """
+        Обучает генератор на реальных данных.
+
+        hooks — отмена и чекпоинты (synthesizer/training.py). Отмена
+        обязательна для всех генераторов: fit() бросает TrainingCancelled не
+        позже конца текущей эпохи. Чекпоинты — там, где генератор владеет
+        циклом обучения (DP-TVAE); остальные их игнорируют.
+        """
         ...
 
     @abstractmethod
@@ -43,6 +70,53 @@ class BaseGenerator(ABC):
         """Генерирует n_rows синтетических строк."""
         ...
 
+    def sample_iter(
+        self,
+        n_rows: int,
+        chunk_rows: int = DEFAULT_SAMPLE_CHUNK_ROWS,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Генерирует n_rows строк порциями не больше chunk_rows.
+
+        В памяти одновременно находится только текущая порция: вызывающий код
+        пишет её на диск и переходит к следующей. Дефолтная реализация
+        вызывает sample() на каждую порцию — генераторы сэмплируют строки
+        независимо, поэтому распределение не отличается от sample(n_rows).
+        """
+        if n_rows <= 0:
+            raise ValueError("n_rows должен быть положительным.")
+        if chunk_rows <= 0:
+            raise ValueError("chunk_rows должен быть положительным.")
+        remaining = n_rows
+        while remaining > 0:
+            chunk = self.sample(min(chunk_rows, remaining))
+            if chunk.empty:
+                raise RuntimeError(f"{type(self).__name__}.sample() вернул пустую порцию")
+            remaining -= len(chunk)
+            yield chunk
+
+    def reseed(self, seed: int) -> None:
+        """
+        Сбрасывает ГСЧ, из которого сэмплирует генератор: после reseed(seed)
+        sample_iter() выдаёт одни и те же строки в любом процессе.
+
+        Дефолт — глобальные random / numpy / torch (DP-TVAE, DPCTGAN).
+        Генераторы со своим ГСЧ (SDV) переопределяют метод.
+        """
+        from synthesizer.training import seed_rng
+        seed_rng(seed)
+
+    def sampling_lock(self) -> threading.RLock:
+        """
+        Блокировка, под которой генерация в процессе сервиса не перемежается
+        с другой генерацией, двигающей тот же ГСЧ.
+
+        Дефолт — одна на процесс: глобальные ГСЧ общие для всех генераторов,
+        которые из них сэмплируют. Генераторы со своим ГСЧ возвращают
+        _instance_lock().
+        """
+        return _GLOBAL_RNG_LOCK
+
     def privacy_report(self) -> Dict[str, Any]:
         """
         Возвращает отчёт о параметрах и расходе DP-бюджета.
@@ -62,7 +136,7 @@ class BaseGenerator(ABC):
         probe_epochs: int = 5,
     ) -> Optional[int]:
         """
-        Оценка максимального числа эпох по DP-бюджету через dry run.
+        Оценка максимального числа эпох по DP-бюджету.
         Для non-DP генераторов всегда возвращает None (нет ограничения по бюджету).
         """
         return None
@@ -90,6 +164,14 @@ class BaseGenerator(ABC):
             self._extra_metadata: Dict[str, Any] = {}
         self._extra_metadata.update(kwargs)
 
+    def _instance_lock(self) -> threading.RLock:
+        """Блокировка этого экземпляра (создаётся при первом обращении)."""
+        with _INSTANCE_LOCK_GUARD:
+            lock = self.__dict__.get("_sampling_lock")
+            if lock is None:
+                lock = self._sampling_lock = threading.RLock()
+            return lock
+
     def _pickle_save(self, path: str, payload: Dict[str, Any]) -> None:
         """Сохраняет payload через pickle. Проверяет, что модель обучена.
 
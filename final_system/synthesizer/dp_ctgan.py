@@ -28,7 +28,9 @@ from typing import Any, Dict, List, Optional, Sequence, Tuple
 import numpy as np
 import sys
 import pandas as pd
+from shared.dp_accounting import default_delta, dpctgan_steps_per_epoch, max_epochs, sample_rate
 from synthesizer.base import BaseGenerator
+from synthesizer.training import TrainingHooks, cancellation_scope
 from snsynth import Synthesizer
 
 logger = logging.getLogger(__name__)
@@ -159,7 +161,7 @@ class DPCTGANGenerator(BaseGenerator):
         fit()                -- обучение с DP-гарантиями
         sample()             -- генерация синтетических строк
         privacy_report()     -- полный отчёт о параметрах и фактическом расходе бюджета
-        estimate_max_epochs()-- оценка максимальных эпох через dry run
+        estimate_max_epochs()-- оценка максимальных эпох (аналитический RDP-accountant)
         save() / load()      -- сериализация обученной модели
     """
 
@@ -192,6 +194,7 @@ class DPCTGANGenerator(BaseGenerator):
         ordinal_columns: Optional[List[str]] = None,
         continuous_columns: Optional[List[str]] = None,
         transformer: Optional[Any] = None,
+        hooks: Optional[TrainingHooks] = None,
     ) -> None:
         """
         Обучает DPCTGAN на реальных данных с DP-гарантиями.
@@ -200,6 +203,10 @@ class DPCTGANGenerator(BaseGenerator):
         privacy accountant отслеживает накопленный расход ε.
         При исчерпании бюджета обучение останавливается раньше заданных epochs --
         фактическое число выполненных эпох фиксируется в privacy_report().
+
+        hooks: отмена — через cancellation_scope (проверка после каждого шага
+        оптимизатора внутри цикла SmartNoise). Чекпоинты не поддерживаются:
+        оптимизаторы и privacy engine SmartNoise живут только внутри fit().
         """
         if not isinstance(data, pd.DataFrame):
             raise TypeError("data должен быть pandas.DataFrame")
@@ -291,7 +298,7 @@ class DPCTGANGenerator(BaseGenerator):
         captured_output = io.StringIO()
         tee = _ProgressTeeStream(captured_output, total_epochs=self.config.epochs)
         try:
-            with contextlib.redirect_stdout(tee):
+            with contextlib.redirect_stdout(tee), cancellation_scope(hooks):
                 self._synth.fit(
                     data,
                     transformer=transformer,
@@ -419,21 +426,18 @@ class DPCTGANGenerator(BaseGenerator):
         probe_epochs: int = 5,
     ) -> Optional[int]:
         """
-        Оценивает максимальное число эпох при текущих DP-параметрах через dry run.
-
-        Логика:
-            1. Запускаем короткое пробное обучение на probe_epochs
-            2. Смотрим, сколько epsilon потрачено за эти эпохи
-            3. Линейно экстраполируем на оставшийся бюджет
-
-        Ограничения:
-            - Результат приблизительный: реальная кривая расхода нелинейна
-              из-за RDP-композиции в privacy accountant.
-            - Это ориентир, а не точный расчёт. Правильный production-подход:
-              задавать epochs с запасом и доверять встроенной остановке SmartNoise.
-
-        Вычисление формулы расхода эпох самостоятельно не рекомендуется --
-        слишком легко ошибиться в accounting (совет научного руководителя).
+        Максимальное число эпох, которое укладывается в бюджет
+        epsilon - preprocessor_eps при текущих sigma / batch_size / delta.
+
+        Считается аналитически RDP-accountant-ом (shared/dp_accounting.py) по тем же
+        формулам, что privacy engine SmartNoise во время обучения: доля выборки
+        q = batch_size / n, шагов за эпоху max(n // batch_size, 1) × 2 для
+        loss="cross_entropy" (fake и real шаги дискриминатора). Пробное обучение
+        не запускается, оценка занимает миллисекунды; probe_epochs не используется
+        и оставлен для совместимости сигнатуры BaseGenerator.
+
+        SmartNoise проверяет бюджет перед началом эпохи, поэтому фактически
+        может выполнить на одну эпоху больше (последняя выходит за бюджет).
         """
         # В non-DP режиме бюджет не ограничивает обучение,
         # оценка максимальных эпох не имеет смысла.
@@ -443,58 +447,24 @@ class DPCTGANGenerator(BaseGenerator):
             )
             return None
 
-        if probe_epochs <= 0:
-            raise ValueError("probe_epochs должен быть > 0")
-
         n_rows = data.shape[0]
         # Используем текущее _delta_used если уже рассчитано, иначе пересчитываем
-        delta = self._delta_used or (1.0 / (n_rows * np.sqrt(n_rows)))
-
-        try:
-            # Создаём облегчённый probe-синтезатор: минимальные эпохи.
-            # verbose=True обязателен -- иначе stdout пустой и парсить нечего.
-            probe_synth = Synthesizer.create(
-                "dpctgan",
-                epsilon=float(self.config.epsilon),
-                delta=float(delta),
-                sigma=float(self.config.sigma),
-                max_per_sample_grad_norm=float(self.config.max_per_sample_grad_norm),
-                epochs=probe_epochs,
-                batch_size=int(self.config.batch_size),
-                verbose=True,
-                cuda=bool(self.config.cuda),
-            )
-            # Перехватываем stdout по той же схеме, что и в fit() --
-            # probe_synth тоже не хранит privacy_engine после обучения
-            captured_probe = io.StringIO()
-            with contextlib.redirect_stdout(captured_probe):
-                probe_synth.fit(
-                    data,
-                    preprocessor_eps=float(self.config.preprocessor_eps),
-                    nullable=bool(self.config.nullable),
-                )
-        except Exception as e:
-            logger.warning(f"[estimate_max_epochs] Dry run не удался: {e}")
-            return None
-
-        spent_probe, _, _, _, _ = _parse_privacy_from_stdout(
-            captured_probe.getvalue(), delta, probe_epochs
-        )
-        if spent_probe is None or spent_probe <= 0:
-            logger.warning(
-                "[estimate_max_epochs] Не удалось получить spent epsilon из dry run"
-            )
-            return None
-
-        # Линейная экстраполяция по epsilon_per_epoch.
-        # Намеренно занижает результат из-за нелинейности RDP -- используй как нижнюю оценку.
+        delta = self._delta_used or default_delta(n_rows)
         budget = self.config.epsilon - self.config.preprocessor_eps
-        eps_per_epoch = spent_probe / probe_epochs
-        estimated = int(budget / eps_per_epoch)
-
+        steps = dpctgan_steps_per_epoch(n_rows, int(self.config.batch_size), str(self.config.loss))
+
+        estimated = max_epochs(
+            n_rows,
+            int(self.config.batch_size),
+            float(self.config.sigma),
+            delta,
+            budget,
+            steps_per_epoch=steps,
+        )
         logger.info(
-            f"[estimate_max_epochs] probe spent={spent_probe:.4f} за {probe_epochs} эпох, "
-            f"eps/epoch~{eps_per_epoch:.4f}, оценка max_epochs~{estimated}"
+            f"[estimate_max_epochs] RDP: q={sample_rate(n_rows, int(self.config.batch_size)):.4f}, "
+            f"steps/epoch={steps}, σ={self.config.sigma}, δ={delta:.2e}, "
+            f"budget ε={budget:.4f} → max_epochs={estimated}"
         )
         self._epochs_estimated_max = estimated
         return estimated
@@ -687,9 +657,9 @@ if __name__ == "__main__":
 
     generator = DPCTGANGenerator(config)
 
-    # Оценка максимальных эпох через dry run перед полным обучением
-    print("[2] Оценка max_epochs (dry run, probe_epochs=3)...")
-    estimated = generator.estimate_max_epochs(df_test, probe_epochs=3)
+    # Оценка максимальных эпох (RDP-accountant) перед полным обучением
+    print("[2] Оценка max_epochs (RDP-accountant)...")
+    estimated = generator.estimate_max_epochs(df_test)
     print(f"    Оценочный max_epochs: {estimated}\n")
 
     # Обучение
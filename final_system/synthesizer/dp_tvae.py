@@ -20,12 +20,13 @@
 
 from __future__ import annotations
 
+import dataclasses
 import importlib.metadata
 import logging
-import pickle
+import os
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
@@ -34,7 +35,11 @@ import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import DataLoader, TensorDataset
 
-from synthesizer.base import BaseGenerator
+from shared.dp_accounting import epsilon_curve
+from synthesizer.base import DEFAULT_SAMPLE_CHUNK_ROWS, BaseGenerator
+from synthesizer.model_format import is_model_file, open_tensors, read_header, write_model_file
+from synthesizer.training import TrainingHooks, rng_state, set_rng_state
+from synthesizer.transformer_spec import SpecTransformer, transformer_to_spec
 
 logger = logging.getLogger(__name__)
 
@@ -169,12 +174,53 @@ class _VAE(nn.Module):
 # ELBO Loss (аналог ctgan TVAE loss)
 # ──────────────────────────────────────────────────────────────────────────────
 
+@dataclass
+class _LossLayout:
+    """
+    Индексы колонок ELBO, сгруппированные для батчевого расчёта.
+
+    softmax_groups — по одному тензору [n_spans, width] на каждую ширину
+    one-hot спана: все категориальные переменные одной ширины обрабатываются
+    одним log_softmax. tanh_cols / other_cols — плоские индексы колонок
+    с MSE-лоссом. Строится один раз на fit() по output_info.
+    """
+    softmax_groups: List[torch.Tensor]
+    tanh_cols: torch.Tensor
+    other_cols: torch.Tensor
+
+
+def _build_loss_layout(output_info: List[Any], device: torch.device) -> _LossLayout:
+    softmax_by_width: Dict[int, List[List[int]]] = {}
+    tanh_cols: List[int] = []
+    other_cols: List[int] = []
+    col_idx = 0
+    for span_info_list in output_info:
+        for span_info in span_info_list:
+            cols = list(range(col_idx, col_idx + span_info.dim))
+            if span_info.activation_fn == "softmax":
+                softmax_by_width.setdefault(span_info.dim, []).append(cols)
+            elif span_info.activation_fn == "tanh":
+                tanh_cols.extend(cols)
+            else:
+                other_cols.extend(cols)
+            col_idx += span_info.dim
+
+    def _index(values: Any) -> torch.Tensor:
+        return torch.tensor(values, dtype=torch.long, device=device)
+
+    return _LossLayout(
+        softmax_groups=[_index(spans) for _, spans in sorted(softmax_by_width.items())],
+        tanh_cols=_index(tanh_cols),
+        other_cols=_index(other_cols),
+    )
+
+
 def _elbo_loss(
     recon: torch.Tensor,
     x: torch.Tensor,
     mu: torch.Tensor,
     logvar: torch.Tensor,
-    output_info: List[Any],
+    layout: _LossLayout,
     loss_factor: float,
 ) -> torch.Tensor:
     """
@@ -187,36 +233,30 @@ def _elbo_loss(
     kl_divergence:
         KL(N(mu, std) || N(0, 1)) = -0.5 * sum(1 + logvar - mu^2 - exp(logvar))
 
-    output_info — список SpanInfo из ctgan.DataTransformer, описывает
-    структуру трансформированных данных (сколько колонок на каждую переменную).
+    layout — индексы колонок из _build_loss_layout (по output_info
+    ctgan.DataTransformer). Вместо цикла по спанам с отдельным ядром на каждый
+    лосс считается за несколько батчевых операций: один log_softmax на группу
+    спанов одинаковой ширины ([batch, n_spans, width]) и один MSE на все
+    tanh-колонки. Сумма совпадает с поспановым расчётом.
     """
     kl = -0.5 * torch.sum(1 + logvar - mu.pow(2) - logvar.exp())
 
-    recon_loss = torch.tensor(0.0, device=recon.device)
-    col_idx = 0
-    for span_info_list in output_info:
-        for span_info in span_info_list:
-            n_dims = span_info.dim
-            activation = span_info.activation_fn
-
-            cols = slice(col_idx, col_idx + n_dims)
-            if activation == "softmax":
-                # Категориальная переменная: log_softmax + NLL
-                log_prob = torch.nn.functional.log_softmax(recon[:, cols], dim=1)
-                target = x[:, cols].argmax(dim=1)
-                recon_loss += torch.nn.functional.nll_loss(log_prob, target, reduction="sum")
-            elif activation == "tanh":
-                # Числовая переменная (в режиме continuous): MSE
-                recon_loss += loss_factor * torch.nn.functional.mse_loss(
-                    recon[:, cols], x[:, cols], reduction="sum"
-                )
-            else:
-                # Fallback: MSE
-                recon_loss += torch.nn.functional.mse_loss(
-                    recon[:, cols], x[:, cols], reduction="sum"
-                )
-
-            col_idx += n_dims
+    recon_loss = torch.zeros((), device=recon.device)
+    for spans in layout.softmax_groups:
+        # Категориальные переменные: log_softmax + NLL по всем спанам группы
+        log_prob = torch.nn.functional.log_softmax(recon[:, spans], dim=2)
+        target = x[:, spans].argmax(dim=2, keepdim=True)
+        recon_loss = recon_loss - log_prob.gather(2, target).sum()
+    if layout.tanh_cols.numel():
+        # Числовые переменные (в режиме continuous): MSE
+        recon_loss = recon_loss + loss_factor * torch.nn.functional.mse_loss(
+            recon[:, layout.tanh_cols], x[:, layout.tanh_cols], reduction="sum"
+        )
+    if layout.other_cols.numel():
+        # Fallback: MSE
+        recon_loss = recon_loss + torch.nn.functional.mse_loss(
+            recon[:, layout.other_cols], x[:, layout.other_cols], reduction="sum"
+        )
 
     return (kl + recon_loss) / len(x)
 
@@ -233,7 +273,7 @@ class DPTVAEGenerator(BaseGenerator):
         fit()            -- обучение с DP-гарантиями
         sample()         -- генерация синтетических строк
         privacy_report() -- отчёт о DP-бюджете
-        save() / load()  -- сериализация
+        save() / load()  -- сериализация в формат *.model (без pickle)
 
     Внутреннее устройство:
         1. ctgan.DataTransformer: препроцессинг (one-hot, mode-specific normalization)
@@ -243,16 +283,19 @@ class DPTVAEGenerator(BaseGenerator):
         5. sample(): sample z ~ N(0,I) → decoder → inverse_transform
     """
 
+    MODEL_SUFFIX = ".model"
+
     def __init__(self, config: DPTVAEConfig) -> None:
         self.config = config
         self._model: Optional[_VAE] = None
-        self._transformer = None        # ctgan.DataTransformer
+        self._transformer = None        # ctgan.DataTransformer (после load — SpecTransformer)
         self._output_info: Optional[List[Any]] = None
         self._data_dim: Optional[int] = None
         self._device: Optional[torch.device] = None
 
         self._delta_used: Optional[float] = None
         self._spent_epsilon: Optional[float] = None
+        self._eps_history: List[Tuple[int, float]] = []
         self._epochs_completed: Optional[int] = None
         self._sample_size: Optional[int] = None
         self._fit_duration_sec: Optional[float] = None
@@ -265,6 +308,7 @@ class DPTVAEGenerator(BaseGenerator):
         data: pd.DataFrame,
         categorical_columns: Optional[List[str]] = None,
         continuous_columns: Optional[List[str]] = None,
+        hooks: Optional[TrainingHooks] = None,
     ) -> None:
         """
         Обучает DP-TVAE на реальных данных с гарантиями дифференциальной приватности.
@@ -276,6 +320,12 @@ class DPTVAEGenerator(BaseGenerator):
 
         Параметр sigma (noise_multiplier) задаётся в конфиге напрямую — аналогично
         DPCTGANConfig.sigma. Чем больше sigma, тем строже DP и хуже качество.
+
+        hooks: токен отмены проверяется перед каждым батчем; каждые
+        hooks.checkpoint_every эпох состояние обучения пишется в
+        hooks.checkpoint_path. Если там уже лежит чекпоинт этого конфига и
+        выборки того же размера — обучение продолжается с сохранённой эпохи
+        с восстановленными весами, оптимизатором, шагами accountant-а и ГСЧ.
         """
         try:
             from ctgan.data_transformer import DataTransformer
@@ -320,10 +370,17 @@ class DPTVAEGenerator(BaseGenerator):
         self._device = torch.device("cuda" if use_cuda else "cpu")
         logger.info(f"[DP-TVAE] Устройство: {self._device}")
 
+        checkpoint = self._read_checkpoint(hooks, n_rows)
+
         # ── 1. Препроцессинг данных ────────────────────────────────────────────
-        discrete_columns = categorical_columns or []
-        self._transformer = DataTransformer()
-        self._transformer.fit(data, discrete_columns=discrete_columns)
+        # При продолжении — трансформер из чекпоинта: от его разметки
+        # (число мод GMM на колонку) зависят размеры слоёв модели
+        if checkpoint is not None:
+            self._transformer = checkpoint["transformer"]
+        else:
+            discrete_columns = categorical_columns or []
+            self._transformer = DataTransformer()
+            self._transformer.fit(data, discrete_columns=discrete_columns)
         train_data = self._transformer.transform(data)
 
         self._output_info = self._transformer.output_info_list
@@ -362,6 +419,9 @@ class DPTVAEGenerator(BaseGenerator):
             lr=1e-3,
             weight_decay=self.config.l2scale,
         )
+        if checkpoint is not None:
+            model.load_state_dict(checkpoint["model"])
+            optimizer.load_state_dict(checkpoint["optimizer"])
 
         # ── 3. Применяем DP-SGD через Opacus 0.14 API ─────────────────────────
         # В Opacus 0.14: PrivacyEngine создаётся с моделью и параметрами,
@@ -377,57 +437,101 @@ class DPTVAEGenerator(BaseGenerator):
             max_grad_norm=self.config.max_grad_norm,
         )
         privacy_engine.attach(optimizer)
+        if checkpoint is not None:
+            # Шаги DP-SGD, уже сделанные до сбоя, — без них accountant
+            # занизил бы итоговый ε
+            privacy_engine.load_state_dict(checkpoint["privacy_engine"])
+
+        # Кривая ε по эпохам — заранее, аналитически (тот же RDP, что у privacy engine):
+        # sigma фиксирована и обучение не останавливается по бюджету, поэтому
+        # итоговый ε известен до первой эпохи
+        self._eps_history = epsilon_curve(
+            n_rows,
+            self.config.batch_size,
+            self.config.sigma,
+            self._delta_used,
+            self.config.epochs,
+            steps_per_epoch=len(loader),
+            orders=rdp_alphas,
+        )
 
         logger.info(
             f"[DP-TVAE] Обучение: σ={self.config.sigma}, "
             f"δ={self._delta_used:.2e}, C={self.config.max_grad_norm}, "
-            f"epochs={self.config.epochs}, batch={self.config.batch_size}, rows={n_rows}"
+            f"epochs={self.config.epochs}, batch={self.config.batch_size}, rows={n_rows}, "
+            f"прогноз ε={self._eps_history[-1][1] if self._eps_history else 0.0:.4f}"
         )
 
         # ── 4. Цикл обучения ──────────────────────────────────────────────────
         model.train()
+        loss_layout = _build_loss_layout(self._output_info, self._device)
         t0 = time.monotonic()
 
+        start_epoch = 0
+        elapsed_before = 0.0
+        if checkpoint is not None:
+            start_epoch = checkpoint["epoch"]
+            elapsed_before = checkpoint["elapsed_sec"]
+            set_rng_state(checkpoint["rng"])
+            logger.info(
+                f"[DP-TVAE] Продолжение с эпохи {start_epoch}/{self.config.epochs} "
+                f"(шагов DP-SGD: {privacy_engine.steps})"
+            )
+
         try:
             from tqdm import tqdm
             epoch_iter = tqdm(
-                range(self.config.epochs),
+                range(start_epoch, self.config.epochs),
                 desc="DP-TVAE",
                 unit="epoch",
                 dynamic_ncols=True,
+                initial=start_epoch,
+                total=self.config.epochs,
             )
         except ImportError:
-            epoch_iter = range(self.config.epochs)
+            epoch_iter = range(start_epoch, self.config.epochs)
 
         for epoch in epoch_iter:
             epoch_loss = 0.0
             for (batch,) in loader:
+                if hooks is not None:
+                    hooks.check_cancelled()
                 batch = batch.to(self._device)
                 optimizer.zero_grad()
                 recon, mu, logvar = model(batch)
                 loss = _elbo_loss(
                     recon, batch, mu, logvar,
-                    self._output_info, self.config.loss_factor,
+                    loss_layout, self.config.loss_factor,
                 )
                 loss.backward()
                 optimizer.step()
                 epoch_loss += loss.item()
 
             if hasattr(epoch_iter, "set_postfix"):
-                try:
-                    eps_now, _ = privacy_engine.get_privacy_spent(self._delta_used)
-                    epoch_iter.set_postfix({"ε": f"{eps_now:.4f}", "loss": f"{epoch_loss:.2f}"})
-                except Exception:
-                    pass
+                eps_now = self._eps_history[epoch][1]
+                epoch_iter.set_postfix({"ε": f"{eps_now:.4f}", "loss": f"{epoch_loss:.2f}"})
+
+            done = epoch + 1
+            if hooks is not None and done < self.config.epochs and hooks.checkpoint_due(done):
+                self._write_checkpoint(
+                    hooks.checkpoint_path,
+                    epoch=done,
+                    n_rows=n_rows,
+                    model=model,
+                    optimizer=optimizer,
+                    privacy_engine=privacy_engine,
+                    elapsed_sec=elapsed_before + time.monotonic() - t0,
+                )
+                hooks.checkpoint_written(done)
 
         self._epochs_completed = self.config.epochs
-        self._fit_duration_sec = time.monotonic() - t0
+        self._fit_duration_sec = elapsed_before + time.monotonic() - t0
 
         # Финальный фактически потраченный ε (вычисляется через RDP accountant)
         try:
             self._spent_epsilon, _ = privacy_engine.get_privacy_spent(self._delta_used)
         except Exception:
-            self._spent_epsilon = None
+            self._spent_epsilon = self._eps_history[-1][1] if self._eps_history else None
 
         model.eval()
         self._model = model
@@ -444,23 +548,37 @@ class DPTVAEGenerator(BaseGenerator):
 
         z ~ N(0, I) → decoder → inverse_transform → DataFrame
         """
+        return next(self.sample_iter(n_rows, chunk_rows=n_rows))
+
+    def sample_iter(
+        self,
+        n_rows: int,
+        chunk_rows: int = DEFAULT_SAMPLE_CHUNK_ROWS,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Порционная генерация: декодирование батчами по batch_size
+        и inverse_transform на каждую порцию chunk_rows, без накопления
+        всех декодированных строк в памяти.
+        """
         if not self._is_fitted or self._model is None:
             raise RuntimeError("Модель не обучена. Сначала вызови fit().")
         if n_rows <= 0:
             raise ValueError("n_rows должен быть положительным.")
+        if chunk_rows <= 0:
+            raise ValueError("chunk_rows должен быть положительным.")
 
         self._model.eval()
-        steps = n_rows // self.config.batch_size + 1
-        chunks = []
-
-        with torch.no_grad():
-            for _ in range(steps):
-                z = torch.randn(self.config.batch_size, self.config.embedding_dim).to(self._device)
-                decoded = self._model.decode(z).cpu().numpy()
-                chunks.append(decoded)
-
-        generated = np.concatenate(chunks, axis=0)[:n_rows]
-        return self._transformer.inverse_transform(generated)
+        remaining = n_rows
+        while remaining > 0:
+            chunk_size = min(chunk_rows, remaining)
+            decoded = []
+            with torch.no_grad():
+                for start in range(0, chunk_size, self.config.batch_size):
+                    batch = min(self.config.batch_size, chunk_size - start)
+                    z = torch.randn(batch, self.config.embedding_dim, device=self._device)
+                    decoded.append(self._model.decode(z).cpu().numpy())
+            remaining -= chunk_size
+            yield self._transformer.inverse_transform(np.concatenate(decoded, axis=0))
 
     def privacy_report(self) -> Dict[str, Any]:
         return {
@@ -485,6 +603,7 @@ class DPTVAEGenerator(BaseGenerator):
             "dp_spent": {
                 "spent_epsilon_final": self._spent_epsilon,
                 "epochs_completed": self._epochs_completed,
+                "eps_per_epoch_history": self._eps_history,
             },
             # Поле dp_guarantees используется PrivacyEvaluator при сборке отчёта
             "dp_guarantees": {
@@ -501,25 +620,90 @@ class DPTVAEGenerator(BaseGenerator):
         }
 
     def save(self, path: str) -> None:
-        payload = {
-            "config": self.config,
-            # Сохраняем unwrapped модель (без Opacus-обёрток)
-            "model_state_dict": self._model.state_dict(),
-            "data_dim": self._data_dim,
-            "transformer": self._transformer,
-            "output_info": self._output_info,
-            "delta_used": self._delta_used,
-            "spent_epsilon": self._spent_epsilon,
-            "epochs_completed": self._epochs_completed,
-            "sample_size": self._sample_size,
-            "fit_duration_sec": self._fit_duration_sec,
-            "is_fitted": self._is_fitted,
+        """
+        Сохраняет модель в формате *.model без pickle (synthesizer/model_format.py):
+        конфиг, состояние и параметры DataTransformer — в JSON-заголовке,
+        веса encoder / decoder — в области тензоров.
+        """
+        if not self._is_fitted or self._model is None:
+            raise RuntimeError("Нельзя сохранить необученную модель.")
+        transformer = self._transformer
+        header = {
+            "generator": type(self).__name__,
+            "config": dataclasses.asdict(self.config),
+            "state": {
+                "data_dim": self._data_dim,
+                "delta_used": self._delta_used,
+                "spent_epsilon": self._spent_epsilon,
+                "eps_history": self._eps_history,
+                "epochs_completed": self._epochs_completed,
+                "sample_size": self._sample_size,
+                "fit_duration_sec": self._fit_duration_sec,
+            },
+            "transformer": (
+                transformer.spec if isinstance(transformer, SpecTransformer)
+                else transformer_to_spec(transformer)
+            ),
+            "metadata": dict(getattr(self, "_extra_metadata", {})),
         }
-        self._pickle_save(path, payload)
+        # Сохраняем unwrapped модель (без Opacus-обёрток)
+        tensors = {
+            name: tensor.detach().cpu().numpy()
+            for name, tensor in self._model.state_dict().items()
+        }
+        write_model_file(path, header, tensors)
         logger.info(f"[DP-TVAE] Модель сохранена: {path}")
 
     @classmethod
     def load(cls, path: str) -> "DPTVAEGenerator":
+        """
+        Загружает модель: *.model — без pickle, веса отображаются в память
+        (mmap) и читаются с диска по мере обращения; иначе — старый pickle.
+        """
+        if not is_model_file(path):
+            return cls._load_pickle(path)
+
+        header = read_header(path)
+        cfg = DPTVAEConfig(**header["config"])
+        obj = cls(config=cfg)
+        state = header["state"]
+        obj._data_dim = state["data_dim"]
+        obj._transformer = SpecTransformer(header["transformer"])
+        obj._output_info = obj._transformer.output_info_list
+
+        use_cuda = cfg.cuda and torch.cuda.is_available()
+        obj._device = torch.device("cuda" if use_cuda else "cpu")
+
+        # Модуль без выделения памяти под веса; параметры — прямо из mmap
+        with torch.device("meta"):
+            model = _VAE(
+                data_dim=obj._data_dim,
+                compress_dims=cfg.compress_dims,
+                decompress_dims=cfg.decompress_dims,
+                embedding_dim=cfg.embedding_dim,
+            )
+        weights = {
+            name: torch.from_numpy(arr)
+            for name, arr in open_tensors(path, header).items()
+        }
+        model.load_state_dict(weights, assign=True)
+        model.eval()
+        obj._model = model.to(obj._device)
+
+        obj._delta_used = state.get("delta_used")
+        obj._spent_epsilon = state.get("spent_epsilon")
+        obj._eps_history = [tuple(point) for point in state.get("eps_history", [])]
+        obj._epochs_completed = state.get("epochs_completed")
+        obj._sample_size = state.get("sample_size")
+        obj._fit_duration_sec = state.get("fit_duration_sec")
+        obj._is_fitted = True
+        if header.get("metadata"):
+            obj.set_metadata(**header["metadata"])
+        return obj
+
+    @classmethod
+    def _load_pickle(cls, path: str) -> "DPTVAEGenerator":
+        """Модели, сохранённые до формата *.model."""
         payload = cls._pickle_load(path)
         obj = cls(config=payload["config"])
 
@@ -551,6 +735,59 @@ class DPTVAEGenerator(BaseGenerator):
         obj._is_fitted = payload["is_fitted"]
         return obj
 
+    # ── Чекпоинты обучения ─────────────────────────────────────────────────────
+
+    def _write_checkpoint(
+        self,
+        path: str,
+        epoch: int,
+        n_rows: int,
+        model: nn.Module,
+        optimizer: optim.Optimizer,
+        privacy_engine: Any,
+        elapsed_sec: float,
+    ) -> None:
+        """
+        Атомарно (tmp + os.replace) пишет состояние обучения после эпохи epoch.
+        Это служебный файл одного запуска, не артефакт модели — поэтому
+        torch.save с pickle трансформера, а не формат *.model.
+        """
+        state = {
+            "config": dataclasses.asdict(self.config),
+            "n_rows": n_rows,
+            "epoch": epoch,
+            "elapsed_sec": elapsed_sec,
+            "transformer": self._transformer,
+            "model": model.state_dict(),
+            "optimizer": optimizer.state_dict(),
+            "privacy_engine": privacy_engine.state_dict(),
+            "rng": rng_state(),
+        }
+        tmp = f"{path}.tmp"
+        torch.save(state, tmp)
+        os.replace(tmp, path)
+        logger.info(f"[DP-TVAE] Чекпоинт: эпоха {epoch}/{self.config.epochs} → {path}")
+
+    def _read_checkpoint(
+        self,
+        hooks: Optional[TrainingHooks],
+        n_rows: int,
+    ) -> Optional[Dict[str, Any]]:
+        """Чекпоинт для продолжения fit(); None — нет, повреждён или от другого обучения."""
+        if hooks is None or not hooks.checkpoint_path or not os.path.exists(hooks.checkpoint_path):
+            return None
+        try:
+            state = torch.load(hooks.checkpoint_path, map_location=self._device, weights_only=False)
+        except Exception as e:
+            logger.warning(f"[DP-TVAE] Чекпоинт {hooks.checkpoint_path} не читается, обучение с нуля: {e}")
+            return None
+        if state.get("config") != dataclasses.asdict(self.config) or state.get("n_rows") != n_rows:
+            logger.warning(
+                f"[DP-TVAE] Чекпоинт {hooks.checkpoint_path} от другого конфига или выборки — игнорируется"
+            )
+            return None
+        return state
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Вспомогательные функции
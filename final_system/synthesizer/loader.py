@@ -1,7 +1,10 @@
 # synthesizer/loader.py
 #
-# Универсальный загрузчик генераторов из .pkl-файлов.
-# Определяет тип генератора по классу конфига, сохранённому в payload.
+# Универсальный загрузчик генераторов из файлов моделей.
+#   *.model — формат без pickle (synthesizer/model_format.py): тип генератора
+#             берётся из JSON-заголовка, импортируется только его модуль;
+#   *.pkl   — pickle: тип определяется по классу конфига в payload.
+# Формат определяется по содержимому файла, а не по расширению.
 
 from __future__ import annotations
 
@@ -9,15 +12,18 @@ import pickle
 from pathlib import Path
 from typing import TYPE_CHECKING
 
+from synthesizer.model_format import is_model_file, read_header
+
 if TYPE_CHECKING:
     from synthesizer.base import BaseGenerator
 
 
 def load_generator(path: str) -> "BaseGenerator":
     """
-    Загружает генератор из .pkl-файла, автоматически определяя его тип.
+    Загружает генератор из файла модели, автоматически определяя его тип.
 
-    Поддерживаемые типы (определяются по классу config в payload):
+    Формат *.model (сейчас его пишет DPTVAEGenerator) — по полю "generator"
+    заголовка. Pickle — по классу config в payload:
         DPCTGANConfig   → DPCTGANGenerator
         DPTVAEConfig    → DPTVAEGenerator
         CTGANConfig     → CTGANGenerator
@@ -25,12 +31,19 @@ def load_generator(path: str) -> "BaseGenerator":
         CopulaGANConfig → CopulaGANGenerator
 
     Пример использования:
-        generator = load_generator("models/adult.pkl")
+        generator = load_generator("models/adult.model")
         synth_df = generator.sample(10000)
     """
     if not Path(path).exists():
         raise FileNotFoundError(f"Файл модели не найден: {path}")
 
+    if is_model_file(path):
+        generator = read_header(path).get("generator")
+        if generator == "DPTVAEGenerator":
+            from synthesizer.dp_tvae import DPTVAEGenerator
+            return DPTVAEGenerator.load(path)
+        raise ValueError(f"Неизвестный генератор в заголовке модели {path}: {generator!r}")
+
     try:
         with open(path, "rb") as f:
             payload = pickle.load(f)
@@ -0,0 +1,163 @@
+# synthesizer/model_format.py
+#
+# Версионированный формат файла модели без pickle (*.model).
+#
+# Раскладка файла:
+#   [8 байт]   MAGIC = b"SYNMODEL"
+#   [8 байт]   длина заголовка, uint64 little-endian
+#   [N байт]   заголовок — UTF-8 JSON
+#   [...]      нули до границы ALIGN
+#   [...]      область тензоров: сырые C-contiguous массивы little-endian,
+#              каждый с начала, кратного ALIGN
+#
+# Заголовок:
+#   {
+#     "format_version": 1,
+#     "generator": "DPTVAEGenerator",
+#     "config":    {...},          # dataclasses.asdict(config)
+#     "state":     {...},          # скалярное состояние (epsilon, epochs, ...)
+#     "metadata":  {...},          # set_metadata(): run_id, dataset_name, ...
+#     ...                          # генератор-специфичные разделы (transformer)
+#     "tensors": {"decoder.seq.0.weight": {"dtype": "<f4", "shape": [128, 128],
+#                                          "offset": 0, "nbytes": 65536}, ...}
+#   }
+#   offset — от начала области тензоров.
+#
+# Чтение заголовка — один read() без импорта torch и ML-библиотек;
+# тензоры открываются через np.memmap: страницы читаются с диска только
+# при первом обращении, неиспользуемые веса (например, энкодер при генерации)
+# в память не попадают.
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+import numpy as np
+
+MAGIC = b"SYNMODEL"
+FORMAT_VERSION = 1
+ALIGN = 64
+
+PathLike = Union[str, Path]
+
+_LEN = struct.Struct("<Q")
+
+
+def is_model_file(path: PathLike) -> bool:
+    """True — файл в формате *.model (по MAGIC, а не по расширению)."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _json_default(value: Any) -> Any:
+    # numpy-скаляры (output_dimensions, epsilon из opacus и т.п.)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Значение {value!r} ({type(value).__name__}) не сериализуется в JSON")
+
+
+def _pad(n: int) -> int:
+    return -n % ALIGN
+
+
+def write_model_file(
+    path: PathLike,
+    header: Dict[str, Any],
+    tensors: Dict[str, np.ndarray],
+) -> None:
+    """
+    Записывает заголовок и тензоры в path.
+
+    Файл пишется во временный path.tmp и атомарно переименовывается:
+    читатель никогда не увидит частично записанную модель.
+    """
+    arrays = {
+        name: np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder("<"))
+        for name, arr in tensors.items()
+    }
+    index: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, arr in arrays.items():
+        index[name] = {
+            "dtype": arr.dtype.str,
+            "shape": list(arr.shape),
+            "offset": offset,
+            "nbytes": arr.nbytes,
+        }
+        offset += arr.nbytes + _pad(arr.nbytes)
+
+    header = {**header, "format_version": FORMAT_VERSION, "tensors": index}
+    raw = json.dumps(header, ensure_ascii=False, default=_json_default).encode("utf-8")
+    prefix = len(MAGIC) + _LEN.size + len(raw)
+
+    tmp = Path(f"{path}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(_LEN.pack(len(raw)))
+            f.write(raw)
+            f.write(b"\0" * _pad(prefix))
+            for arr in arrays.values():
+                f.write(arr.tobytes())
+                f.write(b"\0" * _pad(arr.nbytes))
+        os.replace(tmp, path)
+    except Exception as e:
+        tmp.unlink(missing_ok=True)
+        raise IOError(f"Ошибка при сохранении модели в {path}: {e}") from e
+
+
+def read_header(path: PathLike) -> Dict[str, Any]:
+    """Заголовок модели (без чтения тензоров)."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: не файл модели формата *.model")
+        (size,) = _LEN.unpack(f.read(_LEN.size))
+        header = json.loads(f.read(size).decode("utf-8"))
+    version = header.get("format_version")
+    if version != FORMAT_VERSION:
+        raise ValueError(
+            f"{path}: неподдерживаемая версия формата модели {version!r} "
+            f"(поддерживается {FORMAT_VERSION})"
+        )
+    header["_data_offset"] = _data_offset(size)
+    return header
+
+
+def _data_offset(header_size: int) -> int:
+    prefix = len(MAGIC) + _LEN.size + header_size
+    return prefix + _pad(prefix)
+
+
+def open_tensors(
+    path: PathLike,
+    header: Dict[str, Any],
+    names: Optional[Iterable[str]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Тензоры из файла как np.memmap (copy-on-write: массивы записываемые,
+    но изменения не попадают в файл). names=None — все тензоры.
+    """
+    index = header["tensors"]
+    base = header["_data_offset"]
+    out: Dict[str, np.ndarray] = {}
+    for name in (index if names is None else names):
+        spec = index[name]
+        shape = tuple(spec["shape"])
+        if spec["nbytes"] == 0:
+            out[name] = np.empty(shape, dtype=np.dtype(spec["dtype"]))
+            continue
+        out[name] = np.memmap(
+            path,
+            dtype=np.dtype(spec["dtype"]),
+            mode="c",
+            offset=base + spec["offset"],
+            shape=shape,
+        )
+    return out
@@ -23,6 +23,7 @@ from sdv.single_table import (
 )
 
 from synthesizer.base import BaseGenerator
+from synthesizer.training import TrainingHooks, cancellation_scope
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +67,27 @@ def _build_metadata(
     return metadata
 
 
+class _SDVGenerator(BaseGenerator):
+    """
+    Общее для SDV-генераторов: свой ГСЧ у каждого синтезатора.
+
+    SDV 1.x не сэмплирует из глобальных ГСЧ: перед первым sample() синтезатор
+    выставляет своей модели фиксированный random_state (FIXED_RNG_SEED), а
+    ctgan подменяет им глобальные ГСЧ на время генерации. Поэтому reseed()
+    сбрасывает именно его, а блокировка — своя у каждого экземпляра.
+    """
+
+    _synth: Any
+
+    def reseed(self, seed: int) -> None:
+        if not getattr(self, "_is_fitted", False) or self._synth is None:
+            raise RuntimeError("Модель не обучена. Сначала вызови fit().")
+        self._synth._set_random_state(seed)
+
+    def sampling_lock(self) -> Any:
+        return self._instance_lock()
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # CTGAN
 # ──────────────────────────────────────────────────────────────────────────────
@@ -90,7 +112,7 @@ class CTGANConfig:
     random_seed: Optional[int] = 42
 
 
-class CTGANGenerator(BaseGenerator):
+class CTGANGenerator(_SDVGenerator):
     """
     Обёртка над SDV CTGANSynthesizer без DP.
 
@@ -111,6 +133,7 @@ class CTGANGenerator(BaseGenerator):
         data: pd.DataFrame,
         categorical_columns: Optional[List[str]] = None,
         continuous_columns: Optional[List[str]] = None,
+        hooks: Optional[TrainingHooks] = None,
     ) -> None:
         if self.config.random_seed is not None:
             import numpy as np
@@ -151,7 +174,8 @@ class CTGANGenerator(BaseGenerator):
             f"batch={self.config.batch_size}, rows={self._sample_size}"
         )
         t0 = time.monotonic()
-        self._synth.fit(data)
+        with cancellation_scope(hooks):
+            self._synth.fit(data)
         self._fit_duration_sec = time.monotonic() - t0
         self._is_fitted = True
         logger.info(f"[CTGAN] Готово за {self._fit_duration_sec:.1f}с.")
@@ -220,7 +244,7 @@ class TVAEConfig:
     random_seed: Optional[int] = 42
 
 
-class TVAEGenerator(BaseGenerator):
+class TVAEGenerator(_SDVGenerator):
     """
     Обёртка над SDV TVAESynthesizer без DP.
 
@@ -242,6 +266,7 @@ class TVAEGenerator(BaseGenerator):
         data: pd.DataFrame,
         categorical_columns: Optional[List[str]] = None,
         continuous_columns: Optional[List[str]] = None,
+        hooks: Optional[TrainingHooks] = None,
     ) -> None:
         if self.config.random_seed is not None:
             import numpy as np
@@ -275,7 +300,8 @@ class TVAEGenerator(BaseGenerator):
             f"batch={self.config.batch_size}, rows={self._sample_size}"
         )
         t0 = time.monotonic()
-        self._synth.fit(data)
+        with cancellation_scope(hooks):
+            self._synth.fit(data)
         self._fit_duration_sec = time.monotonic() - t0
         self._is_fitted = True
         logger.info(f"[TVAE] Готово за {self._fit_duration_sec:.1f}с.")
@@ -355,7 +381,7 @@ class CopulaGANConfig:
     random_seed: Optional[int] = 42
 
 
-class CopulaGANGenerator(BaseGenerator):
+class CopulaGANGenerator(_SDVGenerator):
     """
     Обёртка над SDV CopulaGANSynthesizer без DP.
     """
@@ -373,6 +399,7 @@ class CopulaGANGenerator(BaseGenerator):
         data: pd.DataFrame,
         categorical_columns: Optional[List[str]] = None,
         continuous_columns: Optional[List[str]] = None,
+        hooks: Optional[TrainingHooks] = None,
     ) -> None:
         if self.config.random_seed is not None:
             import numpy as np
@@ -411,7 +438,8 @@ class CopulaGANGenerator(BaseGenerator):
             f"batch={self.config.batch_size}, rows={self._sample_size}"
         )
         t0 = time.monotonic()
-        self._synth.fit(data)
+        with cancellation_scope(hooks):
+            self._synth.fit(data)
         self._fit_duration_sec = time.monotonic() - t0
         self._is_fitted = True
         logger.info(f"[CopulaGAN] Готово за {self._fit_duration_sec:.1f}с.")
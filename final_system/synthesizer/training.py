@@ -0,0 +1,173 @@
+# synthesizer/training.py
+#
+# Управление обучением генератора извне: кооперативная отмена и периодические
+# чекпоинты. TrainingHooks передаётся в BaseGenerator.fit(..., hooks=...).
+#
+# Отмена:
+#   CancellationToken выставляет другой поток (DELETE /jobs/{id}); генератор
+#   видит его и бросает TrainingCancelled.
+#   - DP-TVAE проверяет токен на каждом батче собственного цикла обучения;
+#   - SmartNoise DPCTGAN и SDV-генераторы обучаются внутри библиотечных циклов —
+#     для них cancellation_scope() подключает глобальный post-hook torch.optim
+#     (вызывается после optimizer.step() любого оптимизатора). Хук читает токен
+#     текущего потока, параллельные джобы в других потоках не затрагиваются.
+#   В обоих случаях обучение останавливается не позже следующего шага
+#   оптимизатора — в пределах текущей эпохи.
+#
+# Чекпоинты:
+#   каждые checkpoint_every эпох генератор атомарно пишет в checkpoint_path
+#   состояние обучения (веса, оптимизатор, шаги privacy accountant, состояние
+#   ГСЧ) и вызывает on_checkpoint(epoch). Если при старте fit() файл уже есть
+#   и он от того же конфига и данных — обучение продолжается с сохранённой эпохи.
+#   Поддерживается DP-TVAE (цикл обучения наш). У SmartNoise / SDV оптимизаторы
+#   и privacy engine — локальные переменные библиотечного цикла, сохранить и
+#   восстановить их нельзя без переписывания цикла; для них — только отмена.
+
+from __future__ import annotations
+
+import contextlib
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import numpy as np
+
+
+class TrainingCancelled(Exception):
+    """Обучение остановлено через CancellationToken."""
+
+
+class CancellationToken:
+    """
+    Потокобезопасный флаг отмены.
+
+    event — внешнее событие с интерфейсом threading.Event (например,
+    multiprocessing.Event: отмена из родительского процесса, когда обучение
+    идёт в дочернем).
+    """
+
+    def __init__(self, event: Optional[Any] = None) -> None:
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise TrainingCancelled("Обучение отменено")
+
+
+@dataclass
+class TrainingHooks:
+    """
+    Параметры управления обучением для BaseGenerator.fit().
+
+        cancel_token      -- токен отмены; None = обучение не отменяется
+        checkpoint_path   -- файл чекпоинта; None = без чекпоинтов
+        checkpoint_every  -- период чекпоинтов в эпохах
+        on_checkpoint     -- вызывается с номером эпохи после записи чекпоинта
+    """
+    cancel_token: Optional[CancellationToken] = None
+    checkpoint_path: Optional[str] = None
+    checkpoint_every: int = 10
+    on_checkpoint: Optional[Callable[[int], None]] = None
+
+    def check_cancelled(self) -> None:
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
+    def checkpoint_due(self, epoch: int) -> bool:
+        """True — после эпохи epoch (с 1) нужно записать чекпоинт."""
+        return (
+            self.checkpoint_path is not None
+            and self.checkpoint_every > 0
+            and epoch % self.checkpoint_every == 0
+        )
+
+    def checkpoint_written(self, epoch: int) -> None:
+        if self.on_checkpoint is not None:
+            self.on_checkpoint(epoch)
+
+
+# ── Отмена внутри библиотечных циклов ────────────────────────────────────────
+
+_local = threading.local()
+_hook_lock = threading.Lock()
+_hook_installed = False
+
+
+def _optimizer_step_hook(optimizer: Any, args: Any, kwargs: Any) -> None:
+    token: Optional[CancellationToken] = getattr(_local, "token", None)
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def _install_optimizer_hook() -> None:
+    global _hook_installed
+    with _hook_lock:
+        if _hook_installed:
+            return
+        from torch.optim.optimizer import register_optimizer_step_post_hook
+        register_optimizer_step_post_hook(_optimizer_step_hook)
+        _hook_installed = True
+
+
+@contextlib.contextmanager
+def cancellation_scope(hooks: Optional[TrainingHooks]) -> Iterator[None]:
+    """
+    Отмена обучения, идущего внутри сторонней библиотеки (SmartNoise, SDV):
+    в этом потоке любой optimizer.step() бросает TrainingCancelled после
+    выставления токена.
+    """
+    token = hooks.cancel_token if hooks is not None else None
+    if token is None:
+        yield
+        return
+    token.raise_if_cancelled()
+    _install_optimizer_hook()
+    previous = getattr(_local, "token", None)
+    _local.token = token
+    try:
+        yield
+    finally:
+        _local.token = previous
+
+
+# ── Состояние ГСЧ ────────────────────────────────────────────────────────────
+
+def seed_rng(seed: int) -> None:
+    """Инициализирует глобальные ГСЧ random / numpy / torch значением seed."""
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        import torch
+        torch.manual_seed(seed)
+    except ImportError:
+        pass
+
+
+def rng_state() -> Dict[str, Any]:
+    """Состояние глобальных ГСЧ random / numpy / torch."""
+    import torch
+    state: Dict[str, Any] = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state: Dict[str, Any]) -> None:
+    import torch
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
@@ -0,0 +1,167 @@
+# synthesizer/transformer_spec.py
+#
+# Параметры обученного ctgan.DataTransformer в JSON и обратное преобразование
+# по ним — без ctgan / rdt / sklearn и без pickle.
+#
+# Для генерации из сохранённой модели нужен только inverse_transform:
+#   continuous (ClusterBasedNormalizer): значение = clip(x, -1, 1) · 4 · std[k] + mean[k],
+#       k — argmax one-hot компоненты среди валидных компонент GMM;
+#       затем как в rdt.FloatFormatter: клиппинг, округление, приведение dtype;
+#   discrete (OneHotEncoder): категория = dummies[argmax(one-hot)];
+#   в конце — приведение к исходным dtype колонок (как ctgan).
+# Результат совпадает с DataTransformer.inverse_transform(data) при sigmas=None
+# (DP-TVAE вызывает его именно так).
+
+from __future__ import annotations
+
+from collections import namedtuple
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Как ctgan.data_transformer.SpanInfo
+SpanInfo = namedtuple("SpanInfo", ["dim", "activation_fn"])
+
+# rdt.ClusterBasedNormalizer.STD_MULTIPLIER
+_STD_MULTIPLIER = 4
+
+_INTEGER_BOUNDS = {
+    "Int8":   (-(2**7), 2**7 - 1),
+    "Int16":  (-(2**15), 2**15 - 1),
+    "Int32":  (-(2**31), 2**31 - 1),
+    "Int64":  (-(2**63), 2**63 - 1),
+    "UInt8":  (0, 2**8 - 1),
+    "UInt16": (0, 2**16 - 1),
+    "UInt32": (0, 2**32 - 1),
+    "UInt64": (0, 2**64 - 1),
+}
+
+
+def _json_value(value: Any) -> Any:
+    """Значение категории → JSON (numpy-скаляры → python, NaN → None)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if not isinstance(value, (str, int, float, bool)):
+        raise ValueError(f"Категория {value!r} ({type(value).__name__}) не сериализуется в JSON")
+    return value
+
+
+def transformer_to_spec(transformer: Any) -> Dict[str, Any]:
+    """JSON-совместимые параметры обученного ctgan.DataTransformer."""
+    if not getattr(transformer, "dataframe", True):
+        raise ValueError("DataTransformer обучен на ndarray — поддерживается только DataFrame")
+
+    columns: List[Dict[str, Any]] = []
+    for info in transformer._column_transform_info_list:
+        tr = info.transform
+        if info.column_type == "continuous":
+            if tr.null_transformer is not None and tr.null_transformer.models_missing_values():
+                raise ValueError(f"Колонка {info.column_name!r}: пропуски в continuous не поддерживаются")
+            valid = np.asarray(tr.valid_component_indicator, dtype=bool)
+            bgm = tr._bgm_transformer
+            columns.append({
+                "name": info.column_name,
+                "type": "continuous",
+                "dim": int(info.output_dimensions),
+                "means": bgm.means_.reshape(-1)[valid].tolist(),
+                "stds": np.sqrt(bgm.covariances_).reshape(-1)[valid].tolist(),
+                "dtype": str(tr._dtype),
+                "enforce_min_max": bool(tr.enforce_min_max_values),
+                "min": None if tr._min_value is None else float(tr._min_value),
+                "max": None if tr._max_value is None else float(tr._max_value),
+                "rounding_digits": (
+                    int(tr._rounding_digits)
+                    if tr.learn_rounding_scheme and tr._rounding_digits is not None else None
+                ),
+                "computer_representation": tr.computer_representation,
+            })
+        else:
+            columns.append({
+                "name": info.column_name,
+                "type": "discrete",
+                "dim": int(info.output_dimensions),
+                "categories": [_json_value(v) for v in tr.dummies],
+                "dtype": str(tr.dtype),
+            })
+
+    return {
+        "columns": columns,
+        "raw_dtypes": {col: str(dt) for col, dt in transformer._column_raw_dtypes.items()},
+        "output_info": [
+            [[int(span.dim), span.activation_fn] for span in spans]
+            for spans in transformer.output_info_list
+        ],
+    }
+
+
+class SpecTransformer:
+    """
+    Обратное преобразование по параметрам из transformer_to_spec.
+
+    Совместим с ctgan.DataTransformer в части, нужной для генерации:
+    inverse_transform, output_dimensions, output_info_list.
+    """
+
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        self.spec = spec
+        self.output_dimensions = sum(col["dim"] for col in spec["columns"])
+        self.output_info_list = [
+            [SpanInfo(int(dim), activation) for dim, activation in spans]
+            for spans in spec["output_info"]
+        ]
+        self._means = [np.asarray(c.get("means", ()), dtype=float) for c in spec["columns"]]
+        self._stds = [np.asarray(c.get("stds", ()), dtype=float) for c in spec["columns"]]
+
+    def inverse_transform(self, data: np.ndarray, sigmas: Optional[np.ndarray] = None) -> pd.DataFrame:
+        if sigmas is not None:
+            raise NotImplementedError("SpecTransformer: sigmas не поддерживаются")
+        st = 0
+        out: Dict[str, Any] = {}
+        for i, col in enumerate(self.spec["columns"]):
+            block = data[:, st: st + col["dim"]]
+            if col["type"] == "continuous":
+                out[col["name"]] = self._continuous(i, col, block)
+            else:
+                out[col["name"]] = self._discrete(col, block)
+            st += col["dim"]
+
+        # ctgan: np.column_stack → DataFrame → astype(raw dtypes)
+        recovered = pd.DataFrame(np.column_stack(list(out.values())), columns=list(out))
+        return recovered.astype({
+            name: pd.api.types.pandas_dtype(dt) for name, dt in self.spec["raw_dtypes"].items()
+        })
+
+    def _continuous(self, i: int, col: Dict[str, Any], block: np.ndarray) -> np.ndarray:
+        normalized = np.clip(block[:, 0].astype(float), -1, 1)
+        component = np.argmax(block[:, 1:], axis=1).clip(0, len(self._means[i]) - 1)
+        values = normalized * _STD_MULTIPLIER * self._stds[i][component] + self._means[i][component]
+
+        # rdt.FloatFormatter._reverse_transform
+        if col["enforce_min_max"]:
+            values = values.clip(col["min"], col["max"])
+        elif not col["computer_representation"].startswith("Float"):
+            values = values.clip(*_INTEGER_BOUNDS[col["computer_representation"]])
+        dtype = pd.api.types.pandas_dtype(col["dtype"])
+        if col["rounding_digits"] is not None:
+            values = values.round(col["rounding_digits"])
+        elif pd.api.types.is_integer_dtype(dtype):
+            values = values.round(0)
+        return pd.Series(values).astype(dtype).to_numpy()
+
+    def _discrete(self, col: Dict[str, Any], block: np.ndarray) -> np.ndarray:
+        categories = np.array(
+            [np.nan if v is None else v for v in col["categories"]], dtype=object,
+        )
+        result = pd.Series(categories[np.argmax(block, axis=1)])
+        # rdt.utils.try_convert_to_dtype
+        dtype = pd.api.types.pandas_dtype(col["dtype"])
+        try:
+            result = result.astype(dtype)
+        except ValueError:
+            if not pd.api.types.is_integer_dtype(dtype):
+                raise
+            result = result.astype(float)
+        return result.to_numpy()
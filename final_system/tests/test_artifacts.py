@@ -0,0 +1,78 @@
+# final_system/tests/test_artifacts.py
+#
+# Unit-тесты для форматов артефактов Shared Volume (shared/artifacts.py)
+# Запуск: python -m pytest final_system/tests/test_artifacts.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from shared.artifacts import (
+    artifact_format,
+    artifact_name,
+    check_engine,
+    find_artifact,
+    read_frame,
+    write_frame,
+    write_frames,
+)
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "age": rng.integers(18, 80, 50),
+        "score": rng.normal(0, 1, 50),
+        "city": rng.choice(["a", "b"], 50),
+    })
+    # Перемешанный индекс, как после train_test_split
+    return df.sample(frac=1.0, random_state=1)
+
+
+def test_format_detection():
+    assert artifact_format("splits/x/train.csv") == "csv"
+    assert artifact_format("synth/x/synthetic_pending.parquet") == "parquet"
+    assert artifact_format("train.FEATHER") == "feather"
+    assert artifact_name("holdout", "parquet") == "holdout.parquet"
+    with pytest.raises(ValueError):
+        artifact_format("train.json")
+
+
+def test_csv_roundtrip_and_find(tmp_path):
+    df = _frame()
+    assert find_artifact(tmp_path, "train") is None
+    write_frame(df, tmp_path / artifact_name("train", "csv"))
+    path = find_artifact(tmp_path, "train")
+    assert path == tmp_path / "train.csv"
+    pd.testing.assert_frame_equal(read_frame(path), df.reset_index(drop=True), check_dtype=False)
+    check_engine("csv")
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_columnar_roundtrip_keeps_dtypes(tmp_path, fmt):
+    pytest.importorskip("pyarrow")
+    df = _frame().astype({"age": np.int16})
+    path = tmp_path / artifact_name("train", fmt)
+    write_frame(df, path)
+    assert find_artifact(tmp_path, "train") == path
+    out = read_frame(path)
+    assert out["age"].dtype == np.int16
+    pd.testing.assert_frame_equal(out, df.reset_index(drop=True), check_dtype=False)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "feather"])
+def test_streaming_write_matches_single_write(tmp_path, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    df = _frame().reset_index(drop=True)
+    # Первая порция без значений в city — тип колонки задаётся не ей
+    head = df.iloc[:7].assign(city=None)
+    chunks = [head, df.iloc[7:30], df.iloc[30:]]
+    path = tmp_path / artifact_name("synthetic", fmt)
+    assert write_frames(iter(chunks), path) == len(df)
+    out = read_frame(path)
+    assert out["city"].isna().sum() == 7
+    pd.testing.assert_frame_equal(out.iloc[7:], df.iloc[7:], check_dtype=False)
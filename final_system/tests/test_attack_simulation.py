@@ -0,0 +1,46 @@
+# final_system/tests/test_attack_simulation.py
+#
+# Unit-тесты для точного режима proxy MIA (evaluator/privacy/attack_simulation.py)
+# Запуск: python -m pytest final_system/tests/test_attack_simulation.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pytest
+from sklearn.metrics import roc_auc_score, roc_curve
+
+from evaluator.privacy import attack_simulation
+from evaluator.privacy.attack_simulation import _bootstrap_auc, _exact_attack, _mann_whitney_auc
+
+
+@pytest.fixture
+def distances():
+    rng = np.random.default_rng(0)
+    # Округление даёт ничьи между членами и не-членами
+    return np.round(rng.exponential(1.0, 1200), 2), np.round(rng.exponential(1.2, 800), 2)
+
+
+def _labels_scores(members, non_members):
+    y = np.r_[np.ones(len(members)), np.zeros(len(non_members))]
+    return y, -np.r_[members, non_members]
+
+
+def test_exact_auc_and_roc_match_sklearn(distances):
+    members, non_members = distances
+    y, scores = _labels_scores(members, non_members)
+    fpr, tpr, _ = roc_curve(y, scores)
+
+    result = _exact_attack(members, non_members, n_bootstrap=0, random_state=0)
+    assert _mann_whitney_auc(members, non_members) == pytest.approx(roc_auc_score(y, scores))
+    assert result["attacker_advantage"] == pytest.approx(np.max(tpr - fpr), abs=1e-4)
+    assert result["tpr_at_fpr_0.01"] == pytest.approx(tpr[fpr <= 0.01].max(), abs=1e-4)
+
+
+def test_bootstrap_weights_equal_explicit_resample(distances):
+    members, non_members = distances
+    rng = np.random.RandomState(7)
+    w_m = attack_simulation._resample_weights(rng, 1, len(members))[0].astype(int)
+    w_h = attack_simulation._resample_weights(rng, 1, len(non_members))[0].astype(int)
+    explicit = _mann_whitney_auc(np.repeat(members, w_m), np.repeat(non_members, w_h))
+    assert _bootstrap_auc(members, non_members, n_bootstrap=1, random_state=7)[0] == pytest.approx(explicit)
@@ -0,0 +1,65 @@
+# final_system/tests/test_classical.py
+#
+# Unit-тесты для k/l/t-метрик (evaluator/privacy/classical.py)
+# Запуск: python -m pytest final_system/tests/test_classical.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from evaluator.privacy.classical import (
+    compute_classical_metrics,
+    compute_k_anonymity,
+    compute_l_diversity,
+    compute_record_k_risk,
+    compute_t_closeness,
+)
+
+QI = ["age", "sex"]
+
+
+@pytest.fixture
+def synth():
+    rng = np.random.default_rng(0)
+    n = 3000
+    df = pd.DataFrame({
+        "age": rng.integers(20, 30, n).astype(float),
+        "sex": rng.choice(["M", "F"], n),
+        "disease": rng.choice(["flu", "cold", "none", None], n),
+    })
+    df.loc[rng.random(n) < 0.05, "age"] = np.nan
+    return df
+
+
+@pytest.fixture
+def real():
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({"disease": rng.choice(["flu", "cold", "asthma"], 2000)})
+
+
+def test_k_and_l_match_groupby(synth):
+    groups = synth.groupby(QI, observed=True)
+    assert compute_k_anonymity(synth, QI) == groups.size().min()
+    assert compute_l_diversity(synth, QI, "disease") == groups["disease"].nunique().min()
+
+
+def test_t_closeness_matches_per_group_emd(synth, real):
+    global_dist = real["disease"].value_counts(normalize=True)
+    expected = max(
+        0.5 * group["disease"].value_counts(normalize=True).sub(global_dist, fill_value=0).abs().sum()
+        for _, group in synth.groupby(QI, observed=True)
+    )
+    assert compute_t_closeness(synth, QI, "disease", real) == pytest.approx(expected, abs=1e-6)
+
+
+def test_record_k_risk(synth, real):
+    risk = compute_record_k_risk(synth, QI)
+    sizes = synth.groupby(QI, observed=True)["sex"].transform("size")
+    np.testing.assert_allclose(risk.dropna(), 1.0 / sizes.dropna())
+    assert risk.isna().sum() == synth["age"].isna().sum()
+
+    report = compute_classical_metrics(synth, real, QI, "disease")
+    assert report["k_risk"]["max"] == pytest.approx(1.0 / report["k_anonymity"], abs=1e-6)
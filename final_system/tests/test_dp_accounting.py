@@ -0,0 +1,64 @@
+# final_system/tests/test_dp_accounting.py
+#
+# Unit-тесты для аналитического RDP-accountant (shared/dp_accounting.py)
+# Запуск: python -m pytest final_system/tests/test_dp_accounting.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+from shared.dp_accounting import (
+    DEFAULT_ORDERS,
+    compute_rdp,
+    default_delta,
+    dpctgan_steps_per_epoch,
+    dptvae_steps_per_epoch,
+    epsilon_curve,
+    estimate_budget,
+    max_epochs,
+    rdp_to_epsilon,
+)
+
+
+# (q, sigma, steps, delta) → (ε, α) по opacus 0.14 privacy_analysis
+@pytest.mark.parametrize("q, sigma, steps, delta, eps_ref, alpha_ref", [
+    (0.01, 1.1, 10_000, 1e-5, 5.63199236854841, 4.7),
+    (500 / 26048, 5.0, 104 * 300, default_delta(26048), 3.627003969792285, 8.4),
+    (0.05, 0.8, 200, 1e-6, 9.905257248336731, 3.0),
+])
+def test_matches_opacus_reference(q, sigma, steps, delta, eps_ref, alpha_ref):
+    eps, alpha = rdp_to_epsilon(DEFAULT_ORDERS, compute_rdp(q, sigma, steps), delta)
+    assert eps == pytest.approx(eps_ref, rel=1e-9)
+    assert alpha == alpha_ref
+
+
+def test_curve_and_max_epochs_agree():
+    n, batch, sigma = 26048, 500, 5.0
+    delta = default_delta(n)
+    steps = dpctgan_steps_per_epoch(n, batch, "cross_entropy")
+    assert steps == 2 * (n // batch)
+
+    curve = epsilon_curve(n, batch, sigma, delta, 300, steps_per_epoch=steps)
+    assert [e for e, _ in curve] == list(range(1, 301))
+    eps = [v for _, v in curve]
+    assert all(a < b for a, b in zip(eps, eps[1:]))
+
+    k = max_epochs(n, batch, sigma, delta, 2.5, steps_per_epoch=steps)
+    assert eps[k - 1] <= 2.5 < eps[k]
+
+
+def test_estimate_budget():
+    n, batch = 10_000, 500
+    steps = dptvae_steps_per_epoch(n + 1, batch)
+    assert steps == 21
+
+    est = estimate_budget(n, batch, sigma=2.0, epochs=50, steps_per_epoch=steps, epsilon_budget=2.0)
+    assert est.delta == default_delta(n)
+    assert est.sample_rate == 0.05
+    assert est.epsilon_at_requested == est.epsilon_curve[-1][1]
+    assert est.within_budget is False
+    assert 0 < est.max_epochs < 50
+
+    no_budget = estimate_budget(n, batch, sigma=1.0, epochs=5, steps_per_epoch=steps)
+    assert no_budget.max_epochs is None and no_budget.within_budget is None
@@ -0,0 +1,87 @@
+# final_system/tests/test_dp_tvae_loss.py
+#
+# Unit-тесты для ELBO DP-TVAE (synthesizer/dp_tvae.py): батчевый расчёт по
+# _LossLayout против прежнего цикла по спанам output_info.
+# Запуск: python -m pytest final_system/tests/test_dp_tvae_loss.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from collections import namedtuple
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from synthesizer.dp_tvae import _build_loss_layout, _elbo_loss
+
+SpanInfo = namedtuple("SpanInfo", ["dim", "activation_fn"])
+
+# Как у ctgan.DataTransformer: числовая колонка — tanh-скаляр + softmax по модам,
+# категориальная — один softmax-спан; ширины спанов повторяются и различаются
+OUTPUT_INFO = [
+    [SpanInfo(1, "tanh"), SpanInfo(3, "softmax")],
+    [SpanInfo(4, "softmax")],
+    [SpanInfo(1, "tanh"), SpanInfo(5, "softmax")],
+    [SpanInfo(3, "softmax")],
+    [SpanInfo(2, "softmax")],
+    [SpanInfo(1, "tanh"), SpanInfo(3, "softmax")],
+]
+
+
+def _loop_elbo_loss(recon, x, mu, logvar, output_info, loss_factor):
+    """ELBO до группировки спанов: отдельный лосс на каждый спан."""
+    kl = -0.5 * torch.sum(1 + logvar - mu.pow(2) - logvar.exp())
+    recon_loss = torch.tensor(0.0)
+    col_idx = 0
+    for span_info_list in output_info:
+        for span_info in span_info_list:
+            cols = slice(col_idx, col_idx + span_info.dim)
+            if span_info.activation_fn == "softmax":
+                log_prob = torch.nn.functional.log_softmax(recon[:, cols], dim=1)
+                target = x[:, cols].argmax(dim=1)
+                recon_loss = recon_loss + torch.nn.functional.nll_loss(log_prob, target, reduction="sum")
+            else:
+                recon_loss = recon_loss + loss_factor * torch.nn.functional.mse_loss(
+                    recon[:, cols], x[:, cols], reduction="sum"
+                )
+            col_idx += span_info.dim
+    return (kl + recon_loss) / len(x)
+
+
+def _batch(output_info, n_rows, generator):
+    """Батч как после DataTransformer: one-hot в softmax-спанах, [-1, 1] в tanh."""
+    parts = []
+    for span_info_list in output_info:
+        for span_info in span_info_list:
+            if span_info.activation_fn == "softmax":
+                hot = torch.randint(span_info.dim, (n_rows,), generator=generator)
+                parts.append(torch.nn.functional.one_hot(hot, span_info.dim).float())
+            else:
+                parts.append(torch.rand(n_rows, span_info.dim, generator=generator) * 2 - 1)
+    return torch.cat(parts, dim=1)
+
+
+def test_grouped_loss_matches_span_loop():
+    generator = torch.Generator().manual_seed(0)
+    x = _batch(OUTPUT_INFO, 64, generator)
+    recon = torch.randn(x.shape, generator=generator, dtype=torch.float64)
+    mu = torch.randn(64, 8, generator=generator, dtype=torch.float64)
+    logvar = torch.randn(64, 8, generator=generator, dtype=torch.float64) * 0.1
+    x = x.double()
+
+    layout = _build_loss_layout(OUTPUT_INFO, torch.device("cpu"))
+    assert [tuple(g.shape) for g in layout.softmax_groups] == [(1, 2), (3, 3), (1, 4), (1, 5)]
+    assert layout.tanh_cols.tolist() == [0, 8, 19]
+
+    results = []
+    for loss_fn, info in ((_elbo_loss, layout), (_loop_elbo_loss, OUTPUT_INFO)):
+        inputs = [t.clone().requires_grad_() for t in (recon, mu, logvar)]
+        loss = loss_fn(inputs[0], x, inputs[1], inputs[2], info, 2.0)
+        loss.backward()
+        results.append((loss.detach(), [t.grad for t in inputs]))
+
+    (grouped, grouped_grads), (loop, loop_grads) = results
+    torch.testing.assert_close(grouped, loop)
+    for g, expected in zip(grouped_grads, loop_grads):
+        torch.testing.assert_close(g, expected)
@@ -0,0 +1,128 @@
+# final_system/tests/test_evaluate_all.py
+#
+# Unit-тесты для POST /evaluate/all (services/evaluation_service/router.py)
+# Запуск: python -m pytest final_system/tests/test_evaluate_all.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from services.evaluation_service.main import app
+from services.evaluation_service.settings import Settings, get_settings
+
+UTILITY = {
+    "target_column": "income",
+    "categorical_columns": ["sex", "edu", "income"],
+    "continuous_columns": ["age", "hours"],
+}
+PRIVACY = {"quasi_identifiers": ["age", "sex"], "sensitive_attribute": "income"}
+
+
+def _frame(rng, n):
+    return pd.DataFrame({
+        "age": rng.integers(18, 80, n),
+        "hours": rng.normal(40, 5, n),
+        "sex": rng.choice(["M", "F"], n),
+        "edu": rng.choice(["a", "b", "c"], n),
+        "income": rng.choice(["<=50K", ">50K"], n),
+    })
+
+
+@pytest.fixture
+def client(tmp_path):
+    rng = np.random.default_rng(0)
+    split_dir = tmp_path / "splits" / "s1"
+    split_dir.mkdir(parents=True)
+    _frame(rng, 600).to_csv(split_dir / "train.csv", index=False)
+    _frame(rng, 200).to_csv(split_dir / "holdout.csv", index=False)
+    _frame(rng, 500).to_csv(tmp_path / "synth.csv", index=False)
+    app.dependency_overrides[get_settings] = lambda: Settings(data_root=tmp_path)
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_evaluate_all_matches_separate_endpoints(client):
+    resp = client.post("/api/v1/evaluate/all", json={
+        "split_id": "s1", "synth_path": "synth.csv", "privacy": PRIVACY, "utility": UTILITY,
+    })
+    assert resp.status_code == 200
+    body = resp.json()
+    assert set(body["timings"]) == {"load_sec", "privacy_sec", "utility_sec", "total_sec"}
+
+    privacy = client.post("/api/v1/evaluate/privacy", json={
+        "split_id": "s1", "synth_path": "synth.csv", **PRIVACY,
+    }).json()
+    utility = client.post("/api/v1/evaluate/utility", json={
+        "split_id": "s1", "synth_path": "synth.csv", **UTILITY,
+    }).json()
+
+    assert body["privacy_report"]["empirical_risk"]["distance_metrics"] == \
+        privacy["empirical_risk"]["distance_metrics"]
+    assert body["privacy_report"]["diagnostic"] == privacy["diagnostic"]
+    assert body["utility_report"]["statistical"] == utility["statistical"]
+    assert body["utility_report"]["correlations"] == utility["correlations"]
+
+
+def test_large_synthetic_streamed_with_sample(client, tmp_path):
+    # ≈1.2 МБ синтетики: порог SYNTH_STREAM_MB=1 — чтение порциями
+    _frame(np.random.default_rng(1), 40000).to_csv(tmp_path / "big.csv", index=False)
+    request = {"split_id": "s1", "synth_path": "big.csv", "privacy": PRIVACY, "utility": UTILITY}
+    full = client.post("/api/v1/evaluate/all", json=request).json()
+
+    app.dependency_overrides[get_settings] = lambda: Settings(
+        data_root=tmp_path, synth_stream_mb=1, synth_sample_rows=2000, synth_chunk_rows=7000,
+    )
+    streamed = client.post("/api/v1/evaluate/all", json=request).json()
+
+    utility = streamed["utility_report"]
+    assert utility["metadata"]["synth_rows"] == 40000
+    assert utility["metadata"]["synth_rows_sampled"] == 2000
+    assert streamed["privacy_report"]["metadata"]["synth_rows"] == 40000
+    # Маргинальные метрики — по всем строкам: JSD / TVD как при чтении целиком
+    for kind, metric in (("numerical", "jsd"), ("categorical", "tvd")):
+        for col, stats in full["utility_report"]["statistical"][kind].items():
+            assert utility["statistical"][kind][col][metric] == pytest.approx(stats[metric], abs=1e-6)
+    assert utility["correlations"]["pearson_corr_mae"] is not None
+
+
+def test_evaluate_all_missing_split(client):
+    resp = client.post("/api/v1/evaluate/all", json={
+        "split_id": "missing", "synth_path": "synth.csv", "utility": UTILITY,
+    })
+    assert resp.status_code == 404
+
+
+def test_cores_split_between_sections(client, monkeypatch):
+    from services.evaluation_service import router
+
+    monkeypatch.setattr(router.os, "cpu_count", lambda: 8)
+    assert router._split_cores(1) == (1, 7)
+    assert router._split_cores(0) == (4, 4)      # 0 = все ядра → не больше половины
+    assert router._split_cores(16) == (4, 4)
+    monkeypatch.setattr(router.os, "cpu_count", lambda: 1)
+    assert router._split_cores(0) == (1, 1)
+
+    monkeypatch.setattr(router.os, "cpu_count", lambda: 8)
+    budgets = {}
+    run_privacy, run_utility = router._run_privacy, router._run_utility
+
+    def privacy(*args):
+        budgets["privacy"] = args[-1]
+        return run_privacy(*args)
+
+    def utility(*args):
+        budgets["utility"] = args[-1]
+        return run_utility(*args)
+
+    monkeypatch.setattr(router, "_run_privacy", privacy)
+    monkeypatch.setattr(router, "_run_utility", utility)
+    resp = client.post("/api/v1/evaluate/all", json={
+        "split_id": "s1", "synth_path": "synth.csv",
+        "privacy": {**PRIVACY, "n_workers": 0}, "utility": UTILITY,
+    })
+    assert resp.status_code == 200
+    assert budgets == {"privacy": 4, "utility": 4}
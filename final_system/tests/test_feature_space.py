@@ -0,0 +1,48 @@
+# final_system/tests/test_feature_space.py
+#
+# Unit-тесты для FeatureSpace (evaluator/privacy/feature_space.py)
+# Запуск: python -m pytest final_system/tests/test_feature_space.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from evaluator.privacy.feature_space import FeatureSpace
+
+
+@pytest.fixture
+def train_df():
+    return pd.DataFrame({
+        "age":  [20, 30, 40, 60],
+        "city": ["SPb", "Moscow", "Kazan", "Moscow"],
+    })
+
+
+def test_layout_numeric_first_then_sorted_one_hot(train_df):
+    fs = FeatureSpace.fit(train_df)
+    assert fs.feature_names == ["age", "city__Kazan", "city__Moscow", "city__SPb"]
+    assert fs.n_features == 4
+
+
+def test_transform_min_max_and_one_hot(train_df):
+    X = FeatureSpace.fit(train_df).transform(train_df)
+    assert X.dtype == np.float32
+    np.testing.assert_allclose(X[:, 0], [0.0, 0.25, 0.5, 1.0])
+    np.testing.assert_array_equal(X[:, 1:].sum(axis=1), [1, 1, 1, 1])
+    assert X[0, 3] == 1.0  # SPb
+
+
+def test_unknown_category_encoded_as_zero_block(train_df):
+    fs = FeatureSpace.fit(train_df)
+    X = fs.transform(pd.DataFrame({"age": [30], "city": ["Omsk"]}))
+    assert X[0, 1:].sum() == 0.0
+
+
+def test_save_load_roundtrip(tmp_path, train_df):
+    fs = FeatureSpace.fit(train_df)
+    fs.save(tmp_path / "feature_space.json")
+    loaded = FeatureSpace.load(tmp_path / "feature_space.json")
+    np.testing.assert_array_equal(loaded.transform(train_df), fs.transform(train_df))
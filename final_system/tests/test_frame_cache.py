@@ -0,0 +1,93 @@
+# final_system/tests/test_frame_cache.py
+#
+# Unit-тесты для FrameCache (services/evaluation_service/frame_cache.py)
+# Запуск: python -m pytest final_system/tests/test_frame_cache.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.evaluation_service.frame_cache import FrameCache, compact_dtypes, frame_nbytes
+
+
+def _write(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        "age": rng.integers(18, 80, n),
+        "score": rng.normal(0, 1, n),
+        "city": rng.choice(["a", "b", None], n),
+    }).to_csv(path, index=False)
+
+
+class _CountingLoader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, path):
+        self.calls += 1
+        return pd.read_csv(path)
+
+
+def test_compact_dtypes_preserves_values():
+    df = pd.DataFrame({
+        "i": np.arange(1000, dtype=np.int64),
+        "f": np.linspace(0, 1, 1000),
+        "s": pd.Series(["x", "yy", None, "x"] * 250, dtype=object),
+    })
+    out = compact_dtypes(df)
+    pd.testing.assert_frame_equal(out, df, check_dtype=False)
+    assert out["i"].dtype == np.int16
+    assert out["f"].dtype == np.float64
+    assert out["s"].dtype == object
+    # Одинаковые строки — один объект
+    assert out["s"].iloc[0] is out["s"].iloc[3]
+    assert frame_nbytes(out) < df.memory_usage(deep=True).sum()
+
+
+def test_hit_after_first_load(tmp_path):
+    path = tmp_path / "train.csv"
+    _write(path, 200)
+    cache, loader = FrameCache(1 << 20), _CountingLoader()
+    first = cache.get(path, loader)
+    second = cache.get(path, loader)
+    assert second is first
+    assert loader.calls == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["bytes"] == frame_nbytes(first)
+
+
+def test_rewritten_file_is_reloaded(tmp_path):
+    path = tmp_path / "train.csv"
+    _write(path, 200)
+    cache, loader = FrameCache(1 << 20), _CountingLoader()
+    cache.get(path, loader)
+    _write(path, 300, seed=1)
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+    assert len(cache.get(path, loader)) == 300
+    assert loader.calls == 2
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_lru_eviction_and_oversized_frames(tmp_path):
+    paths = [tmp_path / f"{i}.csv" for i in range(3)]
+    for i, p in enumerate(paths):
+        _write(p, 200, seed=i)
+    size = frame_nbytes(compact_dtypes(pd.read_csv(paths[0])))
+    cache, loader = FrameCache(int(size * 2.5)), _CountingLoader()
+    cache.get(paths[0], loader)
+    cache.get(paths[1], loader)
+    cache.get(paths[0], loader)          # paths[1] становится наименее недавним
+    cache.get(paths[2], loader)
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 2
+    cache.get(paths[0], loader)
+    assert cache.stats()["hits"] == 2
+
+    tiny = FrameCache(16)
+    tiny.get(paths[0], loader)
+    assert tiny.stats()["entries"] == 0 and tiny.stats()["bytes"] == 0
@@ -0,0 +1,163 @@
+# final_system/tests/test_job_scheduler.py
+#
+# Unit-тесты для JobScheduler (services/synthesis_service/scheduler.py)
+# Запуск: python -m pytest final_system/tests/test_job_scheduler.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import threading
+
+import pytest
+
+from services.synthesis_service.job_store import JobRecord, JobStatus, JobStore
+from services.synthesis_service.scheduler import JobScheduler
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Jobs:
+    """Задачи, которые ждут release() и пишут порядок запуска."""
+
+    def __init__(self, store):
+        self.store = store
+        self.started = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        self.gates = {}
+        self.finished = threading.Semaphore(0)
+
+    def add(self, scheduler, job_id, priority=0, kind="ctgan"):
+        self.store.add(JobRecord(job_id=job_id))
+        self.gates[job_id] = threading.Event()
+        scheduler.submit(job_id, lambda: self._run(job_id), priority=priority, kind=kind)
+
+    def _run(self, job_id):
+        self.store.update(job_id, status=JobStatus.running)
+        with self.lock:
+            self.started.append(job_id)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.gates[job_id].wait(5)
+        with self.lock:
+            self.active -= 1
+        self.store.update(job_id, status=JobStatus.done)
+        self.finished.release()
+
+    def wait_started(self, n):
+        for _ in range(500):
+            with self.lock:
+                if len(self.started) >= n:
+                    return
+            threading.Event().wait(0.01)
+        raise AssertionError(f"started {self.started}, expected {n}")
+
+    def finish(self, scheduler, job_id):
+        done = scheduler.stats()["completed"]
+        self.gates[job_id].set()
+        assert self.finished.acquire(timeout=5)
+        # длительность попадает в историю после возврата задачи
+        for _ in range(500):
+            if scheduler.stats()["completed"] > done:
+                return
+            threading.Event().wait(0.01)
+        raise AssertionError(f"{job_id} not completed")
+
+
+@pytest.fixture
+def setup():
+    store, clock = JobStore(), _Clock()
+    scheduler = JobScheduler(slots=2, threads_per_job=1, store=store, clock=clock)
+    jobs = _Jobs(store)
+    yield scheduler, jobs, clock
+    scheduler.shutdown(wait=False)
+    for gate in jobs.gates.values():
+        gate.set()
+
+
+def test_slots_priority_and_cancelled_skip(setup):
+    scheduler, jobs, _ = setup
+    jobs.add(scheduler, "a")
+    jobs.add(scheduler, "b")
+    jobs.wait_started(2)
+
+    jobs.add(scheduler, "low")
+    jobs.add(scheduler, "gone")
+    jobs.add(scheduler, "high", priority=5)
+    jobs.add(scheduler, "low2")
+    jobs.store.update("gone", status=JobStatus.cancelled)
+
+    assert [scheduler.position(j) for j in ("high", "low", "low2", "gone", "a")] == [1, 2, 3, None, None]
+    assert scheduler.stats()["queued"] == 3
+
+    for job_id in ("a", "b", "high", "low", "low2"):
+        jobs.finish(scheduler, job_id)
+    assert jobs.started == ["a", "b", "high", "low", "low2"]
+    assert jobs.max_active == 2
+    assert jobs.store.get("gone").status == JobStatus.cancelled
+
+
+def test_eta_from_history(setup):
+    scheduler, jobs, clock = setup
+    jobs.add(scheduler, "warm")
+    jobs.wait_started(1)
+    assert scheduler.eta_seconds("warm") is None    # истории ещё нет
+    clock.now = 100.0
+    jobs.finish(scheduler, "warm")                  # ctgan: 100 с
+
+    for job_id in ("r1", "r2", "q1", "q2"):
+        jobs.add(scheduler, job_id)
+    jobs.wait_started(3)
+    clock.now = 130.0
+    # выполняются r1, r2 (осталось по 70 с); q1 и q2 займут освободившиеся слоты
+    assert scheduler.eta_seconds("r1") == pytest.approx(70.0)
+    assert scheduler.eta_seconds("q1") == pytest.approx(170.0)
+    assert scheduler.eta_seconds("q2") == pytest.approx(170.0)
+
+    jobs.add(scheduler, "other", kind="tvae")
+    assert scheduler.eta_seconds("other") is None
+    for job_id in ("r1", "r2", "q1", "q2", "other"):
+        jobs.finish(scheduler, job_id)
+
+
+def test_cancel_between_dequeue_and_start(setup):
+    scheduler, jobs, _ = setup
+    store = jobs.store
+    rec = JobRecord(job_id="c")
+    store.add(rec)
+    dequeued, go = threading.Event(), threading.Event()
+
+    def task():
+        # Как _run_job: status=running, проверка токена перед обучением
+        dequeued.set()
+        go.wait(5)
+        store.update("c", status=JobStatus.running)
+        if rec.cancel_token.cancelled:
+            store.update("c", status=JobStatus.cancelled)
+            return
+        store.update("c", status=JobStatus.done)
+
+    done = scheduler.stats()["completed"]
+    scheduler.submit("c", task)
+    assert dequeued.wait(5)
+    # DELETE /jobs/{id} между извлечением из очереди и status=running
+    store.update("c", status=JobStatus.cancelled)
+    rec.cancel_token.cancel()
+    go.set()
+    for _ in range(500):
+        if scheduler.stats()["completed"] > done:
+            break
+        threading.Event().wait(0.01)
+    assert store.get("c").status == JobStatus.cancelled
+
+    # Завершённый джоб отмена тоже не перезаписывает
+    store.add(JobRecord(job_id="d", status=JobStatus.done))
+    assert store.update("d", status=JobStatus.cancelled).status == JobStatus.done
+    assert store.update("d", checkpoint_epoch=3).checkpoint_epoch == 3
@@ -0,0 +1,49 @@
+# final_system/tests/test_ml_efficacy.py
+#
+# Unit-тесты для evaluator/utility/ml_efficacy.py
+# Запуск: python -m pytest final_system/tests/test_ml_efficacy.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from evaluator.utility.ml_efficacy import MLEfficacyConfig, evaluate_ml_efficacy, trtr_baseline_key
+
+
+def _frame(rng, n):
+    a = rng.normal(0, 1, n)
+    c = rng.choice(list("xyzw"), n)
+    return pd.DataFrame({
+        "a": a,
+        "c": c,
+        "income": np.where(a + (c == "x") + rng.normal(0, 0.5, n) > 0, ">50K", "<=50K"),
+    })
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(0)
+    return _frame(rng, 1500), _frame(rng, 1500), _frame(rng, 500)
+
+
+@pytest.mark.parametrize("model", ["random_forest", "hist_gradient_boosting"])
+def test_cached_trtr_skips_retraining_and_keeps_scores(frames, model):
+    real, synth, test = frames
+    config = MLEfficacyConfig(target_column="income", model=model, n_estimators=20)
+    fresh = evaluate_ml_efficacy(real, synth, test, config)
+    cached = evaluate_ml_efficacy(real, synth, test, config, trtr_scores=fresh["trtr"])
+
+    assert not fresh["trtr_cached"] and cached["trtr_cached"]
+    assert cached["tstr"] == fresh["tstr"]
+    assert fresh["trtr"]["roc_auc"] > 0.8
+
+
+def test_trtr_key_ignores_thread_budget():
+    base = MLEfficacyConfig(target_column="income")
+    assert trtr_baseline_key(base) == trtr_baseline_key(MLEfficacyConfig(target_column="income", n_jobs=2))
+    assert trtr_baseline_key(base) != trtr_baseline_key(
+        MLEfficacyConfig(target_column="income", model="hist_gradient_boosting")
+    )
@@ -0,0 +1,87 @@
+# final_system/tests/test_model_cache.py
+#
+# Unit-тесты для ModelCache (services/synthesis_service/model_cache.py)
+# Запуск: python -m pytest final_system/tests/test_model_cache.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.synthesis_service.model_cache import ModelCache
+
+
+class _SlowLoader:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, path):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return object()
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _model(tmp_path, name, size=100):
+    path = tmp_path / f"{name}.pkl"
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_concurrent_requests_share_one_load(tmp_path):
+    path = _model(tmp_path, "m")
+    cache, loader = ModelCache(1 << 20), _SlowLoader(delay=0.2)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: cache.get("m", path, loader), range(8)))
+    assert loader.calls == 1
+    assert all(r is results[0] for r in results)
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"], stats["entries"]) == (1, 7, 1)
+
+
+def test_lru_budget_and_rewrite(tmp_path):
+    paths = {n: _model(tmp_path, n) for n in "abc"}
+    cache, loader = ModelCache(250), _SlowLoader()
+    cache.get("a", paths["a"], loader)
+    cache.get("b", paths["b"], loader)
+    cache.get("a", paths["a"], loader)          # b — наименее недавняя
+    cache.get("c", paths["c"], loader)
+    assert cache.stats()["models"] == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+    _model(tmp_path, "a", size=120)             # модель перезаписана
+    cache.get("a", paths["a"], loader)
+    assert cache.stats()["invalidations"] == 1
+    assert loader.calls == 4
+
+    assert not ModelCache(50).warm("a", paths["a"], loader)
+
+
+def test_ttl_warm_and_evict(tmp_path):
+    path = _model(tmp_path, "m")
+    clock, loader = _Clock(), _SlowLoader()
+    cache = ModelCache(1 << 20, ttl_sec=60, clock=clock)
+    assert cache.warm("m", path, loader)
+    clock.now = 30
+    cache.get("m", path, loader)                # обращение продлевает жизнь записи
+    clock.now = 80
+    assert cache.stats()["entries"] == 1
+    clock.now = 200
+    assert cache.stats()["entries"] == 0 and cache.stats()["expirations"] == 1
+
+    cache.get("m", path, loader)
+    assert cache.evict("m") and not cache.evict("m")
+    assert cache.stats()["bytes"] == 0
+    assert loader.calls == 2
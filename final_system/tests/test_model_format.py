@@ -0,0 +1,90 @@
+# final_system/tests/test_model_format.py
+#
+# Unit-тесты для формата модели без pickle (synthesizer/model_format.py)
+# и JSON-параметров трансформера (synthesizer/transformer_spec.py)
+# Запуск: python -m pytest final_system/tests/test_model_format.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from synthesizer.model_format import (
+    ALIGN, MAGIC, is_model_file, open_tensors, read_header, write_model_file,
+)
+
+
+def test_roundtrip_tensors_aligned(tmp_path):
+    path = tmp_path / "m.model"
+    tensors = {
+        "w": np.arange(15, dtype=np.float32).reshape(3, 5),
+        "b": np.array([1.5, -2.0], dtype=np.float64),
+        "empty": np.zeros((0, 4), dtype=np.float32),
+    }
+    write_model_file(path, {"generator": "X", "state": {"n": np.int64(7)}}, tensors)
+
+    assert is_model_file(path)
+    assert not (tmp_path / "m.model.tmp").exists()
+    header = read_header(path)
+    assert header["generator"] == "X"
+    assert header["state"]["n"] == 7
+    assert header["_data_offset"] % ALIGN == 0
+    assert all(spec["offset"] % ALIGN == 0 for spec in header["tensors"].values())
+
+    loaded = open_tensors(path, header)
+    for name, arr in tensors.items():
+        np.testing.assert_array_equal(loaded[name], arr)
+        assert loaded[name].dtype == arr.dtype
+
+    # copy-on-write: запись в массив не меняет файл
+    loaded["w"][0, 0] = 100.0
+    assert open_tensors(path, header, names=["w"])["w"][0, 0] == 0.0
+
+
+def test_rejects_foreign_and_future_files(tmp_path):
+    pkl = tmp_path / "m.pkl"
+    pkl.write_bytes(b"\x80\x04not a model")
+    assert not is_model_file(pkl)
+    assert not is_model_file(tmp_path / "missing.model")
+    with pytest.raises(ValueError):
+        read_header(pkl)
+
+    raw = json.dumps({"format_version": 999, "tensors": {}}).encode()
+    future = tmp_path / "future.model"
+    future.write_bytes(MAGIC + struct.pack("<Q", len(raw)) + raw)
+    with pytest.raises(ValueError, match="версия"):
+        read_header(future)
+
+
+def test_spec_transformer_matches_ctgan():
+    ctgan_dt = pytest.importorskip("ctgan.data_transformer")
+    from synthesizer.transformer_spec import SpecTransformer, transformer_to_spec
+
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame({
+        "age": rng.integers(18, 90, n),
+        "income": np.round(rng.lognormal(10, 1, n), 2),
+        "city": rng.choice(["a", "b", "c"], n),
+        "flag": rng.choice([0, 1], n),
+    })
+    transformer = ctgan_dt.DataTransformer(max_clusters=4)
+    transformer.fit(df, discrete_columns=["city", "flag"])
+
+    spec = json.loads(json.dumps(transformer_to_spec(transformer)))
+    restored = SpecTransformer(spec)
+    assert restored.output_dimensions == transformer.output_dimensions
+    assert restored.output_info_list == [
+        [tuple(span) for span in spans] for spans in transformer.output_info_list
+    ]
+
+    # Произвольный выход декодера: tanh для непрерывных значений, logits для one-hot
+    data = rng.normal(size=(n, transformer.output_dimensions))
+    pd.testing.assert_frame_equal(
+        restored.inverse_transform(data), transformer.inverse_transform(data),
+    )
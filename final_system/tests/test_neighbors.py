@@ -0,0 +1,213 @@
+# final_system/tests/test_neighbors.py
+#
+# Unit-тесты для NeighborIndex (evaluator/privacy/neighbors.py)
+# Запуск: python -m pytest final_system/tests/test_neighbors.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pytest
+
+from evaluator.privacy.neighbors import NeighborIndex
+
+
+def _brute_force(query, reference, k):
+    dists = np.sqrt(((query[:, None, :] - reference[None, :, :]) ** 2).sum(axis=2))
+    dists.sort(axis=1)
+    return dists[:, :k]
+
+
+@pytest.fixture
+def arrays():
+    rng = np.random.default_rng(0)
+    reference = rng.random((300, 30))
+    query = rng.random((120, 30))
+    return query, reference
+
+
+@pytest.mark.parametrize("backend", ["tree", "gemm"])
+def test_query_matches_brute_force(arrays, backend):
+    query, reference = arrays
+    dists, idx = NeighborIndex(reference, backend=backend).query(query, k=2)
+    np.testing.assert_allclose(dists, _brute_force(query, reference, 2), atol=1e-9)
+    assert idx.shape == (120, 2)
+
+
+def test_gemm_rerank_block_bounded(arrays, monkeypatch):
+    import evaluator.privacy.neighbors as neighbors
+
+    query, reference = arrays
+    budget = 2048
+    shapes = []
+    rerank = neighbors._rerank_dense
+
+    def spy(q, ref, cand_idx):
+        shapes.append(cand_idx.shape)
+        return rerank(q, ref, cand_idx)
+
+    monkeypatch.setattr(neighbors, "_GEMM_BLOCK_ELEMENTS", budget)
+    monkeypatch.setattr(neighbors, "_rerank_dense", spy)
+    dists, _ = NeighborIndex(reference, backend="gemm").query(query, k=2)
+    np.testing.assert_allclose(dists, _brute_force(query, reference, 2), atol=1e-9)
+    assert all(rows * k * reference.shape[1] <= budget for rows, k in shapes)
+
+
+def test_gemm_detects_exact_duplicates(arrays):
+    _, reference = arrays
+    dists, idx = NeighborIndex(reference, backend="gemm").query(reference[:10], k=1)
+    assert np.all(dists[:, 0] == 0.0)
+    assert list(idx[:, 0]) == list(range(10))
+
+
+def test_auto_backend_depends_on_width():
+    rng = np.random.default_rng(1)
+    assert NeighborIndex(rng.random((50, 5))).backend == "tree"
+    assert NeighborIndex(rng.random((50, 100))).backend == "gemm"
+
+
+def test_short_reference_padded_with_inf():
+    reference = np.array([[0.0, 0.0]])
+    dists, idx = NeighborIndex(reference, backend="gemm").query(np.array([[3.0, 4.0]]), k=2)
+    assert dists[0, 0] == pytest.approx(5.0)
+    assert np.isinf(dists[0, 1])
+    assert idx[0, 1] == -1
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        NeighborIndex(np.zeros((3, 2)), backend="faiss")
+
+
+def test_codes_backend_matches_one_hot_distances():
+    import pandas as pd
+    from evaluator.privacy.feature_space import FeatureSpace
+
+    rng = np.random.default_rng(2)
+    train = pd.DataFrame({
+        "x":    rng.random(200),
+        "city": rng.choice(["a", "b", "c", "d"], 200),
+        "job":  rng.choice(["p", "q", None], 200),
+    })
+    query = pd.DataFrame({
+        "x":    rng.random(50),
+        "city": rng.choice(["a", "b", "zzz"], 50),   # "zzz" нет в train
+        "job":  rng.choice(["p", "q", None], 50),
+    })
+    fs = FeatureSpace.fit(train)
+    one_hot, _ = NeighborIndex(fs.transform(train, dtype=np.float64), backend="gemm").query(
+        fs.transform(query, dtype=np.float64), k=2
+    )
+    index = NeighborIndex(fs.transform_codes(train))
+    coded, _ = index.query(fs.transform_codes(query), k=2)
+    assert index.backend == "codes"
+    np.testing.assert_allclose(coded, one_hot, atol=1e-6)
+
+
+def test_approximate_index_recall_and_one_sided_error():
+    from evaluator.privacy.neighbors import ApproximateNeighborIndex, estimate_recall
+
+    rng = np.random.default_rng(3)
+    reference = rng.random((2000, 8))
+    query = rng.random((400, 8))
+    index = ApproximateNeighborIndex(reference, n_probe=4)
+    approx, _ = index.query(query, k=2)
+    exact, _ = NeighborIndex(reference, backend="gemm").query(query, k=2)
+
+    # Найденный сосед — реальная строка reference: DCR может только завышаться
+    assert np.all(approx[:, 0] >= exact[:, 0] - 1e-9)
+    stats = estimate_recall(index, query, approx[:, 0], sample_size=400)
+    assert stats["estimated_recall"] == pytest.approx(np.mean(approx[:, 0] <= exact[:, 0] + 1e-9))
+    assert stats["estimated_recall"] > 0.8
+
+
+def test_approximate_index_with_all_lists_probed_is_exact(arrays):
+    from evaluator.privacy.neighbors import ApproximateNeighborIndex
+
+    query, reference = arrays
+    index = ApproximateNeighborIndex(reference, n_lists=10, n_probe=10)
+    dists, _ = index.query(query, k=2)
+    np.testing.assert_allclose(dists, _brute_force(query, reference, 2), atol=1e-9)
+
+
+def test_sharded_index_matches_single_process(arrays):
+    from evaluator.privacy.parallel_neighbors import ShardedNeighborIndex
+
+    query, reference = arrays
+    expected, expected_idx = NeighborIndex(reference, backend="gemm").query(query, k=2)
+    with ShardedNeighborIndex(reference, backend="gemm", n_workers=2) as index:
+        dists, idx = index.query(query, k=2)
+    np.testing.assert_allclose(dists, expected)
+    np.testing.assert_array_equal(idx, expected_idx)
+
+
+def test_neighbor_context_builds_one_index_per_reference(arrays):
+    from evaluator.privacy.neighbor_context import NeighborContext
+
+    query, reference = arrays
+    with NeighborContext({"synth": query, "train": reference}, nn_backend="gemm") as ctx:
+        full, _ = ctx.query("synth", "train", k=2)
+        index = ctx.index("train")
+        top1, _ = ctx.query("synth", "train", k=1)
+        rows = np.array([3, 7, 11])
+        subset, _ = ctx.query("synth", "train", k=1, rows=rows)
+        assert ctx.index("train") is index
+        np.testing.assert_allclose(full, _brute_force(query, reference, 2), atol=1e-9)
+        np.testing.assert_array_equal(top1, full[:, :1])
+        np.testing.assert_array_equal(subset, full[rows, :1])
+
+
+def test_mia_reports_recall_of_approximate_synth_index():
+    from evaluator.privacy.attack_simulation import evaluate_membership_inference
+    from evaluator.privacy.neighbor_context import NeighborContext
+
+    rng = np.random.default_rng(5)
+    matrices = {"train": rng.random((300, 6)), "holdout": rng.random((300, 6)), "synth": rng.random((1500, 6))}
+    with NeighborContext(matrices, approximate=True, ann_n_probe=2) as ctx:
+        report = evaluate_membership_inference(None, None, None, sample_size=None, context=ctx, method="exact")
+    approximation = report["approximation"]
+    assert approximation["method"] == "ivf"
+    assert approximation["recall_sample_size"] == 600
+    assert 0.0 < approximation["estimated_recall"] <= 1.0
+
+    with NeighborContext(matrices) as ctx:
+        report = evaluate_membership_inference(None, None, None, sample_size=None, context=ctx, method="exact")
+    assert "approximation" not in report
+
+
+def _privacy_frames(n_rows, seed):
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "x": rng.random(n_rows),
+        "y": rng.normal(size=n_rows),
+        "c": rng.choice(["a", "b", "c"], n_rows),
+    })
+
+
+def test_mia_and_dcr_samples_are_independent():
+    from evaluator.privacy.privacy_evaluator import PrivacyConfig, PrivacyEvaluator
+
+    train, holdout, synth = (_privacy_frames(8000, seed) for seed in (0, 1, 2))
+
+    def run(**overrides):
+        options = dict(compute_classical=False, distance_sample_size=2000, mia_method="exact", mia_n_bootstrap=10)
+        config = PrivacyConfig(**{**options, **overrides})
+        return PrivacyEvaluator(config).evaluate(train, holdout, synth)["empirical_risk"]
+
+    large = run(mia_sample_size=5000)
+    mia = large["membership_inference"]
+    assert mia["n_members_tested"] == 5000
+    assert mia["n_non_members_tested"] == 5000
+
+    full = run(mia_sample_size=None)
+    assert full["membership_inference"]["n_members_tested"] == 8000
+    assert full["membership_inference"]["n_non_members_tested"] == 8000
+
+    # Размер выборки MIA не меняет DCR/NNDR, и наоборот
+    no_mia = run(compute_mia=False)
+    assert large["distance_metrics"] == no_mia["distance_metrics"]
+    assert full["distance_metrics"] == no_mia["distance_metrics"]
+    small_dcr = run(mia_sample_size=5000, distance_sample_size=500)
+    assert small_dcr["membership_inference"] == mia
@@ -0,0 +1,43 @@
+# final_system/tests/test_real_profile.py
+#
+# Unit-тесты для RealDataProfile (evaluator/utility/profile.py)
+# Запуск: python -m pytest final_system/tests/test_real_profile.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from evaluator.utility.profile import RealDataProfile
+from evaluator.utility.utility_evaluator import UtilityConfig, UtilityEvaluator
+
+
+def _frame(rng, n):
+    a = rng.normal(0, 1, n)
+    return pd.DataFrame({
+        "a": a,
+        "b": 2 * a + rng.normal(0, 1, n),
+        "c": rng.choice(list("xyzw"), n),
+        "d": rng.choice(list("pq"), n),
+        "target": rng.choice(["0", "1"], n),
+    })
+
+
+def test_profile_report_matches_in_memory(tmp_path):
+    rng = np.random.default_rng(0)
+    real, synth, test = _frame(rng, 4000), _frame(rng, 4000), _frame(rng, 1000)
+    for col in ("a", "b"):
+        synth[col] = synth[col].clip(real[col].min(), real[col].max())
+
+    RealDataProfile.build(real).save(tmp_path / "real_profile.json")
+    profile = RealDataProfile.load(tmp_path / "real_profile.json")
+
+    evaluator = UtilityEvaluator(UtilityConfig(target_column="target", compute_ml_efficacy=False))
+    expected = evaluator.evaluate(real, synth, test)
+    result = evaluator.evaluate(real, synth, test, real_profile=profile)
+
+    assert result["correlations"] == pytest.approx(expected["correlations"])
+    assert result["statistical"] == expected["statistical"]
+    assert "target" not in result["statistical"]["categorical"]
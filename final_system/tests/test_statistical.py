@@ -0,0 +1,57 @@
+# final_system/tests/test_statistical.py
+#
+# Unit-тесты для evaluator/utility/statistical.py
+# Запуск: python -m pytest final_system/tests/test_statistical.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import chi2_contingency
+
+from evaluator.utility import statistical
+from evaluator.utility.statistical import _cramers_v, compute_correlation_delta
+
+
+def _reference_cramers_v(col_a, col_b):
+    contingency = pd.crosstab(col_a, col_b)
+    chi2 = chi2_contingency(contingency, correction=False)[0]
+    n = contingency.values.sum()
+    return np.sqrt(chi2 / (n * (min(contingency.shape) - 1)))
+
+
+@pytest.fixture
+def columns():
+    rng = np.random.default_rng(0)
+    n = 3000
+    a = pd.Series(rng.choice(list("abcdef"), n))
+    b = pd.Series(np.where(rng.random(n) < 0.4, a, rng.choice(list("xyz"), n)))
+    a[rng.random(n) < 0.05] = None
+    return a, b
+
+
+def test_cramers_v_matches_crosstab_chi2(columns):
+    a, b = columns
+    assert _cramers_v(a, b) == pytest.approx(_reference_cramers_v(a, b), rel=1e-9)
+
+
+def test_cramers_v_sparse_path_matches_dense(columns, monkeypatch):
+    a, b = columns
+    dense = _cramers_v(a, b)
+    monkeypatch.setattr(statistical, "_DENSE_CONTINGENCY_MAX_CELLS", 1)
+    assert _cramers_v(a, b) == pytest.approx(dense, rel=1e-9)
+
+
+def test_cramers_v_degenerate_column():
+    constant = pd.Series(["q"] * 10)
+    other = pd.Series(list("ababababab"))
+    assert _cramers_v(constant, other) == 0.0
+
+
+def test_correlation_delta_zero_for_permuted_rows(columns):
+    a, b = columns
+    df = pd.DataFrame({"a": a, "b": b, "c": b.str.upper()})
+    shuffled = df.sample(frac=1, random_state=1).reset_index(drop=True)
+    assert compute_correlation_delta(df, shuffled)["cramers_v_mae"] == pytest.approx(0.0, abs=1e-12)
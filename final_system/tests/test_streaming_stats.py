@@ -0,0 +1,115 @@
+# final_system/tests/test_streaming_stats.py
+#
+# Unit-тесты для потоковых маргинальных статистик (evaluator/utility/streaming.py)
+# Запуск: python -m pytest final_system/tests/test_streaming_stats.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from evaluator.utility.statistical import compute_marginal_stats
+from evaluator.utility.streaming import (
+    KLLSketch,
+    MarginalSummary,
+    RowSample,
+    compute_marginal_stats_streaming,
+    fit_bin_edges,
+    iter_chunks,
+    marginal_stats_from_summaries,
+    summarize,
+)
+from shared.artifacts import write_frame
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(0)
+
+    def make(n, shift):
+        return pd.DataFrame({
+            "num": rng.normal(shift, 1.0, n),
+            "cat": rng.choice(list("abcd"), n),
+        })
+
+    real, synth = make(8000, 0.0), make(12000, 0.2)
+    synth["num"] = synth["num"].clip(real["num"].min(), real["num"].max())
+    return real, synth
+
+
+def test_streaming_matches_in_memory(frames, tmp_path):
+    real, synth = frames
+    real.to_csv(tmp_path / "real.csv", index=False)
+    synth.to_csv(tmp_path / "synth.csv", index=False)
+
+    expected = compute_marginal_stats(real, synth)
+    result = compute_marginal_stats_streaming(tmp_path / "real.csv", tmp_path / "synth.csv", chunk_rows=1500)
+
+    num, exp_num = result["numerical"]["num"], expected["numerical"]["num"]
+    assert num["jsd"] == pytest.approx(exp_num["jsd"], abs=1e-6)
+    assert num["mean_delta"] == pytest.approx(exp_num["mean_delta"], abs=1e-4)
+    assert num["std_delta"] == pytest.approx(exp_num["std_delta"], abs=1e-4)
+    assert num["median_delta"] == pytest.approx(exp_num["median_delta"], abs=0.03)
+    assert result["categorical"] == expected["categorical"]
+
+
+def test_out_of_range_synth_goes_to_overflow_bins(frames):
+    real, synth = frames
+    edges, categorical = fit_bin_edges(real)
+    shifted = synth.assign(num=synth["num"] + 100)
+    summary = summarize(shifted, edges, categorical)
+    assert summary.hist["num"][-1] == len(shifted)
+    stats = marginal_stats_from_summaries(summarize(real, edges, categorical), summary)
+    # Носители не пересекаются → JSD максимальна (ln 2 при натуральном логарифме)
+    assert stats["numerical"]["num"]["jsd"] == pytest.approx(np.log(2), abs=1e-6)
+
+
+def test_summary_roundtrip_json(frames):
+    real, synth = frames
+    edges, categorical = fit_bin_edges(real)
+    summary = summarize(real, edges, categorical, chunk_rows=1000)
+    restored = MarginalSummary.from_dict(json.loads(json.dumps(summary.to_dict())))
+    synth_summary = summarize(synth, edges, categorical)
+    assert marginal_stats_from_summaries(restored, synth_summary) == marginal_stats_from_summaries(summary, synth_summary)
+
+
+def test_kll_median_rank_error():
+    values = np.random.default_rng(1).normal(size=100_000)
+    sketch = KLLSketch()
+    for start in range(0, len(values), 7000):
+        sketch.update(values[start:start + 7000])
+    assert sketch.n == len(values)
+    assert abs((values < sketch.quantile(0.5)).mean() - 0.5) < 0.01
+
+
+def test_row_sample_independent_of_chunking(frames):
+    synth = frames[1].assign(row=np.arange(len(frames[1])))
+    samples = []
+    for chunk_rows in (500, 3000):
+        sample = RowSample(1000, random_state=1)
+        for start in range(0, len(synth), chunk_rows):
+            sample.update(synth.iloc[start:start + chunk_rows])
+        samples.append(sample.frame())
+    assert sample.n_rows == len(synth)
+    assert len(samples[0]) == 1000
+    pd.testing.assert_frame_equal(samples[0], samples[1])
+    # Строки — из источника, в исходном порядке; выборка покрывает весь файл
+    rows = samples[0]["row"]
+    pd.testing.assert_frame_equal(samples[0], synth.iloc[rows].reset_index(drop=True))
+    assert rows.is_monotonic_increasing and rows.max() > 0.9 * len(synth)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet", ".feather"])
+def test_iter_chunks_reads_every_artifact_format(tmp_path, suffix):
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame({"num": np.arange(2500, dtype=float), "cat": ["a", "b"] * 1250})
+    path = tmp_path / f"synth{suffix}"
+    write_frame(df, path)
+
+    chunks = list(iter_chunks(path, chunk_rows=1000))
+    assert [len(c) for c in chunks] == [1000, 1000, 500]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), df)
@@ -0,0 +1,101 @@
+# final_system/tests/test_synthesis_client.py
+#
+# Unit-тесты для клиента джобов синтеза (api/clients.py): какие сбои
+# run_synthesis_job повторяет, а какие возвращает сразу; таймауты поллинга.
+# Запуск: python -m pytest final_system/tests/test_synthesis_client.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+import pytest
+
+from api.clients import SynthesisJobCancelled, SynthesisJobFailed, poll_synthesis_job, run_synthesis_job
+from shared.schemas.synthesis import JOB_ERROR_WORKER_CRASHED
+
+
+class _FakeClient:
+    """Synthesis Service: каждый POST /jobs — новый джоб со следующим исходом из outcomes."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.submitted = []
+
+    def post(self, path, **kwargs):
+        job_id = f"job-{len(self.submitted)}"
+        self.submitted.append(job_id)
+        return {"job_id": job_id}
+
+    def get(self, path, **kwargs):
+        outcome = self.outcomes[len(self.submitted) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def _not_found():
+    request = httpx.Request("GET", "http://synthesis/api/v1/jobs/x")
+    return httpx.HTTPStatusError("404", request=request, response=httpx.Response(404, request=request))
+
+
+DONE = {"status": "done", "synth_path": "synth/x.parquet"}
+
+
+@pytest.mark.parametrize("lost", [
+    _not_found(),
+    httpx.ConnectError("connection refused"),
+    {"status": "failed", "error_message": "exitcode=-9", "error_code": JOB_ERROR_WORKER_CRASHED},
+])
+def test_lost_or_crashed_job_is_resubmitted(lost):
+    client = _FakeClient([lost, DONE])
+    assert run_synthesis_job(client, {}, retries=1, poll_interval=0) == DONE
+    assert client.submitted == ["job-0", "job-1"]
+
+
+def test_training_error_is_not_resubmitted():
+    client = _FakeClient([{"status": "failed", "error_message": "bad config"}, DONE])
+    with pytest.raises(SynthesisJobFailed, match="bad config"):
+        run_synthesis_job(client, {}, retries=3, poll_interval=0)
+    assert client.submitted == ["job-0"]
+
+
+def test_cancelled_job_is_not_resubmitted():
+    client = _FakeClient([{"status": "cancelled"}, DONE])
+    with pytest.raises(SynthesisJobCancelled):
+        run_synthesis_job(client, {}, retries=3, poll_interval=0)
+    assert client.submitted == ["job-0"]
+
+
+def test_retries_exhausted():
+    crashed = {"status": "failed", "error_code": JOB_ERROR_WORKER_CRASHED}
+    client = _FakeClient([crashed, crashed, DONE])
+    with pytest.raises(SynthesisJobFailed):
+        run_synthesis_job(client, {}, retries=1, poll_interval=0)
+    assert client.submitted == ["job-0", "job-1"]
+
+
+class _SequenceClient:
+    """GET /jobs/{id} отдаёт статусы по очереди, последний — бесконечно."""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.polls = 0
+
+    def get(self, path, **kwargs):
+        self.polls += 1
+        return {"status": self.statuses[min(self.polls, len(self.statuses)) - 1]}
+
+
+def test_queue_wait_not_counted_against_training_timeout(monkeypatch):
+    monkeypatch.setattr("api.clients.time.sleep", lambda _: None)
+    client = _SequenceClient(["queued"] * 5 + ["running", "done"])
+    job = poll_synthesis_job(client, "j", poll_interval=10, timeout=20, queue_timeout=100)
+    assert job["status"] == "done"
+
+
+def test_stuck_queue_times_out(monkeypatch):
+    monkeypatch.setattr("api.clients.time.sleep", lambda _: None)
+    client = _SequenceClient(["queued"])
+    with pytest.raises(TimeoutError, match="queued"):
+        poll_synthesis_job(client, "j", poll_interval=10, timeout=20, queue_timeout=100)
+    assert client.polls == 10
@@ -0,0 +1,83 @@
+# final_system/tests/test_training_hooks.py
+#
+# Unit-тесты для отмены и чекпоинтов обучения (synthesizer/training.py)
+# Запуск: python -m pytest final_system/tests/test_training_hooks.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from synthesizer.training import (
+    CancellationToken,
+    TrainingCancelled,
+    TrainingHooks,
+    cancellation_scope,
+)
+
+
+def _train_steps(n_steps, on_step=None):
+    """Цикл «сторонней библиотеки»: ничего не знает о токене."""
+    model = torch.nn.Linear(3, 1)
+    opt = torch.optim.SGD(model.parameters(), lr=0.1)
+    x = torch.randn(8, 3)
+    for step in range(n_steps):
+        opt.zero_grad()
+        model(x).pow(2).mean().backward()
+        opt.step()
+        if on_step is not None:
+            on_step(step)
+    return n_steps
+
+
+def test_cancellation_scope_stops_library_loop():
+    token = CancellationToken()
+    hooks = TrainingHooks(cancel_token=token)
+    steps = []
+
+    def on_step(step):
+        steps.append(step)
+        if step == 2:
+            token.cancel()
+
+    with pytest.raises(TrainingCancelled):
+        with cancellation_scope(hooks):
+            _train_steps(100, on_step)
+    # остановка на первом шаге оптимизатора после отмены
+    assert steps == [0, 1, 2]
+
+    # вне scope и без токена хук ничего не делает
+    assert _train_steps(3) == 3
+    with cancellation_scope(None), cancellation_scope(TrainingHooks()):
+        assert _train_steps(3) == 3
+
+
+def test_cancel_is_per_thread():
+    token = CancellationToken()
+    results = {}
+
+    with pytest.raises(TrainingCancelled):
+        with cancellation_scope(TrainingHooks(cancel_token=token)):
+            token.cancel()
+            # обучение другого джоба в соседнем потоке токен не видит
+            t = threading.Thread(target=lambda: results.update(other=_train_steps(5)))
+            t.start()
+            t.join()
+            _train_steps(5)
+    assert results == {"other": 5}
+
+    # уже отменённый токен — обучение не начинается
+    with pytest.raises(TrainingCancelled):
+        with cancellation_scope(TrainingHooks(cancel_token=token)):
+            pass
+
+
+def test_checkpoint_due():
+    assert not TrainingHooks(checkpoint_every=2).checkpoint_due(2)
+    hooks = TrainingHooks(checkpoint_path="x.ckpt", checkpoint_every=3)
+    assert [e for e in range(1, 10) if hooks.checkpoint_due(e)] == [3, 6, 9]
+    assert not TrainingHooks(checkpoint_path="x.ckpt", checkpoint_every=0).checkpoint_due(5)
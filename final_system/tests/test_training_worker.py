@@ -0,0 +1,87 @@
+# final_system/tests/test_training_worker.py
+#
+# Unit-тесты для процессов обучения (services/synthesis_service/training_worker.py)
+# Запуск: python -m pytest final_system/tests/test_training_worker.py -v
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import threading
+import time
+
+from services.synthesis_service.job_store import JobStatus
+from services.synthesis_service.training_worker import WorkerPool
+from shared.schemas.synthesis import JOB_ERROR_WORKER_CRASHED
+from synthesizer.training import CancellationToken
+
+
+# Функции джобов выполняются в дочернем процессе (spawn) — на уровне модуля
+def _job(job_id, body, settings, token, report):
+    report(status=JobStatus.running)
+    if body == "crash":
+        os._exit(3)
+    if body == "wait_cancel":
+        while not token.cancelled:
+            time.sleep(0.05)
+        return
+    if body == "ignore_cancel":
+        time.sleep(60)
+    report(status=JobStatus.done, synth_path=f"synth/{job_id}", pid=os.getpid())
+
+
+class _Updates:
+    def __init__(self):
+        self.fields = {}
+
+    def __call__(self, **fields):
+        self.fields.update(fields)
+
+
+def _run(pool, job_id, body, token=None):
+    updates = _Updates()
+    pool.run(job_id, body, None, token or CancellationToken(), updates)
+    return updates.fields
+
+
+def test_results_and_recycling():
+    pool = WorkerPool(size=1, job_fn=_job, threads_per_job=1, max_jobs_per_worker=2)
+    try:
+        first = _run(pool, "j1", "ok")
+        second = _run(pool, "j2", "ok")
+        third = _run(pool, "j3", "ok")
+        assert first["status"] == JobStatus.done and first["synth_path"] == "synth/j1"
+        assert first["pid"] != os.getpid()
+        # два джоба в одном процессе, третий — уже в новом
+        assert first["pid"] == second["pid"] != third["pid"]
+        assert pool.stats()["recycled"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_crash_and_cancel():
+    pool = WorkerPool(size=1, job_fn=_job, threads_per_job=1, max_jobs_per_worker=10, cancel_grace_sec=2.0)
+    try:
+        crashed = _run(pool, "c", "crash")
+        assert crashed["status"] == JobStatus.failed
+        assert "exitcode=3" in crashed["error_message"]
+        assert crashed["error_code"] == JOB_ERROR_WORKER_CRASHED
+        assert pool.stats()["crashed"] == 1
+        pid = _run(pool, "warm", "ok")["pid"]   # замена запущена и прогрета
+
+        # кооперативная отмена — процесс остаётся в пуле
+        token = CancellationToken()
+        threading.Timer(0.3, token.cancel).start()
+        assert _run(pool, "w", "wait_cancel", token)["status"] == JobStatus.running
+        assert pool.stats()["busy"] == {}
+
+        # джоб не реагирует на отмену — процесс убит через cancel_grace_sec
+        token = CancellationToken()
+        threading.Timer(0.3, token.cancel).start()
+        t0 = time.monotonic()
+        assert "error_message" not in _run(pool, "i", "ignore_cancel", token)
+        assert time.monotonic() - t0 < 10
+
+        after = _run(pool, "after", "ok")
+        assert after["status"] == JobStatus.done and after["pid"] != pid
+    finally:
+        pool.shutdown()